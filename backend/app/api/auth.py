@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from sqlalchemy.orm import Session
-from app.db.sql import SessionLocal, User
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.sql import User, get_async_db
 from app.core.security import verify_password, get_password_hash, create_access_token
 from app.core.deps import get_current_user
 from app.api.schemas import UserSignup, UserLogin, Token, UserResponse
@@ -10,15 +11,6 @@ import re
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
-def get_db():
-    """Get database session"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def validate_email(email: str) -> bool:
     """Validate email format"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -33,7 +25,7 @@ def validate_password(password: str) -> tuple[bool, str]:
 
 
 @router.post("/signup", response_model=Token)
-async def signup(user_data: UserSignup, db: Session = Depends(get_db)):
+async def signup(user_data: UserSignup, db: AsyncSession = Depends(get_async_db)):
     """Create a new user account"""
     # Validate email format
     if not validate_email(user_data.email):
@@ -51,7 +43,7 @@ async def signup(user_data: UserSignup, db: Session = Depends(get_db)):
         )
     
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email.lower()).first()
+    existing_user = (await db.execute(select(User).filter(User.email == user_data.email.lower()))).scalars().first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -67,8 +59,8 @@ async def signup(user_data: UserSignup, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     # Create access token
     # JWT 'sub' claim must be a string, so convert user.id to string
@@ -81,10 +73,10 @@ async def signup(user_data: UserSignup, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Authenticate user and return JWT token"""
     # Find user by email
-    user = db.query(User).filter(User.email == user_data.email.lower()).first()
+    user = (await db.execute(select(User).filter(User.email == user_data.email.lower()))).scalars().first()
     
     if not user or not verify_password(user_data.password, user.hashed_password):
         raise HTTPException(
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Depends, Response
 from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Optional, List, List as ListType
 import uuid
@@ -12,6 +12,8 @@ from app.api.schemas import (
     ChatResponse,
     ProcessMultipleReceiptsResponse,
     CreateManualEntryRequest,
+    ImportLedgerEntriesRequest,
+    ImportLedgerEntriesResponse,
     PerspectiveAnalysisResponse,
     ClaimRightSchema,
     CreateClaimRightRequest,
@@ -20,21 +22,25 @@ from app.api.schemas import (
     ProcessAccrualsResponse,
 )
 from app.services.ocr_service import extract_text_from_image, extract_text_from_pdf
-from app.services.extraction_service import parse_receipt_text
-from app.services.classification_service import classify_transaction
+from app.services.extraction_service import parse_receipt_text, parse_receipt_texts_batch
+from app.services.classification_service import classify_transaction, classify_transactions_batch, CATEGORY_CHOICES
 from app.services.vector_service import (
-    create_embedding, store_document, check_duplicates, update_document_status, delete_document, document_exists
+    create_embedding, create_embeddings, store_document, check_duplicates, update_document_status, delete_document, document_exists
 )
-from app.services.llm_orchestrator import orchestrate
+from app.services.llm_orchestrator import orchestrate, validate_records_batch
 from app.services.ledger_service import (
-    create_ledger_entry, get_ledger_entries, get_ledger_entry, update_ledger_entry_status, delete_ledger_entry
+    create_ledger_entry, create_ledger_entries_bulk, get_ledger_entries, get_ledger_entries_page, get_ledger_entry, update_ledger_entry_status,
+    update_ledger_entry_category, delete_ledger_entry
 )
 from app.services.vector_service import find_similar_documents
+from app.utils.embedding_codec import decode_embedding
+from app.utils.cursor import NEXT_CURSOR_HEADER
 from app.db.mongodb import get_database
 from app.core.config import settings
 from app.services.perspective_service import analyze_perspective
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.deps import get_current_user
-from app.db.sql import User
+from app.db.sql import User, get_async_db, run_in_session
 
 logger = logging.getLogger(__name__)
 
@@ -65,13 +71,23 @@ async def stream_process_logs(record_id: str):
     )
 
 
+async def _persist_reconciliation_links(session: AsyncSession, user_id: int, record_id: str, reconciliation: dict):
+    """Store upload-time duplicate/counterparty matches in the reconciliation link graph"""
+    try:
+        from app.services.reconciliation_graph import record_reconciliation
+        await run_in_session(session, record_reconciliation, user_id, record_id, reconciliation)
+    except Exception as e:
+        logger.warning(f"Could not store reconciliation links for {record_id}: {e}")
+
+
 @router.post("/process-receipt", response_model=ProcessReceiptResponse)
 async def process_receipt(
     file: UploadFile = File(...),
     ocr_engine: str = Query(default="easyocr", description="OCR engine: tesseract or easyocr"),
     language: str = Query(default="en", description="OCR language: en (English), ja (Japanese), or en_ja (both)"),
     record_id: Optional[str] = Query(default=None, description="Optional record ID for log streaming"),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """
     Main endpoint to process a receipt/invoice through the complete pipeline:
@@ -164,7 +180,7 @@ async def process_receipt(
             
             # Step 2.5: Classify transaction using LLM
             if not structured_data.get("category"):
-                structured_data["category"] = await classify_transaction(structured_data)
+                structured_data["category"] = await classify_transaction(structured_data, current_user.id)
             
             # Step 3: Create embedding
             embedding = await create_embedding(raw_text)
@@ -179,6 +195,7 @@ async def process_receipt(
                 
                 # Store document but mark as duplicate
                 await store_document(record_id, structured_data, embedding, raw_text, current_user.id)
+                await _persist_reconciliation_links(session, current_user.id, record_id, reconciliation)
                 
                 # Update document with reconciliation info
                 db = get_database()
@@ -215,6 +232,7 @@ async def process_receipt(
             
             # Step 5: Store in vector DB
             await store_document(record_id, structured_data, embedding, raw_text, current_user.id)
+            await _persist_reconciliation_links(session, current_user.id, record_id, reconciliation)
             
             # Store reconciliation info in MongoDB
             db = get_database()
@@ -247,7 +265,9 @@ async def process_receipt(
             # Step 7: Store in ledger (always create entry, status depends on validation)
             ledger_entry_id = None
             try:
-                ledger_entry = create_ledger_entry(record_id, structured_data, orchestration_result, current_user.id)
+                ledger_entry = await run_in_session(
+                    session, create_ledger_entry, record_id, structured_data, orchestration_result, current_user.id
+                )
                 ledger_entry_id = ledger_entry.id
                 logger.info(f"Ledger entry created with ID: {ledger_entry_id}, Status: {ledger_entry.status}")
                 
@@ -311,7 +331,8 @@ async def process_multiple_receipts(
     files: ListType[UploadFile] = File(..., description="Multiple receipt/invoice files"),
     ocr_engine: str = Query(default="easyocr", description="OCR engine: tesseract or easyocr"),
     language: str = Query(default="en", description="OCR language: en (English), ja (Japanese), or en_ja (both)"),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """
     Process multiple receipts/invoices in batch
@@ -324,9 +345,10 @@ async def process_multiple_receipts(
         Batch processing results
     """
     results = []
-    successful = 0
     failed = 0
     
+    # Phase 1: OCR every file; a failing file only drops itself from the batch
+    pending = []
     for file in files:
         try:
             # Generate record ID
@@ -336,7 +358,6 @@ async def process_multiple_receipts(
             file_bytes = await file.read()
             file_ext = file.filename.split('.')[-1].lower() if file.filename else ''
             
-            # Step 1: OCR Extraction
             logger.info(f"Processing file {file.filename} with OCR engine: {ocr_engine}, language: {language}")
             if file_ext == 'pdf':
                 raw_text = await extract_text_from_pdf(file_bytes, language=language)
@@ -346,48 +367,110 @@ async def process_multiple_receipts(
             if not raw_text:
                 raise Exception("No text extracted from image")
             
-            # Step 2: Data Extraction
-            structured_data = await parse_receipt_text(raw_text)
-            structured_data["record_id"] = record_id
-            
-            # Step 2.5: Classify transaction
-            if not structured_data.get("category"):
-                structured_data["category"] = await classify_transaction(structured_data)
-            
-            # Step 3: Create embedding
-            embedding = await create_embedding(raw_text)
-            
-            # Step 4: Check for duplicates/reconciliation
-            reconciliation = await check_duplicates(record_id, embedding, current_user.id, structured_data)
-            
-            # Step 5: Store in vector DB
-            await store_document(record_id, structured_data, embedding, raw_text, current_user.id)
-            
-            # Step 6: LLM Orchestration
-            orchestration_result = await orchestrate(
-                structured_data,
-                reconciliation_info=reconciliation
+            pending.append({"filename": file.filename, "record_id": record_id, "raw_text": raw_text})
+        except Exception as e:
+            logger.error(f"Error processing file {file.filename}: {e}", exc_info=True)
+            failed += 1
+    
+    if pending:
+        # Phase 2: Data extraction, several receipts per LLM call
+        extracted = await parse_receipt_texts_batch([record["raw_text"] for record in pending])
+        for record, structured_data in zip(pending, extracted):
+            structured_data["record_id"] = record["record_id"]
+            record["structured_data"] = structured_data
+        
+        # Phase 3: Classify the transactions the extractor left uncategorised
+        unclassified = [record for record in pending if not record["structured_data"].get("category")]
+        if unclassified:
+            categories = await classify_transactions_batch(
+                [record["structured_data"] for record in unclassified], current_user.id
             )
-            
-            # Step 7: Store in ledger
-            ledger_entry_id = None
-            try:
-                ledger_entry = create_ledger_entry(record_id, structured_data, orchestration_result, current_user.id)
-                ledger_entry_id = ledger_entry.id
-                validation_status = orchestration_result["validation_result"]["status"]
-                if validation_status == "valid":
-                    await update_document_status(record_id, "validated", current_user.id)
-                else:
-                    await update_document_status(record_id, "pending_review", current_user.id)
-            except Exception as e:
-                logger.error(f"Error creating ledger entry: {e}", exc_info=True)
+            for record, category in zip(unclassified, categories):
+                record["structured_data"]["category"] = category
+    
+    # Phase 4: Embedding, duplicate check and storage run per record so later
+    # files in the batch are checked against earlier ones
+    stored = []
+    try:
+        # Every record's text in one encoder batch
+        embeddings = await create_embeddings([record["raw_text"] for record in pending]) if pending else []
+    except Exception as e:
+        logger.warning(f"Batch embedding failed, embedding records one by one: {e}")
+        embeddings = [None] * len(pending)
+    for record, embedding in zip(pending, embeddings):
+        try:
+            record_id = record["record_id"]
+            structured_data = record["structured_data"]
+            record["embedding"] = embedding if embedding is not None else await create_embedding(record["raw_text"])
+            record["reconciliation"] = await check_duplicates(
+                record_id, record["embedding"], current_user.id, structured_data
+            )
+            await store_document(record_id, structured_data, record["embedding"], record["raw_text"], current_user.id)
+            await _persist_reconciliation_links(session, current_user.id, record_id, record["reconciliation"])
+            stored.append(record)
+        except Exception as e:
+            logger.error(f"Error processing file {record['filename']}: {e}", exc_info=True)
+            failed += 1
+    
+    # Phase 5: Validation, several records per LLM call
+    validations = []
+    if stored:
+        validations = await validate_records_batch(
+            [record["structured_data"] for record in stored],
+            [record["reconciliation"] for record in stored]
+        )
+    
+    # Phase 6: Reasoning/explanation per record
+    orchestrated = []
+    for record, validation_result in zip(stored, validations):
+        try:
+            record["orchestration_result"] = await orchestrate(
+                record["structured_data"],
+                reconciliation_info=record["reconciliation"],
+                validation_result=validation_result
+            )
+            orchestrated.append(record)
+        except Exception as e:
+            logger.error(f"Error processing file {record['filename']}: {e}", exc_info=True)
+            failed += 1
+    
+    # Phase 7: Ledger entries for the whole batch in bulk, failures isolated per record
+    ledger_entry_ids = {}
+    if orchestrated:
+        try:
+            posting = await run_in_session(
+                session,
+                create_ledger_entries_bulk,
+                [(record["record_id"], record["structured_data"], record["orchestration_result"]) for record in orchestrated],
+                current_user.id
+            )
+            ledger_entry_ids = {posted["record_id"]: posted["ledger_entry_id"] for posted in posting["posted"]}
+            for failure in posting["failed"]:
+                logger.error(f"Error creating ledger entry for {failure['record_id']}: {failure['error']}")
+        except Exception as e:
+            logger.error(f"Error creating ledger entries: {e}", exc_info=True)
+    
+    for record in orchestrated:
+        try:
+            record_id = record["record_id"]
+            orchestration_result = record["orchestration_result"]
+            ledger_entry_id = ledger_entry_ids.get(record_id)
+            if ledger_entry_id:
+                try:
+                    validation_status = orchestration_result["validation_result"]["status"]
+                    if validation_status == "valid":
+                        await update_document_status(record_id, "validated", current_user.id)
+                    else:
+                        await update_document_status(record_id, "pending_review", current_user.id)
+                except Exception as e:
+                    logger.error(f"Error updating document status: {e}", exc_info=True)
             
             results.append(ProcessReceiptResponse(
                 record_id=record_id,
-                raw_text=raw_text[:500],
-                structured_data=structured_data,
-                embedding=embedding[:10],
-                reconciliation=reconciliation,
+                raw_text=record["raw_text"][:500],
+                structured_data=record["structured_data"],
+                embedding=record["embedding"][:10],
+                reconciliation=record["reconciliation"],
                 validation=orchestration_result["validation_result"],
                 reasoning_trace=orchestration_result["reasoning_trace"],
                 explanation=orchestration_result["explanation"],
@@ -395,12 +478,12 @@ async def process_multiple_receipts(
                 ledger_entry_id=ledger_entry_id,
                 status="validated" if ledger_entry_id else "pending_review"
             ))
-            successful += 1
-            
         except Exception as e:
-            logger.error(f"Error processing file {file.filename}: {e}", exc_info=True)
+            logger.error(f"Error processing file {record['filename']}: {e}", exc_info=True)
             failed += 1
     
+    successful = len(results)
+    
     return ProcessMultipleReceiptsResponse(
         total=len(files),
         successful=successful,
@@ -411,17 +494,30 @@ async def process_multiple_receipts(
 
 @router.get("/ledger", response_model=List[LedgerEntryResponse])
 async def get_ledger(
-    skip: int = Query(default=0, ge=0),
+    response: Response,
+    skip: int = Query(default=0, ge=0, description="Legacy offset paging; prefer cursor"),
     limit: int = Query(default=100, ge=1, le=1000),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor of the previous page"),
     status: Optional[str] = Query(default=None),
     vendor: Optional[str] = Query(default=None),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
-    """Get ledger entries with optional filters"""
+    """
+    Get ledger entries with optional filters, newest first. When there are
+    more, the X-Next-Cursor response header holds the cursor of the next page.
+    """
     try:
-        entries = get_ledger_entries(current_user.id, skip=skip, limit=limit, status=status, vendor=vendor)
-        logger.info(f"Retrieved {len(entries)} ledger entries (skip={skip}, limit={limit}, status={status})")
+        entries, next_cursor = await run_in_session(
+            session, get_ledger_entries_page,
+            current_user.id, limit=limit, cursor=cursor, skip=skip, status=status, vendor=vendor
+        )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        logger.info(f"Retrieved {len(entries)} ledger entries (skip={skip}, cursor={bool(cursor)}, limit={limit}, status={status})")
         return [LedgerEntryResponse(**entry) for entry in entries]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching ledger: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -430,10 +526,11 @@ async def get_ledger(
 @router.get("/ledger/{record_id}", response_model=LedgerEntryResponse)
 async def get_ledger_entry_by_id(
     record_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Get specific ledger entry by record_id"""
-    entry = get_ledger_entry(record_id, current_user.id)
+    entry = await run_in_session(session, get_ledger_entry, record_id, current_user.id)
     if not entry:
         raise HTTPException(status_code=404, detail="Ledger entry not found")
     return LedgerEntryResponse(**entry)
@@ -487,12 +584,12 @@ async def get_ledger_entry_perspective(
     # Vector reconciliation: detect duplicates or counterpart transactions
     # ------------------------------------------------------------------
     try:
-        embedding = doc.get("embedding") or []
-        if embedding:
+        embedding = decode_embedding(doc)
+        if embedding is not None:
             # Use same helper as other parts of the system
-            similar_docs = await find_similar_documents(embedding, current_user.id, threshold=0.95, limit=5)
-            # Exclude self
-            similar_docs = [d for d in similar_docs if d.get("record_id") != record_id]
+            similar_docs = await find_similar_documents(
+                embedding, current_user.id, threshold=0.95, limit=5, exclude_record_id=record_id
+            )
 
             if similar_docs:
                 top = similar_docs[0]
@@ -544,23 +641,56 @@ async def get_ledger_entry_perspective(
     return PerspectiveAnalysisResponse(**perspective)
 
 
+@router.put("/ledger/{record_id}/category")
+async def update_ledger_entry_category_endpoint(
+    record_id: str,
+    category: str = Query(..., description="New category (one of the classification categories)"),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """Update ledger entry category (corrections also retrain the user's vendor memo)"""
+    if category not in CATEGORY_CHOICES:
+        raise HTTPException(status_code=400, detail=f"Category must be one of: {', '.join(CATEGORY_CHOICES)}")
+    
+    if not await run_in_session(session, update_ledger_entry_category, record_id, category, current_user.id):
+        raise HTTPException(status_code=404, detail="Ledger entry not found")
+    
+    # Keep the stored document in MongoDB in sync
+    mongo_updated = False
+    db = get_database()
+    if db is not None:
+        result = await db.receipts.update_one(
+            {"record_id": record_id, "user_id": current_user.id},
+            {"$set": {"structured_data.category": category, "updated_at": datetime.utcnow()}}
+        )
+        mongo_updated = result.matched_count > 0
+    
+    return {
+        "message": f"Entry category updated to {category}",
+        "record_id": record_id,
+        "category": category,
+        "mongo_updated": mongo_updated
+    }
+
+
 @router.put("/ledger/{record_id}/status")
 async def update_ledger_entry_status_endpoint(
     record_id: str,
     status: str = Query(..., description="New status: validated, pending, or rejected"),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Update ledger entry status"""
     try:
         if status not in ["validated", "pending", "rejected"]:
             raise HTTPException(status_code=400, detail="Status must be one of: validated, pending, rejected")
         
-        entry = get_ledger_entry(record_id, current_user.id)
+        entry = await run_in_session(session, get_ledger_entry, record_id, current_user.id)
         if not entry:
             raise HTTPException(status_code=404, detail="Ledger entry not found")
         
         # Update in MySQL
-        mysql_updated = update_ledger_entry_status(record_id, status)
+        mysql_updated = await run_in_session(session, update_ledger_entry_status, record_id, status, current_user.id)
         if not mysql_updated:
             raise HTTPException(status_code=404, detail="Ledger entry not found in MySQL")
         
@@ -568,12 +698,12 @@ async def update_ledger_entry_status_endpoint(
         vector_status = "validated" if status == "validated" else "pending_review" if status == "pending" else "rejected"
         
         # Check if document exists in MongoDB first
-        mongo_exists = await document_exists(record_id)
+        mongo_exists = await document_exists(record_id, current_user.id)
         if not mongo_exists:
             logger.warning(f"Document {record_id} does not exist in MongoDB. It may have been created before MongoDB was set up, or record_id mismatch.")
             mongo_updated = False
         else:
-            mongo_updated = await update_document_status(record_id, vector_status)
+            mongo_updated = await update_document_status(record_id, vector_status, current_user.id)
             if not mongo_updated:
                 logger.warning(f"MySQL update succeeded but MongoDB update failed for record_id: {record_id}")
         
@@ -594,18 +724,19 @@ async def update_ledger_entry_status_endpoint(
 @router.post("/ledger/{record_id}/approve")
 async def approve_ledger_entry(
     record_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Approve a pending ledger entry (deprecated - use PUT /ledger/{record_id}/status instead)"""
     try:
-        entry = get_ledger_entry(record_id, current_user.id)
+        entry = await run_in_session(session, get_ledger_entry, record_id, current_user.id)
         if not entry:
             raise HTTPException(status_code=404, detail="Ledger entry not found")
         
         if entry["status"] == "pending":
             # Create ledger entry if not exists
             # This would require fetching the original structured data
-            update_ledger_entry_status(record_id, "validated", current_user.id)
+            await run_in_session(session, update_ledger_entry_status, record_id, "validated", current_user.id)
             await update_document_status(record_id, "validated", current_user.id)
             return {"message": "Entry approved and validated"}
         else:
@@ -618,16 +749,17 @@ async def approve_ledger_entry(
 @router.delete("/ledger/{record_id}")
 async def delete_ledger_entry_endpoint(
     record_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Delete a ledger entry from both MySQL and MongoDB vector database"""
     try:
-        entry = get_ledger_entry(record_id, current_user.id)
+        entry = await run_in_session(session, get_ledger_entry, record_id, current_user.id)
         if not entry:
             raise HTTPException(status_code=404, detail="Ledger entry not found")
         
         # Delete from MySQL
-        mysql_deleted = delete_ledger_entry(record_id, current_user.id)
+        mysql_deleted = await run_in_session(session, delete_ledger_entry, record_id, current_user.id)
         
         # Delete from MongoDB vector DB
         mongo_exists = await document_exists(record_id, current_user.id)
@@ -637,6 +769,12 @@ async def delete_ledger_entry_endpoint(
             logger.info(f"Document {record_id} does not exist in MongoDB, skipping MongoDB deletion")
             mongo_deleted = False
         
+        try:
+            from app.services.reconciliation_graph import remove_record
+            await run_in_session(session, remove_record, current_user.id, record_id)
+        except Exception as e:
+            logger.warning(f"Could not remove reconciliation links for {record_id}: {e}")
+        
         if mysql_deleted or mongo_deleted:
             return {
                 "message": "Entry deleted successfully",
@@ -654,16 +792,18 @@ async def delete_ledger_entry_endpoint(
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat_with_ledger(message: ChatMessage):
+async def chat_with_ledger(
+    message: ChatMessage,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
+):
     """
     RAG chatbot for querying ledger and receipts using LLM (Gemini)
     """
     try:
-        from app.core.llm import get_llm
+        from app.core.llm_gateway import invoke_llm
         from langchain.schema import HumanMessage
         
-        # Get LLM with specified model (defaults to settings.LLM_MODEL)
-        llm = get_llm(model=message.model)
         db = get_database()
         if db is None:
             raise HTTPException(status_code=500, detail="MongoDB database not connected")
@@ -673,7 +813,7 @@ async def chat_with_ledger(message: ChatMessage):
         query_embedding = await create_embedding(message.message)
         
         # Find relevant documents
-        similar_docs = await find_similar_documents(query_embedding, threshold=0.5, limit=5)
+        similar_docs = await find_similar_documents(query_embedding, current_user.id, threshold=0.5, limit=5)
         
         # Build context from similar documents
         context = ""
@@ -693,7 +833,7 @@ async def chat_with_ledger(message: ChatMessage):
         
         # Get ledger summary if no specific record
         if not message.record_id:
-            ledger_entries = get_ledger_entries(current_user.id, limit=10)
+            ledger_entries = await run_in_session(session, get_ledger_entries, current_user.id, limit=10)
             if ledger_entries:
                 context += "\n\nRecent Ledger Entries:\n"
                 for entry in ledger_entries[:5]:
@@ -710,7 +850,8 @@ User Question: {message.message}
 
 Provide a helpful, accurate answer based on the context. If the information is not available, say so clearly."""
         
-        response = llm.invoke([HumanMessage(content=prompt)])
+        # Use the requested model (defaults to settings.LLM_MODEL) through the hedged gateway
+        response = await invoke_llm([HumanMessage(content=prompt)], timeout=30.0, model=message.model)
         
         return ChatResponse(
             response=response.content,
@@ -723,28 +864,20 @@ Provide a helpful, accurate answer based on the context. If the information is n
 
 
 @router.get("/stats")
-async def get_stats(current_user: User = Depends(get_current_user)):
-    """Get statistics about the ledger"""
+async def get_stats(
+    start_date: Optional[str] = Query(default=None, description="Only receipts dated on or after this date"),
+    end_date: Optional[str] = Query(default=None, description="Only receipts dated on or before this date"),
+    by_category: bool = Query(default=False, description="Include count and USD total per category"),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """Get statistics about the ledger, aggregated in the database"""
     try:
-        entries = get_ledger_entries(current_user.id, limit=10000)
-        
-        total_entries = len(entries)
-        # Use USD totals for aggregation to handle multi-currency
-        total_amount = sum(e.get("usd_total", e.get("total", 0)) or 0 for e in entries)
-        validated_count = sum(1 for e in entries if e.get("status") == "validated")
-        pending_count = sum(1 for e in entries if e.get("status") == "pending")
-        
-        # Get unique vendors
-        vendors = set(e.get("vendor") for e in entries if e.get("vendor"))
-        
-        return {
-            "total_entries": total_entries,
-            "validated_entries": validated_count,
-            "pending_entries": pending_count,
-            "total_amount": total_amount,  # In USD
-            "unique_vendors": len(vendors),
-            "average_transaction": total_amount / total_entries if total_entries > 0 else 0
-        }
+        from app.services.stats_service import get_ledger_stats
+        start, end = _parse_report_date(start_date, "start_date"), _parse_report_date(end_date, "end_date")
+        return await run_in_session(session, get_ledger_stats, current_user.id, start, end, by_category)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -760,7 +893,7 @@ async def convert_currency(
     Convert currency amount using LLM to get current exchange rate
     """
     try:
-        from app.core.llm import get_llm
+        from app.core.llm_gateway import invoke_llm
         from langchain.schema import HumanMessage
         import json
         import asyncio
@@ -774,8 +907,6 @@ async def convert_currency(
                 "converted_amount": amount
             }
         
-        llm = get_llm()
-        
         prompt = f"""You are a currency conversion expert. Convert {amount} {from_currency} to {to_currency}.
 
 Provide the current exchange rate and converted amount in the following JSON format:
@@ -792,14 +923,7 @@ Use realistic current exchange rates. For example:
 
 Return ONLY the JSON object, no additional text."""
         
-        def call_llm():
-            return llm.invoke([HumanMessage(content=prompt)])
-        
-        loop = asyncio.get_event_loop()
-        response = await asyncio.wait_for(
-            loop.run_in_executor(None, call_llm),
-            timeout=15.0
-        )
+        response = await invoke_llm([HumanMessage(content=prompt)], timeout=15.0)
         response_text = response.content
         
         # Parse JSON
@@ -825,10 +949,57 @@ Return ONLY the JSON object, no additional text."""
         raise HTTPException(status_code=500, detail=f"Error converting currency: {str(e)}")
 
 
+def _manual_structured_data(record_id: str, entry_data: CreateManualEntryRequest) -> dict:
+    """Structured data of a user-entered (manual or imported) ledger entry"""
+    return {
+        "record_id": record_id,
+        "vendor": entry_data.vendor,
+        "date": entry_data.date,
+        "amount": entry_data.amount or entry_data.total,
+        "tax": entry_data.tax,
+        "total": entry_data.total,
+        "currency": entry_data.currency,
+        "category": entry_data.category,
+        "payment_method": entry_data.payment_method,
+        "invoice_number": entry_data.invoice_number,
+        "description": entry_data.description or f"Manual entry: {entry_data.vendor}",
+        "items": [
+            {
+                "name": item.name,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price,
+                "line_total": item.line_total or (item.quantity * item.unit_price)
+            }
+            for item in entry_data.items
+        ]
+    }
+
+
+def _manual_orchestration_result(currency: str) -> dict:
+    """Minimal orchestration result for entries the user created themselves"""
+    return {
+        "validation_result": {
+            "status": "valid",
+            "issues": [],
+            "confidence": 1.0,
+            "reasoning": "Manual entry created by user",
+            "currency": currency,
+            "currency_validated": True
+        },
+        "reasoning_trace": {
+            "steps": [{"step": 1, "action": "manual_entry", "observation": "User created manual entry", "conclusion": "Entry validated"}],
+            "final_conclusion": "Manual entry created and validated",
+            "confidence_score": 1.0,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    }
+
+
 @router.post("/ledger/manual", response_model=LedgerEntryResponse)
 async def create_manual_entry(
     entry_data: CreateManualEntryRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a manual ledger entry without OCR processing
@@ -841,28 +1012,7 @@ async def create_manual_entry(
         record_id = f"manual_{uuid.uuid4().hex[:12]}"
         
         # Prepare structured data
-        structured_data = {
-            "record_id": record_id,
-            "vendor": entry_data.vendor,
-            "date": entry_data.date,
-            "amount": entry_data.amount or entry_data.total,
-            "tax": entry_data.tax,
-            "total": entry_data.total,
-            "currency": entry_data.currency,
-            "category": entry_data.category,
-            "payment_method": entry_data.payment_method,
-            "invoice_number": entry_data.invoice_number,
-            "description": entry_data.description or f"Manual entry: {entry_data.vendor}",
-            "items": [
-                {
-                    "name": item.name,
-                    "quantity": item.quantity,
-                    "unit_price": item.unit_price,
-                    "line_total": item.line_total or (item.quantity * item.unit_price)
-                }
-                for item in entry_data.items
-            ]
-        }
+        structured_data = _manual_structured_data(record_id, entry_data)
         
         # Calculate exchange rate and USD equivalent if not USD
         exchange_rate = 1.0
@@ -871,12 +1021,10 @@ async def create_manual_entry(
         if entry_data.currency != "USD":
             # Use LLM to get exchange rate
             try:
-                from app.core.llm import get_llm
+                from app.core.llm_gateway import invoke_llm
                 from langchain.schema import HumanMessage
                 import json
-                import asyncio
                 
-                llm = get_llm()
                 prompt = f"""What is the current exchange rate from {entry_data.currency} to USD?
                 
 Return ONLY a JSON object:
@@ -887,14 +1035,7 @@ Return ONLY a JSON object:
 
 Use realistic current exchange rates."""
                 
-                def call_llm():
-                    return llm.invoke([HumanMessage(content=prompt)])
-                
-                loop = asyncio.get_event_loop()
-                response = await asyncio.wait_for(
-                    loop.run_in_executor(None, call_llm),
-                    timeout=10.0
-                )
+                response = await invoke_llm([HumanMessage(content=prompt)], timeout=10.0)
                 response_text = response.content
                 
                 if "```json" in response_text:
@@ -921,30 +1062,16 @@ Use realistic current exchange rates."""
         structured_data["exchange_rate"] = exchange_rate
         structured_data["usd_equivalent"] = usd_total
         
-        # Create a minimal orchestration result for manual entries
         # Manual entries are considered validated by default
-        orchestration_result = {
-            "validation_result": {
-                "status": "valid",
-                "issues": [],
-                "confidence": 1.0,
-                "reasoning": "Manual entry created by user",
-                "currency": entry_data.currency,
-                "currency_validated": True
-            },
-            "reasoning_trace": {
-                "steps": [{"step": 1, "action": "manual_entry", "observation": "User created manual entry", "conclusion": "Entry validated"}],
-                "final_conclusion": "Manual entry created and validated",
-                "confidence_score": 1.0,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-        }
+        orchestration_result = _manual_orchestration_result(entry_data.currency)
         
         # Create ledger entry
-        ledger_entry = create_ledger_entry(record_id, structured_data, orchestration_result, current_user.id)
+        ledger_entry = await run_in_session(
+            session, create_ledger_entry, record_id, structured_data, orchestration_result, current_user.id
+        )
         
         # Get the created entry with items
-        entry_dict = get_ledger_entry(record_id, current_user.id)
+        entry_dict = await run_in_session(session, get_ledger_entry, record_id, current_user.id)
         if not entry_dict:
             raise HTTPException(status_code=500, detail="Failed to retrieve created entry")
         
@@ -955,6 +1082,47 @@ Use realistic current exchange rates."""
         raise HTTPException(status_code=500, detail=f"Error creating manual entry: {str(e)}")
 
 
+@router.post("/ledger/import", response_model=ImportLedgerEntriesResponse)
+async def import_ledger_entries(
+    request: ImportLedgerEntriesRequest,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """
+    Import historical entries in bulk. Entries are posted like manual entries
+    (validated, with items and a journal entry) but with bulk inserts, one
+    transaction per chunk. A bad entry fails on its own; the rest are posted.
+    Non-USD entries need usd_total or exchange_rate (no rate lookup is made).
+    """
+    try:
+        from app.services.accounting_service import initialize_chart_of_accounts
+        await run_in_session(session, initialize_chart_of_accounts, current_user.id)
+        
+        records, errors = [], []
+        for index, entry_data in enumerate(request.entries):
+            record_id = entry_data.record_id or f"import_{uuid.uuid4().hex[:12]}"
+            structured_data = _manual_structured_data(record_id, entry_data)
+            try:
+                structured_data["exchange_rate"], structured_data["usd_equivalent"] = entry_data.usd_conversion()
+            except ValueError as e:
+                errors.append({"record_id": record_id, "error": f"Entry {index}: {e}"})
+                continue
+            records.append((record_id, structured_data, _manual_orchestration_result(entry_data.currency)))
+        
+        posting = await run_in_session(session, create_ledger_entries_bulk, records, current_user.id)
+        errors.extend(posting["failed"])
+        return ImportLedgerEntriesResponse(
+            total=len(request.entries),
+            posted=len(posting["posted"]),
+            failed=len(errors),
+            results=posting["posted"],
+            errors=errors
+        )
+    except Exception as e:
+        logger.error(f"Error importing ledger entries: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error importing ledger entries: {str(e)}")
+
+
 @router.get("/health/mongodb")
 async def check_mongodb_health():
     """Check MongoDB connection and document count"""
@@ -988,24 +1156,81 @@ async def check_mongodb_health():
         }
 
 
+@router.get("/health/llm")
+async def check_llm_health():
+    """Report per-provider LLM health: circuit state, rolling latency and hedge counts"""
+    from app.core.llm_gateway import get_llm_health
+    return get_llm_health()
+
+
+@router.get("/health/vectors")
+async def check_vector_health():
+    """Report the active vector store backend, local index size and latency, and blocking-key hit rate"""
+    from app.services.vector_index import get_vector_index_stats
+    from app.services.vector_service import get_blocking_stats
+    from app.services.vector_store import get_vector_store_info
+    return {
+        "vector_store": get_vector_store_info(),
+        "vector_index_enabled": settings.VECTOR_INDEX_ENABLED,
+        "vector_index": get_vector_index_stats(),
+        "duplicate_blocking": get_blocking_stats()
+    }
+
+
+@router.get("/health/embeddings")
+async def check_embedding_health():
+    """
+    Report embedding cache hit rate, micro-batcher batch sizes, queue latency
+    and encode time, and how often the vendor memo and local classifier avoid
+    an LLM call
+    """
+    from app.services.embedding_service import get_embedding_stats
+    from app.services.embedding_cache import get_embedding_cache_stats
+    from app.services.local_classifier import get_local_classifier_stats
+    from app.services.vendor_memo import get_vendor_memo_stats
+    return {
+        "batch_max_size": settings.EMBEDDING_BATCH_MAX_SIZE,
+        "batch_window_ms": settings.EMBEDDING_BATCH_WINDOW_MS,
+        "embedding_service": get_embedding_stats(),
+        "embedding_cache": get_embedding_cache_stats(),
+        "local_classifier": get_local_classifier_stats(),
+        "vendor_memo": get_vendor_memo_stats()
+    }
+
+
+@router.get("/health/posting")
+async def check_posting_health():
+    """Report ledger postings (entry + items + journal per transaction) and the chart of accounts cache"""
+    from app.services.posting_service import get_posting_stats
+    from app.services.accounting_service import get_chart_cache_stats
+    return {
+        "posting": get_posting_stats(),
+        "chart_cache": get_chart_cache_stats()
+    }
+
+
 # =============================================================================
 # Double-Entry Accounting Endpoints
 # =============================================================================
 
 from app.api.schemas import (
     AccountSchema, JournalEntrySchema, CreateAccountRequest,
-    TrialBalanceResponse, IncomeStatementResponse, BalanceSheetResponse
+    TrialBalanceResponse, IncomeStatementResponse, BalanceSheetResponse, FinancialReportsResponse,
+    PeriodCloseSchema, ClosePeriodsRequest, ClosePeriodsResponse
 )
 
 
 @router.get("/accounts", response_model=List[AccountSchema])
-async def get_accounts():
+async def get_accounts(
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
+):
     """Get all accounts in the Chart of Accounts with their current balances"""
     try:
         from app.services.accounting_service import get_all_accounts, initialize_chart_of_accounts
         # Ensure chart of accounts exists
-        initialize_chart_of_accounts()
-        accounts = get_all_accounts()
+        await run_in_session(session, initialize_chart_of_accounts, current_user.id)
+        accounts = await run_in_session(session, get_all_accounts, current_user.id)
         return accounts
     except Exception as e:
         logger.error(f"Error getting accounts: {e}", exc_info=True)
@@ -1013,43 +1238,39 @@ async def get_accounts():
 
 
 @router.post("/accounts", response_model=AccountSchema)
-async def create_account(account_data: CreateAccountRequest):
+async def create_account(
+    account_data: CreateAccountRequest,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
+):
     """Create a new account in the Chart of Accounts"""
     try:
-        from app.services.accounting_service import get_account_by_code
-        from app.db.sql import SessionLocal, Account
+        from app.services.accounting_service import create_account as create_chart_account
         
-        # Check if account code already exists
-        existing = get_account_by_code(account_data.code)
-        if existing:
-            raise HTTPException(status_code=400, detail=f"Account with code {account_data.code} already exists")
-        
-        db = SessionLocal()
         try:
-            account = Account(
+            account = await run_in_session(
+                session,
+                create_chart_account,
+                current_user.id,
                 code=account_data.code,
                 name=account_data.name,
                 account_type=account_data.account_type,
                 parent_id=account_data.parent_id,
-                description=account_data.description,
-                is_active=True
+                description=account_data.description
             )
-            db.add(account)
-            db.commit()
-            db.refresh(account)
-            
-            return {
-                "id": account.id,
-                "code": account.code,
-                "name": account.name,
-                "account_type": account.account_type,
-                "parent_id": account.parent_id,
-                "description": account.description,
-                "balance": 0.0,
-                "normal_balance": "debit" if account.account_type in ["asset", "expense"] else "credit"
-            }
-        finally:
-            db.close()
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        return {
+            "id": account.id,
+            "code": account.code,
+            "name": account.name,
+            "account_type": account.account_type,
+            "parent_id": account.parent_id,
+            "description": account_data.description,
+            "balance": 0.0,
+            "normal_balance": account.normal_balance
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -1058,29 +1279,25 @@ async def create_account(account_data: CreateAccountRequest):
 
 
 @router.get("/accounts/{account_id}/balance")
-async def get_account_balance(account_id: int):
+async def get_account_balance(account_id: int, session: AsyncSession = Depends(get_async_db)):
     """Get current balance for a specific account"""
     try:
         from app.services.accounting_service import calculate_account_balance
-        from app.db.sql import SessionLocal, Account
+        from app.db.sql import Account
         
-        db = SessionLocal()
-        try:
-            account = db.query(Account).filter(Account.id == account_id).first()
-            if not account:
-                raise HTTPException(status_code=404, detail="Account not found")
-            
-            balance = calculate_account_balance(account_id)
-            return {
-                "account_id": account_id,
-                "account_code": account.code,
-                "account_name": account.name,
-                "account_type": account.account_type,
-                "balance": balance,
-                "normal_balance": "debit" if account.account_type in ["asset", "expense"] else "credit"
-            }
-        finally:
-            db.close()
+        account = await session.get(Account, account_id)
+        if not account:
+            raise HTTPException(status_code=404, detail="Account not found")
+        
+        balance = await run_in_session(session, calculate_account_balance, account_id)
+        return {
+            "account_id": account_id,
+            "account_code": account.code,
+            "account_name": account.name,
+            "account_type": account.account_type,
+            "balance": balance,
+            "normal_balance": "debit" if account.account_type in ["asset", "expense"] else "credit"
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -1089,25 +1306,24 @@ async def get_account_balance(account_id: int):
 
 
 @router.get("/ledger/{record_id}/journal", response_model=JournalEntrySchema)
-async def get_ledger_journal_entry(record_id: str):
+async def get_ledger_journal_entry(record_id: str, session: AsyncSession = Depends(get_async_db)):
     """Get the journal entry for a specific ledger entry"""
     try:
+        from sqlalchemy import select
         from app.services.accounting_service import get_journal_entry_by_ledger_entry
-        from app.db.sql import SessionLocal, LedgerEntry
+        from app.db.sql import LedgerEntry
         
-        db = SessionLocal()
-        try:
-            ledger = db.query(LedgerEntry).filter(LedgerEntry.record_id == record_id).first()
-            if not ledger:
-                raise HTTPException(status_code=404, detail="Ledger entry not found")
-            
-            journal = get_journal_entry_by_ledger_entry(ledger.id)
-            if not journal:
-                raise HTTPException(status_code=404, detail="No journal entry found for this ledger entry")
-            
-            return journal
-        finally:
-            db.close()
+        ledger_id = (await session.execute(
+            select(LedgerEntry.id).filter(LedgerEntry.record_id == record_id)
+        )).scalars().first()
+        if not ledger_id:
+            raise HTTPException(status_code=404, detail="Ledger entry not found")
+        
+        journal = await run_in_session(session, get_journal_entry_by_ledger_entry, ledger_id)
+        if not journal:
+            raise HTTPException(status_code=404, detail="No journal entry found for this ledger entry")
+        
+        return journal
     except HTTPException:
         raise
     except Exception as e:
@@ -1117,71 +1333,168 @@ async def get_ledger_journal_entry(record_id: str):
 
 @router.get("/journal-entries")
 async def get_journal_entries(
-    skip: int = Query(default=0, ge=0),
-    limit: int = Query(default=100, ge=1, le=1000)
+    response: Response,
+    skip: int = Query(default=0, ge=0, description="Legacy offset paging; prefer cursor"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor of the previous page"),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
-    """Get all journal entries with pagination"""
+    """
+    Get the user's journal entries, latest first. When there are more, the
+    X-Next-Cursor response header holds the cursor of the next page.
+    """
     try:
-        from app.db.sql import SessionLocal, JournalEntry
-        from sqlalchemy.orm import joinedload
-        from app.services.accounting_service import format_journal_entry
-        
-        db = SessionLocal()
-        try:
-            entries = db.query(JournalEntry).options(
-                joinedload(JournalEntry.lines)
-            ).order_by(JournalEntry.entry_date.desc()).offset(skip).limit(limit).all()
-            
-            return [format_journal_entry(entry) for entry in entries]
-        finally:
-            db.close()
+        from app.services.accounting_service import get_journal_entries_page
+        entries, next_cursor = await run_in_session(
+            session, get_journal_entries_page, current_user.id, limit=limit, cursor=cursor, skip=skip
+        )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return entries
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting journal entries: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _parse_report_date(value: Optional[str], name: str):
+    """Optional ISO date query parameter for the reports"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO date (YYYY-MM-DD)")
+
+
 @router.get("/reports/trial-balance", response_model=TrialBalanceResponse)
-async def get_trial_balance_report():
+async def get_trial_balance_report(
+    start_date: Optional[str] = Query(default=None, description="Only journal lines on or after this date"),
+    end_date: Optional[str] = Query(default=None, description="Only journal lines on or before this date"),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
+):
     """Generate a Trial Balance report - sum of all debits should equal sum of all credits"""
     try:
         from app.services.accounting_service import get_trial_balance, initialize_chart_of_accounts
-        initialize_chart_of_accounts()
-        return get_trial_balance()
+        start, end = _parse_report_date(start_date, "start_date"), _parse_report_date(end_date, "end_date")
+        await run_in_session(session, initialize_chart_of_accounts, current_user.id)
+        return await run_in_session(session, get_trial_balance, current_user.id, start, end)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating trial balance: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/reports/income-statement", response_model=IncomeStatementResponse)
-async def get_income_statement_report():
+async def get_income_statement_report(
+    start_date: Optional[str] = Query(default=None, description="Period start (inclusive)"),
+    end_date: Optional[str] = Query(default=None, description="Period end (inclusive)"),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
+):
     """Generate an Income Statement (Profit & Loss) report"""
     try:
         from app.services.accounting_service import get_income_statement, initialize_chart_of_accounts
-        initialize_chart_of_accounts()
-        return get_income_statement()
+        start, end = _parse_report_date(start_date, "start_date"), _parse_report_date(end_date, "end_date")
+        await run_in_session(session, initialize_chart_of_accounts, current_user.id)
+        return await run_in_session(session, get_income_statement, current_user.id, start, end)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating income statement: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/reports/balance-sheet", response_model=BalanceSheetResponse)
-async def get_balance_sheet_report():
+async def get_balance_sheet_report(
+    end_date: Optional[str] = Query(default=None, description="Balance sheet as of this date"),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
+):
     """Generate a Balance Sheet report - Assets = Liabilities + Equity"""
     try:
         from app.services.accounting_service import get_balance_sheet, initialize_chart_of_accounts
-        initialize_chart_of_accounts()
-        return get_balance_sheet()
+        end = _parse_report_date(end_date, "end_date")
+        await run_in_session(session, initialize_chart_of_accounts, current_user.id)
+        return await run_in_session(session, get_balance_sheet, current_user.id, end)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating balance sheet: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/reports/financial-statements", response_model=FinancialReportsResponse)
+async def get_financial_statements_report(
+    start_date: Optional[str] = Query(default=None, description="Period start for the trial balance and income statement"),
+    end_date: Optional[str] = Query(default=None, description="Period end; the balance sheet is as of this date"),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """Trial balance, income statement and balance sheet from one shared aggregate"""
+    try:
+        from app.services.accounting_service import get_financial_reports, initialize_chart_of_accounts
+        start, end = _parse_report_date(start_date, "start_date"), _parse_report_date(end_date, "end_date")
+        await run_in_session(session, initialize_chart_of_accounts, current_user.id)
+        return await run_in_session(session, get_financial_reports, current_user.id, start, end)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating financial statements: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/periods/close", response_model=ClosePeriodsResponse)
+async def close_accounting_periods(
+    request: ClosePeriodsRequest,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """
+    Close months or quarters: snapshot every account's balance at each period
+    end so as-of reports only aggregate the lines after the latest snapshot.
+    Reopened periods (back-dated entries) are recomputed.
+    """
+    try:
+        from app.services.period_close_service import close_periods, PERIOD_TYPES
+        if request.period_type not in PERIOD_TYPES:
+            raise HTTPException(status_code=400, detail=f"period_type must be one of {', '.join(PERIOD_TYPES)}")
+        through = _parse_report_date(request.through, "through")
+        return {"closed": await run_in_session(session, close_periods, current_user.id, through, request.period_type)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error closing periods: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/periods", response_model=List[PeriodCloseSchema])
+async def get_accounting_periods(
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """List closed and reopened periods"""
+    try:
+        from app.services.period_close_service import list_period_closes
+        return await run_in_session(session, list_period_closes, current_user.id)
+    except Exception as e:
+        logger.error(f"Error listing periods: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/accounts/initialize")
-async def initialize_accounts():
+async def initialize_accounts(
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
+):
     """Initialize the default Chart of Accounts"""
     try:
         from app.services.accounting_service import initialize_chart_of_accounts
-        initialize_chart_of_accounts()
+        await run_in_session(session, initialize_chart_of_accounts, current_user.id)
         return {"message": "Chart of accounts initialized successfully"}
     except Exception as e:
         logger.error(f"Error initializing accounts: {e}", exc_info=True)
@@ -1192,7 +1505,10 @@ async def initialize_accounts():
 # Reconciliation Endpoints
 # =============================================================================
 
-from app.api.schemas import ReconciliationResponse, ReconciliationMatch
+from app.api.schemas import (
+    ReconciliationResponse, ReconciliationMatch, RelatedDocumentsResponse,
+    BulkReconciliationRequest, BulkReconciliationResponse
+)
 from app.services.reconciliation_service import (
     get_reconciliation_status,
     link_transactions
@@ -1200,23 +1516,34 @@ from app.services.reconciliation_service import (
 
 
 @router.get("/ledger/{record_id}/reconciliation", response_model=ReconciliationResponse)
-async def get_reconciliation(record_id: str):
-    """Get reconciliation status for a specific transaction"""
+async def get_reconciliation(
+    record_id: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """Get reconciliation status for a specific transaction from its precomputed link group"""
     try:
-        from app.services.reconciliation_service import get_reconciliation_status
+        from app.services.reconciliation_graph import get_record_group, reconciliation_from_group
         from app.db.mongodb import get_database
         
+        group = await run_in_session(session, get_record_group, current_user.id, record_id)
+        if group:
+            return ReconciliationResponse(**reconciliation_from_group(record_id, group))
+        
+        # No links yet: fall back to what was stored when the receipt was processed
         db = get_database()
         if db is None:
             raise HTTPException(status_code=500, detail="MongoDB database not connected")
         
         collection = db.receipts
-        doc = await collection.find_one({"record_id": record_id})
+        doc = await collection.find_one(
+            {"record_id": record_id, "user_id": current_user.id},
+            {"reconciliation_info": 1}
+        )
         
         if not doc:
             raise HTTPException(status_code=404, detail="Transaction not found")
         
-        # Get reconciliation info from document or compute it
         reconciliation_info = doc.get("reconciliation_info", {})
         
         # If not stored, return basic info
@@ -1239,18 +1566,80 @@ async def get_reconciliation(record_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/ledger/{record_id}/related", response_model=RelatedDocumentsResponse)
+async def get_related_documents(
+    record_id: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """All transactions connected to a record through reconciliation links"""
+    try:
+        from app.services.reconciliation_graph import get_record_group
+        
+        group = await run_in_session(session, get_record_group, current_user.id, record_id)
+        if not group:
+            return RelatedDocumentsResponse(record_id=record_id)
+        return RelatedDocumentsResponse(
+            record_id=record_id,
+            group_id=group["group_id"],
+            records=group["records"],
+            links=group["links"]
+        )
+    except Exception as e:
+        logger.error(f"Error getting related documents: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/reconciliation/run", response_model=BulkReconciliationResponse)
+async def run_bulk_reconciliation(
+    request: BulkReconciliationRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Reconcile all of the user's ledger entries in a period in one set-based pass"""
+    try:
+        from app.services.bulk_reconciliation_service import reconcile_period
+        from datetime import datetime
+        import asyncio
+        
+        try:
+            start_date = datetime.fromisoformat(request.start_date.replace("Z", "+00:00")).date()
+            end_date = datetime.fromisoformat(request.end_date.replace("Z", "+00:00")).date()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="start_date and end_date must be ISO dates")
+        if end_date < start_date:
+            raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+        
+        result = await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: reconcile_period(
+                current_user.id, start_date, end_date,
+                date_window_days=request.date_window_days,
+                amount_tolerance=request.amount_tolerance,
+                dry_run=request.dry_run
+            )
+        )
+        return BulkReconciliationResponse(**result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error running bulk reconciliation: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/ledger/{record_id_1}/link/{record_id_2}")
 async def link_transactions_endpoint(
     record_id_1: str,
     record_id_2: str,
-    relationship: str = Query(default="counterparty", description="Relationship type: counterparty, duplicate, or related")
+    relationship: str = Query(default="counterparty", description="Relationship type: counterparty, duplicate, or related"),
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Manually link two transactions"""
     try:
         if relationship not in ["counterparty", "duplicate", "related"]:
             raise HTTPException(status_code=400, detail="Relationship must be one of: counterparty, duplicate, related")
         
-        success = await link_transactions(record_id_1, record_id_2, relationship)
+        success = await link_transactions(record_id_1, record_id_2, relationship, current_user.id, session)
         
         if success:
             return {
@@ -1260,7 +1649,7 @@ async def link_transactions_endpoint(
                 "relationship": relationship
             }
         else:
-            raise HTTPException(status_code=500, detail="Failed to link transactions")
+            raise HTTPException(status_code=404, detail="Both transactions must exist and belong to you")
     except HTTPException:
         raise
     except Exception as e:
@@ -1387,20 +1776,23 @@ async def toggle_perspective(record_id: str):
 @router.post("/claim-rights", response_model=ClaimRightSchema)
 async def create_claim_right_endpoint(
     request: CreateClaimRightRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a claim right for a long-term transaction.
     Initial recognition: Creates balance sheet item only (no P&L impact).
     """
     try:
-        from app.services.claim_right_service import create_claim_right
+        from app.services.claim_right_service import create_claim_right, get_claim_right
         from datetime import datetime
         
         start_date = datetime.fromisoformat(request.start_date.replace("Z", "+00:00"))
         end_date = datetime.fromisoformat(request.end_date.replace("Z", "+00:00"))
         
-        claim = create_claim_right(
+        claim = await run_in_session(
+            session,
+            create_claim_right,
             user_id=current_user.id,
             ledger_entry_id=request.ledger_entry_id,
             structured_data={},  # Can be enhanced to pass structured data
@@ -1413,18 +1805,8 @@ async def create_claim_right_endpoint(
         )
         
         # Reload claim with schedule relationship to avoid lazy loading issues
-        from app.db.sql import SessionLocal, ClaimRight
-        from sqlalchemy.orm import joinedload
-        db = SessionLocal()
-        try:
-            claim_with_schedule = db.query(ClaimRight).options(
-                joinedload(ClaimRight.schedule)
-            ).filter(ClaimRight.id == claim.id).first()
-            if claim_with_schedule:
-                return ClaimRightSchema.model_validate(claim_with_schedule)
-            return ClaimRightSchema.model_validate(claim)
-        finally:
-            db.close()
+        claim_with_schedule = await run_in_session(session, get_claim_right, claim.id, current_user.id)
+        return ClaimRightSchema.model_validate(claim_with_schedule or claim)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -1436,32 +1818,18 @@ async def create_claim_right_endpoint(
 async def get_claim_rights_endpoint(
     claim_type: Optional[str] = Query(None, description="Filter by claim type: ASSET_CLAIM or LIABILITY_CLAIM"),
     status: Optional[str] = Query(None, description="Filter by status: active, completed, cancelled"),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Get all claim rights for the current user."""
     try:
         from app.services.claim_right_service import get_claim_rights
         
-        from app.db.sql import SessionLocal, ClaimRight
-        from sqlalchemy.orm import joinedload
-        
-        # Eagerly load schedule to avoid lazy loading issues
-        db = SessionLocal()
-        try:
-            query = db.query(ClaimRight).options(
-                joinedload(ClaimRight.schedule)
-            ).filter(ClaimRight.user_id == current_user.id)
-            
-            if claim_type:
-                query = query.filter(ClaimRight.claim_type == claim_type)
-            if status:
-                query = query.filter(ClaimRight.status == status)
-            
-            claims = query.order_by(ClaimRight.created_at.desc()).limit(100).all()
-            
-            return [ClaimRightSchema.model_validate(claim) for claim in claims]
-        finally:
-            db.close()
+        # Schedule is eagerly loaded to avoid lazy loading issues
+        claims = await run_in_session(
+            session, get_claim_rights, current_user.id, claim_type=claim_type, status=status, limit=100
+        )
+        return [ClaimRightSchema.model_validate(claim) for claim in claims]
     except Exception as e:
         logger.error(f"Error getting claim rights: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -1470,29 +1838,19 @@ async def get_claim_rights_endpoint(
 @router.get("/claim-rights/{claim_right_id}", response_model=ClaimRightSchema)
 async def get_claim_right_endpoint(
     claim_right_id: int,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific claim right by ID."""
     try:
-        from app.db.sql import SessionLocal, ClaimRight
-        from sqlalchemy.orm import joinedload
+        from app.services.claim_right_service import get_claim_right
         
-        # Eagerly load schedule to avoid lazy loading issues
-        db = SessionLocal()
-        try:
-            claim = db.query(ClaimRight).options(
-                joinedload(ClaimRight.schedule)
-            ).filter(
-                ClaimRight.id == claim_right_id,
-                ClaimRight.user_id == current_user.id
-            ).first()
-            
-            if not claim:
-                raise HTTPException(status_code=404, detail="Claim right not found")
-            
-            return ClaimRightSchema.model_validate(claim)
-        finally:
-            db.close()
+        # Schedule is eagerly loaded to avoid lazy loading issues
+        claim = await run_in_session(session, get_claim_right, claim_right_id, current_user.id)
+        if not claim:
+            raise HTTPException(status_code=404, detail="Claim right not found")
+        
+        return ClaimRightSchema.model_validate(claim)
     except HTTPException:
         raise
     except Exception as e:
@@ -1504,13 +1862,14 @@ async def get_claim_right_endpoint(
 async def cancel_claim_right_endpoint(
     claim_right_id: int,
     reason: Optional[str] = Query(None, description="Cancellation reason"),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Cancel a claim right (early termination)."""
     try:
         from app.services.claim_right_service import cancel_claim_right
         
-        claim = cancel_claim_right(claim_right_id, current_user.id, reason)
+        claim = await run_in_session(session, cancel_claim_right, claim_right_id, current_user.id, reason)
         return {"message": "Claim right cancelled successfully", "claim_right": ClaimRightSchema.from_orm(claim)}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -1521,13 +1880,14 @@ async def cancel_claim_right_endpoint(
 
 @router.get("/claim-rights/summary", response_model=ClaimRightSummarySchema)
 async def get_claim_rights_summary_endpoint(
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """Get summary of claim rights for the current user."""
     try:
         from app.services.accrual_engine_service import get_claim_right_summary
         
-        summary = get_claim_right_summary(current_user.id)
+        summary = await run_in_session(session, get_claim_right_summary, current_user.id)
         return ClaimRightSummarySchema(**summary)
     except Exception as e:
         logger.error(f"Error getting claim rights summary: {e}", exc_info=True)
@@ -1537,7 +1897,8 @@ async def get_claim_rights_summary_endpoint(
 @router.post("/claim-rights/process-accruals", response_model=ProcessAccrualsResponse)
 async def process_accruals_endpoint(
     request: ProcessAccrualsRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """
     Process pending accruals for a given accounting period.
@@ -1555,7 +1916,9 @@ async def process_accruals_endpoint(
         if request.period_end:
             period_end = datetime.fromisoformat(request.period_end.replace("Z", "+00:00"))
         
-        result = process_accruals_for_period(
+        result = await run_in_session(
+            session,
+            process_accruals_for_period,
             user_id=current_user.id,
             period_start=period_start,
             period_end=period_end,
@@ -1575,7 +1938,8 @@ async def create_claim_right_from_ledger(
     start_date: Optional[str] = Query(None, description="Start date (ISO format)"),
     end_date: Optional[str] = Query(None, description="End date (ISO format)"),
     frequency: str = Query("monthly", description="Frequency: monthly, quarterly, yearly"),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_db)
 ):
     """
     Automatically create a claim right from an existing ledger entry.
@@ -1583,31 +1947,29 @@ async def create_claim_right_from_ledger(
     """
     try:
         from app.services.claim_right_service import (
-            classify_claim_right, create_claim_right, extract_period_dates
+            classify_claim_right, create_claim_right, extract_period_dates, get_claim_right
         )
-        from app.services.ledger_service import get_ledger_entry
         from datetime import datetime
         
         # Get ledger entry by ID
-        from app.db.sql import SessionLocal, LedgerEntry
-        db = SessionLocal()
-        try:
-            entry = db.query(LedgerEntry).filter(
+        from sqlalchemy import select
+        from app.db.sql import LedgerEntry
+        entry = (await session.execute(
+            select(LedgerEntry).filter(
                 LedgerEntry.id == ledger_entry_id,
                 LedgerEntry.user_id == current_user.id
-            ).first()
-            if not entry:
-                raise HTTPException(status_code=404, detail="Ledger entry not found")
-            ledger_entry_dict = {
-                "id": entry.id,
-                "description": entry.description,
-                "category": entry.category,
-                "vendor": entry.vendor,
-                "total": entry.total,
-                "date": entry.date
-            }
-        finally:
-            db.close()
+            )
+        )).scalars().first()
+        if not entry:
+            raise HTTPException(status_code=404, detail="Ledger entry not found")
+        ledger_entry_dict = {
+            "id": entry.id,
+            "description": entry.description,
+            "category": entry.category,
+            "vendor": entry.vendor,
+            "total": entry.total,
+            "date": entry.date
+        }
         
         if not ledger_entry_dict:
             raise HTTPException(status_code=404, detail="Ledger entry not found")
@@ -1645,7 +2007,9 @@ async def create_claim_right_from_ledger(
             end_date_obj = datetime.fromisoformat(end_date.replace("Z", "+00:00"))
         
         # Create claim right
-        claim = create_claim_right(
+        claim = await run_in_session(
+            session,
+            create_claim_right,
             user_id=current_user.id,
             ledger_entry_id=ledger_entry_id,
             structured_data=structured_data,
@@ -1658,18 +2022,8 @@ async def create_claim_right_from_ledger(
         )
         
         # Reload claim with schedule relationship to avoid lazy loading issues
-        from app.db.sql import SessionLocal, ClaimRight
-        from sqlalchemy.orm import joinedload
-        db = SessionLocal()
-        try:
-            claim_with_schedule = db.query(ClaimRight).options(
-                joinedload(ClaimRight.schedule)
-            ).filter(ClaimRight.id == claim.id).first()
-            if claim_with_schedule:
-                return ClaimRightSchema.model_validate(claim_with_schedule)
-            return ClaimRightSchema.model_validate(claim)
-        finally:
-            db.close()
+        claim_with_schedule = await run_in_session(session, get_claim_right, claim.id, current_user.id)
+        return ClaimRightSchema.model_validate(claim_with_schedule or claim)
     except HTTPException:
         raise
     except ValueError as e:
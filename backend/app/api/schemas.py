@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any, Union
+from typing import Optional, List, Dict, Any, Tuple, Union
 from datetime import datetime
 
 
@@ -18,6 +18,25 @@ class ReconciliationMatch(BaseModel):
     relationship: Optional[str] = None  # "duplicate", "counterparty", "related"
 
 
+class ReconciliationGroupRecord(BaseModel):
+    """A member of a reconciliation group (connected component of links)"""
+    record_id: str
+    ledger_entry_id: Optional[int] = None
+    vendor: Optional[str] = None
+    date: Optional[str] = None
+    total: Optional[float] = None
+    status: Optional[str] = None
+
+
+class ReconciliationEdge(BaseModel):
+    """A stored reconciliation link (record_id_a < record_id_b)"""
+    record_id_a: str
+    record_id_b: str
+    relationship: str  # "duplicate", "counterparty", "related"
+    source: Optional[str] = None  # "auto", "receipt", "manual"
+    confidence: Optional[float] = None
+
+
 class ReconciliationResponse(BaseModel):
     """Enhanced reconciliation information"""
     is_duplicate: bool = False
@@ -29,6 +48,42 @@ class ReconciliationResponse(BaseModel):
     duplicate_record_id: Optional[str] = None
     counterparty_record_id: Optional[str] = None
     counterparty_vendor: Optional[str] = None
+    group_id: Optional[str] = None
+    group_records: List[ReconciliationGroupRecord] = []
+
+
+class RelatedDocumentsResponse(BaseModel):
+    """Every transaction connected to a record through reconciliation links"""
+    record_id: str
+    group_id: Optional[str] = None
+    records: List[ReconciliationGroupRecord] = []
+    links: List[ReconciliationEdge] = []
+
+
+class BulkReconciliationRequest(BaseModel):
+    """Reconcile every ledger entry in a period"""
+    start_date: str
+    end_date: str
+    date_window_days: int = 0  # Counterparty/related matches may be this many days apart
+    amount_tolerance: float = 0.0  # Counterparty/related matches may differ by this amount
+    dry_run: bool = False
+
+
+class BulkReconciliationResponse(BaseModel):
+    period_start: str
+    period_end: str
+    records: int
+    candidate_pairs: int
+    duplicates: int
+    counterparties: int
+    related: int
+    links_written: int
+    groups: Optional[int] = None
+    dry_run: bool
+    load_ms: float
+    match_ms: float
+    write_ms: float
+    records_per_sec: Optional[float] = None
 
 
 class ProcessReceiptResponse(BaseModel):
@@ -149,6 +204,8 @@ class TrialBalanceResponse(BaseModel):
     total_debits: float
     total_credits: float
     is_balanced: bool
+    period_start: Optional[str] = None
+    period_end: Optional[str] = None
     generated_at: str
 
 
@@ -159,6 +216,8 @@ class IncomeStatementResponse(BaseModel):
     expenses: List[Dict[str, Any]]
     total_expenses: float
     net_income: float
+    period_start: Optional[str] = None
+    period_end: Optional[str] = None
     generated_at: str
 
 
@@ -171,9 +230,39 @@ class BalanceSheetResponse(BaseModel):
     equity: List[Dict[str, Any]]
     total_equity: float
     is_balanced: bool
+    period_start: Optional[str] = None
+    period_end: Optional[str] = None
     generated_at: str
 
 
+class FinancialReportsResponse(BaseModel):
+    """Trial balance, income statement and balance sheet computed together"""
+    trial_balance: TrialBalanceResponse
+    income_statement: IncomeStatementResponse
+    balance_sheet: BalanceSheetResponse
+
+
+class PeriodCloseSchema(BaseModel):
+    """A closed (or reopened) accounting period"""
+    period_type: str
+    period_end: str
+    status: str
+    closed_at: Optional[str] = None
+    reopened_at: Optional[str] = None
+    accounts: int
+
+
+class ClosePeriodsRequest(BaseModel):
+    """Close every period up to a date (default: the last complete period)"""
+    period_type: str = "month"
+    through: Optional[str] = None
+
+
+class ClosePeriodsResponse(BaseModel):
+    """Periods closed or recomputed by the request"""
+    closed: List[PeriodCloseSchema]
+
+
 # =============================================================================
 # Ledger Entry with Journal Entry
 # =============================================================================
@@ -238,6 +327,41 @@ class CreateManualEntryRequest(BaseModel):
     items: List[ManualEntryItem] = []
 
 
+class ImportLedgerEntry(CreateManualEntryRequest):
+    """Historical entry for bulk import; non-USD entries carry their own rate"""
+    record_id: Optional[str] = None
+    usd_total: Optional[float] = None
+    exchange_rate: Optional[float] = None
+
+    def usd_conversion(self) -> Tuple[float, float]:
+        """(exchange_rate, usd_equivalent); ValueError if the entry cannot be converted"""
+        if self.currency == "USD":
+            return 1.0, self.total
+        if self.exchange_rate is not None:
+            if self.exchange_rate <= 0:
+                raise ValueError("exchange_rate must be positive")
+            usd_total = self.usd_total if self.usd_total is not None else self.total / self.exchange_rate
+            return self.exchange_rate, usd_total
+        if self.usd_total is not None:
+            if not self.usd_total or self.total / self.usd_total <= 0:
+                raise ValueError("usd_total must be non-zero with the same sign as total")
+            return self.total / self.usd_total, self.usd_total
+        raise ValueError(f"{self.currency} needs usd_total or exchange_rate")
+
+
+class ImportLedgerEntriesRequest(BaseModel):
+    entries: List[ImportLedgerEntry]
+
+
+class ImportLedgerEntriesResponse(BaseModel):
+    """Outcome of a bulk import; failures are reported per record"""
+    total: int
+    posted: int
+    failed: int
+    results: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+
+
 # Authentication schemas
 class UserSignup(BaseModel):
     email: str
@@ -1,44 +1,127 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_openai import ChatOpenAI
 from app.core.config import settings
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
+import httpx
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize LLM instances (lazy loading)
-_gemini_llm = None
-_openai_llm = None
+DEFAULT_GEMINI_MODEL = "gemini-2.5-flash"
+DEFAULT_OPENAI_MODEL = "gpt-4o-mini"
+DEFAULT_FAKE_MODEL = "fake-deterministic"
+PROVIDER_DEFAULT_MODELS = {
+    "gemini": DEFAULT_GEMINI_MODEL,
+    "openai": DEFAULT_OPENAI_MODEL,
+    "fake": DEFAULT_FAKE_MODEL,
+}
+
+# LLM client registry keyed by (provider, model), lazily populated.
+# Each entry keeps its own pooled HTTP client so switching models never
+# tears down connections held by other models.
+_llm_registry: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_registry_lock = threading.Lock()
+
+
+def _default_model(provider: str) -> str:
+    """
+    Model used when none is requested: LLM_MODEL for the primary provider,
+    LLM_SECONDARY_MODEL for any other, else the provider's own default (a
+    model name is never sent to a provider it was not configured for).
+    """
+    provider = provider.lower()
+    if provider == (settings.LLM_PROVIDER or "openai").lower():
+        configured = settings.LLM_MODEL
+    else:
+        configured = settings.LLM_SECONDARY_MODEL
+    return configured or PROVIDER_DEFAULT_MODELS.get(provider, DEFAULT_OPENAI_MODEL)
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.LLM_HTTP_POOL_SIZE,
+        max_keepalive_connections=settings.LLM_HTTP_KEEPALIVE,
+    )
+
+
+def _get_or_create(provider: str, model: str, factory) -> Any:
+    """Return the cached LLM for (provider, model), creating it on first use"""
+    key = (provider, model)
+    entry = _llm_registry.get(key)
+    if entry is not None:
+        entry["reuse_count"] += 1
+        entry["last_used_at"] = time.time()
+        return entry["llm"]
+
+    with _registry_lock:
+        entry = _llm_registry.get(key)
+        if entry is None:
+            llm, http_client = factory(model)
+            entry = {
+                "llm": llm,
+                "http_client": http_client,
+                "created_at": time.time(),
+                "last_used_at": time.time(),
+                "reuse_count": 0,
+                "warmed_up": False,
+            }
+            _llm_registry[key] = entry
+            logger.info(f"Initialized {provider} LLM with model: {model}")
+        else:
+            entry["reuse_count"] += 1
+            entry["last_used_at"] = time.time()
+        return entry["llm"]
+
+
+def _create_gemini(model: str):
+    if not settings.GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY not set in environment variables")
+    # The Gemini client manages its own gRPC channel per instance; reusing the
+    # instance is what keeps the channel (and its TLS session) alive.
+    llm = ChatGoogleGenerativeAI(
+        model=model,
+        google_api_key=settings.GOOGLE_API_KEY,
+        temperature=settings.LLM_TEMPERATURE,
+        max_tokens=settings.LLM_MAX_TOKENS
+    )
+    return llm, None
+
+
+def _create_openai(model: str):
+    if not settings.OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY not set in environment variables")
+    http_client = httpx.Client(limits=_http_limits(), timeout=settings.LLM_HTTP_TIMEOUT)
+    llm = ChatOpenAI(
+        model=model,
+        api_key=settings.OPENAI_API_KEY,
+        temperature=settings.LLM_TEMPERATURE,
+        max_tokens=settings.LLM_MAX_TOKENS,
+        http_client=http_client
+    )
+    return llm, http_client
+
+
+def _create_fake(model: str):
+    # Imported lazily so the fake provider's module is only loaded when selected
+    from app.core.fake_llm import create_fake_llm
+    return create_fake_llm(model), None
 
 
 def get_gemini_llm(model: str = None):
     """
     Get Gemini LLM instance
-    
+
     Args:
-        model: Model name (defaults to settings.LLM_MODEL)
-    
+        model: Model name (defaults to the configured model or gemini-2.5-flash)
+
     Returns:
         Gemini LLM instance
     """
-    global _gemini_llm
-    
-    model = model or "gemini-2.5-flash"
-    
-    if _gemini_llm is not None:
-        return _gemini_llm
-    
+    model = model or _default_model("gemini")
     try:
-        if not settings.GOOGLE_API_KEY:
-            raise ValueError("GOOGLE_API_KEY not set in environment variables")
-        
-        _gemini_llm = ChatGoogleGenerativeAI(
-            model=model,
-            google_api_key=settings.GOOGLE_API_KEY,
-            temperature=settings.LLM_TEMPERATURE,
-            max_tokens=settings.LLM_MAX_TOKENS
-        )
-        logger.info(f"Initialized Gemini LLM with model: {model}")
-        return _gemini_llm
+        return _get_or_create("gemini", model, _create_gemini)
     except Exception as e:
         logger.error(f"Error initializing Gemini LLM: {e}")
         raise
@@ -47,66 +130,161 @@ def get_gemini_llm(model: str = None):
 def get_openai_llm(model: str = None):
     """
     Get OpenAI LLM instance
-    
+
     Args:
-        model: Model name (defaults to gpt-4o-mini)
-    
+        model: Model name (defaults to the configured model or gpt-4o-mini)
+
     Returns:
         OpenAI LLM instance
     """
-    global _openai_llm
-    
-    model = model or settings.LLM_MODEL or "gpt-4o-mini"
-    
-    if _openai_llm is not None:
-        return _openai_llm
-    
+    model = model or _default_model("openai")
     try:
-        if not settings.OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY not set in environment variables")
-        
-        _openai_llm = ChatOpenAI(
-            model=model,
-            api_key=settings.OPENAI_API_KEY,
-            temperature=settings.LLM_TEMPERATURE,
-            max_tokens=settings.LLM_MAX_TOKENS
-        )
-        logger.info(f"Initialized OpenAI LLM with model: {model}")
-        return _openai_llm
+        return _get_or_create("openai", model, _create_openai)
     except Exception as e:
         logger.error(f"Error initializing OpenAI LLM: {e}")
         raise
 
 
+def get_fake_llm(model: str = None):
+    """
+    Get the offline fake LLM instance (deterministic, no network; for load tests)
+
+    Args:
+        model: Model name (only used as a registry key and in metrics)
+
+    Returns:
+        FakeChatModel instance
+    """
+    model = model or _default_model("fake")
+    return _get_or_create("fake", model, _create_fake)
+
+
 def get_llm(model: str = None, provider: str = None):
     """
     Get LLM instance based on provider setting
-    
+
     Args:
         model: Model name (optional, uses provider default)
-        provider: LLM provider - "gemini" or "openai" (defaults to settings.LLM_PROVIDER)
-    
+        provider: LLM provider - "gemini", "openai" or "fake" (defaults to settings.LLM_PROVIDER)
+
     Returns:
-        LLM instance (Gemini or OpenAI)
+        LLM instance (Gemini, OpenAI or fake), cached per (provider, model)
     """
     # Use provided provider or default from settings
     provider = provider or settings.LLM_PROVIDER or "openai"
-    
-    logger.info(f"Getting LLM with provider: {provider}")
-    
+
+    logger.debug(f"Getting LLM with provider: {provider}, model: {model or 'default'}")
+
     if provider.lower() == "gemini":
         return get_gemini_llm(model)
     elif provider.lower() == "openai":
         return get_openai_llm(model)
+    elif provider.lower() == "fake":
+        return get_fake_llm(model)
     else:
         logger.warning(f"Unknown provider '{provider}', defaulting to OpenAI")
         return get_openai_llm(model)
 
 
-def reset_llm():
-    """Reset LLM instances (useful for switching providers)"""
-    global _gemini_llm, _openai_llm
-    _gemini_llm = None
-    _openai_llm = None
-    logger.info("Reset all LLM instances")
+def _warm_up_entry(provider: str, model: str) -> Dict[str, Any]:
+    """Open the connection (TLS handshake + auth) for one registry entry"""
+    start = time.perf_counter()
+    llm = get_llm(model=model, provider=provider)
+    if provider == "openai":
+        # Cheap authenticated request on the pooled client; no tokens billed
+        llm.root_client.models.retrieve(model)
+    elif provider == "gemini":
+        # count_tokens is free and goes through the same client channel
+        llm.get_num_tokens("ping")
+    _llm_registry[(provider, model)]["warmed_up"] = True
+    return {"provider": provider, "model": model, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def warm_up_llms(targets: Optional[List[Tuple[str, Optional[str]]]] = None) -> List[Dict[str, Any]]:
+    """
+    Create and warm up LLM clients so the first request after a deploy is fast.
+
+    Args:
+        targets: (provider, model) pairs; defaults to the configured primary
+            provider/model plus the secondary provider used for hedging.
+
+    Returns:
+        Per-target warm-up results (failures are logged, never raised)
+    """
+    if targets is None:
+        from app.core.llm_gateway import get_secondary_provider, _normalize_provider
+        primary = _normalize_provider(None)
+        targets = [(primary, None)]
+        secondary = get_secondary_provider(primary)
+        if secondary:
+            targets.append((secondary, None))
+
+    results = []
+    for provider, model in targets:
+        provider = provider.lower()
+        model = model or _default_model(provider)
+        try:
+            result = _warm_up_entry(provider, model)
+            logger.info(f"Warmed up {provider} LLM ({model}) in {result['seconds']}s")
+        except Exception as e:
+            logger.warning(f"LLM warm-up failed for {provider}/{model}: {e}")
+            result = {"provider": provider, "model": model, "error": str(e)}
+        results.append(result)
+    return results
+
+
+def _pool_connections(http_client: Optional[httpx.Client]) -> Optional[int]:
+    """Best-effort count of open connections in an httpx pool"""
+    if http_client is None:
+        return None
+    try:
+        return len(http_client._transport._pool.connections)
+    except Exception:
+        return None
+
 
+def get_llm_registry_stats() -> Dict[str, Any]:
+    """Metrics for the LLM client registry: instances, reuse and pool sizes"""
+    clients = []
+    for (provider, model), entry in list(_llm_registry.items()):
+        clients.append({
+            "provider": provider,
+            "model": model,
+            "reuse_count": entry["reuse_count"],
+            "warmed_up": entry["warmed_up"],
+            "created_at": entry["created_at"],
+            "last_used_at": entry["last_used_at"],
+            "pool_max_connections": settings.LLM_HTTP_POOL_SIZE if entry["http_client"] else None,
+            "pool_open_connections": _pool_connections(entry["http_client"]),
+        })
+        if provider == "fake":
+            # Injected latency/error counters, useful when reading load-test results
+            clients[-1]["fake"] = entry["llm"].stats()
+    return {
+        "instances": len(clients),
+        "total_reuse": sum(c["reuse_count"] for c in clients),
+        "clients": clients,
+    }
+
+
+def reset_llm(provider: str = None, model: str = None):
+    """
+    Reset LLM instances (useful for switching providers or rotating keys)
+
+    Args:
+        provider: Only reset this provider's instances (default: all)
+        model: Only reset this model (default: all models of the provider)
+    """
+    with _registry_lock:
+        keys = [
+            key for key in _llm_registry
+            if (provider is None or key[0] == provider.lower()) and (model is None or key[1] == model)
+        ]
+        for key in keys:
+            entry = _llm_registry.pop(key)
+            if entry["http_client"] is not None:
+                try:
+                    entry["http_client"].close()
+                except Exception as e:
+                    logger.debug(f"Error closing HTTP client for {key}: {e}")
+    logger.info(f"Reset {len(keys)} LLM instance(s)")
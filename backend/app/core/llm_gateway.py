@@ -0,0 +1,501 @@
+"""
+LLM gateway with hedged requests and per-provider circuit breakers.
+
+Every service used to run ``llm.invoke`` in an executor wrapped in its own
+``asyncio.wait_for``, so a slow provider held each pipeline stage for the full
+20-30 second timeout before the rule-based fallback kicked in. ``invoke_llm``
+replaces that pattern:
+
+- The primary provider (settings.LLM_PROVIDER) is called first.
+- Once the call has been running longer than the provider's rolling p95
+  latency, a hedged request is fired at the secondary provider and whichever
+  answer arrives first wins.
+- Repeated timeouts/errors open a circuit breaker for that provider; while it
+  is open calls skip it entirely, and when every provider is open the call
+  fails immediately with ``LLMUnavailableError`` so callers drop straight into
+  their existing fallbacks.
+
+``invoke_llm_batched`` adds a batching mode on top: several records share one
+copy of the instructions and the model answers with a JSON array that is split
+back per record, falling back to single-record calls for anything that does
+not parse.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from langchain.schema import HumanMessage
+
+from app.core.config import settings
+from app.core.llm import get_llm, get_llm_registry_stats
+from app.utils.json_parser import parse_llm_json_response
+
+logger = logging.getLogger(__name__)
+
+KNOWN_PROVIDERS = ("openai", "gemini", "fake")
+
+# Providers eligible as an automatic secondary. The fake provider is never
+# hedged to or from implicitly: load tests must not spill onto paid APIs.
+LIVE_PROVIDERS = ("openai", "gemini")
+
+# Circuit breaker states
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# Minimum number of latency samples before the rolling p95 drives hedging
+MIN_LATENCY_SAMPLES = 10
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no provider can take the call (all circuits are open)"""
+
+
+class ProviderHealth:
+    """Rolling latency window and circuit breaker state for one provider"""
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.latencies: Deque[float] = deque(maxlen=max(settings.LLM_LATENCY_WINDOW, MIN_LATENCY_SAMPLES))
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def hedge_delay(self, timeout: float) -> float:
+        """Seconds to wait on this provider before firing a hedged request"""
+        if len(self.latencies) < MIN_LATENCY_SAMPLES:
+            delay = settings.LLM_HEDGE_DEFAULT_DELAY
+        else:
+            delay = self.percentile(95) or settings.LLM_HEDGE_DEFAULT_DELAY
+        return min(max(delay, settings.LLM_HEDGE_MIN_DELAY), timeout)
+
+    def is_available(self) -> bool:
+        """True if the circuit lets a call through right now (no side effects)"""
+        if self.state == CIRCUIT_CLOSED:
+            return True
+        if self.state == CIRCUIT_OPEN:
+            return (time.monotonic() - (self.opened_at or 0.0)) >= settings.LLM_CIRCUIT_RESET_SECONDS
+        # Half-open: only one trial call at a time
+        return not self.trial_in_flight
+
+    def on_attempt(self):
+        if self.state == CIRCUIT_OPEN:
+            self.state = CIRCUIT_HALF_OPEN
+            logger.info(f"LLM circuit for {self.provider} half-open, sending trial call")
+        if self.state == CIRCUIT_HALF_OPEN:
+            self.trial_in_flight = True
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.trial_in_flight = False
+        if self.state != CIRCUIT_CLOSED:
+            logger.info(f"LLM circuit for {self.provider} closed after successful call")
+        self.state = CIRCUIT_CLOSED
+        self.opened_at = None
+
+    def record_failure(self, error: BaseException, timed_out: bool = False):
+        self.failures += 1
+        if timed_out:
+            self.timeouts += 1
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        self.last_error = "timeout" if timed_out else f"{type(error).__name__}: {error}"
+        if self.state == CIRCUIT_HALF_OPEN or self.consecutive_failures >= settings.LLM_CIRCUIT_FAILURE_THRESHOLD:
+            if self.state != CIRCUIT_OPEN:
+                logger.warning(
+                    f"LLM circuit for {self.provider} opened after {self.consecutive_failures} "
+                    f"consecutive failures (last: {self.last_error})"
+                )
+            self.state = CIRCUIT_OPEN
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50 = self.percentile(50)
+        p95 = self.percentile(95)
+        return {
+            "provider": self.provider,
+            "circuit_state": self.state,
+            "available": self.is_available(),
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "latency_samples": len(self.latencies),
+            "latency_p50": round(p50, 3) if p50 is not None else None,
+            "latency_p95": round(p95, 3) if p95 is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+_health: Dict[str, ProviderHealth] = {}
+
+# Losing hedge calls keep running until they finish or time out; hold references
+# so they are not garbage collected mid-flight.
+_background_calls: Set[asyncio.Task] = set()
+
+
+def get_provider_health(provider: str) -> ProviderHealth:
+    provider = provider.lower()
+    if provider not in _health:
+        _health[provider] = ProviderHealth(provider)
+    return _health[provider]
+
+
+def _normalize_provider(provider: Optional[str]) -> str:
+    provider = (provider or settings.LLM_PROVIDER or "openai").lower()
+    return provider if provider in KNOWN_PROVIDERS else "openai"
+
+
+def _provider_configured(provider: str) -> bool:
+    if provider == "gemini":
+        return bool(settings.GOOGLE_API_KEY)
+    if provider == "openai":
+        return bool(settings.OPENAI_API_KEY)
+    if provider == "fake":
+        return True
+    return False
+
+
+def get_secondary_provider(primary: str) -> Optional[str]:
+    """Provider used for hedged requests and failover, if one is configured"""
+    if settings.LLM_SECONDARY_PROVIDER:
+        secondary = settings.LLM_SECONDARY_PROVIDER.lower()
+    elif primary == "fake":
+        return None
+    else:
+        secondary = next((p for p in LIVE_PROVIDERS if p != primary), None)
+    if not secondary or secondary == primary or not _provider_configured(secondary):
+        return None
+    return secondary
+
+
+async def _call_provider(
+    provider: str,
+    model: Optional[str],
+    messages: List[Any],
+    timeout: float
+) -> Tuple[bool, Any]:
+    """Run one provider call; always records the outcome and never raises"""
+    health = get_provider_health(provider)
+    health.on_attempt()
+    start = time.monotonic()
+    try:
+        llm = get_llm(model=model, provider=provider)
+        loop = asyncio.get_running_loop()
+        response = await asyncio.wait_for(
+            loop.run_in_executor(None, lambda: llm.invoke(messages)),
+            timeout=timeout
+        )
+        health.record_success(time.monotonic() - start)
+        return True, response
+    except asyncio.TimeoutError as e:
+        health.record_failure(e, timed_out=True)
+        return False, e
+    except Exception as e:
+        health.record_failure(e)
+        return False, e
+
+
+def _spawn(provider: str, model: Optional[str], messages: List[Any], timeout: float) -> asyncio.Task:
+    task = asyncio.ensure_future(_call_provider(provider, model, messages, timeout))
+    task.provider = provider
+    _background_calls.add(task)
+    task.add_done_callback(_background_calls.discard)
+    return task
+
+
+async def invoke_llm(
+    messages: List[Any],
+    timeout: float = 30.0,
+    model: Optional[str] = None,
+    provider: Optional[str] = None
+) -> Any:
+    """
+    Invoke the LLM with hedging and circuit breaking.
+
+    Args:
+        messages: LangChain messages passed to ``llm.invoke``
+        timeout: Overall deadline in seconds for the call
+        model: Model name for the primary provider (secondary uses its default)
+        provider: Primary provider override (defaults to settings.LLM_PROVIDER)
+
+    Returns:
+        The provider response (object with ``.content``)
+
+    Raises:
+        LLMUnavailableError: every provider's circuit is open
+        asyncio.TimeoutError: no provider answered before the deadline
+    """
+    primary = _normalize_provider(provider)
+    secondary = get_secondary_provider(primary)
+
+    candidates = []
+    for name in (primary, secondary):
+        if not name:
+            continue
+        if get_provider_health(name).is_available():
+            candidates.append(name)
+        else:
+            get_provider_health(name).rejected += 1
+
+    if not candidates:
+        raise LLMUnavailableError(f"All LLM provider circuits are open ({primary}, {secondary or 'no secondary'})")
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    deadline = start + timeout
+
+    first = candidates[0]
+    hedge = candidates[1] if len(candidates) > 1 and settings.LLM_HEDGING_ENABLED else None
+    if first != primary:
+        logger.info(f"LLM provider {primary} circuit open, failing over to {first}")
+
+    pending = {_spawn(first, model if first == primary else None, messages, timeout)}
+    hedge_at = start + get_provider_health(first).hedge_delay(timeout) if hedge else None
+    last_error: Optional[BaseException] = None
+
+    while True:
+        now = loop.time()
+        if hedge and (now >= hedge_at or not pending):
+            remaining = deadline - now
+            if remaining > 0 and get_provider_health(hedge).is_available():
+                if pending:
+                    get_provider_health(first).hedges_fired += 1
+                    logger.info(f"LLM call on {first} exceeded {hedge_at - start:.2f}s, hedging to {hedge}")
+                else:
+                    logger.info(f"LLM call on {first} failed, failing over to {hedge}")
+                pending.add(_spawn(hedge, model if hedge == primary else None, messages, remaining))
+            hedge = None
+
+        if not pending:
+            break
+
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        wait_for = min(remaining, max(0.0, hedge_at - loop.time())) if hedge else remaining
+
+        done, pending = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            ok, value = task.result()
+            if ok:
+                if task.provider != first:
+                    get_provider_health(first).hedges_won += 1
+                return value
+            last_error = value
+
+    if pending:
+        # Losing calls are left to finish in the background so their latency
+        # and failures still feed the health stats.
+        raise asyncio.TimeoutError(f"LLM call timed out after {timeout:.0f} seconds")
+    if isinstance(last_error, asyncio.TimeoutError):
+        raise last_error
+    raise last_error or LLMUnavailableError("LLM call failed on every provider")
+
+
+# =============================================================================
+# Batched multi-record calls
+# =============================================================================
+
+_batch_stats: Dict[str, int] = {
+    "batch_calls": 0,
+    "records_batched": 0,
+    "records_split": 0,
+    "single_fallbacks": 0,
+    "instruction_tokens_saved": 0,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used for batch sizing"""
+    return len(text or "") // 4 + 1
+
+
+def _pack_batches(
+    records: List[str],
+    instructions: str,
+    token_budget: int,
+    max_records: int
+) -> List[List[int]]:
+    """Greedily pack record indexes into chunks that fit the prompt token budget"""
+    chunks: List[List[int]] = []
+    current: List[int] = []
+    used = estimate_tokens(instructions)
+    for idx, record in enumerate(records):
+        cost = estimate_tokens(record) + 8  # Record delimiter overhead
+        if current and (used + cost > token_budget or len(current) >= max_records):
+            chunks.append(current)
+            current = []
+            used = estimate_tokens(instructions)
+        current.append(idx)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _build_batch_prompt(instructions: str, records: List[str], indexes: List[int]) -> str:
+    parts = [
+        instructions.strip(),
+        "",
+        f"BATCH MODE: You will receive {len(indexes)} independent records, each starting with a "
+        "'### RECORD <index>' line. Apply the instructions above to every record separately.",
+        f"Return ONLY a JSON array with exactly {len(indexes)} objects, one per record in the same order. "
+        "Each object must contain an \"index\" field equal to the record's index plus the fields "
+        "requested above. Do NOT wrap the array in markdown.",
+        "",
+    ]
+    for idx in indexes:
+        parts.append(f"### RECORD {idx}")
+        parts.append(records[idx].strip())
+        parts.append("")
+    return "\n".join(parts)
+
+
+def _split_batch_response(response_text: str, indexes: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Map each record index to its JSON object from a list-shaped response"""
+    data = parse_llm_json_response(response_text, default=[])
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        return {}
+
+    by_index: Dict[int, Dict[str, Any]] = {}
+    wanted = set(indexes)
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        try:
+            idx = int(item.get("index"))
+        except (TypeError, ValueError):
+            continue
+        if idx in wanted and idx not in by_index:
+            by_index[idx] = item
+
+    # Models occasionally drop the index field; fall back to position when the
+    # array length lines up exactly.
+    if not by_index and len(data) == len(indexes):
+        by_index = {idx: item for idx, item in zip(indexes, data) if isinstance(item, dict)}
+    return by_index
+
+
+async def invoke_llm_batched(
+    instructions: str,
+    records: List[str],
+    parse_item: Callable[[int, Dict[str, Any]], Any],
+    single_call: Callable[[int], Awaitable[Any]],
+    timeout: float = 60.0,
+    token_budget: Optional[int] = None,
+    max_records: Optional[int] = None
+) -> List[Any]:
+    """
+    Run the same instructions over many records with as few LLM calls as possible.
+
+    Records are packed into prompts of at most ``token_budget`` estimated tokens
+    (instructions are sent once per prompt), the list-shaped response is split
+    back per record, and any record whose item is missing or fails
+    ``parse_item`` is retried on its own via ``single_call``.
+
+    Args:
+        instructions: Task instructions shared by every record
+        records: Per-record prompt payloads
+        parse_item: (index, raw JSON object) -> result, or None if unusable
+        single_call: index -> result, the single-record fallback path
+        timeout: Deadline for each batched call
+        token_budget: Max estimated prompt tokens (defaults to settings.LLM_BATCH_TOKEN_BUDGET)
+        max_records: Max records per prompt (defaults to settings.LLM_BATCH_MAX_RECORDS)
+
+    Returns:
+        Results aligned with ``records``
+    """
+    if not records:
+        return []
+    token_budget = token_budget or settings.LLM_BATCH_TOKEN_BUDGET
+    max_records = max_records or settings.LLM_BATCH_MAX_RECORDS
+    results: List[Any] = [None] * len(records)
+    resolved = [False] * len(records)
+
+    async def run_chunk(indexes: List[int]):
+        if len(indexes) == 1:
+            return
+        prompt = _build_batch_prompt(instructions, records, indexes)
+        try:
+            response = await invoke_llm([HumanMessage(content=prompt)], timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Batched LLM call for {len(indexes)} records failed, falling back to single calls: {e}")
+            return
+        _batch_stats["batch_calls"] += 1
+        _batch_stats["records_batched"] += len(indexes)
+        _batch_stats["instruction_tokens_saved"] += estimate_tokens(instructions) * (len(indexes) - 1)
+        items = _split_batch_response(response.content, indexes)
+        for idx in indexes:
+            item = items.get(idx)
+            if item is None:
+                continue
+            try:
+                parsed = parse_item(idx, item)
+            except Exception as e:
+                logger.debug(f"Batch item {idx} failed to parse: {e}")
+                parsed = None
+            if parsed is not None:
+                results[idx] = parsed
+                resolved[idx] = True
+                _batch_stats["records_split"] += 1
+
+    chunks = _pack_batches(records, instructions, token_budget, max_records)
+    logger.info(f"Batching {len(records)} records into {len(chunks)} LLM call(s)")
+    await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+
+    fallbacks = [idx for idx in range(len(records)) if not resolved[idx]]
+    if fallbacks:
+        logger.info(f"Falling back to single-record LLM calls for {len(fallbacks)} record(s)")
+        _batch_stats["single_fallbacks"] += len(fallbacks)
+        singles = await asyncio.gather(*(single_call(idx) for idx in fallbacks))
+        for idx, value in zip(fallbacks, singles):
+            results[idx] = value
+    return results
+
+
+def get_llm_health() -> Dict[str, Any]:
+    """Per-provider health report (circuit state, latency percentiles, hedge counts)"""
+    primary = _normalize_provider(None)
+    secondary = get_secondary_provider(primary)
+    providers = [p for p in (primary, secondary) if p]
+    providers += [p for p in _health if p not in providers]
+    return {
+        "primary": primary,
+        "secondary": secondary,
+        "hedging_enabled": settings.LLM_HEDGING_ENABLED,
+        "providers": [get_provider_health(p).snapshot() for p in providers],
+        "registry": get_llm_registry_stats(),
+        "batching": dict(_batch_stats),
+    }
+
+
+def reset_llm_health():
+    """Reset circuit breakers and latency windows (useful for switching providers)"""
+    _health.clear()
+    logger.info("Reset LLM provider health")
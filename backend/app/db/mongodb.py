@@ -1,5 +1,6 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.core.config import settings
+from app.utils.match_keys import BLOCKING_INDEX, BLOCKING_INDEX_NAME
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,6 +21,23 @@ async def connect_to_mongo():
     except Exception as e:
         logger.error(f"Failed to connect to MongoDB: {e}")
         raise
+    await ensure_indexes()
+
+
+async def ensure_indexes():
+    """Create the secondary and TTL indexes the app relies on (idempotent)"""
+    indexes = [("receipts", BLOCKING_INDEX, {"name": BLOCKING_INDEX_NAME})]
+    if settings.EMBEDDING_CACHE_PERSISTENT:
+        indexes.append((
+            "embedding_cache", [("created_at", 1)],
+            {"expireAfterSeconds": settings.EMBEDDING_CACHE_TTL_DAYS * 86400}
+        ))
+    # One failure (e.g. a conflicting existing index) must not skip the others
+    for collection, keys, options in indexes:
+        try:
+            await database[collection].create_index(keys, **options)
+        except Exception as e:
+            logger.warning(f"Could not create index {keys} {options} on '{collection}': {type(e).__name__}: {e}")
 
 
 async def close_mongo_connection():
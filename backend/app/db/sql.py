@@ -1,7 +1,14 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, JSON, ForeignKey, Boolean, UniqueConstraint
+from sqlalchemy import (
+    create_engine, event, inspect, func, case, or_, select, insert, update, literal,
+    Column, Integer, String, Float, Date, DateTime, Text, JSON, ForeignKey, Boolean, UniqueConstraint, Index
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session, sessionmaker, relationship, column_property
 from app.core.config import settings
+from app.utils.date_normalizer import normalize_date, locale_for_currency
+from typing import AsyncIterator, Callable, Dict, List, TypeVar
 import logging
 from datetime import datetime
 
@@ -34,8 +41,13 @@ class LedgerEntry(Base):
     # Unique constraint on user_id + record_id combination
     __table_args__ = (
         UniqueConstraint('user_id', 'record_id', name='uq_user_record'),
+        # Newest-first listing and its keyset cursor
+        Index('ix_ledger_entries_user_created', 'user_id', 'created_at', 'id'),
+        # Date-range stats and reconciliation windows
+        Index('ix_ledger_entries_user_txn_date', 'user_id', 'transaction_date'),
     )
-    date = Column(String(50))
+    date = Column(String(50))  # Date as extracted from the receipt
+    transaction_date = Column(Date, nullable=True)  # `date` normalised; None when it is not a date
     amount = Column(Float)
     tax = Column(Float, nullable=True)
     total = Column(Float)
@@ -99,6 +111,19 @@ class Account(Base):
     journal_lines = relationship("JournalEntryLine", back_populates="account")
 
 
+class ChartOfAccountsVersion(Base):
+    """
+    Per-user change counter for the chart of accounts. Bumped in the same
+    transaction as every account insert/update so each worker's in-memory
+    chart cache can tell when its copy is stale.
+    """
+    __tablename__ = "chart_of_accounts_versions"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class JournalEntry(Base):
     """Double-entry journal entry - groups debit/credit lines for a transaction"""
     __tablename__ = "journal_entries"
@@ -106,7 +131,8 @@ class JournalEntry(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     ledger_entry_id = Column(Integer, ForeignKey("ledger_entries.id"), nullable=True)
-    entry_date = Column(DateTime, nullable=False)
+    # active_history: _reopen_closed_periods needs the old date of a re-dated entry
+    entry_date = column_property(Column(DateTime, nullable=False), active_history=True)
     reference = Column(String(100), index=True)  # Links to receipt/invoice record_id
     description = Column(Text)
     memo = Column(Text, nullable=True)
@@ -115,6 +141,11 @@ class JournalEntry(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # Date-range report aggregates; (entry_date, id) is also the journal listing's keyset cursor
+        Index('ix_journal_entries_user_date', 'user_id', 'entry_date', 'id'),
+    )
+    
     # Relationships
     ledger_entry = relationship("LedgerEntry", back_populates="journal_entry")
     lines = relationship("JournalEntryLine", back_populates="journal_entry", cascade="all, delete-orphan")
@@ -125,10 +156,17 @@ class JournalEntryLine(Base):
     __tablename__ = "journal_entry_lines"
     
     id = Column(Integer, primary_key=True, index=True)
-    journal_entry_id = Column(Integer, ForeignKey("journal_entries.id"), nullable=False)
-    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False)
-    debit = Column(Float, default=0.0)
-    credit = Column(Float, default=0.0)
+    # active_history: the old value is loaded before an expired attribute is
+    # overwritten, so _track_account_balances can reverse it and
+    # _reopen_closed_periods can date it
+    journal_entry_id = column_property(
+        Column(Integer, ForeignKey("journal_entries.id"), nullable=False, index=True), active_history=True
+    )
+    account_id = column_property(
+        Column(Integer, ForeignKey("accounts.id"), nullable=False, index=True), active_history=True
+    )
+    debit = column_property(Column(Float, default=0.0), active_history=True)
+    credit = column_property(Column(Float, default=0.0), active_history=True)
     description = Column(String(255), nullable=True)
     
     # Relationships
@@ -136,6 +174,114 @@ class JournalEntryLine(Base):
     account = relationship("Account", back_populates="journal_lines")
 
 
+class AccountBalance(Base):
+    """
+    Running debit/credit totals per account, maintained in the same transaction
+    as every journal line insert/update/delete (see _track_account_balances).
+    last_line_id is the highest journal line folded into the totals.
+    """
+    __tablename__ = "account_balances"
+    
+    account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    debit_total = Column(Float, nullable=False, default=0.0)
+    credit_total = Column(Float, nullable=False, default=0.0)
+    last_line_id = Column(Integer, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class PeriodClose(Base):
+    """
+    A closed month or quarter. Its snapshots hold every account's cumulative
+    debit/credit totals through period_end, so "as of" reports start from the
+    latest snapshot and only aggregate the lines dated after it. status turns
+    "reopened" when a journal entry dated on or before period_end is written,
+    re-dated or deleted (see _reopen_closed_periods); reopened periods are
+    recomputed before their snapshots are used again.
+    """
+    __tablename__ = "period_closes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    period_type = Column(String(10), nullable=False, default="month")  # month, quarter
+    period_end = Column(Date, nullable=False)
+    status = Column(String(20), nullable=False, default="closed")  # closed, reopened
+    closed_at = Column(DateTime, default=datetime.utcnow)
+    reopened_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        UniqueConstraint('user_id', 'period_end', name='uq_user_period_end'),
+        Index('ix_period_closes_user_status_end', 'user_id', 'status', 'period_end'),
+    )
+    
+    snapshots = relationship("AccountBalanceSnapshot", back_populates="period_close", cascade="all, delete-orphan")
+
+
+class AccountBalanceSnapshot(Base):
+    """Cumulative debit/credit totals of one account at a period close"""
+    __tablename__ = "account_balance_snapshots"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    period_close_id = Column(Integer, ForeignKey("period_closes.id", ondelete="CASCADE"), nullable=False)
+    account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), nullable=False)
+    debit_total = Column(Float, nullable=False, default=0.0)
+    credit_total = Column(Float, nullable=False, default=0.0)
+    
+    __table_args__ = (
+        UniqueConstraint('period_close_id', 'account_id', name='uq_period_close_account'),
+    )
+    
+    period_close = relationship("PeriodClose", back_populates="snapshots")
+
+
+# =============================================================================
+# Reconciliation Models
+# =============================================================================
+
+class ReconciliationLink(Base):
+    """
+    Edge between two of a user's transactions found by reconciliation.
+    Stored once per pair with record_id_a < record_id_b.
+    """
+    __tablename__ = "reconciliation_links"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    record_id_a = Column(String(100), nullable=False)
+    record_id_b = Column(String(100), nullable=False)
+    ledger_entry_id_a = Column(Integer, ForeignKey("ledger_entries.id", ondelete="CASCADE"), nullable=True)
+    ledger_entry_id_b = Column(Integer, ForeignKey("ledger_entries.id", ondelete="CASCADE"), nullable=True)
+    relationship_type = Column("relationship", String(20), nullable=False)  # duplicate, counterparty, related
+    source = Column(String(20), default="auto")  # auto (bulk reconciliation), receipt (upload-time match) or manual
+    confidence = Column(Float, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('user_id', 'record_id_a', 'record_id_b', name='uq_user_link_pair'),
+        Index('ix_reconciliation_links_user_b', 'user_id', 'record_id_b'),
+    )
+
+
+class ReconciliationGroupMember(Base):
+    """
+    Connected component of the reconciliation link graph a transaction belongs to.
+    group_id is the smallest record_id in the component; records without links
+    have no row.
+    """
+    __tablename__ = "reconciliation_group_members"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    record_id = Column(String(100), nullable=False)
+    group_id = Column(String(100), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('user_id', 'record_id', name='uq_user_group_member'),
+        Index('ix_reconciliation_group_members_user_group', 'user_id', 'group_id'),
+    )
+
+
 # =============================================================================
 # IFRS-Based Claim Rights and Amortization Models
 # =============================================================================
@@ -246,10 +392,7 @@ class AmortizationEntry(Base):
 
 
 # Create engine and session
-def create_database_engine():
-    """Create database engine with appropriate connection args"""
-    url = settings.DATABASE_URL
-    
+def _connect_args(url: str) -> dict:
     if "sqlite" in url:
         # SQLite connection args
         connect_args = {"check_same_thread": False}
@@ -262,12 +405,228 @@ def create_database_engine():
     else:
         # Default (PostgreSQL, etc.)
         connect_args = {}
-    
-    return create_engine(url, connect_args=connect_args, pool_pre_ping=True)
+    return connect_args
+
+
+def create_database_engine():
+    """Create database engine with appropriate connection args"""
+    url = settings.DATABASE_URL
+    return create_engine(url, connect_args=_connect_args(url), pool_pre_ping=True)
+
+
+# Sync driver -> its asyncio counterpart for the same database
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """DATABASE_URL with its driver swapped for the asyncio one (mysql+pymysql -> mysql+aiomysql, ...)"""
+    parsed = make_url(url)
+    if parsed.drivername in ASYNC_DRIVERS.values():
+        return url
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver known for {parsed.drivername}; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def create_async_database_engine():
+    """Async engine on the same database as engine (ASYNC_DATABASE_URL overrides the derived URL)"""
+    url = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+    return create_async_engine(url, connect_args=_connect_args(url), pool_pre_ping=True)
+
+
+class LedgerSession(Session):
+    """
+    Session class behind both SessionLocal and AsyncSessionLocal, so the
+    after-flush hooks below run for sync and async sessions alike.
+    """
+
 
 engine = create_database_engine()
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=LedgerSession, autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_async_database_engine()
+
+# expire_on_commit=False: attributes of committed objects stay readable
+# outside the greenlet, where an expired attribute could not be reloaded
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, sync_session_class=LedgerSession, autoflush=False, expire_on_commit=False
+)
+
+
+# =============================================================================
+# Account Balance Maintenance
+# =============================================================================
+
+def apply_account_balance_deltas(connection, deltas: Dict[int, List[float]]):
+    """
+    Add {account_id: [debit, credit, last_line_id]} to account_balances on the
+    given connection (i.e. inside the caller's transaction).
+    """
+    table = AccountBalance.__table__
+    now = datetime.utcnow()
+    for account_id, (debit, credit, last_line_id) in deltas.items():
+        values = {
+            "debit_total": table.c.debit_total + debit,
+            "credit_total": table.c.credit_total + credit,
+            "updated_at": now,
+        }
+        if last_line_id is not None:
+            values["last_line_id"] = case(
+                (or_(table.c.last_line_id.is_(None), table.c.last_line_id < last_line_id), last_line_id),
+                else_=table.c.last_line_id
+            )
+        updated = connection.execute(
+            update(table).where(table.c.account_id == account_id).values(**values)
+        ).rowcount
+        if not updated:
+            # Account created before balances were tracked; rebuild_account_balances fixes its history
+            connection.execute(insert(table).from_select(
+                ["account_id", "user_id", "debit_total", "credit_total", "last_line_id", "updated_at"],
+                select(
+                    Account.__table__.c.id, Account.__table__.c.user_id,
+                    literal(debit), literal(credit), literal(last_line_id), literal(now)
+                ).where(Account.__table__.c.id == account_id)
+            ))
+
+
+def _track_account_balances(session, flush_context):
+    """Fold the journal lines written by this flush into account_balances"""
+    deltas: Dict[int, List[float]] = {}
+    
+    def add(account_id, debit, credit, line_id=None):
+        if account_id is None:
+            return
+        delta = deltas.setdefault(account_id, [0.0, 0.0, None])
+        delta[0] += debit or 0.0
+        delta[1] += credit or 0.0
+        if line_id is not None and (delta[2] is None or line_id > delta[2]):
+            delta[2] = line_id
+    
+    new_accounts = []
+    for obj in session.new:
+        if isinstance(obj, JournalEntryLine):
+            add(obj.account_id, obj.debit, obj.credit, obj.id)
+        elif isinstance(obj, Account):
+            new_accounts.append({"account_id": obj.id, "user_id": obj.user_id, "updated_at": datetime.utcnow()})
+    for obj in session.deleted:
+        if isinstance(obj, JournalEntryLine):
+            add(obj.account_id, -(obj.debit or 0.0), -(obj.credit or 0.0))
+    for obj in session.dirty:
+        if not isinstance(obj, JournalEntryLine) or not session.is_modified(obj):
+            continue
+        state = inspect(obj)
+        old = {}
+        for attr in ("account_id", "debit", "credit"):
+            history = state.attrs[attr].history
+            old[attr] = history.deleted[0] if history.deleted else getattr(obj, attr)
+        add(old["account_id"], -(old["debit"] or 0.0), -(old["credit"] or 0.0))
+        add(obj.account_id, obj.debit, obj.credit)
+    
+    connection = session.connection()
+    if new_accounts:
+        connection.execute(insert(AccountBalance.__table__), new_accounts)
+    if deltas:
+        apply_account_balance_deltas(connection, deltas)
+
+
+event.listen(LedgerSession, "after_flush", _track_account_balances)
+
+
+# =============================================================================
+# Transaction Date Maintenance
+# =============================================================================
+
+def _normalise_transaction_date(mapper, connection, target):
+    """Keep transaction_date in step with the extracted date on every ORM write"""
+    state = inspect(target)
+    if state.pending or state.attrs.date.history.has_changes() or target.transaction_date is None:
+        target.transaction_date = normalize_date(target.date, locale_for_currency(target.currency))
+
+
+event.listen(LedgerEntry, "before_insert", _normalise_transaction_date)
+event.listen(LedgerEntry, "before_update", _normalise_transaction_date)
+
+
+# =============================================================================
+# Period Close Maintenance
+# =============================================================================
+
+def reopen_closed_periods(connection, earliest: Dict[int, datetime]):
+    """
+    Mark each user's closed periods ending on or after their earliest changed
+    journal date ({user_id: entry_date}) as reopened, on the given connection
+    (i.e. inside the caller's transaction).
+    """
+    table = PeriodClose.__table__
+    now = datetime.utcnow()
+    for user_id, entry_date in earliest.items():
+        if isinstance(entry_date, str):
+            entry_date = datetime.fromisoformat(entry_date)
+        connection.execute(
+            update(table)
+            .where(table.c.user_id == user_id, table.c.status == "closed", table.c.period_end >= entry_date.date())
+            .values(status="reopened", reopened_at=now)
+        )
+
+
+def _reopen_closed_periods(session, flush_context):
+    """
+    Mark closed periods stale when this flush writes, re-dates or deletes a
+    journal entry dated on or before their period_end.
+    """
+    earliest: Dict[int, datetime] = {}
+    
+    def touch(user_id, entry_date):
+        if user_id is None or entry_date is None:
+            return
+        if user_id not in earliest or entry_date < earliest[user_id]:
+            earliest[user_id] = entry_date
+    
+    seen_entries = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, JournalEntry):
+            seen_entries.add(obj.id)
+            touch(obj.user_id, obj.entry_date)
+    for obj in session.dirty:
+        if isinstance(obj, JournalEntry) and session.is_modified(obj):
+            seen_entries.add(obj.id)
+            history = inspect(obj).attrs.entry_date.history
+            for entry_date in list(history.deleted) + [obj.entry_date]:
+                touch(obj.user_id, entry_date)
+    
+    # Lines changed on their own: the date comes from their journal entry
+    entry_ids = set()
+    for obj in list(session.new) + list(session.deleted) + list(session.dirty):
+        if not isinstance(obj, JournalEntryLine):
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        history = inspect(obj).attrs.journal_entry_id.history
+        entry_ids.update(i for i in list(history.deleted) + [obj.journal_entry_id] if i not in seen_entries)
+    entry_ids.discard(None)
+    
+    connection = session.connection()
+    if entry_ids:
+        table = JournalEntry.__table__
+        rows = connection.execute(
+            select(table.c.user_id, func.min(table.c.entry_date))
+            .where(table.c.id.in_(entry_ids))
+            .group_by(table.c.user_id)
+        ).all()
+        for user_id, entry_date in rows:
+            touch(user_id, entry_date)
+    
+    if earliest:
+        reopen_closed_periods(connection, earliest)
+
+
+event.listen(LedgerSession, "after_flush", _reopen_closed_periods)
 
 
 def init_db():
@@ -284,3 +643,30 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Request-scoped async session (FastAPI caches it per request, so routes and get_current_user share it)"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+T = TypeVar("T")
+
+
+async def run_in_session(db: AsyncSession, fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Await a sync service function on the request's async session: fn gets the
+    session as db= and runs in a greenlet, so its queries go through the
+    asyncio driver instead of blocking the event loop.
+    """
+    return await db.run_sync(lambda session: fn(*args, db=session, **kwargs))
+
+
+def independent_session(db=None) -> Session:
+    """
+    New session for a separate transaction on db's engine (SessionLocal() when
+    db is None). Under run_in_session that is the async engine, so the extra
+    connection goes through the asyncio driver too.
+    """
+    return SessionLocal(bind=db.get_bind()) if db is not None else SessionLocal()
+
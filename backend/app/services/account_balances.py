@@ -0,0 +1,135 @@
+"""
+Account Balances Service
+
+``account_balances`` holds running debit/credit totals per account. The
+after-flush hook in app/db/sql.py keeps it in step with journal_entry_lines
+inside the same transaction as each post, so balance reads are one indexed
+row per account instead of a scan of the account's journal lines.
+
+This module rebuilds the table from the journal (after a restore, a bulk load
+that bypassed the ORM, or when first enabling it) and checks it against the
+journal. See scripts/rebuild_account_balances.py.
+"""
+
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import logging
+
+from sqlalchemy import func, insert
+
+from app.db.sql import SessionLocal, Account, AccountBalance, JournalEntryLine
+
+logger = logging.getLogger(__name__)
+
+# Totals closer than this are considered equal
+TOLERANCE = 0.005
+
+
+def _journal_totals(db, user_id: Optional[int] = None):
+    """(account_id, user_id, debit_total, credit_total, last_line_id) for every account, from the journal"""
+    line_totals = db.query(
+        JournalEntryLine.account_id.label("account_id"),
+        func.sum(JournalEntryLine.debit).label("debit_total"),
+        func.sum(JournalEntryLine.credit).label("credit_total"),
+        func.max(JournalEntryLine.id).label("last_line_id")
+    )
+    if user_id is not None:
+        line_totals = line_totals.join(Account, Account.id == JournalEntryLine.account_id).filter(
+            Account.user_id == user_id
+        )
+    line_totals = line_totals.group_by(JournalEntryLine.account_id).subquery()
+
+    query = db.query(
+        Account.id, Account.user_id,
+        func.coalesce(line_totals.c.debit_total, 0.0),
+        func.coalesce(line_totals.c.credit_total, 0.0),
+        line_totals.c.last_line_id
+    ).outerjoin(line_totals, line_totals.c.account_id == Account.id)
+    if user_id is not None:
+        query = query.filter(Account.user_id == user_id)
+    return query.all()
+
+
+def rebuild_account_balances(user_id: Optional[int] = None) -> int:
+    """
+    Recompute account_balances from journal_entry_lines.
+
+    Args:
+        user_id: Only this user's accounts (default: everyone)
+
+    Returns:
+        Number of balance rows written
+    """
+    db = SessionLocal()
+    try:
+        rows = _journal_totals(db, user_id)
+        query = db.query(AccountBalance)
+        if user_id is not None:
+            query = query.filter(AccountBalance.user_id == user_id)
+        query.delete(synchronize_session=False)
+
+        now = datetime.utcnow()
+        values = [
+            {
+                "account_id": account_id,
+                "user_id": owner,
+                "debit_total": float(debit or 0.0),
+                "credit_total": float(credit or 0.0),
+                "last_line_id": last_line_id,
+                "updated_at": now,
+            }
+            for account_id, owner, debit, credit, last_line_id in rows
+        ]
+        for i in range(0, len(values), 1000):
+            db.execute(insert(AccountBalance), values[i:i + 1000])
+        db.commit()
+        logger.info(f"Rebuilt {len(values)} account balance(s){f' for user {user_id}' if user_id else ''}")
+        return len(values)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def check_account_balances(user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Compare account_balances with the journal.
+
+    Returns:
+        One dict per inconsistent account (missing row or totals that differ)
+    """
+    db = SessionLocal()
+    try:
+        expected = _journal_totals(db, user_id)
+        query = db.query(AccountBalance)
+        if user_id is not None:
+            query = query.filter(AccountBalance.user_id == user_id)
+        stored = {row.account_id: row for row in query.all()}
+    finally:
+        db.close()
+
+    problems = []
+    for account_id, owner, debit, credit, last_line_id in expected:
+        row = stored.pop(account_id, None)
+        if row is None:
+            if abs(debit or 0.0) > TOLERANCE or abs(credit or 0.0) > TOLERANCE:
+                problems.append({"account_id": account_id, "user_id": owner, "issue": "missing",
+                                 "expected_debit": debit, "expected_credit": credit})
+            continue
+        if abs(row.debit_total - (debit or 0.0)) > TOLERANCE or abs(row.credit_total - (credit or 0.0)) > TOLERANCE:
+            problems.append({
+                "account_id": account_id, "user_id": owner, "issue": "totals",
+                "expected_debit": debit, "expected_credit": credit,
+                "stored_debit": row.debit_total, "stored_credit": row.credit_total,
+            })
+    for account_id, row in stored.items():
+        problems.append({"account_id": account_id, "user_id": row.user_id, "issue": "orphan"})
+    return problems
+
+
+def account_balance(account_type: str, debit_total: float, credit_total: float) -> float:
+    """Signed balance on the account's normal side"""
+    if account_type in ["asset", "expense"]:
+        return (debit_total or 0.0) - (credit_total or 0.0)
+    return (credit_total or 0.0) - (debit_total or 0.0)
@@ -3,18 +3,27 @@ Double-Entry Accounting Service
 
 Implements core double-entry accounting logic:
 - Chart of Accounts management
-- Journal entry creation and validation
-- Auto-generation of journal entries from receipt transactions
+- Balanced expense journal entries for receipt transactions (posted by posting_service)
 - Account balance calculations
 - Financial reports (Trial Balance, Income Statement, Balance Sheet)
 """
 
-from typing import Dict, Any, List, Optional, Tuple
-from datetime import datetime
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+from datetime import datetime, date, timedelta
+import threading
+import time
 import logging
-from sqlalchemy.orm import joinedload
-
-from app.db.sql import SessionLocal, Account, JournalEntry, JournalEntryLine, LedgerEntry
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.core.config import settings
+from app.db.sql import (
+    SessionLocal, independent_session, Account, AccountBalance, ChartOfAccountsVersion, JournalEntry, JournalEntryLine, LedgerEntry
+)
+from app.services.account_balances import account_balance
+from app.utils.cursor import encode_cursor, decode_cursor, after_cursor
+from app.utils.date_normalizer import normalize_date, locale_for_currency
 
 logger = logging.getLogger(__name__)
 
@@ -112,278 +121,360 @@ DEFAULT_ACCOUNTS = [
 # Chart of Accounts Functions
 # =============================================================================
 
-def initialize_chart_of_accounts():
-    """Initialize the default chart of accounts if not exists"""
-    db = SessionLocal()
+def initialize_chart_of_accounts(user_id: int, db=None):
+    """Initialize the default chart of accounts for a user if they have none"""
+    if _chart_cache.get(user_id, {}).get("accounts"):
+        return
+    own_session = db is None
+    db = db or SessionLocal()
     try:
         # Check if accounts already exist
-        existing_count = db.query(Account).count()
+        existing_count = db.query(Account).filter(Account.user_id == user_id).count()
         if existing_count > 0:
-            logger.info(f"Chart of accounts already initialized with {existing_count} accounts")
+            logger.debug(f"Chart of accounts already initialized with {existing_count} accounts for user {user_id}")
             return
         
         # First pass: create all accounts without parent links
         account_map = {}
         for acc_data in DEFAULT_ACCOUNTS:
             account = Account(
+                user_id=user_id,
                 code=acc_data["code"],
                 name=acc_data["name"],
                 account_type=acc_data["account_type"],
                 is_active=True
             )
             db.add(account)
-            db.flush()  # Get the ID
-            account_map[acc_data["code"]] = account.id
+            account_map[acc_data["code"]] = account
+        db.flush()  # Get the IDs
         
         # Second pass: set parent relationships
         for acc_data in DEFAULT_ACCOUNTS:
-            if acc_data["parent_id"]:
-                parent_code = acc_data["parent_id"]
-                if parent_code in account_map:
-                    account = db.query(Account).filter(Account.code == acc_data["code"]).first()
-                    account.parent_id = account_map[parent_code]
+            if acc_data["parent_id"] in account_map:
+                account_map[acc_data["code"]].parent_id = account_map[acc_data["parent_id"]].id
         
+        version = bump_chart_version(db, user_id)
         db.commit()
-        logger.info(f"Initialized chart of accounts with {len(DEFAULT_ACCOUNTS)} accounts")
+        _store_chart(user_id, version, list(account_map.values()))
+        logger.info(f"Initialized chart of accounts with {len(DEFAULT_ACCOUNTS)} accounts for user {user_id}")
     except Exception as e:
         db.rollback()
         logger.error(f"Error initializing chart of accounts: {e}")
         raise
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
-def get_account_by_code(code: str) -> Optional[Account]:
-    """Get account by its code"""
-    db = SessionLocal()
-    try:
-        return db.query(Account).filter(Account.code == code).first()
-    finally:
-        db.close()
+# =============================================================================
+# Chart of Accounts Cache
+# =============================================================================
+#
+# Each worker keeps every user's chart in memory (code -> CachedAccount), loaded
+# once with a single query. Changes made through this module are written through
+# to the local cache and bump the user's row in chart_of_accounts_versions in
+# the same transaction; other workers compare their copy's version at most every
+# CHART_CACHE_REVALIDATE_SECONDS (one primary-key lookup) or straight away when
+# a code is missing, and reload on mismatch.
+
+class CachedAccount(NamedTuple):
+    id: int
+    code: str
+    name: str
+    account_type: str
+    normal_balance: str
+    parent_id: Optional[int]
+
+
+_chart_cache: Dict[int, Dict[str, Any]] = {}
+_chart_lock = threading.Lock()
+_chart_stats = {"hits": 0, "loads": 0, "revalidations": 0, "stale_reloads": 0}
+
+
+def _cached_account(account: Account) -> CachedAccount:
+    return CachedAccount(
+        id=account.id,
+        code=account.code,
+        name=account.name,
+        account_type=account.account_type,
+        normal_balance=NORMAL_BALANCES.get(account.account_type, "debit"),
+        parent_id=account.parent_id
+    )
+
+
+def _store_chart(user_id: int, version: int, accounts: List[Account]):
+    with _chart_lock:
+        _chart_cache[user_id] = {
+            "version": version,
+            "checked_at": time.monotonic(),
+            "accounts": {account.code: _cached_account(account) for account in accounts},
+        }
+
+
+def _read_chart_version(db, user_id: int) -> int:
+    version = db.query(ChartOfAccountsVersion.version).filter(
+        ChartOfAccountsVersion.user_id == user_id
+    ).scalar()
+    return version or 0
+
+
+def bump_chart_version(db, user_id: int) -> int:
+    """Increment a user's chart version inside the caller's transaction"""
+    row = db.query(ChartOfAccountsVersion).filter(
+        ChartOfAccountsVersion.user_id == user_id
+    ).with_for_update().first()
+    if row is None:
+        row = ChartOfAccountsVersion(user_id=user_id, version=0)
+        db.add(row)
+    row.version = (row.version or 0) + 1
+    return row.version
+
+
+def _load_chart(db, user_id: int):
+    version = _read_chart_version(db, user_id)
+    accounts = db.query(Account).filter(Account.user_id == user_id).all()
+    _store_chart(user_id, version, accounts)
+    _chart_stats["loads"] += 1
+    return accounts
 
 
-def get_all_accounts() -> List[Dict[str, Any]]:
-    """Get all accounts with their current balances"""
-    db = SessionLocal()
+def get_chart(user_id: int, db=None, revalidate: bool = False) -> Dict[str, CachedAccount]:
+    """
+    A user's chart of accounts by code, from this worker's cache.
+    The default chart is created on first use.
+    """
+    entry = _chart_cache.get(user_id)
+    max_age = settings.CHART_CACHE_REVALIDATE_SECONDS
+    if entry and not revalidate and time.monotonic() - entry["checked_at"] < max_age:
+        _chart_stats["hits"] += 1
+        return entry["accounts"]
+    
+    own_session = db is None
+    db = db or SessionLocal()
     try:
-        accounts = db.query(Account).filter(Account.is_active == True).order_by(Account.code).all()
-        result = []
-        for acc in accounts:
-            balance = calculate_account_balance(acc.id)
-            result.append({
-                "id": acc.id,
-                "code": acc.code,
-                "name": acc.name,
-                "account_type": acc.account_type,
-                "parent_id": acc.parent_id,
-                "description": acc.description,
-                "balance": balance,
-                "normal_balance": NORMAL_BALANCES.get(acc.account_type, "debit")
-            })
-        return result
+        if entry:
+            _chart_stats["revalidations"] += 1
+            if _read_chart_version(db, user_id) == entry["version"]:
+                entry["checked_at"] = time.monotonic()
+                return entry["accounts"]
+            _chart_stats["stale_reloads"] += 1
+        if not _load_chart(db, user_id):
+            # Created in its own transaction on db's engine; the caller's stays open
+            fresh = independent_session(None if own_session else db)
+            try:
+                initialize_chart_of_accounts(user_id, db=fresh)
+                if not _chart_cache[user_id]["accounts"]:
+                    # Another worker created it first; read it outside our snapshot
+                    fresh.rollback()
+                    _load_chart(fresh, user_id)
+            finally:
+                fresh.close()
+        return _chart_cache[user_id]["accounts"]
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
-# =============================================================================
-# Journal Entry Functions
-# =============================================================================
+def get_cached_account(user_id: int, code: str, db=None) -> Optional[CachedAccount]:
+    """Account by code; a miss re-checks the version once before giving up"""
+    account = get_chart(user_id, db).get(code)
+    if account is None:
+        account = get_chart(user_id, db, revalidate=True).get(code)
+    return account
+
+
+def invalidate_chart_cache(user_id: Optional[int] = None):
+    """Drop cached charts for one user (or everyone)"""
+    with _chart_lock:
+        if user_id is None:
+            _chart_cache.clear()
+        else:
+            _chart_cache.pop(user_id, None)
+
 
-def create_journal_entry(
-    ledger_entry_id: Optional[int],
-    entry_date: datetime,
-    reference: str,
-    description: str,
-    lines: List[Dict[str, Any]],
-    memo: Optional[str] = None
-) -> JournalEntry:
+def get_chart_cache_stats() -> Dict[str, Any]:
+    return {
+        "users": len(_chart_cache),
+        "revalidate_seconds": settings.CHART_CACHE_REVALIDATE_SECONDS,
+        **_chart_stats,
+    }
+
+
+def create_account(
+    user_id: int,
+    code: str,
+    name: str,
+    account_type: str,
+    parent_id: Optional[int] = None,
+    description: Optional[str] = None,
+    db=None
+) -> CachedAccount:
     """
-    Create a new journal entry with debit/credit lines.
-    
-    Args:
-        ledger_entry_id: Optional link to ledger entry
-        entry_date: Date of the transaction
-        reference: Reference number (e.g., record_id)
-        description: Description of the entry
-        lines: List of line items with account_id, debit, credit, description
-        memo: Optional additional notes
+    Add an account to a user's chart (write-through to the cache).
     
-    Returns:
-        Created JournalEntry object
+    Raises:
+        ValueError: if the user already has an account with this code
     """
-    db = SessionLocal()
+    if get_cached_account(user_id, code, db) is not None:
+        raise ValueError(f"Account with code {code} already exists")
+    
+    own_session = db is None
+    db = db or SessionLocal()
     try:
-        # Validate that debits = credits
-        total_debits = sum(line.get("debit", 0) for line in lines)
-        total_credits = sum(line.get("credit", 0) for line in lines)
-        
-        if abs(total_debits - total_credits) > 0.01:  # Allow small rounding errors
-            raise ValueError(f"Journal entry not balanced: debits={total_debits}, credits={total_credits}")
-        
-        # Get user_id from ledger_entry if provided
-        user_id = None
-        if ledger_entry_id:
-            ledger_entry = db.query(LedgerEntry).filter(LedgerEntry.id == ledger_entry_id).first()
-            if ledger_entry:
-                user_id = ledger_entry.user_id
-        
-        if user_id is None:
-            raise ValueError("user_id is required. Provide it directly or via ledger_entry_id")
-        
-        # Create journal entry
-        journal_entry = JournalEntry(
+        account = Account(
             user_id=user_id,
-            ledger_entry_id=ledger_entry_id,
-            entry_date=entry_date,
-            reference=reference,
+            code=code,
+            name=name,
+            account_type=account_type,
+            parent_id=parent_id,
             description=description,
-            memo=memo,
-            is_balanced=True
+            is_active=True
         )
-        db.add(journal_entry)
-        db.flush()  # Get the ID
-        
-        # Create journal entry lines
-        for line in lines:
-            journal_line = JournalEntryLine(
-                journal_entry_id=journal_entry.id,
-                account_id=line["account_id"],
-                debit=line.get("debit", 0),
-                credit=line.get("credit", 0),
-                description=line.get("description")
-            )
-            db.add(journal_line)
-        
+        db.add(account)
+        db.flush()
+        version = bump_chart_version(db, user_id)
         db.commit()
-        db.refresh(journal_entry)
-        logger.info(f"Created journal entry {journal_entry.id} with {len(lines)} lines")
-        return journal_entry
+        
+        cached = _cached_account(account)
+        with _chart_lock:
+            entry = _chart_cache.get(user_id)
+            if entry is not None:
+                # Only advance when we held the previous version, otherwise force a reload
+                if entry["version"] == version - 1:
+                    entry["accounts"] = {**entry["accounts"], code: cached}
+                    entry["version"] = version
+                else:
+                    entry["checked_at"] = 0.0
+        logger.info(f"Created account {code} {name} for user {user_id}")
+        return cached
+    except IntegrityError:
+        db.rollback()
+        invalidate_chart_cache(user_id)
+        raise ValueError(f"Account with code {code} already exists")
     except Exception as e:
         db.rollback()
-        logger.error(f"Error creating journal entry: {e}")
+        logger.error(f"Error creating account: {e}")
         raise
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
-def auto_generate_journal_entry(ledger_entry: LedgerEntry, category: Optional[str] = None) -> Optional[JournalEntry]:
+def get_or_create_account(user_id: int, code: str, name: str, account_type: str, db=None) -> CachedAccount:
     """
-    Automatically generate a journal entry for a ledger entry based on category and payment method.
-    
-    For expense transactions (receipts):
-    - DEBIT: Expense account (based on category)
-    - CREDIT: Cash/Credit Card/AP account (based on payment method)
-    
-    Args:
-        ledger_entry: The ledger entry to create journal entry for
-        category: Transaction category (e.g., "Food & Beverage")
-    
-    Returns:
-        Created JournalEntry or None if failed
+    Account by code, created with the given name/type if the user's chart lacks it.
+    A missing account is created in its own transaction, so a concurrent
+    creator's conflict cannot roll back the caller's work on db.
     """
-    db = SessionLocal()
+    account = get_cached_account(user_id, code, db)
+    if account is not None:
+        return account
+    fresh = independent_session(db)
     try:
-        # Get expense account based on category
-        expense_account_code = CATEGORY_TO_EXPENSE_ACCOUNT.get(category, "5990")  # Default to General Expense
-        expense_account = db.query(Account).filter(Account.code == expense_account_code).first()
-        
-        # Get payment account based on payment method
-        payment_method = (ledger_entry.payment_method or "").lower().strip()
-        payment_account_code = PAYMENT_METHOD_TO_ACCOUNT.get(payment_method, "1100")
-        payment_account = db.query(Account).filter(Account.code == payment_account_code).first()
-        
-        if not expense_account or not payment_account:
-            logger.warning(f"Could not find accounts for category={category}, payment_method={payment_method}")
-            # Initialize accounts if missing
-            initialize_chart_of_accounts()
-            expense_account = db.query(Account).filter(Account.code == expense_account_code).first()
-            payment_account = db.query(Account).filter(Account.code == payment_account_code).first()
-        
-        if not expense_account or not payment_account:
-            logger.error("Failed to find or create required accounts")
-            return None
-        
-        # Determine the amount
-        amount = ledger_entry.total or ledger_entry.amount or 0
-        
-        if amount <= 0:
-            logger.warning(f"Cannot create journal entry for zero or negative amount: {amount}")
-            return None
-        
-        # Parse entry date
-        try:
-            if ledger_entry.date:
-                entry_date = datetime.strptime(ledger_entry.date, "%Y-%m-%d")
-            else:
-                entry_date = ledger_entry.created_at or datetime.utcnow()
-        except (ValueError, TypeError):
-            entry_date = datetime.utcnow()
-        
-        # Determine if payment account is liability (credit increases) or asset (credit decreases)
-        is_liability = payment_account.account_type == "liability"
-        
-        # Build journal entry lines
-        # For expenses: DEBIT expense, CREDIT cash (if asset) or CREDIT liability (if credit card)
-        lines = []
-        
-        # Debit: Expense account
-        lines.append({
-            "account_id": expense_account.id,
-            "debit": amount,
-            "credit": 0,
-            "description": f"{category or 'Expense'} - {ledger_entry.vendor or 'Unknown'}"
-        })
-        
-        # Credit: Payment account (Cash or Liability)
-        lines.append({
-            "account_id": payment_account.id,
-            "debit": 0,
-            "credit": amount,
-            "description": f"Payment for {ledger_entry.vendor or 'transaction'}"
-        })
-        
-        # Create the journal entry with user_id from ledger_entry
-        journal_entry = JournalEntry(
-            user_id=ledger_entry.user_id,
-            ledger_entry_id=ledger_entry.id,
-            entry_date=entry_date,
-            reference=ledger_entry.record_id,
-            description=f"{ledger_entry.vendor or 'Unknown'} - {category or 'Expense'}",
-            is_balanced=True
-        )
-        db.add(journal_entry)
-        db.flush()
-        
-        # Add lines
-        for line in lines:
-            journal_line = JournalEntryLine(
-                journal_entry_id=journal_entry.id,
-                account_id=line["account_id"],
-                debit=line["debit"],
-                credit=line["credit"],
-                description=line["description"]
-            )
-            db.add(journal_line)
-        
-        db.commit()
-        db.refresh(journal_entry)
-        
-        logger.info(f"Auto-generated journal entry {journal_entry.id} for ledger entry {ledger_entry.id}")
-        logger.info(f"  DEBIT {expense_account.code} {expense_account.name}: ${amount}")
-        logger.info(f"  CREDIT {payment_account.code} {payment_account.name}: ${amount}")
-        
-        return journal_entry
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error auto-generating journal entry: {e}", exc_info=True)
-        return None
+        return create_account(user_id, code, name, account_type, db=fresh)
+    except ValueError:
+        # Created concurrently by another worker
+        return get_cached_account(user_id, code, db)
+    finally:
+        fresh.close()
+
+
+def get_all_accounts(user_id: int, db=None) -> List[Dict[str, Any]]:
+    """Get all of a user's accounts with their current balances"""
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        rows = db.query(Account, AccountBalance.debit_total, AccountBalance.credit_total).outerjoin(
+            AccountBalance, AccountBalance.account_id == Account.id
+        ).filter(
+            Account.user_id == user_id,
+            Account.is_active == True
+        ).order_by(Account.code).all()
+        return [
+            {
+                "id": acc.id,
+                "code": acc.code,
+                "name": acc.name,
+                "account_type": acc.account_type,
+                "parent_id": acc.parent_id,
+                "description": acc.description,
+                "balance": account_balance(acc.account_type, debit_total, credit_total),
+                "normal_balance": NORMAL_BALANCES.get(acc.account_type, "debit")
+            }
+            for acc, debit_total, credit_total in rows
+        ]
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
-def get_journal_entry(journal_entry_id: int) -> Optional[Dict[str, Any]]:
+# =============================================================================
+# Journal Entry Functions
+# =============================================================================
+
+def expense_account_code(category: Optional[str]) -> str:
+    """Expense account for a transaction category (General Expense if unmapped)"""
+    return CATEGORY_TO_EXPENSE_ACCOUNT.get(category, "5990")
+
+
+def payment_account_code(payment_method: Optional[str]) -> str:
+    """Cash, card or payable account for a payment method (Cash if unmapped)"""
+    return PAYMENT_METHOD_TO_ACCOUNT.get((payment_method or "").lower().strip(), "1100")
+
+
+def parse_entry_date(ledger_entry: LedgerEntry) -> datetime:
+    """Journal date for a ledger entry (its normalised transaction date, else when it was created)"""
+    transaction_date = ledger_entry.transaction_date or normalize_date(
+        ledger_entry.date, locale_for_currency(ledger_entry.currency)
+    )
+    if transaction_date:
+        return datetime.combine(transaction_date, datetime.min.time())
+    return ledger_entry.created_at or datetime.utcnow()
+
+
+def build_expense_journal(
+    ledger_entry: LedgerEntry,
+    category: Optional[str],
+    expense_account_id: int,
+    payment_account_id: int
+) -> Optional[JournalEntry]:
+    """
+    Unsaved balanced journal entry for an expense receipt:
+    DEBIT the expense account, CREDIT the payment account.
+    Returns None for zero or negative amounts.
+    """
+    amount = ledger_entry.total or ledger_entry.amount or 0
+    if amount <= 0:
+        logger.warning(f"Cannot create journal entry for zero or negative amount: {amount}")
+        return None
+    
+    return JournalEntry(
+        user_id=ledger_entry.user_id,
+        entry_date=parse_entry_date(ledger_entry),
+        reference=ledger_entry.record_id,
+        description=f"{ledger_entry.vendor or 'Unknown'} - {category or 'Expense'}",
+        is_balanced=True,
+        lines=[
+            JournalEntryLine(
+                account_id=expense_account_id,
+                debit=amount,
+                credit=0,
+                description=f"{category or 'Expense'} - {ledger_entry.vendor or 'Unknown'}"
+            ),
+            JournalEntryLine(
+                account_id=payment_account_id,
+                debit=0,
+                credit=amount,
+                description=f"Payment for {ledger_entry.vendor or 'transaction'}"
+            ),
+        ]
+    )
+
+
+def get_journal_entry(journal_entry_id: int, db=None) -> Optional[Dict[str, Any]]:
     """Get journal entry with its lines"""
-    db = SessionLocal()
+    own_session = db is None
+    db = db or SessionLocal()
     try:
         entry = db.query(JournalEntry).options(
             joinedload(JournalEntry.lines).joinedload(JournalEntryLine.account)
@@ -394,12 +485,14 @@ def get_journal_entry(journal_entry_id: int) -> Optional[Dict[str, Any]]:
         
         return format_journal_entry(entry)
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
-def get_journal_entry_by_ledger_entry(ledger_entry_id: int, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+def get_journal_entry_by_ledger_entry(ledger_entry_id: int, user_id: Optional[int] = None, db=None) -> Optional[Dict[str, Any]]:
     """Get journal entry for a specific ledger entry, optionally filtered by user_id"""
-    db = SessionLocal()
+    own_session = db is None
+    db = db or SessionLocal()
     try:
         # Try with eager loading first
         try:
@@ -435,7 +528,46 @@ def get_journal_entry_by_ledger_entry(ledger_entry_id: int, user_id: Optional[in
         
         return format_journal_entry(entry)
     finally:
-        db.close()
+        if own_session:
+            db.close()
+
+
+def get_journal_entries_page(
+    user_id: int,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    db=None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of a user's journal entries, latest entry_date first, and the
+    cursor of the next page (None on the last page). With a cursor the page is
+    a keyset seek on (user_id, entry_date, id); skip is the legacy OFFSET
+    paging. Raises ValueError for a bad cursor.
+    """
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        query = db.query(JournalEntry).options(
+            selectinload(JournalEntry.lines).joinedload(JournalEntryLine.account)
+        ).filter(JournalEntry.user_id == user_id)
+        
+        if cursor:
+            query = query.filter(after_cursor(JournalEntry.entry_date, JournalEntry.id, decode_cursor("journal", cursor)))
+        
+        query = query.order_by(JournalEntry.entry_date.desc(), JournalEntry.id.desc())
+        if skip and not cursor:
+            query = query.offset(skip)
+        entries = query.limit(limit + 1).all()
+        next_cursor = None
+        if len(entries) > limit:
+            entries = entries[:limit]
+            next_cursor = encode_cursor("journal", entries[-1].entry_date, entries[-1].id)
+        
+        return [format_journal_entry(entry) for entry in entries], next_cursor
+    finally:
+        if own_session:
+            db.close()
 
 
 def format_journal_entry(entry: JournalEntry) -> Dict[str, Any]:
@@ -472,186 +604,277 @@ def format_journal_entry(entry: JournalEntry) -> Dict[str, Any]:
 # Account Balance and Reports
 # =============================================================================
 
-def calculate_account_balance(account_id: int) -> float:
+def calculate_account_balance(account_id: int, db=None) -> float:
     """
-    Calculate the current balance of an account.
+    Calculate the current balance of an account from its materialised totals.
     
     For assets and expenses: balance = sum(debits) - sum(credits)
     For liabilities, equity, revenue: balance = sum(credits) - sum(debits)
     """
-    db = SessionLocal()
+    own_session = db is None
+    db = db or SessionLocal()
     try:
-        account = db.query(Account).filter(Account.id == account_id).first()
-        if not account:
+        row = db.query(Account.account_type, AccountBalance.debit_total, AccountBalance.credit_total).outerjoin(
+            AccountBalance, AccountBalance.account_id == Account.id
+        ).filter(Account.id == account_id).first()
+        if not row:
             return 0.0
-        
-        lines = db.query(JournalEntryLine).filter(JournalEntryLine.account_id == account_id).all()
-        
-        total_debits = sum(line.debit for line in lines)
-        total_credits = sum(line.credit for line in lines)
-        
-        # Determine balance based on account type
-        if account.account_type in ["asset", "expense"]:
-            return total_debits - total_credits
-        else:  # liability, equity, revenue
-            return total_credits - total_debits
+        return account_balance(*row)
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
-def get_trial_balance() -> Dict[str, Any]:
+def get_account_totals(
+    user_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db=None,
+    include_inactive: bool = False
+) -> List[Dict[str, Any]]:
     """
-    Generate a trial balance report.
-    Sum of all debit balances should equal sum of all credit balances.
+    Debit/credit totals per account for a user's journal lines dated within
+    [start_date, end_date] (either bound optional): one GROUP BY account_id over
+    journal_entry_lines joined to journal_entries and accounts. Every report
+    below is built from this aggregate.
     """
-    db = SessionLocal()
+    own_session = db is None
+    db = db or SessionLocal()
     try:
-        accounts = db.query(Account).filter(Account.is_active == True).order_by(Account.code).all()
-        
-        trial_balance = []
-        total_debits = 0
-        total_credits = 0
-        
-        for account in accounts:
-            balance = calculate_account_balance(account.id)
-            
-            if abs(balance) < 0.01:  # Skip zero balances
-                continue
-            
-            debit_balance = 0
-            credit_balance = 0
-            
-            # Determine which column the balance goes in
-            if account.account_type in ["asset", "expense"]:
-                if balance >= 0:
-                    debit_balance = balance
-                else:
-                    credit_balance = abs(balance)
-            else:  # liability, equity, revenue
-                if balance >= 0:
-                    credit_balance = balance
-                else:
-                    debit_balance = abs(balance)
-            
-            trial_balance.append({
-                "account_code": account.code,
-                "account_name": account.name,
-                "account_type": account.account_type,
-                "debit_balance": debit_balance,
-                "credit_balance": credit_balance
-            })
-            
-            total_debits += debit_balance
-            total_credits += credit_balance
-        
-        return {
-            "accounts": trial_balance,
-            "total_debits": total_debits,
-            "total_credits": total_credits,
-            "is_balanced": abs(total_debits - total_credits) < 0.01,
-            "generated_at": datetime.utcnow().isoformat()
-        }
+        query = db.query(
+            Account.id, Account.code, Account.name, Account.account_type,
+            func.sum(JournalEntryLine.debit), func.sum(JournalEntryLine.credit)
+        ).join(
+            JournalEntryLine, JournalEntryLine.account_id == Account.id
+        ).join(
+            JournalEntry, JournalEntry.id == JournalEntryLine.journal_entry_id
+        ).filter(JournalEntry.user_id == user_id)
+        if not include_inactive:
+            query = query.filter(Account.is_active == True)
+        if start_date:
+            query = query.filter(JournalEntry.entry_date >= datetime.combine(start_date, datetime.min.time()))
+        if end_date:
+            query = query.filter(JournalEntry.entry_date < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        rows = query.group_by(Account.id, Account.code, Account.name, Account.account_type).all()
+        return [
+            {
+                "account_id": account_id,
+                "account_code": code,
+                "account_name": name,
+                "account_type": account_type,
+                "debit_total": debit_total or 0.0,
+                "credit_total": credit_total or 0.0,
+                "balance": account_balance(account_type, debit_total, credit_total),
+            }
+            for account_id, code, name, account_type, debit_total, credit_total in rows
+        ]
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
-def get_income_statement() -> Dict[str, Any]:
-    """Generate income statement (Profit & Loss)"""
-    db = SessionLocal()
-    try:
-        accounts = db.query(Account).filter(Account.is_active == True).all()
-        
-        revenues = []
-        expenses = []
-        total_revenue = 0
-        total_expenses = 0
-        
-        for account in accounts:
-            balance = calculate_account_balance(account.id)
-            if abs(balance) < 0.01:
-                continue
-            
-            item = {
-                "account_code": account.code,
-                "account_name": account.name,
-                "amount": balance
-            }
-            
-            if account.account_type == "revenue":
-                revenues.append(item)
-                total_revenue += balance
-            elif account.account_type == "expense":
-                expenses.append(item)
-                total_expenses += balance
+def _report_period(start_date: Optional[date], end_date: Optional[date]) -> Dict[str, Any]:
+    return {
+        "period_start": start_date.isoformat() if start_date else None,
+        "period_end": end_date.isoformat() if end_date else None,
+        "generated_at": datetime.utcnow().isoformat()
+    }
+
+
+def trial_balance_from_totals(totals: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Trial balance from get_account_totals rows.
+    Sum of all debit balances should equal sum of all credit balances.
+    """
+    trial_balance = []
+    total_debits = 0
+    total_credits = 0
+    
+    for account in sorted(totals, key=lambda a: a["account_code"] or ""):
+        balance = account["balance"]
+        if abs(balance) < 0.01:  # Skip zero balances
+            continue
+        
+        debit_balance = 0
+        credit_balance = 0
+        
+        # Determine which column the balance goes in
+        if account["account_type"] in ["asset", "expense"]:
+            if balance >= 0:
+                debit_balance = balance
+            else:
+                credit_balance = abs(balance)
+        else:  # liability, equity, revenue
+            if balance >= 0:
+                credit_balance = balance
+            else:
+                debit_balance = abs(balance)
+        
+        trial_balance.append({
+            "account_code": account["account_code"],
+            "account_name": account["account_name"],
+            "account_type": account["account_type"],
+            "debit_balance": debit_balance,
+            "credit_balance": credit_balance
+        })
         
-        net_income = total_revenue - total_expenses
+        total_debits += debit_balance
+        total_credits += credit_balance
+    
+    return {
+        "accounts": trial_balance,
+        "total_debits": total_debits,
+        "total_credits": total_credits,
+        "is_balanced": abs(total_debits - total_credits) < 0.01
+    }
+
+
+def income_statement_from_totals(totals: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Income statement (Profit & Loss) from get_account_totals rows"""
+    revenues = []
+    expenses = []
+    total_revenue = 0
+    total_expenses = 0
+    
+    for account in totals:
+        balance = account["balance"]
+        if abs(balance) < 0.01:
+            continue
+        
+        item = {
+            "account_code": account["account_code"],
+            "account_name": account["account_name"],
+            "amount": balance
+        }
         
-        return {
-            "revenues": revenues,
-            "total_revenue": total_revenue,
-            "expenses": expenses,
-            "total_expenses": total_expenses,
-            "net_income": net_income,
-            "generated_at": datetime.utcnow().isoformat()
+        if account["account_type"] == "revenue":
+            revenues.append(item)
+            total_revenue += balance
+        elif account["account_type"] == "expense":
+            expenses.append(item)
+            total_expenses += balance
+    
+    return {
+        "revenues": revenues,
+        "total_revenue": total_revenue,
+        "expenses": expenses,
+        "total_expenses": total_expenses,
+        "net_income": total_revenue - total_expenses
+    }
+
+
+def balance_sheet_from_totals(totals: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Balance sheet (Assets = Liabilities + Equity) from cumulative get_account_totals rows"""
+    assets = []
+    liabilities = []
+    equity = []
+    total_assets = 0
+    total_liabilities = 0
+    total_equity = 0
+    
+    for account in totals:
+        balance = account["balance"]
+        if abs(balance) < 0.01:
+            continue
+        
+        item = {
+            "account_code": account["account_code"],
+            "account_name": account["account_name"],
+            "amount": balance
         }
-    finally:
-        db.close()
+        
+        if account["account_type"] == "asset":
+            assets.append(item)
+            total_assets += balance
+        elif account["account_type"] == "liability":
+            liabilities.append(item)
+            total_liabilities += balance
+        elif account["account_type"] == "equity":
+            equity.append(item)
+            total_equity += balance
+    
+    # Add net income to equity, from the same totals
+    net_income = income_statement_from_totals(totals)["net_income"]
+    if abs(net_income) >= 0.01:
+        equity.append({
+            "account_code": "NET",
+            "account_name": "Net Income (Current Period)",
+            "amount": net_income
+        })
+        total_equity += net_income
+    
+    return {
+        "assets": assets,
+        "total_assets": total_assets,
+        "liabilities": liabilities,
+        "total_liabilities": total_liabilities,
+        "equity": equity,
+        "total_equity": total_equity,
+        "is_balanced": abs(total_assets - (total_liabilities + total_equity)) < 0.01
+    }
 
 
-def get_balance_sheet() -> Dict[str, Any]:
-    """Generate balance sheet (Assets = Liabilities + Equity)"""
-    db = SessionLocal()
+def get_trial_balance(
+    user_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db=None
+) -> Dict[str, Any]:
+    """
+    Generate a user's trial balance for journal lines dated within the optional
+    range. Without a start date it is cumulative and starts from the latest
+    period-close snapshot (see period_close_service).
+    """
+    if start_date is None:
+        from app.services.period_close_service import get_cumulative_totals
+        totals = get_cumulative_totals(user_id, end_date, db=db)
+    else:
+        totals = get_account_totals(user_id, start_date, end_date, db=db)
+    return {**trial_balance_from_totals(totals), **_report_period(start_date, end_date)}
+
+
+def get_income_statement(
+    user_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db=None
+) -> Dict[str, Any]:
+    """Generate a user's income statement (Profit & Loss) for the optional range"""
+    totals = get_account_totals(user_id, start_date, end_date, db=db)
+    return {**income_statement_from_totals(totals), **_report_period(start_date, end_date)}
+
+
+def get_balance_sheet(user_id: int, end_date: Optional[date] = None, db=None) -> Dict[str, Any]:
+    """Generate a user's balance sheet as of end_date, from the latest period-close snapshot plus later lines"""
+    from app.services.period_close_service import get_cumulative_totals
+    totals = get_cumulative_totals(user_id, end_date, db=db)
+    return {**balance_sheet_from_totals(totals), **_report_period(None, end_date)}
+
+
+def get_financial_reports(
+    user_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db=None
+) -> Dict[str, Any]:
+    """
+    Trial balance, income statement and balance sheet together. The balance
+    sheet (cumulative to end_date) comes from the latest period-close snapshot
+    plus later lines; without a start date the other two share it, with one
+    they need a second aggregate over the range.
+    """
+    from app.services.period_close_service import get_cumulative_totals
+    own_session = db is None
+    db = db or SessionLocal()
     try:
-        accounts = db.query(Account).filter(Account.is_active == True).all()
-        
-        assets = []
-        liabilities = []
-        equity = []
-        total_assets = 0
-        total_liabilities = 0
-        total_equity = 0
-        
-        for account in accounts:
-            balance = calculate_account_balance(account.id)
-            if abs(balance) < 0.01:
-                continue
-            
-            item = {
-                "account_code": account.code,
-                "account_name": account.name,
-                "amount": balance
-            }
-            
-            if account.account_type == "asset":
-                assets.append(item)
-                total_assets += balance
-            elif account.account_type == "liability":
-                liabilities.append(item)
-                total_liabilities += balance
-            elif account.account_type == "equity":
-                equity.append(item)
-                total_equity += balance
-        
-        # Add net income to equity (from income statement)
-        income_statement = get_income_statement()
-        net_income = income_statement["net_income"]
-        if abs(net_income) >= 0.01:
-            equity.append({
-                "account_code": "NET",
-                "account_name": "Net Income (Current Period)",
-                "amount": net_income
-            })
-            total_equity += net_income
-        
-        return {
-            "assets": assets,
-            "total_assets": total_assets,
-            "liabilities": liabilities,
-            "total_liabilities": total_liabilities,
-            "equity": equity,
-            "total_equity": total_equity,
-            "is_balanced": abs(total_assets - (total_liabilities + total_equity)) < 0.01,
-            "generated_at": datetime.utcnow().isoformat()
-        }
+        cumulative = get_cumulative_totals(user_id, end_date, db=db)
+        totals = cumulative if start_date is None else get_account_totals(user_id, start_date, end_date, db=db)
     finally:
-        db.close()
+        if own_session:
+            db.close()
+    period = _report_period(start_date, end_date)
+    return {
+        "trial_balance": {**trial_balance_from_totals(totals), **period},
+        "income_statement": {**income_statement_from_totals(totals), **period},
+        "balance_sheet": {**balance_sheet_from_totals(cumulative), **_report_period(None, end_date)},
+    }
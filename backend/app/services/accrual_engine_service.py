@@ -21,7 +21,7 @@ from sqlalchemy.orm import Session
 
 from app.db.sql import (
     SessionLocal, ClaimRight, AmortizationEntry, AmortizationSchedule,
-    Account, JournalEntry, JournalEntryLine, User
+    Account, JournalEntry, JournalEntryLine, LedgerEntry, User
 )
 from app.services.accounting_service import get_or_create_account
 
@@ -49,7 +49,8 @@ def process_accruals_for_period(
     user_id: int,
     period_start: Optional[datetime] = None,
     period_end: Optional[datetime] = None,
-    dry_run: bool = False
+    dry_run: bool = False,
+    db=None
 ) -> Dict[str, Any]:
     """
     Process all pending accruals for a given accounting period.
@@ -63,11 +64,13 @@ def process_accruals_for_period(
         period_start: Start of accounting period (defaults to current month start)
         period_end: End of accounting period (defaults to current month end)
         dry_run: If True, don't post entries, just return what would be posted
+        db: Session to post on and commit (default: a new one)
     
     Returns:
         Dictionary with processing results
     """
-    db = SessionLocal()
+    own_session = db is None
+    db = db or SessionLocal()
     try:
         # Default to current month if not specified
         if not period_start:
@@ -99,7 +102,7 @@ def process_accruals_for_period(
         
         for entry in pending_entries:
             try:
-                result = process_single_accrual(entry, user_id, dry_run)
+                result = process_single_accrual(entry, user_id, dry_run, db)
                 results["entries_processed"] += 1
                 results["total_amount"] += entry.amount
                 
@@ -122,18 +125,23 @@ def process_accruals_for_period(
         
         if not dry_run:
             db.commit()
+        else:
+            # Discard the journals built for the preview
+            db.rollback()
         
         logger.info(f"Processed {results['entries_processed']} accruals for user {user_id}")
         
         return results
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
 def process_single_accrual(
     entry: AmortizationEntry,
     user_id: int,
-    dry_run: bool = False
+    dry_run: bool = False,
+    db=None
 ) -> JournalEntry:
     """
     Process a single amortization entry.
@@ -141,25 +149,26 @@ def process_single_accrual(
     Accounting logic:
     - ASSET_CLAIM: Dr Expense, Cr Prepaid Asset (Asset ↓, Expense ↑)
     - LIABILITY_CLAIM: Dr Deferred Revenue, Cr Revenue (Liability ↓, Revenue ↑)
+    
+    The journal is added to db (default: the entry's own session) and
+    committed by the caller together with the entry's status change.
     """
-    db = SessionLocal()
-    try:
-        claim = entry.claim_right
-        
-        if claim.claim_type == "ASSET_CLAIM":
-            return _process_asset_claim_accrual(entry, user_id, dry_run)
-        elif claim.claim_type == "LIABILITY_CLAIM":
-            return _process_liability_claim_accrual(entry, user_id, dry_run)
-        else:
-            raise ValueError(f"Unknown claim type: {claim.claim_type}")
-    finally:
-        db.close()
+    db = db or Session.object_session(entry)
+    claim = entry.claim_right
+    
+    if claim.claim_type == "ASSET_CLAIM":
+        return _process_asset_claim_accrual(entry, user_id, dry_run, db)
+    elif claim.claim_type == "LIABILITY_CLAIM":
+        return _process_liability_claim_accrual(entry, user_id, dry_run, db)
+    else:
+        raise ValueError(f"Unknown claim type: {claim.claim_type}")
 
 
 def _process_asset_claim_accrual(
     entry: AmortizationEntry,
     user_id: int,
-    dry_run: bool = False
+    dry_run: bool = False,
+    db=None
 ) -> JournalEntry:
     """
     Process asset claim accrual: Asset ↓ → Expense ↑
@@ -168,93 +177,91 @@ def _process_asset_claim_accrual(
     Dr Expense Account
     Cr Prepaid Expenses (Asset)
     """
-    db = SessionLocal()
-    try:
-        claim = entry.claim_right
-        
-        # Get or create accounts
-        prepaid_account = get_or_create_account(
-            user_id, PREPAID_EXPENSE_ACCOUNT, "Prepaid Expenses", "asset"
-        )
-        
-        # Try to get expense account from ledger entry category
-        expense_account_code = DEFAULT_EXPENSE_ACCOUNT
-        if claim.ledger_entry_id:
-            ledger_entry = db.query(LedgerEntry).filter(
-                LedgerEntry.id == claim.ledger_entry_id
-            ).first()
-            if ledger_entry and ledger_entry.category:
-                from app.services.accounting_service import CATEGORY_TO_EXPENSE_ACCOUNT
-                expense_account_code = CATEGORY_TO_EXPENSE_ACCOUNT.get(
-                    ledger_entry.category, DEFAULT_EXPENSE_ACCOUNT
-                )
-        
-        expense_account = get_or_create_account(
-            user_id, expense_account_code, "Expense", "expense"
-        )
-        
-        # Create journal entry
-        journal_entry = JournalEntry(
-            user_id=user_id,
-            ledger_entry_id=claim.ledger_entry_id,
-            entry_date=entry.period_start,
-            reference=f"AMORT-{claim.id}-{entry.period_number}",
-            description=f"Amortization: {claim.description} (Period {entry.period_number})",
-            memo=f"Claim Right {claim.id} - Asset Claim Amortization",
-            is_adjusting=True
-        )
-        
-        db.add(journal_entry)
-        db.flush()
-        
-        # Debit Expense (increase expense)
-        expense_line = JournalEntryLine(
-            journal_entry_id=journal_entry.id,
-            account_id=expense_account.id,
-            debit=entry.amount,
-            credit=0.0,
-            description=f"Expense recognition for {claim.description}"
-        )
-        
-        # Credit Prepaid Asset (decrease asset)
-        prepaid_line = JournalEntryLine(
-            journal_entry_id=journal_entry.id,
-            account_id=prepaid_account.id,
-            debit=0.0,
-            credit=entry.amount,
-            description=f"Prepaid expense reduction for {claim.description}"
-        )
-        
-        db.add(expense_line)
-        db.add(prepaid_line)
-        
-        if not dry_run:
-            # Update entry status
-            entry.status = "POSTED"
-            entry.posted_at = datetime.utcnow()
-            entry.journal_entry_id = journal_entry.id
-            
-            # Update claim right amounts
-            claim.amortized_amount += entry.amount
-            claim.remaining_amount -= entry.amount
-            
-            # Check if claim is fully amortized
-            if abs(claim.remaining_amount) < 0.01:  # Allow for rounding
-                claim.status = "completed"
-        
-        db.flush()
-        
-        logger.info(f"Posted asset claim accrual: Entry {entry.id}, Amount {entry.amount}")
-        
-        return journal_entry
-    finally:
-        db.close()
+    db = db or Session.object_session(entry)
+    claim = entry.claim_right
+    
+    # Get or create accounts
+    prepaid_account = get_or_create_account(
+        user_id, PREPAID_EXPENSE_ACCOUNT, "Prepaid Expenses", "asset", db
+    )
+    
+    # Try to get expense account from ledger entry category
+    expense_account_code = DEFAULT_EXPENSE_ACCOUNT
+    if claim.ledger_entry_id:
+        ledger_entry = db.query(LedgerEntry).filter(
+            LedgerEntry.id == claim.ledger_entry_id
+        ).first()
+        if ledger_entry and ledger_entry.category:
+            from app.services.accounting_service import CATEGORY_TO_EXPENSE_ACCOUNT
+            expense_account_code = CATEGORY_TO_EXPENSE_ACCOUNT.get(
+                ledger_entry.category, DEFAULT_EXPENSE_ACCOUNT
+            )
+    
+    expense_account = get_or_create_account(
+        user_id, expense_account_code, "Expense", "expense", db
+    )
+    
+    # Create journal entry
+    journal_entry = JournalEntry(
+        user_id=user_id,
+        ledger_entry_id=claim.ledger_entry_id,
+        entry_date=entry.period_start,
+        reference=f"AMORT-{claim.id}-{entry.period_number}",
+        description=f"Amortization: {claim.description} (Period {entry.period_number})",
+        memo=f"Claim Right {claim.id} - Asset Claim Amortization",
+        is_adjusting=True
+    )
+    
+    db.add(journal_entry)
+    db.flush()
+    
+    # Debit Expense (increase expense)
+    expense_line = JournalEntryLine(
+        journal_entry_id=journal_entry.id,
+        account_id=expense_account.id,
+        debit=entry.amount,
+        credit=0.0,
+        description=f"Expense recognition for {claim.description}"
+    )
+    
+    # Credit Prepaid Asset (decrease asset)
+    prepaid_line = JournalEntryLine(
+        journal_entry_id=journal_entry.id,
+        account_id=prepaid_account.id,
+        debit=0.0,
+        credit=entry.amount,
+        description=f"Prepaid expense reduction for {claim.description}"
+    )
+    
+    db.add(expense_line)
+    db.add(prepaid_line)
+    
+    if not dry_run:
+        # Update entry status
+        entry.status = "POSTED"
+        entry.posted_at = datetime.utcnow()
+        entry.journal_entry_id = journal_entry.id
+        
+        # Update claim right amounts
+        claim.amortized_amount += entry.amount
+        claim.remaining_amount -= entry.amount
+        
+        # Check if claim is fully amortized
+        if abs(claim.remaining_amount) < 0.01:  # Allow for rounding
+            claim.status = "completed"
+    
+    db.flush()
+    
+    logger.info(f"Posted asset claim accrual: Entry {entry.id}, Amount {entry.amount}")
+    
+    return journal_entry
 
 
 def _process_liability_claim_accrual(
     entry: AmortizationEntry,
     user_id: int,
-    dry_run: bool = False
+    dry_run: bool = False,
+    db=None
 ) -> JournalEntry:
     """
     Process liability claim accrual: Liability ↓ → Revenue ↑
@@ -263,94 +270,92 @@ def _process_liability_claim_accrual(
     Dr Deferred Revenue (Liability)
     Cr Revenue Account
     """
-    db = SessionLocal()
-    try:
-        claim = entry.claim_right
-        
-        # Get or create accounts
-        deferred_account = get_or_create_account(
-            user_id, DEFERRED_REVENUE_ACCOUNT, "Deferred Revenue", "liability"
-        )
-        
-        # Try to get revenue account from ledger entry
-        revenue_account_code = DEFAULT_REVENUE_ACCOUNT
-        if claim.ledger_entry_id:
-            ledger_entry = db.query(LedgerEntry).filter(
-                LedgerEntry.id == claim.ledger_entry_id
-            ).first()
-            if ledger_entry:
-                # Use service revenue for service-based transactions
-                revenue_account_code = "4200"  # Service Revenue
-        
-        revenue_account = get_or_create_account(
-            user_id, revenue_account_code, "Revenue", "revenue"
-        )
-        
-        # Create journal entry
-        journal_entry = JournalEntry(
-            user_id=user_id,
-            ledger_entry_id=claim.ledger_entry_id,
-            entry_date=entry.period_start,
-            reference=f"AMORT-{claim.id}-{entry.period_number}",
-            description=f"Amortization: {claim.description} (Period {entry.period_number})",
-            memo=f"Claim Right {claim.id} - Liability Claim Amortization",
-            is_adjusting=True
-        )
-        
-        db.add(journal_entry)
-        db.flush()
-        
-        # Debit Deferred Revenue (decrease liability)
-        deferred_line = JournalEntryLine(
-            journal_entry_id=journal_entry.id,
-            account_id=deferred_account.id,
-            debit=entry.amount,
-            credit=0.0,
-            description=f"Deferred revenue reduction for {claim.description}"
-        )
-        
-        # Credit Revenue (increase revenue)
-        revenue_line = JournalEntryLine(
-            journal_entry_id=journal_entry.id,
-            account_id=revenue_account.id,
-            debit=0.0,
-            credit=entry.amount,
-            description=f"Revenue recognition for {claim.description}"
-        )
-        
-        db.add(deferred_line)
-        db.add(revenue_line)
-        
-        if not dry_run:
-            # Update entry status
-            entry.status = "POSTED"
-            entry.posted_at = datetime.utcnow()
-            entry.journal_entry_id = journal_entry.id
-            
-            # Update claim right amounts
-            claim.amortized_amount += entry.amount
-            claim.remaining_amount -= entry.amount
-            
-            # Check if claim is fully amortized
-            if abs(claim.remaining_amount) < 0.01:  # Allow for rounding
-                claim.status = "completed"
-        
-        db.flush()
-        
-        logger.info(f"Posted liability claim accrual: Entry {entry.id}, Amount {entry.amount}")
-        
-        return journal_entry
-    finally:
-        db.close()
+    db = db or Session.object_session(entry)
+    claim = entry.claim_right
+    
+    # Get or create accounts
+    deferred_account = get_or_create_account(
+        user_id, DEFERRED_REVENUE_ACCOUNT, "Deferred Revenue", "liability", db
+    )
+    
+    # Try to get revenue account from ledger entry
+    revenue_account_code = DEFAULT_REVENUE_ACCOUNT
+    if claim.ledger_entry_id:
+        ledger_entry = db.query(LedgerEntry).filter(
+            LedgerEntry.id == claim.ledger_entry_id
+        ).first()
+        if ledger_entry:
+            # Use service revenue for service-based transactions
+            revenue_account_code = "4200"  # Service Revenue
+    
+    revenue_account = get_or_create_account(
+        user_id, revenue_account_code, "Revenue", "revenue", db
+    )
+    
+    # Create journal entry
+    journal_entry = JournalEntry(
+        user_id=user_id,
+        ledger_entry_id=claim.ledger_entry_id,
+        entry_date=entry.period_start,
+        reference=f"AMORT-{claim.id}-{entry.period_number}",
+        description=f"Amortization: {claim.description} (Period {entry.period_number})",
+        memo=f"Claim Right {claim.id} - Liability Claim Amortization",
+        is_adjusting=True
+    )
+    
+    db.add(journal_entry)
+    db.flush()
+    
+    # Debit Deferred Revenue (decrease liability)
+    deferred_line = JournalEntryLine(
+        journal_entry_id=journal_entry.id,
+        account_id=deferred_account.id,
+        debit=entry.amount,
+        credit=0.0,
+        description=f"Deferred revenue reduction for {claim.description}"
+    )
+    
+    # Credit Revenue (increase revenue)
+    revenue_line = JournalEntryLine(
+        journal_entry_id=journal_entry.id,
+        account_id=revenue_account.id,
+        debit=0.0,
+        credit=entry.amount,
+        description=f"Revenue recognition for {claim.description}"
+    )
+    
+    db.add(deferred_line)
+    db.add(revenue_line)
+    
+    if not dry_run:
+        # Update entry status
+        entry.status = "POSTED"
+        entry.posted_at = datetime.utcnow()
+        entry.journal_entry_id = journal_entry.id
+        
+        # Update claim right amounts
+        claim.amortized_amount += entry.amount
+        claim.remaining_amount -= entry.amount
+        
+        # Check if claim is fully amortized
+        if abs(claim.remaining_amount) < 0.01:  # Allow for rounding
+            claim.status = "completed"
+    
+    db.flush()
+    
+    logger.info(f"Posted liability claim accrual: Entry {entry.id}, Amount {entry.amount}")
+    
+    return journal_entry
 
 
 # =============================================================================
 # Utility Functions
 # =============================================================================
 
-def get_pending_accruals_count(user_id: int) -> int:
+def get_pending_accruals_count(user_id: int, db=None) -> int:
     """Get count of pending accrual entries for a user."""
-    db = SessionLocal()
+    own_session = db is None
+    db = db or SessionLocal()
     try:
         return db.query(AmortizationEntry).join(ClaimRight).filter(
             ClaimRight.user_id == user_id,
@@ -358,12 +363,14 @@ def get_pending_accruals_count(user_id: int) -> int:
             AmortizationEntry.status == "PENDING"
         ).count()
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
-def get_claim_right_summary(user_id: int) -> Dict[str, Any]:
+def get_claim_right_summary(user_id: int, db=None) -> Dict[str, Any]:
     """Get summary of claim rights for a user."""
-    db = SessionLocal()
+    own_session = db is None
+    db = db or SessionLocal()
     try:
         claims = db.query(ClaimRight).filter(
             ClaimRight.user_id == user_id,
@@ -383,8 +390,9 @@ def get_claim_right_summary(user_id: int) -> Dict[str, Any]:
             "total_liability_amount": liability_total,
             "remaining_asset_amount": asset_remaining,
             "remaining_liability_amount": liability_remaining,
-            "pending_accruals": get_pending_accruals_count(user_id)
+            "pending_accruals": get_pending_accruals_count(user_id, db=db)
         }
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
@@ -0,0 +1,295 @@
+"""
+Bulk Reconciliation Service
+
+Reconciles a user's whole period in one pass instead of one transaction at a
+time. The period's ledger entries are loaded with a single query into columnar
+NumPy arrays (amount in cents, date as a day number, vendor), sorted by
+(amount, date), and every pair within the amount/date window is generated with
+a sort-merge sweep. Vendors are compared on the candidate pairs as whole
+arrays. The matching rules are the same as ``reconcile_transaction``:
+
+- duplicate:    same amount, same date, same vendor
+- counterparty: same amount, date within the window, clearly different vendors
+- related:      same amount, date within the window, otherwise
+
+Matches are written in bulk to ``reconciliation_links`` (source "auto");
+receipt and manual links are never overwritten. The user's reconciliation
+groups are rebuilt afterwards (see reconciliation_graph).
+"""
+
+from typing import Dict, Any, List, Optional, Sequence, Set, Tuple
+from datetime import datetime, date, timedelta
+import time
+import logging
+
+import numpy as np
+from sqlalchemy import insert, or_
+
+from app.db.sql import SessionLocal, LedgerEntry, ReconciliationLink
+from app.services.vendor_memo import normalize_vendor
+from app.services.reconciliation_graph import rebuild_groups
+
+logger = logging.getLogger(__name__)
+
+RELATIONSHIPS = ("duplicate", "counterparty", "related")
+_DUPLICATE, _COUNTERPARTY, _RELATED = 0, 1, 2
+
+# Rows per INSERT / IN (...) list
+WRITE_CHUNK_SIZE = 1000
+
+
+def date_ordinals(dates: Sequence[Optional[str]]) -> np.ndarray:
+    """Day numbers for ISO date strings (time parts ignored); -1 where unparseable"""
+    heads = np.array([(d or "").strip()[:10] for d in dates], dtype="U10")
+    try:
+        days = heads.astype("datetime64[D]")
+    except ValueError:
+        days = np.array([_parse_day(d) for d in heads], dtype="datetime64[D]")
+    ordinals = days.astype(np.int64)
+    ordinals[np.isnat(days)] = -1
+    return ordinals
+
+
+def _parse_day(value: str) -> np.datetime64:
+    try:
+        return np.datetime64(value, "D")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def match_period(
+    cents: np.ndarray,
+    days: np.ndarray,
+    vendors: np.ndarray,
+    date_window_days: int = 0,
+    amount_tolerance_cents: int = 0
+) -> Dict[str, np.ndarray]:
+    """
+    Find duplicate / counterparty / related pairs among columnar records.
+
+    Args:
+        cents: int64 amounts in cents (0 = no amount, never matched)
+        days: int64 day numbers (-1 = no date, never matched)
+        vendors: normalised vendor strings ("" = unknown)
+        date_window_days: Max day distance for counterparty/related matches
+        amount_tolerance_cents: Max amount distance for counterparty/related matches
+
+    Returns:
+        {"left", "right": record indexes, "relationship": codes into RELATIONSHIPS,
+         "day_distance": int64, "candidate_pairs": pairs examined}
+    """
+    window = max(0, int(date_window_days))
+    tolerance = max(0, int(amount_tolerance_cents))
+
+    valid = np.flatnonzero((cents != 0) & (days >= 0))
+    order = valid[np.lexsort((days[valid], cents[valid]))]
+    c, d = cents[order], days[order]
+    n = len(order)
+    empty = np.zeros(0, dtype=np.int64)
+    if n < 2:
+        return {"left": empty, "right": empty, "relationship": empty, "day_distance": empty, "candidate_pairs": 0}
+
+    # Sweep end for each row: last row within the window of (amount, date) sort order
+    if tolerance == 0:
+        span = int(d.max() - d.min()) + window + 1
+        key = c * span + (d - d.min())
+        ends = np.searchsorted(key, key + window, side="right")
+    else:
+        ends = np.searchsorted(c, c + tolerance, side="right")
+
+    starts = np.arange(1, n + 1)
+    counts = np.maximum(ends - starts, 0)
+    total = int(counts.sum())
+    left = np.repeat(np.arange(n), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    right = left + 1 + offsets
+
+    day_distance = np.abs(d[right] - d[left])
+    if tolerance:
+        keep = day_distance <= window
+        left, right, day_distance = left[keep], right[keep], day_distance[keep]
+
+    same_amount = c[left] == c[right]
+    same_date = day_distance == 0
+
+    # Vendor comparison on whole pair arrays
+    sorted_vendors = vendors[order]
+    codes = np.unique(sorted_vendors, return_inverse=True)[1]
+    known = sorted_vendors != ""
+    both_known = known[left] & known[right]
+    same_vendor = both_known & (codes[left] == codes[right])
+    contained = np.zeros(len(left), dtype=bool)
+    differ = np.flatnonzero(both_known & ~same_vendor)
+    if differ.size:
+        va, vb = sorted_vendors[left[differ]], sorted_vendors[right[differ]]
+        contained[differ] = (np.char.find(vb, va) >= 0) | (np.char.find(va, vb) >= 0)
+    different_vendor = both_known & ~same_vendor & ~contained
+
+    relationship = np.full(len(left), _RELATED, dtype=np.int64)
+    relationship[different_vendor] = _COUNTERPARTY
+    relationship[same_vendor & same_date & same_amount] = _DUPLICATE
+
+    return {
+        "left": order[left],
+        "right": order[right],
+        "relationship": relationship,
+        "day_distance": day_distance,
+        "candidate_pairs": total,
+    }
+
+
+def _load_period(db, user_id: int, start: date, end: date, window: int):
+    """One query for the period plus ``window`` days either side (for cross-boundary pairs)"""
+    return db.query(
+        LedgerEntry.id, LedgerEntry.record_id, LedgerEntry.vendor, LedgerEntry.transaction_date,
+        LedgerEntry.total, LedgerEntry.amount
+    ).filter(
+        LedgerEntry.user_id == user_id,
+        LedgerEntry.transaction_date >= start - timedelta(days=window),
+        LedgerEntry.transaction_date <= end + timedelta(days=window)
+    ).all()
+
+
+def _existing_pairs(db, user_id: int, record_ids: List[str]) -> Set[Tuple[str, str]]:
+    pairs: Set[Tuple[str, str]] = set()
+    for i in range(0, len(record_ids), WRITE_CHUNK_SIZE):
+        chunk = record_ids[i:i + WRITE_CHUNK_SIZE]
+        rows = db.query(ReconciliationLink.record_id_a, ReconciliationLink.record_id_b).filter(
+            ReconciliationLink.user_id == user_id,
+            or_(ReconciliationLink.record_id_a.in_(chunk), ReconciliationLink.record_id_b.in_(chunk))
+        ).all()
+        pairs.update((a, b) for a, b in rows)
+    return pairs
+
+
+def _delete_auto_links(db, user_id: int, record_ids: List[str]) -> int:
+    deleted = 0
+    for i in range(0, len(record_ids), WRITE_CHUNK_SIZE):
+        chunk = record_ids[i:i + WRITE_CHUNK_SIZE]
+        deleted += db.query(ReconciliationLink).filter(
+            ReconciliationLink.user_id == user_id,
+            ReconciliationLink.source == "auto",
+            or_(ReconciliationLink.record_id_a.in_(chunk), ReconciliationLink.record_id_b.in_(chunk))
+        ).delete(synchronize_session=False)
+    return deleted
+
+
+def reconcile_period(
+    user_id: int,
+    start_date: date,
+    end_date: date,
+    date_window_days: int = 0,
+    amount_tolerance: float = 0.0,
+    dry_run: bool = False
+) -> Dict[str, Any]:
+    """
+    Reconcile every ledger entry of a user dated within [start_date, end_date].
+
+    Args:
+        user_id: Owner of the ledger
+        start_date: First day of the period
+        end_date: Last day of the period (inclusive)
+        date_window_days: Max day distance for counterparty/related matches
+        amount_tolerance: Max amount difference for counterparty/related matches
+        dry_run: Compute matches without writing links
+
+    Returns:
+        Counts per relationship, timings and records per second
+    """
+    started = time.perf_counter()
+    window = max(0, int(date_window_days))
+    db = SessionLocal()
+    try:
+        rows = _load_period(db, user_id, start_date, end_date, window)
+        loaded = time.perf_counter()
+
+        ids = np.array([r.id for r in rows], dtype=np.int64)
+        record_ids = np.array([r.record_id or "" for r in rows], dtype=object)
+        totals = np.array(
+            [r.total if r.total is not None else (r.amount or 0.0) for r in rows], dtype=np.float64
+        )
+        totals[~np.isfinite(totals)] = 0.0
+        cents = np.rint(totals * 100).astype(np.int64)
+        days = date_ordinals([r.transaction_date.isoformat() for r in rows])
+        vendors = np.array([normalize_vendor(r.vendor) for r in rows])
+        if vendors.size == 0:
+            vendors = vendors.astype("U1")
+
+        matches = match_period(cents, days, vendors, window, int(round(amount_tolerance * 100)))
+        matched = time.perf_counter()
+
+        # Keep pairs with at least one side inside the period
+        first, last = np.datetime64(start_date, "D").astype(np.int64), np.datetime64(end_date, "D").astype(np.int64)
+        in_period = (days >= first) & (days <= last)
+        left, right = matches["left"], matches["right"]
+        keep = in_period[left] | in_period[right]
+        left, right = left[keep], right[keep]
+        relationship, day_distance = matches["relationship"][keep], matches["day_distance"][keep]
+
+        counts = {name: int(np.sum(relationship == code)) for code, name in enumerate(RELATIONSHIPS)}
+        written = 0
+        groups = None
+        if not dry_run:
+            period_record_ids = [rid for rid in record_ids[in_period].tolist() if rid]
+            _delete_auto_links(db, user_id, period_record_ids)
+            existing = _existing_pairs(db, user_id, period_record_ids)
+
+            confidence = 1.0 - day_distance / (window + 1)
+            links = []
+            now = datetime.utcnow()
+            for i, j, code, conf in zip(left.tolist(), right.tolist(), relationship.tolist(), confidence.tolist()):
+                a, b = record_ids[i], record_ids[j]
+                if not a or not b or a == b:
+                    continue
+                if b < a:
+                    a, b, i, j = b, a, j, i
+                if (a, b) in existing:
+                    continue
+                existing.add((a, b))
+                links.append({
+                    "user_id": user_id,
+                    "record_id_a": a,
+                    "record_id_b": b,
+                    "ledger_entry_id_a": int(ids[i]),
+                    "ledger_entry_id_b": int(ids[j]),
+                    "relationship_type": RELATIONSHIPS[code],
+                    "source": "auto",
+                    "confidence": round(conf, 4),
+                    "created_at": now,
+                })
+            for k in range(0, len(links), WRITE_CHUNK_SIZE):
+                db.execute(insert(ReconciliationLink), links[k:k + WRITE_CHUNK_SIZE])
+            db.commit()
+            written = len(links)
+            groups = rebuild_groups(user_id, db)
+        finished = time.perf_counter()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    records = int(np.sum(in_period))
+    elapsed = finished - started
+    result = {
+        "period_start": start_date.isoformat(),
+        "period_end": end_date.isoformat(),
+        "records": records,
+        "candidate_pairs": matches["candidate_pairs"],
+        "duplicates": counts["duplicate"],
+        "counterparties": counts["counterparty"],
+        "related": counts["related"],
+        "links_written": written,
+        "groups": groups,
+        "dry_run": dry_run,
+        "load_ms": round((loaded - started) * 1000, 2),
+        "match_ms": round((matched - loaded) * 1000, 2),
+        "write_ms": round((finished - matched) * 1000, 2),
+        "records_per_sec": round(records / elapsed, 1) if elapsed > 0 else None,
+    }
+    logger.info(
+        f"Reconciled {records} records for user {user_id} ({result['period_start']}..{result['period_end']}): "
+        f"{counts['duplicate']} duplicates, {counts['counterparty']} counterparties, {counts['related']} related "
+        f"at {result['records_per_sec']} records/s"
+    )
+    return result
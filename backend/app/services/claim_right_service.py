@@ -15,8 +15,9 @@ except ImportError:
     # Fallback if dateutil not available
     def relativedelta(*args, **kwargs):
         raise ImportError("python-dateutil is required. Install with: pip install python-dateutil")
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
+from app.utils.keyword_matcher import KeywordMatcher
 from app.db.sql import (
     SessionLocal, ClaimRight, AmortizationSchedule, AmortizationEntry,
     LedgerEntry, Account, JournalEntry, JournalEntryLine
@@ -29,6 +30,18 @@ logger = logging.getLogger(__name__)
 # Claim Right Classification Logic
 # =============================================================================
 
+# Keywords that indicate long-term transactions, compiled into one automaton
+CLAIM_KEYWORDS = {
+    "prepaid": ["prepaid", "pre-paid", "subscription", "annual", "yearly", "monthly", "quarterly"],
+    "deferred": ["deferred", "advance", "deposit", "retainer", "prepayment"],
+    "loan": ["loan", "emi", "installment", "financing", "credit"],
+    "service": ["service", "maintenance", "support", "license", "membership"],
+    "revenue": ["revenue", "income"],
+    "recurring": ["annual", "yearly", "subscription"],
+}
+_CLAIM_KEYWORD_MATCHER = KeywordMatcher(CLAIM_KEYWORDS)
+
+
 def classify_claim_right(
     structured_data: Dict[str, Any],
     ledger_entry: Optional[LedgerEntry] = None
@@ -48,34 +61,29 @@ def classify_claim_right(
     vendor = (structured_data.get("vendor") or "").lower()
     payment_method = (structured_data.get("payment_method") or "").lower()
     
-    # Keywords that indicate long-term transactions
-    prepaid_keywords = ["prepaid", "pre-paid", "subscription", "annual", "yearly", "monthly", "quarterly"]
-    deferred_keywords = ["deferred", "advance", "deposit", "retainer", "prepayment"]
-    loan_keywords = ["loan", "emi", "installment", "financing", "credit"]
-    service_keywords = ["service", "maintenance", "support", "license", "membership"]
-    
     combined_text = f"{description} {category} {vendor} {payment_method}".lower()
+    matched = _CLAIM_KEYWORD_MATCHER.labels_in(combined_text)
     
     # Check for prepaid expenses (ASSET_CLAIM - we paid for future benefits)
-    if any(keyword in combined_text for keyword in prepaid_keywords + service_keywords):
+    if "prepaid" in matched or "service" in matched:
         # If we're paying for something, it's an asset claim
-        if "revenue" not in combined_text and "income" not in combined_text:
+        if "revenue" not in matched:
             return "ASSET_CLAIM"
     
     # Check for deferred revenue (LIABILITY_CLAIM - we received payment for future delivery)
-    if any(keyword in combined_text for keyword in deferred_keywords):
+    if "deferred" in matched:
         # If we received payment, it's a liability claim
         return "LIABILITY_CLAIM"
     
     # Check for loans/EMI (LIABILITY_CLAIM - we owe money)
-    if any(keyword in combined_text for keyword in loan_keywords):
+    if "loan" in matched:
         return "LIABILITY_CLAIM"
     
     # Check transaction amount and date patterns
     # If amount is large and description suggests recurring payment
     amount = structured_data.get("total") or structured_data.get("amount") or 0.0
     if amount > 1000:  # Threshold for potential long-term transaction
-        if any(keyword in combined_text for keyword in ["annual", "yearly", "subscription"]):
+        if "recurring" in matched:
             return "ASSET_CLAIM"
     
     return None  # Not a long-term transaction
@@ -190,7 +198,8 @@ def create_claim_right(
     start_date: datetime,
     end_date: datetime,
     frequency: str = "monthly",
-    description: Optional[str] = None
+    description: Optional[str] = None,
+    db=None
 ) -> ClaimRight:
     """
     Create a claim right with initial recognition (no P&L impact).
@@ -199,7 +208,8 @@ def create_claim_right(
     - Initial recognition: Create balance sheet item only
     - No revenue/expense recognition at this stage
     """
-    db = SessionLocal()
+    own_session = db is None
+    db = db or SessionLocal()
     try:
         # Validate IFRS recognition criteria
         is_probable = True  # Assume probable unless specified otherwise
@@ -231,19 +241,22 @@ def create_claim_right(
         logger.info(f"Created claim right {claim.id} of type {claim_type} for amount {total_amount}")
         
         # Generate amortization schedule
-        generate_amortization_schedule(claim.id)
+        generate_amortization_schedule(claim.id, db=db)
+        db.refresh(claim)
         
         return claim
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
-def generate_amortization_schedule(claim_right_id: int) -> AmortizationSchedule:
+def generate_amortization_schedule(claim_right_id: int, db=None) -> AmortizationSchedule:
     """
     Generate amortization schedule for a claim right.
     Creates period entries as PENDING.
     """
-    db = SessionLocal()
+    own_session = db is None
+    db = db or SessionLocal()
     try:
         claim = db.query(ClaimRight).filter(ClaimRight.id == claim_right_id).first()
         if not claim:
@@ -335,7 +348,8 @@ def generate_amortization_schedule(claim_right_id: int) -> AmortizationSchedule:
         
         return schedule
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
 # =============================================================================
@@ -346,12 +360,16 @@ def get_claim_rights(
     user_id: int,
     claim_type: Optional[str] = None,
     status: Optional[str] = None,
-    limit: int = 100
+    limit: int = 100,
+    db=None
 ) -> List[ClaimRight]:
-    """Get claim rights for a user with optional filters."""
-    db = SessionLocal()
+    """Get claim rights for a user with optional filters (schedule loaded)."""
+    own_session = db is None
+    db = db or SessionLocal()
     try:
-        query = db.query(ClaimRight).filter(ClaimRight.user_id == user_id)
+        query = db.query(ClaimRight).options(
+            joinedload(ClaimRight.schedule)
+        ).filter(ClaimRight.user_id == user_id)
         
         if claim_type:
             query = query.filter(ClaimRight.claim_type == claim_type)
@@ -361,27 +379,33 @@ def get_claim_rights(
         
         return query.order_by(ClaimRight.created_at.desc()).limit(limit).all()
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
-def get_claim_right(claim_right_id: int, user_id: int) -> Optional[ClaimRight]:
-    """Get a specific claim right by ID."""
-    db = SessionLocal()
+def get_claim_right(claim_right_id: int, user_id: int, db=None) -> Optional[ClaimRight]:
+    """Get a specific claim right by ID (schedule loaded)."""
+    own_session = db is None
+    db = db or SessionLocal()
     try:
-        return db.query(ClaimRight).filter(
+        return db.query(ClaimRight).options(
+            joinedload(ClaimRight.schedule)
+        ).filter(
             ClaimRight.id == claim_right_id,
             ClaimRight.user_id == user_id
         ).first()
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
-def cancel_claim_right(claim_right_id: int, user_id: int, reason: Optional[str] = None) -> ClaimRight:
+def cancel_claim_right(claim_right_id: int, user_id: int, reason: Optional[str] = None, db=None) -> ClaimRight:
     """
     Cancel a claim right (early termination).
     Marks remaining entries as SKIPPED.
     """
-    db = SessionLocal()
+    own_session = db is None
+    db = db or SessionLocal()
     try:
         # Query claim directly in this session to avoid detached instance issues
         claim = db.query(ClaimRight).filter(
@@ -415,5 +439,6 @@ def cancel_claim_right(claim_right_id: int, user_id: int, reason: Optional[str]
         
         return claim
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
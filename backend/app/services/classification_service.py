@@ -2,8 +2,10 @@
 LLM-based classification service for categorizing receipts and invoices.
 """
 
-from typing import Dict, Any, Optional, Tuple
-from app.core.llm import get_llm
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.llm_gateway import invoke_llm, invoke_llm_batched
+from app.core.config import settings
+from app.utils.keyword_matcher import KeywordMatcher
 from langchain.schema import HumanMessage
 import json
 import logging
@@ -28,19 +30,68 @@ CATEGORY_CHOICES = [
 ]
 
 
-async def classify_transaction(structured_data: Dict[str, Any]) -> str:
+def _memoized_category(structured_data: Dict[str, Any], user_id: Optional[int]) -> Optional[str]:
+    """The user's usual category for this vendor, from their ledger history"""
+    try:
+        from app.services.vendor_memo import get_memoized_category
+        category = get_memoized_category(user_id, structured_data.get("vendor"))
+    except Exception as e:
+        logger.warning(f"Vendor memo lookup failed: {e}")
+        return None
+    if category:
+        logger.info(f"Classified transaction as: {category} (vendor memo)")
+    return category
+
+
+def _classify_locally(structured_data: Dict[str, Any], user_id: Optional[int]) -> Optional[str]:
+    """Local embedding classifier; None when disabled, unavailable or ambiguous"""
+    if not settings.LOCAL_CLASSIFIER_ENABLED:
+        return None
+    try:
+        from app.services.local_classifier import classify_locally
+        result = classify_locally(structured_data, user_id)
+    except Exception as e:
+        logger.warning(f"Local classifier failed, using LLM: {e}")
+        return None
+    if result:
+        logger.info(
+            f"Locally classified transaction as: {result['category']} "
+            f"(confidence={result['confidence']:.2f}, source={result['source']})"
+        )
+        return result["category"]
+    return None
+
+
+def _classify_without_llm(structured_data: Dict[str, Any], user_id: Optional[int]) -> Optional[str]:
+    """
+    Vendor memo, then the local classifier. Blocking: the memo may load the
+    user's ledger history from SQL and the classifier runs a model forward
+    pass, so async callers run this in a worker thread.
+    """
+    return _memoized_category(structured_data, user_id) or _classify_locally(structured_data, user_id)
+
+
+async def classify_transaction(structured_data: Dict[str, Any], user_id: Optional[int] = None) -> str:
     """
-    Classify transaction using LLM for better accuracy
+    Classify transaction: the user's vendor memo first, then the local embedding
+    classifier when it is confident, and the LLM otherwise
     
     Args:
         structured_data: Structured receipt data
+        user_id: Owner; their confirmed ledger categories refine local classification
     
     Returns:
         Category string
     """
+    category = await asyncio.to_thread(_classify_without_llm, structured_data, user_id)
+    if category:
+        return category
+    return await _classify_with_llm(structured_data)
+
+
+async def _classify_with_llm(structured_data: Dict[str, Any]) -> str:
+    """Classify transaction using LLM, falling back to rules on timeout/error"""
     try:
-        llm = get_llm()
-        
         vendor = structured_data.get("vendor", "Unknown")
         items = structured_data.get("items", [])
         total = structured_data.get("total", 0)
@@ -69,15 +120,8 @@ Respond with JSON ONLY in this shape:
 If unsure, choose "General Expense" with a low confidence.
 """
         
-        # Run LLM call with timeout
-        def call_llm():
-            return llm.invoke([HumanMessage(content=prompt)])
-        
-        loop = asyncio.get_event_loop()
-        response = await asyncio.wait_for(
-            loop.run_in_executor(None, call_llm),
-            timeout=20.0  # Increased from 10s to 20s
-        )
+        # Hedged LLM call; fails fast with LLMUnavailableError when every circuit is open
+        response = await invoke_llm([HumanMessage(content=prompt)], timeout=20.0)
         
         category, confidence = _parse_llm_response(response.content)
         logger.info(f"Classified transaction as: {category} (confidence={confidence:.2f})")
@@ -91,6 +135,73 @@ If unsure, choose "General Expense" with a low confidence.
         return _rule_based_classification(structured_data)
 
 
+async def classify_transactions_batch(records: List[Dict[str, Any]], user_id: Optional[int] = None) -> List[str]:
+    """
+    Classify several transactions (batch uploads): from the vendor memo or the
+    local embedding classifier where possible, the rest with batched LLM calls.
+    
+    Any record missing from the batched response, or with a category outside
+    CATEGORY_CHOICES, is classified on its own with a single LLM call.
+    
+    Args:
+        records: Structured receipt data, one per transaction
+        user_id: Owner of the transactions
+    
+    Returns:
+        Category strings aligned with records
+    """
+    categories: List[Optional[str]] = await asyncio.to_thread(
+        lambda: [_classify_without_llm(record, user_id) for record in records]
+    )
+    remaining = [idx for idx, category in enumerate(categories) if category is None]
+    if remaining:
+        llm_categories = await _classify_batch_with_llm([records[idx] for idx in remaining])
+        for idx, category in zip(remaining, llm_categories):
+            categories[idx] = category
+    return categories
+
+
+async def _classify_batch_with_llm(records: List[Dict[str, Any]]) -> List[str]:
+    """Batched LLM classification"""
+    instructions = f"""
+You are an expert accounting classifier. Read each transaction's details and
+decide the category and confidence.
+
+Categories (choose the single best match):
+{json.dumps(CATEGORY_CHOICES)}
+
+For each record respond with:
+{{
+  "category": "<one of the categories>",
+  "confidence": <number between 0 and 1>
+}}
+
+If unsure, choose "General Expense" with a low confidence.
+"""
+    payloads = []
+    for structured_data in records:
+        items = structured_data.get("items", [])
+        items_text = ", ".join([item.get("name", "") for item in items[:5]])
+        payloads.append(
+            f"- Vendor: {structured_data.get('vendor', 'Unknown')}\n"
+            f"- Items: {items_text or 'Unknown'}\n"
+            f"- Total: {structured_data.get('total', 0)}"
+        )
+    
+    def parse_item(idx: int, item: Dict[str, Any]) -> Optional[str]:
+        category = item.get("category")
+        if category not in CATEGORY_CHOICES:
+            return None
+        return category
+    
+    async def single_call(idx: int) -> str:
+        return await _classify_with_llm(records[idx])
+    
+    categories = await invoke_llm_batched(instructions, payloads, parse_item, single_call, timeout=30.0)
+    logger.info(f"Batch-classified {len(records)} transactions")
+    return categories
+
+
 def _parse_llm_response(response_text: str) -> Tuple[str, float]:
     """Parse LLM JSON response into category and confidence."""
     text = response_text.strip()
@@ -114,6 +225,25 @@ def _parse_llm_response(response_text: str) -> Tuple[str, float]:
     return category, confidence
 
 
+# Rule-based fallback keywords, in priority order (first matching category wins)
+RULE_KEYWORDS: List[Tuple[str, List[str]]] = [
+    ("Food & Beverage", ["starbucks", "coffee", "cafe", "restaurant", "food", "pizza", "burger", "dining", "meal", "beverage", "drink"]),
+    ("Transportation", ["taxi", "uber", "lyft", "train", "bus", "metro", "subway", "flight", "airline", "parking", "gas", "fuel"]),
+    ("Accommodation", ["hotel", "lodge", "airbnb", "accommodation", "resort"]),
+    ("Office Supplies", ["office", "stationery", "supplies", "paper", "pen", "printer"]),
+    ("Utilities", ["electric", "water", "gas", "utility", "internet", "phone", "cable"]),
+    ("Healthcare", ["pharmacy", "drug", "medical", "hospital", "clinic", "doctor", "health"]),
+    ("Entertainment", ["movie", "cinema", "theater", "concert", "sports", "game", "entertainment"]),
+    ("Software/Technology", ["software", "cloud", "saas", "subscription", "app", "tech", "it", "computer"]),
+    ("Professional Services", ["legal", "consulting", "accounting", "service", "professional"]),
+    ("Retail/Shopping", ["store", "shop", "retail", "market", "mall", "walmart", "target", "amazon"]),
+]
+
+# Compiled once: one pass over the text finds every matching category
+_rule_matcher = KeywordMatcher(dict(RULE_KEYWORDS))
+_rule_priority = [category for category, _ in RULE_KEYWORDS]
+
+
 def _rule_based_classification(structured_data: Dict[str, Any]) -> str:
     """Fallback rule-based classification"""
     vendor = (structured_data.get("vendor") or "").lower()
@@ -121,45 +251,4 @@ def _rule_based_classification(structured_data: Dict[str, Any]) -> str:
     items_text = " ".join([item.get("name", "").lower() for item in items])
     text = f"{vendor} {items_text}"
     
-    # Food & Beverage
-    if any(k in text for k in ["starbucks", "coffee", "cafe", "restaurant", "food", "pizza", "burger", "dining", "meal", "beverage", "drink"]):
-        return "Food & Beverage"
-    
-    # Transportation
-    if any(k in text for k in ["taxi", "uber", "lyft", "train", "bus", "metro", "subway", "flight", "airline", "parking", "gas", "fuel"]):
-        return "Transportation"
-    
-    # Accommodation
-    if any(k in text for k in ["hotel", "lodge", "airbnb", "accommodation", "resort"]):
-        return "Accommodation"
-    
-    # Office Supplies
-    if any(k in text for k in ["office", "stationery", "supplies", "paper", "pen", "printer"]):
-        return "Office Supplies"
-    
-    # Utilities
-    if any(k in text for k in ["electric", "water", "gas", "utility", "internet", "phone", "cable"]):
-        return "Utilities"
-    
-    # Healthcare
-    if any(k in text for k in ["pharmacy", "drug", "medical", "hospital", "clinic", "doctor", "health"]):
-        return "Healthcare"
-    
-    # Entertainment
-    if any(k in text for k in ["movie", "cinema", "theater", "concert", "sports", "game", "entertainment"]):
-        return "Entertainment"
-    
-    # Software/Technology
-    if any(k in text for k in ["software", "cloud", "saas", "subscription", "app", "tech", "it", "computer"]):
-        return "Software/Technology"
-    
-    # Professional Services
-    if any(k in text for k in ["legal", "consulting", "accounting", "service", "professional"]):
-        return "Professional Services"
-    
-    # Retail/Shopping
-    if any(k in text for k in ["store", "shop", "retail", "market", "mall", "walmart", "target", "amazon"]):
-        return "Retail/Shopping"
-    
-    return "General Expense"
-
+    return _rule_matcher.first_label(text, _rule_priority) or "General Expense"
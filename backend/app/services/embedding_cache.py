@@ -0,0 +1,135 @@
+"""
+Text-hash embedding cache.
+
+The same OCR text is embedded again on re-uploads and reprocessing, and chat
+questions repeat. Embeddings are cached under
+``sha256(model id + normalised text)`` so a repeated input never reaches the
+transformer. Two tiers:
+
+- an in-memory LRU of ``EMBEDDING_CACHE_SIZE`` float32 vectors per process
+- optionally (``EMBEDDING_CACHE_PERSISTENT``) the Mongo ``embedding_cache``
+  collection, shared by all workers and surviving restarts; entries expire
+  after ``EMBEDDING_CACHE_TTL_DAYS`` through a TTL index
+
+The model id covers the model name, its revision and the encoder backend that
+is actually loaded (torch or the quantised ONNX export; an ONNX configuration
+that fell back to torch keys as torch), so changing any of them starts a fresh
+key space instead of serving stale vectors.
+"""
+
+from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from datetime import datetime
+import hashlib
+import re
+import logging
+
+import numpy as np
+
+from app.core.config import settings
+from app.db.mongodb import get_database
+from app.utils.embedding_codec import encode_embedding, decode_embedding
+
+logger = logging.getLogger(__name__)
+
+CACHE_COLLECTION = "embedding_cache"
+
+_WHITESPACE = re.compile(r"\s+")
+
+# {key: float32 vector}, least recently used first
+_memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+_stats: Dict[str, int] = {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "evictions": 0, "persistent_errors": 0}
+
+
+def model_id(backend: Optional[str] = None) -> str:
+    """Identifies the vectors a key maps to: model name, revision and loaded encoder backend"""
+    if backend is None:
+        from app.services.embedding_service import get_embedding_backend
+        backend = get_embedding_backend() or "unloaded"
+    return f"{settings.EMBEDDING_MODEL_NAME}@{settings.EMBEDDING_MODEL_REVISION}/{backend}"
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so OCR spacing differences hit the same entry"""
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+
+def cache_key(text: str, backend: str) -> str:
+    """Key for text embedded by the given loaded backend ("onnx" or "torch")"""
+    return hashlib.sha256(f"{model_id(backend)}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def _remember(key: str, vector: np.ndarray):
+    if settings.EMBEDDING_CACHE_SIZE <= 0:
+        return
+    _memory[key] = vector
+    _memory.move_to_end(key)
+    while len(_memory) > settings.EMBEDDING_CACHE_SIZE:
+        _memory.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+async def get_cached_embedding(key: str) -> Optional[List[float]]:
+    """Cached embedding for a key, checking memory then the persistent tier"""
+    vector = _memory.get(key)
+    if vector is not None:
+        _memory.move_to_end(key)
+        _stats["memory_hits"] += 1
+        return vector.tolist()
+
+    if settings.EMBEDDING_CACHE_PERSISTENT:
+        db = get_database()
+        if db is not None:
+            try:
+                doc = await db[CACHE_COLLECTION].find_one({"_id": key})
+            except Exception as e:
+                _stats["persistent_errors"] += 1
+                logger.warning(f"Embedding cache lookup failed: {e}")
+                doc = None
+            if doc is not None:
+                vector = decode_embedding(doc)
+                if vector is not None:
+                    _remember(key, vector)
+                    _stats["persistent_hits"] += 1
+                    return vector.tolist()
+
+    _stats["misses"] += 1
+    return None
+
+
+async def put_cached_embedding(key: str, embedding: List[float], backend: str):
+    """Store a freshly computed embedding in both tiers"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    _remember(key, vector)
+
+    if settings.EMBEDDING_CACHE_PERSISTENT:
+        db = get_database()
+        if db is None:
+            return
+        try:
+            await db[CACHE_COLLECTION].update_one(
+                {"_id": key},
+                {"$set": {
+                    **encode_embedding(vector, "float32"),
+                    "model": model_id(backend),
+                    "created_at": datetime.utcnow()
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            _stats["persistent_errors"] += 1
+            logger.warning(f"Embedding cache write failed: {e}")
+
+
+def get_embedding_cache_stats() -> Dict[str, Any]:
+    hits = _stats["memory_hits"] + _stats["persistent_hits"]
+    lookups = hits + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+        "memory_entries": len(_memory),
+        "memory_capacity": settings.EMBEDDING_CACHE_SIZE,
+        "persistent": settings.EMBEDDING_CACHE_PERSISTENT,
+        "model": model_id(),
+    }
@@ -0,0 +1,255 @@
+"""
+Embedding service: micro-batched sentence-transformer encoding off the event loop.
+
+``model.encode`` is CPU-bound and was called directly from async handlers, so
+every upload and chat message stalled the event loop while concurrent requests
+were encoded one at a time. Callers now enqueue their text and await a future;
+a single worker task collects requests for up to ``EMBEDDING_BATCH_WINDOW_MS``
+(or until ``EMBEDDING_BATCH_MAX_SIZE`` is reached) and encodes them as one
+batch on a dedicated thread. Requests that arrive while a batch is encoding
+join the next one, so batch size grows with load.
+
+Repeated texts are served from the embedding cache (embedding_cache.py) and
+never reach the batcher; concurrent requests for the same uncached text share
+one encode.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
+import logging
+
+from app.core.config import settings
+from app.services.embedding_cache import cache_key, get_cached_embedding, put_cached_embedding
+
+logger = logging.getLogger(__name__)
+
+# Initialize embedding model (lazy loading)
+_embedding_model = None
+_model_lock = threading.Lock()
+
+
+def _load_embedding_model():
+    if settings.EMBEDDING_BACKEND == "onnx":
+        from app.services.onnx_embedder import OnnxEmbedder
+        try:
+            return OnnxEmbedder(settings.EMBEDDING_ONNX_DIR, settings.EMBEDDING_ONNX_THREADS)
+        except Exception as e:
+            logger.warning(f"ONNX embedder unavailable, using sentence-transformers: {e}")
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(settings.EMBEDDING_MODEL_NAME)
+
+
+def get_embedding_model():
+    """Lazy load embedding model (sentence-transformers, or the ONNX export when EMBEDDING_BACKEND=onnx)"""
+    global _embedding_model
+    if _embedding_model is None:
+        with _model_lock:
+            if _embedding_model is None:
+                _embedding_model = _load_embedding_model()
+    return _embedding_model
+
+
+def get_embedding_backend() -> Optional[str]:
+    """Backend serving embeddings ("onnx" or "torch"), None until the model is loaded"""
+    if _embedding_model is None:
+        return None
+    from app.services.onnx_embedder import OnnxEmbedder
+    return "onnx" if isinstance(_embedding_model, OnnxEmbedder) else "torch"
+
+
+async def _loaded_backend() -> str:
+    """Backend of the loaded model, loading it off the event loop on first use"""
+    if _embedding_model is None:
+        await asyncio.get_running_loop().run_in_executor(None, get_embedding_model)
+    return get_embedding_backend()
+
+
+def encode_texts(texts: List[str]) -> List[List[float]]:
+    """Encode a batch of texts synchronously (runs on the embedding thread)"""
+    model = get_embedding_model()
+    vectors = model.encode(texts, batch_size=max(1, len(texts)), show_progress_bar=False)
+    return [vector.tolist() for vector in vectors]
+
+
+class EmbeddingBatcher:
+    """Collects concurrent embedding requests into batches encoded on a worker thread"""
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], List[List[float]]],
+        max_batch_size: int,
+        max_wait_ms: float
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.stats: Dict[str, Any] = {
+            "requests": 0,
+            "batches": 0,
+            "errors": 0,
+            "max_batch_size": 0,
+            "queue_wait_ms": 0.0,
+            "max_queue_wait_ms": 0.0,
+            "encode_ms": 0.0,
+        }
+
+    def _ensure_worker(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        return loop
+
+    async def embed(self, text: str) -> List[float]:
+        loop = self._ensure_worker()
+        future = loop.create_future()
+        self._queue.put_nowait((text, future, time.perf_counter()))
+        return await future
+
+    async def _next_batch(self) -> List[Tuple[str, asyncio.Future, float]]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return [item for item in batch if not item[1].cancelled()]
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            if not batch:
+                continue
+            texts = [text for text, _, _ in batch]
+            started = time.perf_counter()
+            try:
+                vectors = await self._loop.run_in_executor(self._executor, self.encode_fn, texts)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Embedding batch of {len(texts)} failed: {e}", exc_info=True)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            for (_, future, enqueued), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+                wait_ms = (started - enqueued) * 1000
+                self.stats["queue_wait_ms"] += wait_ms
+                self.stats["max_queue_wait_ms"] = max(self.stats["max_queue_wait_ms"], wait_ms)
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["max_batch_size"] = max(self.stats["max_batch_size"], len(batch))
+            self.stats["encode_ms"] += (finished - started) * 1000
+
+    async def close(self):
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+        self._executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        requests, batches = self.stats["requests"], self.stats["batches"]
+        return {
+            "requests": requests,
+            "batches": batches,
+            "errors": self.stats["errors"],
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "avg_batch_size": round(requests / batches, 2) if batches else None,
+            "max_batch_size": self.stats["max_batch_size"],
+            "avg_queue_wait_ms": round(self.stats["queue_wait_ms"] / requests, 3) if requests else None,
+            "max_queue_wait_ms": round(self.stats["max_queue_wait_ms"], 3),
+            "avg_batch_encode_ms": round(self.stats["encode_ms"] / batches, 3) if batches else None,
+        }
+
+
+_batcher: Optional[EmbeddingBatcher] = None
+# Cache key -> future of an encode already in flight for that text
+_inflight: Dict[str, asyncio.Future] = {}
+_coalesced = 0
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = EmbeddingBatcher(
+            encode_texts,
+            settings.EMBEDDING_BATCH_MAX_SIZE,
+            settings.EMBEDDING_BATCH_WINDOW_MS
+        )
+    return _batcher
+
+
+async def embed_text(text: str) -> List[float]:
+    """Embed one text: cache first, otherwise through the shared micro-batcher"""
+    global _coalesced
+    # Keyed by the backend actually serving, not the configured one
+    backend = await _loaded_backend()
+    key = cache_key(text, backend)
+    cached = await get_cached_embedding(key)
+    if cached is not None:
+        return cached
+
+    pending = _inflight.get(key)
+    if pending is not None:
+        _coalesced += 1
+        return list(await asyncio.shield(pending))
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        embedding = await get_embedding_batcher().embed(text)
+        future.set_result(embedding)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Retrieved here so a failure nobody else awaited is not logged as unhandled
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(key, None)
+    await put_cached_embedding(key, embedding, backend)
+    return embedding
+
+
+async def embed_texts(texts: List[str]) -> List[List[float]]:
+    """Embed several texts; misses are encoded together with any concurrent requests"""
+    return list(await asyncio.gather(*(embed_text(text) for text in texts)))
+
+
+async def shutdown_embedding_service():
+    global _batcher
+    if _batcher is not None:
+        await _batcher.close()
+        _batcher = None
+
+
+def get_embedding_stats() -> Dict[str, Any]:
+    stats = _batcher.get_stats() if _batcher is not None else {"requests": 0, "batches": 0}
+    # Cache misses that joined an identical encode already in flight
+    stats["coalesced"] = _coalesced
+    stats["backend"] = get_embedding_backend()
+    return stats
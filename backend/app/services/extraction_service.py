@@ -23,7 +23,8 @@ except ImportError:
     logging.warning("sentence-transformers not available, semantic fallback disabled")
 
 logger = logging.getLogger(__name__)
-from app.core.llm import get_llm
+from app.core.llm_gateway import invoke_llm, invoke_llm_batched
+from app.core.config import settings
 from langchain.schema import HumanMessage
 from app.utils.json_parser import parse_llm_json_response
 import json
@@ -264,6 +265,120 @@ def _normalize_amount(value: Optional[float]) -> Optional[float]:
         return None
 
 
+EXTRACTION_INSTRUCTIONS = """Extract the following fields:
+- vendor: Name of the vendor/store
+- date: Date of transaction (YYYY-MM-DD format if possible, otherwise preserve original format)
+- invoice_number: Invoice or receipt number
+- currency: ISO currency code (USD, IDR, ZAR, EUR, GBP, etc.) based on the country/vendor location
+- items: List of ALL items purchased. For each item include:
+  * name: string - the item name
+  * quantity: number - quantity purchased (default to 1 if not specified)
+  * unit_price: string - price per unit (preserve formatting like "16,000" or "74.00")
+  * line_total: string - total for this line item (preserve formatting)
+- subtotal: Subtotal amount (as string, preserve formatting like "175,000")
+- tax: Tax amount (as string)
+- total: Total amount (as string)
+- usd_equivalent: Convert the total to USD (as float, e.g., 175000 IDR = 11.67 USD)
+- exchange_rate: Exchange rate used for conversion (local currency to USD, e.g., 15000 for IDR)
+- payment_method: Payment method (CASH, CARD, etc.)
+- cash_given: Cash given/tendered (if applicable)
+- change: Change returned (if applicable)
+
+CRITICAL INSTRUCTIONS:
+1. Extract EVERY line item from the receipt - do not skip any items
+2. Return all monetary values as STRINGS to preserve formatting (e.g., "175,000" not 175000, "16.00" not 16, "¥237" not 237)
+3. Look for patterns like "1 Item Name    16,000" or "2x Item Name $10.00" or "Item Name        $5.99" or "商品名    237" (Japanese)
+4. For items with quantity at the start (e.g., "1 Ice Java Tea"), make sure quantity field is set correctly
+5. Ensure the number of items in your response matches the actual line items on the receipt
+6. DETECT CURRENCY: Look at vendor location, country, currency symbols to determine the currency
+   - Japanese receipts (業務スーパー, ¥ symbol, Japan) → currency = "JPY", exchange_rate ≈ 150
+   - Indonesian receipts (MOMI, Jakarta, Indonesia) → currency = "IDR", exchange_rate ≈ 15000
+   - South African receipts (SPAR, ZAR, Rand) → currency = "ZAR", exchange_rate ≈ 18
+   - US receipts → currency = "USD", exchange_rate = 1
+7. CONVERT TO USD: Calculate usd_equivalent = total / exchange_rate
+8. For Japanese receipts: Pay attention to Japanese characters (漢字, ひらがな, カタカナ) in item names
+   - Common patterns: "商品名 数量 価格" or "商品名    価格"
+   - Tax keywords: 消費税 (consumption tax), 税込 (tax included), 税抜 (tax excluded)
+   - Payment keywords: 現金 (cash), お預かり (cash received), お釣り (change)
+
+EXAMPLE FORMAT (Indonesian Receipt):
+{
+  "vendor": "MOMI & Toy's",
+  "date": "26/01/2015",
+  "currency": "IDR",
+  "items": [
+    {"name": "Ham Cheese", "quantity": 2, "unit_price": "8,000", "line_total": "16,000"},
+    {"name": "Ice Java Tea", "quantity": 1, "unit_price": "16,000", "line_total": "16,000"},
+    {"name": "Mineral Water", "quantity": 1, "unit_price": "13,000", "line_total": "13,000"}
+  ],
+  "subtotal": "175,000",
+  "total": "175,000",
+  "usd_equivalent": 11.67,
+  "exchange_rate": 15000,
+  "payment_method": "CASH"
+}
+
+EXAMPLE FORMAT (Japanese Receipt):
+{
+  "vendor": "業務スーパー河内屋",
+  "date": "2025-07-12",
+  "currency": "JPY",
+  "items": [
+    {"name": "鶏卵赤玉MSP 10個入", "quantity": 1, "unit_price": "237", "line_total": "237"},
+    {"name": "マカロニ(セダニーニ) 500G", "quantity": 1, "unit_price": "138", "line_total": "138"},
+    {"name": "JUCOVIA(業)チェダースライスチーズ", "quantity": 2, "unit_price": "209", "line_total": "418"},
+    {"name": "協同牛乳酪農牛乳 1L", "quantity": 1, "unit_price": "199", "line_total": "199"},
+    {"name": "おかめ納豆極小粒ミニ3", "quantity": 1, "unit_price": "76", "line_total": "76"}
+  ],
+  "subtotal": "1,068",
+  "tax": "85",
+  "total": "1,153",
+  "usd_equivalent": 7.69,
+  "exchange_rate": 150,
+  "payment_method": "CASH",
+  "cash_given": "5,000",
+  "change": "3,847"
+}
+
+CRITICAL JSON FORMATTING REQUIREMENTS:
+- Do NOT include any explanatory text before or after the JSON
+- Do NOT wrap the JSON in markdown code blocks
+- Ensure all string values are properly escaped (use \" for quotes inside strings)
+- Ensure all special characters in strings are properly escaped
+- Do NOT include trailing commas
+- Ensure all brackets and braces are properly closed
+- If a field is missing, set it to null (not undefined or omitted)
+"""
+
+
+# Fields a batched item must carry to be used instead of a single-record call
+EXTRACTION_REQUIRED_FIELDS = ("vendor", "total")
+
+
+def _postprocess_extraction(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert monetary strings returned by the LLM into floats"""
+    if data.get('subtotal'):
+        data['subtotal'] = parse_price(str(data['subtotal']))
+    if data.get('tax'):
+        data['tax'] = parse_price(str(data['tax']))
+    if data.get('total'):
+        data['total'] = parse_price(str(data['total']))
+    if data.get('cash_given'):
+        data['cash_given'] = parse_price(str(data['cash_given']))
+    if data.get('change'):
+        data['change'] = parse_price(str(data['change']))
+    
+    # Process items
+    if data.get('items'):
+        for item in data['items']:
+            if item.get('unit_price'):
+                item['unit_price'] = parse_price(str(item['unit_price']))
+            if item.get('line_total'):
+                item['line_total'] = parse_price(str(item['line_total']))
+    
+    return data
+
+
 async def extract_with_llm(raw_text: str) -> Dict[str, Any]:
     """
     Extract structured data from raw OCR text using LLM.
@@ -274,111 +389,18 @@ async def extract_with_llm(raw_text: str) -> Dict[str, Any]:
     Returns:
         Structured dictionary
     """
-    llm = get_llm()
-    
     prompt = f"""You are an expert data extraction system. Extract structured financial data from the following OCR text from a receipt or invoice.
 
-    OCR Text:
-    {raw_text}
-    
-    Extract the following fields:
-    - vendor: Name of the vendor/store
-    - date: Date of transaction (YYYY-MM-DD format if possible, otherwise preserve original format)
-    - invoice_number: Invoice or receipt number
-    - currency: ISO currency code (USD, IDR, ZAR, EUR, GBP, etc.) based on the country/vendor location
-    - items: List of ALL items purchased. For each item include:
-      * name: string - the item name
-      * quantity: number - quantity purchased (default to 1 if not specified)
-      * unit_price: string - price per unit (preserve formatting like "16,000" or "74.00")
-      * line_total: string - total for this line item (preserve formatting)
-    - subtotal: Subtotal amount (as string, preserve formatting like "175,000")
-    - tax: Tax amount (as string)
-    - total: Total amount (as string)
-    - usd_equivalent: Convert the total to USD (as float, e.g., 175000 IDR = 11.67 USD)
-    - exchange_rate: Exchange rate used for conversion (local currency to USD, e.g., 15000 for IDR)
-    - payment_method: Payment method (CASH, CARD, etc.)
-    - cash_given: Cash given/tendered (if applicable)
-    - change: Change returned (if applicable)
-    
-    CRITICAL INSTRUCTIONS:
-    1. Extract EVERY line item from the receipt - do not skip any items
-    2. Return all monetary values as STRINGS to preserve formatting (e.g., "175,000" not 175000, "16.00" not 16, "¥237" not 237)
-    3. Look for patterns like "1 Item Name    16,000" or "2x Item Name $10.00" or "Item Name        $5.99" or "商品名    237" (Japanese)
-    4. For items with quantity at the start (e.g., "1 Ice Java Tea"), make sure quantity field is set correctly
-    5. Ensure the number of items in your response matches the actual line items on the receipt
-    6. DETECT CURRENCY: Look at vendor location, country, currency symbols to determine the currency
-       - Japanese receipts (業務スーパー, ¥ symbol, Japan) → currency = "JPY", exchange_rate ≈ 150
-       - Indonesian receipts (MOMI, Jakarta, Indonesia) → currency = "IDR", exchange_rate ≈ 15000
-       - South African receipts (SPAR, ZAR, Rand) → currency = "ZAR", exchange_rate ≈ 18
-       - US receipts → currency = "USD", exchange_rate = 1
-    7. CONVERT TO USD: Calculate usd_equivalent = total / exchange_rate
-    8. For Japanese receipts: Pay attention to Japanese characters (漢字, ひらがな, カタカナ) in item names
-       - Common patterns: "商品名 数量 価格" or "商品名    価格"
-       - Tax keywords: 消費税 (consumption tax), 税込 (tax included), 税抜 (tax excluded)
-       - Payment keywords: 現金 (cash), お預かり (cash received), お釣り (change)
-    
-    EXAMPLE FORMAT (Indonesian Receipt):
-    {{
-      "vendor": "MOMI & Toy's",
-      "date": "26/01/2015",
-      "currency": "IDR",
-      "items": [
-        {{"name": "Ham Cheese", "quantity": 2, "unit_price": "8,000", "line_total": "16,000"}},
-        {{"name": "Ice Java Tea", "quantity": 1, "unit_price": "16,000", "line_total": "16,000"}},
-        {{"name": "Mineral Water", "quantity": 1, "unit_price": "13,000", "line_total": "13,000"}}
-      ],
-      "subtotal": "175,000",
-      "total": "175,000",
-      "usd_equivalent": 11.67,
-      "exchange_rate": 15000,
-      "payment_method": "CASH"
-    }}
-    
-    EXAMPLE FORMAT (Japanese Receipt):
-    {{
-      "vendor": "業務スーパー河内屋",
-      "date": "2025-07-12",
-      "currency": "JPY",
-      "items": [
-        {{"name": "鶏卵赤玉MSP 10個入", "quantity": 1, "unit_price": "237", "line_total": "237"}},
-        {{"name": "マカロニ(セダニーニ) 500G", "quantity": 1, "unit_price": "138", "line_total": "138"}},
-        {{"name": "JUCOVIA(業)チェダースライスチーズ", "quantity": 2, "unit_price": "209", "line_total": "418"}},
-        {{"name": "協同牛乳酪農牛乳 1L", "quantity": 1, "unit_price": "199", "line_total": "199"}},
-        {{"name": "おかめ納豆極小粒ミニ3", "quantity": 1, "unit_price": "76", "line_total": "76"}}
-      ],
-      "subtotal": "1,068",
-      "tax": "85",
-      "total": "1,153",
-      "usd_equivalent": 7.69,
-      "exchange_rate": 150,
-      "payment_method": "CASH",
-      "cash_given": "5,000",
-      "change": "3,847"
-    }}
-    
-    CRITICAL JSON FORMATTING REQUIREMENTS:
-    - Return ONLY the JSON object, nothing else
-    - Do NOT include any explanatory text before or after the JSON
-    - Do NOT wrap the JSON in markdown code blocks
-    - Ensure all string values are properly escaped (use \" for quotes inside strings)
-    - Ensure all special characters in strings are properly escaped
-    - Do NOT include trailing commas
-    - Ensure all brackets and braces are properly closed
-    - If a field is missing, set it to null (not undefined or omitted)
-    
-    Return ONLY a valid JSON object with these fields. Start with {{ and end with }}.
-    """
+OCR Text:
+{raw_text}
+
+{EXTRACTION_INSTRUCTIONS}
+Return ONLY the JSON object, nothing else: a valid JSON object with these fields. Start with {{ and end with }}.
+"""
     
     try:
-        # Run LLM call in executor
-        def call_llm():
-            return llm.invoke([HumanMessage(content=prompt)])
-        
-        loop = asyncio.get_event_loop()
-        response = await asyncio.wait_for(
-            loop.run_in_executor(None, call_llm),
-            timeout=30.0
-        )
+        # Hedged LLM call with circuit breaking (30 second deadline)
+        response = await invoke_llm([HumanMessage(content=prompt)], timeout=30.0)
         response_text = response.content
         
         # Use robust JSON parser to handle malformed responses
@@ -388,32 +410,52 @@ async def extract_with_llm(raw_text: str) -> Dict[str, Any]:
             logger.warning("Failed to parse LLM response, returning empty dict")
             return {}
         
-        # Post-process monetary values: convert strings to floats using parse_price
-        if data.get('subtotal'):
-            data['subtotal'] = parse_price(str(data['subtotal']))
-        if data.get('tax'):
-            data['tax'] = parse_price(str(data['tax']))
-        if data.get('total'):
-            data['total'] = parse_price(str(data['total']))
-        if data.get('cash_given'):
-            data['cash_given'] = parse_price(str(data['cash_given']))
-        if data.get('change'):
-            data['change'] = parse_price(str(data['change']))
-        
-        # Process items
-        if data.get('items'):
-            for item in data['items']:
-                if item.get('unit_price'):
-                    item['unit_price'] = parse_price(str(item['unit_price']))
-                if item.get('line_total'):
-                    item['line_total'] = parse_price(str(item['line_total']))
-        
-        return data
+        return _postprocess_extraction(data)
     except Exception as e:
         logger.error(f"LLM extraction error: {e}")
         return {}
 
 
+async def extract_with_llm_batch(raw_texts: List[str]) -> List[Dict[str, Any]]:
+    """
+    Extract structured data for several OCR texts with batched LLM calls.
+    
+    Records that the batched response does not cover (or that fail to parse)
+    are re-extracted one at a time via extract_with_llm.
+    
+    Args:
+        raw_texts: Raw OCR texts
+    
+    Returns:
+        Structured dictionaries aligned with raw_texts ({} on failure)
+    """
+    instructions = (
+        "You are an expert data extraction system. Extract structured financial data from the "
+        "OCR text of each receipt or invoice below.\n\n" + EXTRACTION_INSTRUCTIONS
+    )
+    records = [f"OCR Text:\n{text}" for text in raw_texts]
+    
+    def parse_item(idx: int, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        item = dict(item)
+        item.pop("index", None)
+        # An item without a vendor or total is retried on its own via single_call
+        if any(item.get(field) in (None, "") for field in EXTRACTION_REQUIRED_FIELDS):
+            return None
+        return _postprocess_extraction(item)
+    
+    async def single_call(idx: int) -> Dict[str, Any]:
+        return await extract_with_llm(raw_texts[idx])
+    
+    # Extraction output is long (every line item), so keep batches smaller
+    return await invoke_llm_batched(
+        instructions,
+        records,
+        parse_item,
+        single_call,
+        timeout=60.0,
+        max_records=min(4, settings.LLM_BATCH_MAX_RECORDS)
+    )
+
 
 async def parse_receipt_text(raw_text: str) -> Dict[str, Any]:
     """
@@ -428,22 +470,60 @@ async def parse_receipt_text(raw_text: str) -> Dict[str, Any]:
     """
     # Try LLM extraction first
     try:
-        llm_result = await extract_with_llm(raw_text)
-        if llm_result and llm_result.get("total") is not None:
-            llm_result["raw_text"] = raw_text
-            # Ensure description is present
-            if not llm_result.get("description"):
-                if llm_result.get("items"):
-                    item_names = [item["name"] for item in llm_result["items"][:3]]
-                    llm_result["description"] = f"Purchase: {', '.join(item_names)}"
-                    if len(llm_result["items"]) > 3:
-                        llm_result["description"] += f" and {len(llm_result['items']) - 3} more items"
-                else:
-                    llm_result["description"] = f"Transaction from {llm_result.get('vendor', 'Unknown')}"
+        llm_result = _finalize_llm_result(await extract_with_llm(raw_text), raw_text)
+        if llm_result:
             return llm_result
     except Exception as e:
         logger.warning(f"LLM extraction failed, falling back to regex: {e}")
 
+    return _parse_receipt_text_rules(raw_text)
+
+
+async def parse_receipt_texts_batch(raw_texts: List[str]) -> List[Dict[str, Any]]:
+    """
+    Batch variant of parse_receipt_text for batch uploads.
+    
+    LLM extraction is batched across records; each record that the LLM could
+    not structure falls back to the regex/heuristic parser on its own.
+    
+    Args:
+        raw_texts: Raw OCR texts
+    
+    Returns:
+        Structured dictionaries aligned with raw_texts
+    """
+    try:
+        llm_results = await extract_with_llm_batch(raw_texts)
+    except Exception as e:
+        logger.warning(f"Batched LLM extraction failed, falling back to regex: {e}")
+        llm_results = [{} for _ in raw_texts]
+    
+    results = []
+    for raw_text, llm_result in zip(raw_texts, llm_results):
+        finalized = _finalize_llm_result(llm_result, raw_text)
+        results.append(finalized or _parse_receipt_text_rules(raw_text))
+    return results
+
+
+def _finalize_llm_result(llm_result: Dict[str, Any], raw_text: str) -> Optional[Dict[str, Any]]:
+    """Accept an LLM extraction if it found a total, filling in raw_text and description"""
+    if not llm_result or llm_result.get("total") is None:
+        return None
+    llm_result["raw_text"] = raw_text
+    # Ensure description is present
+    if not llm_result.get("description"):
+        if llm_result.get("items"):
+            item_names = [item["name"] for item in llm_result["items"][:3]]
+            llm_result["description"] = f"Purchase: {', '.join(item_names)}"
+            if len(llm_result["items"]) > 3:
+                llm_result["description"] += f" and {len(llm_result['items']) - 3} more items"
+        else:
+            llm_result["description"] = f"Transaction from {llm_result.get('vendor', 'Unknown')}"
+    return llm_result
+
+
+def _parse_receipt_text_rules(raw_text: str) -> Dict[str, Any]:
+    """Regex/heuristic receipt parser used when LLM extraction is unavailable"""
     # Fallback to regex logic
     # Clean and prepare text
 
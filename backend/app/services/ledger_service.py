@@ -1,11 +1,18 @@
 from sqlalchemy.orm import Session, joinedload
-from app.db.sql import SessionLocal, LedgerEntry, LedgerItem
-from typing import Dict, Any, List, Optional
+from app.db.sql import SessionLocal, LedgerEntry
+from app.utils.cursor import encode_cursor, decode_cursor, after_cursor
+from typing import Dict, Any, List, Optional, Tuple
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Category learning (a MiniLM encode) runs here, off the caller's thread, which
+# under run_in_session is the event loop's; one worker keeps updates in order
+_learning_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="category-learning")
+
 
 def format_validation_issues(issues):
     """Convert validation issues to a consistent format (dicts to strings)"""
@@ -33,97 +40,112 @@ def create_ledger_entry(
     record_id: str,
     structured_data: Dict[str, Any],
     orchestration_result: Dict[str, Any],
-    user_id: int
+    user_id: int,
+    db=None
 ) -> LedgerEntry:
-    """Create ledger entry from validated record"""
-    db = SessionLocal()
+    """Create ledger entry (with items and journal entry, in one transaction) from validated record"""
+    from app.services.posting_service import post_ledger_entry
+    
+    validation_status = orchestration_result["validation_result"]["status"]
+    logger.info(f"Creating ledger entry for record_id: {record_id}, validation_status: {validation_status}")
+    entry = post_ledger_entry(record_id, structured_data, orchestration_result, user_id, db=db)
+    
+    if entry.status == "validated":
+        _learn_categories(user_id, [(entry.vendor, structured_data, entry.category)])
+    
+    return entry
+
+
+def _learn_categories(user_id: int, examples: List[Tuple[Optional[str], Dict[str, Any], Optional[str]]]):
+    """
+    Teach the vendor memo and local classifier the confirmed (vendor,
+    structured_data, category) examples in the background: one memo update
+    per (vendor, category) pair and one batched encode for the classifier.
+    """
+    _learning_executor.submit(_apply_learned_categories, user_id, examples)
+
+
+def _apply_learned_categories(user_id: int, examples: List[Tuple[Optional[str], Dict[str, Any], Optional[str]]]):
     try:
-        validation_status = orchestration_result["validation_result"]["status"]
-        logger.info(f"Creating ledger entry for record_id: {record_id}, validation_status: {validation_status}")
-        
-        # Determine entry status based on validation
-        entry_status = "validated" if validation_status == "valid" else "pending"
-        
-        # Use validated currency from LLM if available, otherwise use extracted currency
-        validated_currency = orchestration_result["validation_result"].get("currency")
-        currency = validated_currency if validated_currency else structured_data.get("currency", "USD")
-        
-        entry = LedgerEntry(
-            user_id=user_id,
-            record_id=record_id,
-            vendor=structured_data.get("vendor") or "Unknown Vendor",
-            date=structured_data.get("date") or "N/A",
-            amount=structured_data.get("subtotal") or structured_data.get("total") or 0.0,
-            tax=structured_data.get("tax"),
-            total=structured_data.get("total") or structured_data.get("subtotal") or 0.0,
-            currency=currency,
-            exchange_rate=structured_data.get("exchange_rate", 1.0),
-            usd_total=structured_data.get("usd_equivalent", structured_data.get("total", 0.0)),
-            invoice_number=structured_data.get("invoice_number"),
-            description=structured_data.get("description") or f"Transaction from {structured_data.get('vendor', 'Unknown')}",
-            category=structured_data.get("category"),
-            payment_method=structured_data.get("payment_method"),
-            status=entry_status,
-            validation_confidence=orchestration_result["validation_result"].get("confidence"),
-            validation_issues=orchestration_result["validation_result"].get("issues", []),
-            reasoning_trace=orchestration_result.get("reasoning_trace")
-        )
-        # Add items if present
-        items_to_add = structured_data.get("items", [])
-        logger.info(f"Processing {len(items_to_add)} items for ledger entry")
-        
-        if items_to_add:
-            for idx, item_data in enumerate(items_to_add):
-                item = LedgerItem(
-                    name=item_data.get("name"),
-                    quantity=item_data.get("quantity", 1),
-                    unit_price=item_data.get("unit_price", 0.0),
-                    line_total=item_data.get("line_total", 0.0)
-                )
-                entry.items.append(item)
-                logger.info(f"Added item {idx + 1}: {item.name} - {item.quantity} x ${item.unit_price}")
-        else:
-            logger.warning(f"No items in structured_data for record_id: {record_id}")
-        
-        db.add(entry)
-        db.commit()
-        db.refresh(entry)
-        logger.info(f"Successfully created ledger entry with ID: {entry.id}, Status: {entry.status}")
-        
-        # Auto-generate double-entry journal entry
-        try:
-            from app.services.accounting_service import auto_generate_journal_entry, initialize_chart_of_accounts
-            # Initialize chart of accounts if needed
-            initialize_chart_of_accounts()
-            # Generate journal entry
-            category = structured_data.get("category")
-            journal_entry = auto_generate_journal_entry(entry, category)
-            if journal_entry:
-                logger.info(f"Auto-generated journal entry {journal_entry.id} for ledger entry {entry.id}")
-            else:
-                logger.warning(f"Failed to auto-generate journal entry for ledger entry {entry.id}")
-        except Exception as je:
-            logger.error(f"Error generating journal entry: {je}", exc_info=True)
-            # Don't fail the ledger entry creation if journal entry fails
-        
-        return entry
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error creating ledger entry: {e}", exc_info=True)
-        raise
-    finally:
-        db.close()
+        from app.services.vendor_memo import remember_vendor_category
+        from app.services.local_classifier import add_user_examples
+        for (vendor, category), count in Counter((vendor, category) for vendor, _, category in examples).items():
+            remember_vendor_category(user_id, vendor, category, count)
+        add_user_examples(user_id, [(structured_data, category) for _, structured_data, category in examples])
+    except Exception as ce:
+        logger.debug(f"Could not update category caches: {ce}")
 
 
-def get_ledger_entries(
+def create_ledger_entries_bulk(
+    records: List[Tuple[str, Dict[str, Any], Dict[str, Any]]],
+    user_id: int,
+    db=None
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Create ledger entries (with items and journal entries) for many validated
+    records with bulk inserts, one transaction per chunk; failures are per
+    record. See posting_service.post_ledger_entries_bulk.
+    """
+    from app.services.posting_service import post_ledger_entries_bulk
+    
+    result = post_ledger_entries_bulk(records, user_id, db=db)
+    
+    validated = {posted["record_id"] for posted in result["posted"] if posted["status"] == "validated"}
+    if validated:
+        _learn_categories(user_id, [
+            (structured_data.get("vendor") or "Unknown Vendor", structured_data, structured_data.get("category"))
+            for record_id, structured_data, _ in records
+            if record_id in validated
+        ])
+    
+    logger.info(f"Bulk created {len(result['posted'])} ledger entries for user {user_id}, {len(result['failed'])} failed")
+    return result
+
+
+def format_ledger_entry_summary(entry: LedgerEntry) -> Dict[str, Any]:
+    """Ledger entry fields returned by the listings (no items or reasoning trace)"""
+    return {
+        "id": entry.id,
+        "record_id": entry.record_id,
+        "vendor": entry.vendor,
+        "date": entry.date,
+        "amount": entry.amount,
+        "tax": entry.tax,
+        "total": entry.total,
+        "currency": entry.currency,
+        "exchange_rate": entry.exchange_rate,
+        "usd_total": entry.usd_total,
+        "invoice_number": entry.invoice_number,
+        "description": entry.description,
+        "category": entry.category,
+        "payment_method": entry.payment_method,
+        "status": entry.status,
+        "validation_confidence": entry.validation_confidence,
+        "validation_issues": format_validation_issues(entry.validation_issues),
+        "created_at": entry.created_at.isoformat() if entry.created_at else None,
+        "updated_at": entry.updated_at.isoformat() if entry.updated_at else None
+    }
+
+
+def get_ledger_entries_page(
     user_id: int,
-    skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    skip: int = 0,
     status: Optional[str] = None,
-    vendor: Optional[str] = None
-) -> List[Dict[str, Any]]:
-    """Get ledger entries with filters for a specific user"""
-    db = SessionLocal()
+    vendor: Optional[str] = None,
+    db=None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of a user's ledger entries, newest first, and the cursor of the
+    next page (None on the last page).
+
+    With a cursor the page is a keyset seek on (user_id, created_at, id), so
+    deep pages cost the same as the first; skip is the legacy OFFSET paging
+    and is ignored when a cursor is given. Raises ValueError for a bad cursor.
+    """
+    own_session = db is None
+    db = db or SessionLocal()
     try:
         query = db.query(LedgerEntry).filter(LedgerEntry.user_id == user_id)
         
@@ -132,39 +154,42 @@ def get_ledger_entries(
         if vendor:
             query = query.filter(LedgerEntry.vendor.ilike(f"%{vendor}%"))
         
-        entries = query.order_by(LedgerEntry.created_at.desc()).offset(skip).limit(limit).all()
+        if cursor:
+            query = query.filter(after_cursor(LedgerEntry.created_at, LedgerEntry.id, decode_cursor("ledger", cursor)))
         
-        return [
-            {
-                "id": entry.id,
-                "record_id": entry.record_id,
-                "vendor": entry.vendor,
-                "date": entry.date,
-                "amount": entry.amount,
-                "tax": entry.tax,
-                "total": entry.total,
-                "currency": entry.currency,
-                "exchange_rate": entry.exchange_rate,
-                "usd_total": entry.usd_total,
-                "invoice_number": entry.invoice_number,
-                "description": entry.description,
-                "category": entry.category,
-                "payment_method": entry.payment_method,
-                "status": entry.status,
-                "validation_confidence": entry.validation_confidence,
-                "validation_issues": format_validation_issues(entry.validation_issues),
-                "created_at": entry.created_at.isoformat() if entry.created_at else None,
-                "updated_at": entry.updated_at.isoformat() if entry.updated_at else None
-            }
-            for entry in entries
-        ]
+        query = query.order_by(LedgerEntry.created_at.desc(), LedgerEntry.id.desc())
+        if skip and not cursor:
+            query = query.offset(skip)
+        # One extra row tells whether there is a next page
+        entries = query.limit(limit + 1).all()
+        next_cursor = None
+        if len(entries) > limit:
+            entries = entries[:limit]
+            next_cursor = encode_cursor("ledger", entries[-1].created_at, entries[-1].id)
+        
+        return [format_ledger_entry_summary(entry) for entry in entries], next_cursor
     finally:
-        db.close()
+        if own_session:
+            db.close()
+
+
+def get_ledger_entries(
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    vendor: Optional[str] = None,
+    db=None
+) -> List[Dict[str, Any]]:
+    """Get ledger entries with filters for a specific user"""
+    entries, _ = get_ledger_entries_page(user_id, limit=limit, skip=skip, status=status, vendor=vendor, db=db)
+    return entries
 
 
-def get_ledger_entry(record_id: str, user_id: int) -> Optional[Dict[str, Any]]:
+def get_ledger_entry(record_id: str, user_id: int, db=None) -> Optional[Dict[str, Any]]:
     """Get single ledger entry by record_id with eager loading of items for a specific user"""
-    db = SessionLocal()
+    own_session = db is None
+    db = db or SessionLocal()
     try:
         # Use joinedload to eagerly load items relationship
         entry = db.query(LedgerEntry).options(joinedload(LedgerEntry.items)).filter(
@@ -217,25 +242,38 @@ def get_ledger_entry(record_id: str, user_id: int) -> Optional[Dict[str, Any]]:
             "created_at": entry.created_at.isoformat() if entry.created_at else None,
             "updated_at": entry.updated_at.isoformat() if entry.updated_at else None,
             "items": items_list,
-            "journal_entry": get_journal_entry_for_ledger(entry.id, user_id)
+            "journal_entry": get_journal_entry_for_ledger(entry.id, user_id, db)
         }
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
 
-def get_journal_entry_for_ledger(ledger_entry_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+def get_journal_entry_for_ledger(ledger_entry_id: int, user_id: int, db=None) -> Optional[Dict[str, Any]]:
     """Get journal entry data for a ledger entry, filtered by user_id"""
     try:
         from app.services.accounting_service import get_journal_entry_by_ledger_entry
-        return get_journal_entry_by_ledger_entry(ledger_entry_id, user_id=user_id)
+        return get_journal_entry_by_ledger_entry(ledger_entry_id, user_id=user_id, db=db)
     except Exception as e:
         logger.warning(f"Could not fetch journal entry for ledger {ledger_entry_id}: {e}")
         return None
 
 
-def update_ledger_entry_status(record_id: str, status: str, user_id: int):
+def _invalidate_category_caches(user_id: int):
+    """Confirmed categories changed; the vendor memo and local classifier reload them on next use"""
+    try:
+        from app.services.vendor_memo import invalidate_vendor_memo
+        invalidate_vendor_memo(user_id)
+        from app.services.local_classifier import invalidate_user_profile
+        invalidate_user_profile(user_id)
+    except Exception as e:
+        logger.debug(f"Could not invalidate category caches: {e}")
+
+
+def update_ledger_entry_status(record_id: str, status: str, user_id: int, db=None):
     """Update ledger entry status for a specific user"""
-    db = SessionLocal()
+    own_session = db is None
+    db = db or SessionLocal()
     try:
         entry = db.query(LedgerEntry).filter(
             LedgerEntry.record_id == record_id,
@@ -246,6 +284,7 @@ def update_ledger_entry_status(record_id: str, status: str, user_id: int):
             entry.updated_at = datetime.utcnow()
             db.commit()
             logger.info(f"Updated ledger entry {record_id} status to {status}")
+            _invalidate_category_caches(user_id)
             return True
         return False
     except Exception as e:
@@ -253,12 +292,40 @@ def update_ledger_entry_status(record_id: str, status: str, user_id: int):
         logger.error(f"Error updating ledger entry: {e}")
         raise
     finally:
-        db.close()
+        if own_session:
+            db.close()
+
+
+def update_ledger_entry_category(record_id: str, category: str, user_id: int, db=None) -> bool:
+    """Update ledger entry category for a specific user"""
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        entry = db.query(LedgerEntry).filter(
+            LedgerEntry.record_id == record_id,
+            LedgerEntry.user_id == user_id
+        ).first()
+        if entry:
+            entry.category = category
+            entry.updated_at = datetime.utcnow()
+            db.commit()
+            logger.info(f"Updated ledger entry {record_id} category to {category}")
+            _invalidate_category_caches(user_id)
+            return True
+        return False
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error updating ledger entry category: {e}")
+        raise
+    finally:
+        if own_session:
+            db.close()
 
 
-def delete_ledger_entry(record_id: str, user_id: int) -> bool:
+def delete_ledger_entry(record_id: str, user_id: int, db=None) -> bool:
     """Delete ledger entry from MySQL database for a specific user"""
-    db = SessionLocal()
+    own_session = db is None
+    db = db or SessionLocal()
     try:
         entry = db.query(LedgerEntry).filter(
             LedgerEntry.record_id == record_id,
@@ -268,6 +335,7 @@ def delete_ledger_entry(record_id: str, user_id: int) -> bool:
             db.delete(entry)
             db.commit()
             logger.info(f"Deleted ledger entry {record_id} from MySQL")
+            _invalidate_category_caches(user_id)
             return True
         logger.warning(f"Ledger entry {record_id} not found in MySQL")
         return False
@@ -276,5 +344,6 @@ def delete_ledger_entry(record_id: str, user_id: int) -> bool:
         logger.error(f"Error deleting ledger entry: {e}")
         raise
     finally:
-        db.close()
+        if own_session:
+            db.close()
 
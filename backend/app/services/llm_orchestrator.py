@@ -11,7 +11,27 @@ from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
-from app.core.llm import get_llm
+from app.core.llm_gateway import invoke_llm, invoke_llm_batched
+
+
+# Validation rules shared by the single-record and batched prompts
+VALIDATION_CHECKS = """1. Completeness: Are all critical fields present?
+2. Consistency: Do the numbers add up correctly (amount + tax = total)?
+3. Format: Are dates, amounts, and other fields in correct format?
+4. Reasonableness: Are the values within expected ranges?
+5. Business logic: Does the record make business sense?
+6. Currency: Validate the currency code is correct (ISO 4217 format: USD, IDR, ZAR, EUR, GBP, etc.)"""
+
+VALIDATION_RESPONSE_FORMAT = """{
+    "status": "valid|invalid|warning|needs_review",
+    "issues": ["list of issues found"],
+    "confidence": 0.0-1.0,
+    "reasoning": "detailed explanation of validation",
+    "currency": "ISO currency code (e.g., USD, IDR, ZAR, EUR, GBP)",
+    "currency_validated": true/false
+}
+
+IMPORTANT: Always include the currency field in your response. If the currency is not specified in the record, infer it from vendor location, country, or currency symbols in the text."""
 
 
 async def validate_record(
@@ -24,20 +44,13 @@ async def validate_record(
     Returns:
         Validation result with status, issues, confidence, and reasoning
     """
-    llm = get_llm()
-    
     record_json = json.dumps(structured_data, indent=2)
     recon_json = json.dumps(reconciliation_info, indent=2) if reconciliation_info else "No reconciliation data"
     
     prompt = f"""You are an expert accounting validation system. Your task is to validate extracted financial records.
 
 Given a structured JSON record, analyze it for:
-1. Completeness: Are all critical fields present?
-2. Consistency: Do the numbers add up correctly (amount + tax = total)?
-3. Format: Are dates, amounts, and other fields in correct format?
-4. Reasonableness: Are the values within expected ranges?
-5. Business logic: Does the record make business sense?
-6. Currency: Validate the currency code is correct (ISO 4217 format: USD, IDR, ZAR, EUR, GBP, etc.)
+{VALIDATION_CHECKS}
 
 Extracted Record:
 {record_json}
@@ -46,16 +59,7 @@ Reconciliation Information:
 {recon_json}
 
 Provide your validation in the following JSON format:
-{{
-    "status": "valid|invalid|warning|needs_review",
-    "issues": ["list of issues found"],
-    "confidence": 0.0-1.0,
-    "reasoning": "detailed explanation of validation",
-    "currency": "ISO currency code (e.g., USD, IDR, ZAR, EUR, GBP)",
-    "currency_validated": true/false
-}}
-
-IMPORTANT: Always include the currency field in your response. If the currency is not specified in the record, infer it from vendor location, country, or currency symbols in the text.
+{VALIDATION_RESPONSE_FORMAT}
 
 CRITICAL JSON FORMATTING REQUIREMENTS:
 - Return ONLY the JSON object, nothing else
@@ -69,15 +73,8 @@ Be thorough and precise. Flag any potential issues."""
     
     try:
         logger.info("Calling LLM for validation...")
-        # Run LLM call in executor with timeout (30 seconds)
-        def call_llm():
-            return llm.invoke([HumanMessage(content=prompt)])
-        
-        loop = asyncio.get_event_loop()
-        response = await asyncio.wait_for(
-            loop.run_in_executor(None, call_llm),
-            timeout=30.0
-        )
+        # Hedged LLM call with circuit breaking (30 second deadline)
+        response = await invoke_llm([HumanMessage(content=prompt)], timeout=30.0)
         response_text = response.content
         logger.info(f"LLM validation response received (length: {len(response_text)})")
         
@@ -94,14 +91,7 @@ Be thorough and precise. Flag any potential issues."""
         if not validation_data or "status" not in validation_data:
             raise ValueError("Could not find valid JSON in LLM response")
         
-        return {
-            "status": validation_data.get("status", "needs_review"),
-            "issues": validation_data.get("issues", []),
-            "confidence": validation_data.get("confidence", 0.5),
-            "reasoning": validation_data.get("reasoning", ""),
-            "currency": validation_data.get("currency", structured_data.get("currency", "USD")),
-            "currency_validated": validation_data.get("currency_validated", True)
-        }
+        return _normalize_validation(validation_data, structured_data)
     
     except json.JSONDecodeError as json_err:
         logger.error(f"JSON parsing error in validation: {json_err}", exc_info=True)
@@ -135,14 +125,69 @@ Be thorough and precise. Flag any potential issues."""
         }
 
 
+def _normalize_validation(validation_data: Dict[str, Any], structured_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a parsed LLM validation object into the validation result contract"""
+    return {
+        "status": validation_data.get("status", "needs_review"),
+        "issues": validation_data.get("issues", []),
+        "confidence": validation_data.get("confidence", 0.5),
+        "reasoning": validation_data.get("reasoning", ""),
+        "currency": validation_data.get("currency", structured_data.get("currency", "USD")),
+        "currency_validated": validation_data.get("currency_validated", True)
+    }
+
+
+BATCH_VALIDATION_INSTRUCTIONS = f"""You are an expert accounting validation system. Your task is to validate extracted financial records.
+
+For each record below (extracted record plus its reconciliation information), analyze it for:
+{VALIDATION_CHECKS}
+
+Provide each record's validation in the following JSON format:
+{VALIDATION_RESPONSE_FORMAT}
+
+Be thorough and precise. Flag any potential issues."""
+
+
+async def validate_records_batch(
+    records: List[Dict[str, Any]],
+    reconciliation_infos: Optional[List[Optional[Dict[str, Any]]]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Validate several records with batched LLM calls (batch uploads).
+    
+    Records missing from the batched response are validated on their own via
+    validate_record, so every record gets a result in the usual shape.
+    
+    Returns:
+        Validation results aligned with records
+    """
+    reconciliation_infos = reconciliation_infos or [None] * len(records)
+    payloads = []
+    for structured_data, reconciliation_info in zip(records, reconciliation_infos):
+        recon_json = json.dumps(reconciliation_info, indent=2, default=str) if reconciliation_info else "No reconciliation data"
+        payloads.append(
+            f"Extracted Record:\n{json.dumps(structured_data, indent=2, default=str)}\n\n"
+            f"Reconciliation Information:\n{recon_json}"
+        )
+    
+    def parse_item(idx: int, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if "status" not in item:
+            return None
+        return _normalize_validation(item, records[idx])
+    
+    async def single_call(idx: int) -> Dict[str, Any]:
+        return await validate_record(records[idx], reconciliation_infos[idx])
+    
+    logger.info(f"Calling LLM for batched validation of {len(records)} records...")
+    return await invoke_llm_batched(BATCH_VALIDATION_INSTRUCTIONS, payloads, parse_item, single_call, timeout=60.0)
+
+
 async def generate_reasoning_trace(
     structured_data: Dict[str, Any],
     validation_result: Dict[str, Any],
     reconciliation_info: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """Generate reasoning trace for a record"""
-    llm = get_llm()
-    
     record_json = json.dumps(structured_data, indent=2)
     recon_json = json.dumps(reconciliation_info, indent=2) if reconciliation_info else "No reconciliation data"
     validation_json = json.dumps(validation_result, indent=2)
@@ -185,15 +230,8 @@ CRITICAL JSON FORMATTING REQUIREMENTS:
     
     try:
         logger.info("Calling LLM for reasoning trace...")
-        # Run LLM call in executor with timeout (30 seconds)
-        def call_llm():
-            return llm.invoke([HumanMessage(content=prompt)])
-        
-        loop = asyncio.get_event_loop()
-        response = await asyncio.wait_for(
-            loop.run_in_executor(None, call_llm),
-            timeout=30.0
-        )
+        # Hedged LLM call with circuit breaking (30 second deadline)
+        response = await invoke_llm([HumanMessage(content=prompt)], timeout=30.0)
         response_text = response.content
         logger.info(f"LLM reasoning trace response received (length: {len(response_text)})")
         
@@ -235,8 +273,6 @@ async def generate_explanation(
     reasoning_trace: Dict[str, Any]
 ) -> str:
     """Generate human-readable explanation"""
-    llm = get_llm()
-    
     record_json = json.dumps(structured_data, indent=2)
     validation_json = json.dumps(validation_result, indent=2)
     trace_json = json.dumps(reasoning_trace, indent=2)
@@ -262,15 +298,8 @@ Write in clear, professional language suitable for accounting professionals."""
     
     try:
         logger.info("Calling LLM for explanation...")
-        # Run LLM call in executor with timeout (30 seconds)
-        def call_llm():
-            return llm.invoke([HumanMessage(content=prompt)])
-        
-        loop = asyncio.get_event_loop()
-        response = await asyncio.wait_for(
-            loop.run_in_executor(None, call_llm),
-            timeout=30.0
-        )
+        # Hedged LLM call with circuit breaking (30 second deadline)
+        response = await invoke_llm([HumanMessage(content=prompt)], timeout=30.0)
         logger.info(f"LLM explanation response received (length: {len(response.content)})")
         return response.content
     except asyncio.TimeoutError:
@@ -283,11 +312,16 @@ Write in clear, professional language suitable for accounting professionals."""
 
 async def orchestrate(
     structured_data: Dict[str, Any],
-    reconciliation_info: Optional[Dict[str, Any]] = None
+    reconciliation_info: Optional[Dict[str, Any]] = None,
+    validation_result: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
     Main orchestration method
     
+    Args:
+        validation_result: Precomputed validation (e.g. from validate_records_batch);
+            when given, the validation LLM call is skipped
+    
     Returns:
         Complete orchestration output with validation, reasoning, and explanation
     """
@@ -295,8 +329,9 @@ async def orchestrate(
     structured_data["record_id"] = record_id
     
     # Step 1: Validate
-    logger.info(f"Validating record {record_id}...")
-    validation_result = await validate_record(structured_data, reconciliation_info)
+    if validation_result is None:
+        logger.info(f"Validating record {record_id}...")
+        validation_result = await validate_record(structured_data, reconciliation_info)
     
     # Step 2: Generate reasoning trace
     logger.info(f"Generating reasoning trace for record {record_id}...")
@@ -0,0 +1,363 @@
+"""
+Local embedding-based category classifier.
+
+Vendor and item text is embedded with the MiniLM model already loaded for
+vector search and compared against per-category centroids. Each centroid
+starts from a handful of built-in exemplars and is pulled towards the user's
+own confirmed ledger categories, so classification adapts to how each user
+books their expenses. A near-identical confirmed example (same vendor, same
+kind of purchase) wins outright, k-NN style.
+
+The caller only falls back to the LLM when the local decision is ambiguous
+(low margin between the two best categories, or low similarity overall).
+"""
+
+from typing import Dict, Any, List, Optional, Tuple
+import threading
+import time
+import logging
+
+import numpy as np
+
+from app.core.config import settings
+from app.db.sql import SessionLocal, LedgerEntry
+from app.services.embedding_service import get_embedding_model
+
+logger = logging.getLogger(__name__)
+
+# Short descriptions of typical receipts per category (vendor + items style)
+CATEGORY_EXEMPLARS: Dict[str, List[str]] = {
+    "Food & Beverage": [
+        "Starbucks. latte, croissant",
+        "restaurant dinner, main course, wine",
+        "cafe coffee and sandwich",
+        "McDonald's burger meal, fries, soda",
+        "pizza delivery",
+        "bakery bread and pastries",
+        "grocery food and drinks",
+    ],
+    "Transportation": [
+        "Uber trip fare",
+        "Lyft ride",
+        "taxi fare",
+        "Shell gas station fuel",
+        "parking garage fee",
+        "metro subway train ticket",
+        "bus pass",
+    ],
+    "Accommodation": [
+        "Marriott hotel room night",
+        "Airbnb stay",
+        "hotel lodging, room service",
+        "resort accommodation",
+        "hostel booking",
+    ],
+    "Office Supplies": [
+        "Staples printer paper, pens",
+        "office supplies, stationery, notebooks",
+        "ink cartridges, toner",
+        "desk organizer, folders, binders",
+        "Office Depot supplies",
+    ],
+    "Utilities": [
+        "electricity bill",
+        "water utility bill",
+        "internet service provider monthly",
+        "mobile phone bill",
+        "natural gas utility",
+    ],
+    "Healthcare": [
+        "CVS pharmacy prescription",
+        "medical clinic consultation",
+        "hospital visit",
+        "dentist appointment",
+        "Walgreens medicine",
+    ],
+    "Entertainment": [
+        "movie theater tickets, popcorn",
+        "concert tickets",
+        "Netflix streaming",
+        "sports event tickets",
+        "bowling and games",
+    ],
+    "Retail/Shopping": [
+        "Walmart household items",
+        "Target clothing, home goods",
+        "Amazon order",
+        "department store clothes",
+        "shopping mall purchase",
+    ],
+    "Professional Services": [
+        "legal services consultation",
+        "accounting and bookkeeping fees",
+        "consulting services invoice",
+        "notary services",
+        "marketing agency services",
+    ],
+    "Software/Technology": [
+        "AWS cloud computing",
+        "software subscription license",
+        "Microsoft 365 subscription",
+        "SaaS monthly plan",
+        "laptop computer, monitor",
+        "GitHub, domain hosting",
+    ],
+    "Travel": [
+        "Delta airline flight ticket",
+        "travel agency booking",
+        "baggage fee, airport",
+        "car rental",
+        "Expedia trip",
+    ],
+    "Education": [
+        "online course tuition",
+        "textbooks",
+        "training workshop registration",
+        "Udemy course",
+        "conference registration, seminar",
+    ],
+    "General Expense": [
+        "miscellaneous purchase",
+        "general expense",
+        "sundry items",
+    ],
+}
+
+CATEGORIES = list(CATEGORY_EXEMPLARS.keys())
+
+# Built-in state: category centroids derived from the exemplars
+_base_centroids: Optional[np.ndarray] = None
+_base_lock = threading.Lock()
+
+# Per-user state: {user_id: {"centroids", "vectors", "labels", "examples", "loaded_at"}}
+_user_profiles: Dict[int, Dict[str, Any]] = {}
+_user_lock = threading.Lock()
+
+_stats: Dict[str, Any] = {
+    "local": 0,
+    "ambiguous": 0,
+    "user_example_hits": 0,
+    "profile_loads": 0,
+    "total_ms": 0.0,
+}
+
+
+def classification_text(vendor: Optional[str], item_names: List[str]) -> str:
+    """Text embedded for classification (the same shape for receipts and ledger history)"""
+    vendor = (vendor or "").strip()
+    items = ", ".join(name for name in item_names if name)
+    if vendor and items:
+        return f"{vendor}. {items}"
+    return vendor or items
+
+
+def _encode(texts: List[str]) -> np.ndarray:
+    model = get_embedding_model()
+    vectors = model.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+    return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _get_base_centroids() -> np.ndarray:
+    global _base_centroids
+    if _base_centroids is None:
+        with _base_lock:
+            if _base_centroids is None:
+                rows = [_encode(CATEGORY_EXEMPLARS[c]).mean(axis=0) for c in CATEGORIES]
+                _base_centroids = _normalize_rows(np.vstack(rows))
+    return _base_centroids
+
+
+def _load_user_examples(user_id: int) -> List[Tuple[str, str]]:
+    """(text, category) pairs from the user's confirmed ledger entries, newest first"""
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            LedgerEntry.vendor, LedgerEntry.description, LedgerEntry.category
+        ).filter(
+            LedgerEntry.user_id == user_id,
+            LedgerEntry.status == "validated",
+            LedgerEntry.category.in_(CATEGORIES)
+        ).order_by(LedgerEntry.created_at.desc()).limit(settings.LOCAL_CLASSIFIER_MAX_USER_EXAMPLES).all()
+    finally:
+        db.close()
+
+    examples = []
+    for vendor, description, category in rows:
+        description = (description or "")
+        if description.startswith("Purchase: "):
+            description = description[len("Purchase: "):]
+        elif description.startswith("Transaction from "):
+            description = ""
+        text = classification_text(vendor, [description])
+        if text:
+            examples.append((text, category))
+    return examples
+
+
+def _build_user_profile(user_id: int) -> Dict[str, Any]:
+    base = _get_base_centroids()
+    examples = _load_user_examples(user_id)
+    # Exemplar centroid acts as a prior worth LOCAL_CLASSIFIER_PRIOR_WEIGHT examples
+    sums = base * settings.LOCAL_CLASSIFIER_PRIOR_WEIGHT
+    profile = {
+        "centroids": base,
+        "sums": sums,
+        "vectors": None,
+        "labels": [],
+        "examples": len(examples),
+        "loaded_at": time.monotonic(),
+    }
+    if not examples:
+        return profile
+
+    vectors = _encode([text for text, _ in examples])
+    labels = [category for _, category in examples]
+    for vector, category in zip(vectors, labels):
+        sums[CATEGORIES.index(category)] += vector
+    profile["centroids"] = _normalize_rows(sums)
+    profile["vectors"] = vectors
+    profile["labels"] = labels
+    return profile
+
+
+def _get_user_profile(user_id: Optional[int]) -> Dict[str, Any]:
+    if user_id is None:
+        return {"centroids": _get_base_centroids(), "vectors": None, "labels": []}
+    profile = _user_profiles.get(user_id)
+    if profile is None or time.monotonic() - profile["loaded_at"] > settings.LOCAL_CLASSIFIER_PROFILE_TTL:
+        with _user_lock:
+            profile = _user_profiles.get(user_id)
+            if profile is None or time.monotonic() - profile["loaded_at"] > settings.LOCAL_CLASSIFIER_PROFILE_TTL:
+                profile = _build_user_profile(user_id)
+                _user_profiles[user_id] = profile
+                _stats["profile_loads"] += 1
+    return profile
+
+
+def add_user_example(user_id: int, structured_data: Dict[str, Any], category: Optional[str]):
+    """
+    Fold a newly confirmed transaction into the user's cached profile.
+
+    Cheaper than invalidating on every new ledger entry; profiles that are not
+    cached yet simply pick the entry up when they are first loaded.
+    """
+    add_user_examples(user_id, [(structured_data, category)])
+
+
+def add_user_examples(user_id: int, examples: List[Tuple[Dict[str, Any], Optional[str]]]):
+    """add_user_example for many (structured_data, category) pairs, with one batched encode"""
+    profile = _user_profiles.get(user_id)
+    if profile is None:
+        return
+    texts, labels = [], []
+    for structured_data, category in examples:
+        if category not in CATEGORIES:
+            continue
+        items = structured_data.get("items") or []
+        text = classification_text(structured_data.get("vendor"), [item.get("name", "") for item in items[:5]])
+        if text:
+            texts.append(text)
+            labels.append(category)
+    if not texts:
+        return
+    new_vectors = _encode(texts)
+    with _user_lock:
+        sums = profile["sums"].copy()
+        for vector, category in zip(new_vectors, labels):
+            sums[CATEGORIES.index(category)] += vector
+        vectors = new_vectors if profile["vectors"] is None else np.vstack([profile["vectors"], new_vectors])
+        # Swap in new arrays rather than mutating, so concurrent readers see a consistent profile
+        profile.update(
+            sums=sums,
+            centroids=_normalize_rows(sums),
+            vectors=vectors,
+            labels=profile["labels"] + labels,
+            examples=profile["examples"] + len(labels),
+        )
+
+
+def invalidate_user_profile(user_id: int):
+    """Drop a user's learned centroids so the next classification reloads their history"""
+    with _user_lock:
+        _user_profiles.pop(user_id, None)
+
+
+def classify_locally(
+    structured_data: Dict[str, Any],
+    user_id: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Classify a transaction without calling the LLM.
+
+    Args:
+        structured_data: Structured receipt data (vendor, items)
+        user_id: Owner, whose confirmed ledger categories refine the centroids
+
+    Returns:
+        {"category", "confidence", "margin", "source"} when the decision is
+        clear enough, None when the caller should ask the LLM
+    """
+    start = time.perf_counter()
+    items = structured_data.get("items") or []
+    text = classification_text(
+        structured_data.get("vendor"),
+        [item.get("name", "") for item in items[:5]]
+    )
+    if not text:
+        _stats["ambiguous"] += 1
+        return None
+
+    profile = _get_user_profile(user_id)
+    query = _encode([text])[0]
+
+    # k-NN shortcut: a near-identical confirmed example decides on its own
+    if profile["vectors"] is not None:
+        similarities = profile["vectors"] @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] >= settings.LOCAL_CLASSIFIER_EXAMPLE_MATCH:
+            _stats["local"] += 1
+            _stats["user_example_hits"] += 1
+            _stats["total_ms"] += (time.perf_counter() - start) * 1000
+            return {
+                "category": profile["labels"][best],
+                "confidence": round(float(similarities[best]), 4),
+                "margin": None,
+                "source": "user_example",
+            }
+
+    scores = profile["centroids"] @ query
+    order = np.argsort(scores)[::-1]
+    top, second = float(scores[order[0]]), float(scores[order[1]])
+    margin = top - second
+    _stats["total_ms"] += (time.perf_counter() - start) * 1000
+
+    if margin < settings.LOCAL_CLASSIFIER_MIN_MARGIN or top < settings.LOCAL_CLASSIFIER_MIN_SIMILARITY:
+        _stats["ambiguous"] += 1
+        logger.debug(f"Local classification ambiguous for '{text}' (top={top:.3f}, margin={margin:.3f})")
+        return None
+
+    _stats["local"] += 1
+    return {
+        "category": CATEGORIES[int(order[0])],
+        # Map the margin onto a rough confidence; a clear margin is worth more than raw similarity
+        "confidence": round(min(1.0, 0.5 + margin * 5), 2),
+        "margin": round(margin, 4),
+        "source": "centroid",
+    }
+
+
+def get_local_classifier_stats() -> Dict[str, Any]:
+    """Counters for local vs. ambiguous (LLM) classifications"""
+    attempts = _stats["local"] + _stats["ambiguous"]
+    return {
+        **{k: v for k, v in _stats.items() if k != "total_ms"},
+        "local_rate": round(_stats["local"] / attempts, 4) if attempts else None,
+        "avg_ms": round(_stats["total_ms"] / attempts, 3) if attempts else None,
+        "cached_user_profiles": len(_user_profiles),
+    }
@@ -0,0 +1,87 @@
+"""
+ONNX Runtime CPU embedder for the sentence-transformer model.
+
+Runs an ONNX export of ``EMBEDDING_MODEL_NAME`` (dynamically quantised to int8
+by scripts/export_onnx_embedder.py) with onnxruntime and the fast Rust
+tokenizer, so a worker needs neither torch nor the fp32 weights in memory.
+Pooling and normalisation reproduce the sentence-transformers pipeline of
+all-MiniLM-L6-v2 (mean pooling over the attention mask, then L2 normalise).
+
+The export directory contains:
+    model.onnx       quantised graph (inputs input_ids, attention_mask, token_type_ids)
+    tokenizer.json   tokenizer of the source model
+"""
+
+from pathlib import Path
+from typing import List, Union
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "model.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+# all-MiniLM-L6-v2 max_seq_length
+MAX_SEQ_LENGTH = 256
+
+
+class OnnxEmbedder:
+    """Drop-in for SentenceTransformer.encode backed by onnxruntime"""
+
+    def __init__(self, model_dir: Union[str, Path], intra_op_threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        if not (model_dir / MODEL_FILE).exists():
+            raise FileNotFoundError(
+                f"No ONNX embedder at {model_dir}; run scripts/export_onnx_embedder.py first"
+            )
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads or (os.cpu_count() or 1)
+        self.session = ort.InferenceSession(
+            str(model_dir / MODEL_FILE), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        logger.info(f"Loaded ONNX embedder from {model_dir}")
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        normalize_embeddings: bool = True
+    ) -> np.ndarray:
+        """Same contract as SentenceTransformer.encode (embeddings are always normalised)"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batch_size = max(1, batch_size)
+        vectors = np.vstack([
+            self._encode_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)
+        ])
+        return vectors[0] if single else vectors
@@ -0,0 +1,262 @@
+"""
+Period Close Service
+
+Closing a month or quarter writes a snapshot of every account's cumulative
+debit/credit totals through the period end (``period_closes`` +
+``account_balance_snapshots``). A point-in-time report "as of X" then reads
+the latest valid snapshot on or before X and aggregates only the journal lines
+dated after it, instead of every line since the start of history.
+
+Back-dated changes: the after-flush hook in app/db/sql.py marks every closed
+period on or after the date of a written, re-dated or deleted journal entry as
+"reopened" in the same transaction. Reopened periods are skipped when picking
+a snapshot and recomputed (oldest first, each from the previous valid one)
+before an as-of report or the next close_periods run uses them.
+"""
+
+from typing import Dict, Any, List, Optional
+from datetime import datetime, date, timedelta
+import logging
+
+from sqlalchemy import func, insert
+
+from app.db.sql import SessionLocal, Account, AccountBalanceSnapshot, JournalEntry, PeriodClose
+from app.services.account_balances import account_balance
+from app.services.accounting_service import get_account_totals
+
+logger = logging.getLogger(__name__)
+
+PERIOD_TYPES = ("month", "quarter")
+
+
+def period_end_for(day: date, period_type: str = "month") -> date:
+    """Last day of the month or quarter containing day"""
+    if period_type not in PERIOD_TYPES:
+        raise ValueError(f"period_type must be one of {PERIOD_TYPES}")
+    month = day.month if period_type == "month" else ((day.month - 1) // 3 + 1) * 3
+    first_of_next = date(day.year + (month == 12), month % 12 + 1, 1)
+    return first_of_next - timedelta(days=1)
+
+
+def period_ends(first: date, last: date, period_type: str = "month") -> List[date]:
+    """Ends of every period from the one containing first up to last (inclusive)"""
+    ends = []
+    end = period_end_for(first, period_type)
+    while end <= last:
+        ends.append(end)
+        end = period_end_for(end + timedelta(days=1), period_type)
+    return ends
+
+
+def last_complete_period_end(period_type: str = "month", today: Optional[date] = None) -> date:
+    """End of the latest period that has finished by today"""
+    today = today or datetime.utcnow().date()
+    if period_end_for(today, period_type) == today:
+        return today
+    first_month = today.month if period_type == "month" else (today.month - 1) // 3 * 3 + 1
+    return date(today.year, first_month, 1) - timedelta(days=1)
+
+
+def _latest_close(db, user_id: int, on_or_before: Optional[date]) -> Optional[PeriodClose]:
+    query = db.query(PeriodClose).filter(PeriodClose.user_id == user_id, PeriodClose.status == "closed")
+    if on_or_before is not None:
+        query = query.filter(PeriodClose.period_end <= on_or_before)
+    return query.order_by(PeriodClose.period_end.desc()).first()
+
+
+def _totals_as_of(
+    db,
+    user_id: int,
+    as_of: Optional[date],
+    snapshot_on_or_before: Optional[date],
+    include_inactive: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Cumulative totals per account through as_of: the latest valid snapshot
+    on or before snapshot_on_or_before plus the lines dated after it.
+    """
+    base = _latest_close(db, user_id, snapshot_on_or_before)
+    merged: Dict[int, Dict[str, Any]] = {}
+    if base is not None:
+        query = db.query(
+            Account.id, Account.code, Account.name, Account.account_type,
+            AccountBalanceSnapshot.debit_total, AccountBalanceSnapshot.credit_total
+        ).join(
+            AccountBalanceSnapshot, AccountBalanceSnapshot.account_id == Account.id
+        ).filter(AccountBalanceSnapshot.period_close_id == base.id)
+        if not include_inactive:
+            query = query.filter(Account.is_active == True)
+        for account_id, code, name, account_type, debit_total, credit_total in query.all():
+            merged[account_id] = {
+                "account_id": account_id,
+                "account_code": code,
+                "account_name": name,
+                "account_type": account_type,
+                "debit_total": debit_total,
+                "credit_total": credit_total,
+            }
+
+    start = base.period_end + timedelta(days=1) if base is not None else None
+    if base is None or as_of is None or start <= as_of:
+        for row in get_account_totals(user_id, start, as_of, db=db, include_inactive=include_inactive):
+            current = merged.setdefault(row["account_id"], {**row, "debit_total": 0.0, "credit_total": 0.0})
+            current["debit_total"] += row["debit_total"]
+            current["credit_total"] += row["credit_total"]
+
+    for row in merged.values():
+        row["balance"] = account_balance(row["account_type"], row["debit_total"], row["credit_total"])
+    return list(merged.values())
+
+
+def close_period(user_id: int, period_end: date, period_type: str = "month", db=None) -> Dict[str, Any]:
+    """
+    Close (or re-close) the period ending on period_end: snapshot every
+    account's cumulative totals through that day.
+    """
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        close = db.query(PeriodClose).filter(
+            PeriodClose.user_id == user_id,
+            PeriodClose.period_end == period_end
+        ).with_for_update().first()
+
+        totals = _totals_as_of(
+            db, user_id, period_end, period_end - timedelta(days=1), include_inactive=True
+        )
+
+        if close is None:
+            close = PeriodClose(user_id=user_id, period_type=period_type, period_end=period_end)
+            db.add(close)
+        else:
+            db.query(AccountBalanceSnapshot).filter(
+                AccountBalanceSnapshot.period_close_id == close.id
+            ).delete(synchronize_session=False)
+            if period_type == "quarter":
+                close.period_type = period_type
+        close.status = "closed"
+        close.closed_at = datetime.utcnow()
+        close.reopened_at = None
+        db.flush()
+
+        rows = [
+            {
+                "period_close_id": close.id,
+                "account_id": row["account_id"],
+                "debit_total": row["debit_total"],
+                "credit_total": row["credit_total"],
+            }
+            for row in totals
+            if row["debit_total"] or row["credit_total"]
+        ]
+        for i in range(0, len(rows), 1000):
+            db.execute(insert(AccountBalanceSnapshot), rows[i:i + 1000])
+        db.commit()
+        logger.info(f"Closed {close.period_type} ending {period_end} for user {user_id} ({len(rows)} account snapshots)")
+        return format_period_close(close, len(rows))
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if own_session:
+            db.close()
+
+
+def recompute_reopened_periods(user_id: int, through: Optional[date] = None, db=None) -> List[Dict[str, Any]]:
+    """Re-close reopened periods (oldest first) ending on or before through"""
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        query = db.query(PeriodClose.period_end, PeriodClose.period_type).filter(
+            PeriodClose.user_id == user_id,
+            PeriodClose.status == "reopened"
+        )
+        if through is not None:
+            query = query.filter(PeriodClose.period_end <= through)
+        reopened = query.order_by(PeriodClose.period_end).all()
+    finally:
+        if own_session:
+            db.close()
+    return [close_period(user_id, period_end, period_type, db=None if own_session else db)
+            for period_end, period_type in reopened]
+
+
+def close_periods(
+    user_id: int,
+    through: Optional[date] = None,
+    period_type: str = "month",
+    db=None
+) -> List[Dict[str, Any]]:
+    """
+    Close every period from the user's first journal entry up to through
+    (default: the last complete period), recomputing reopened ones. Periods
+    that are already closed and still valid are left alone.
+
+    Returns:
+        The periods closed by this call
+    """
+    through = period_end_for(through, period_type) if through else last_complete_period_end(period_type)
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        first = db.query(func.min(JournalEntry.entry_date)).filter(JournalEntry.user_id == user_id).scalar()
+        existing = dict(db.query(PeriodClose.period_end, PeriodClose.status).filter(
+            PeriodClose.user_id == user_id
+        ).all())
+    finally:
+        if own_session:
+            db.close()
+    if first is None:
+        return []
+    if isinstance(first, str):
+        first = datetime.fromisoformat(first)
+
+    closed = []
+    for period_end in period_ends(first.date(), through, period_type):
+        if existing.get(period_end) == "closed":
+            continue
+        closed.append(close_period(user_id, period_end, period_type, db=None if own_session else db))
+    # Reopened closes of the other period type (e.g. month ends inside a quarter run)
+    closed.extend(recompute_reopened_periods(user_id, through, db=None if own_session else db))
+    return closed
+
+
+def get_cumulative_totals(user_id: int, as_of: Optional[date] = None, db=None) -> List[Dict[str, Any]]:
+    """
+    Cumulative totals per active account through as_of (default: everything),
+    in the shape returned by get_account_totals, from the latest period-close
+    snapshot plus the lines dated after it.
+    """
+    recompute_reopened_periods(user_id, as_of, db=db)
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        return _totals_as_of(db, user_id, as_of, as_of)
+    finally:
+        if own_session:
+            db.close()
+
+
+def list_period_closes(user_id: int, db=None) -> List[Dict[str, Any]]:
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        closes = db.query(PeriodClose).filter(PeriodClose.user_id == user_id).order_by(PeriodClose.period_end).all()
+        counts = dict(db.query(AccountBalanceSnapshot.period_close_id, func.count(AccountBalanceSnapshot.id)).join(
+            PeriodClose, PeriodClose.id == AccountBalanceSnapshot.period_close_id
+        ).filter(PeriodClose.user_id == user_id).group_by(AccountBalanceSnapshot.period_close_id).all())
+        return [format_period_close(close, counts.get(close.id, 0)) for close in closes]
+    finally:
+        if own_session:
+            db.close()
+
+
+def format_period_close(close: PeriodClose, accounts: int) -> Dict[str, Any]:
+    return {
+        "period_type": close.period_type,
+        "period_end": close.period_end.isoformat(),
+        "status": close.status,
+        "closed_at": close.closed_at.isoformat() if close.closed_at else None,
+        "reopened_at": close.reopened_at.isoformat() if close.reopened_at else None,
+        "accounts": accounts,
+    }
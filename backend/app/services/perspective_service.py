@@ -3,7 +3,7 @@ import re
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional
 
-from app.core.llm import get_llm
+from app.core.llm_gateway import invoke_llm
 from langchain.schema import HumanMessage
 
 logger = logging.getLogger(__name__)
@@ -211,12 +211,6 @@ async def _llm_fallback(
     LLM-based classifier used only when rules are ambiguous.
     Always post-processed to enforce role mapping invariants.
     """
-    try:
-        llm = get_llm()
-    except Exception as e:
-        logger.warning(f"LLM not available for perspective analysis: {e}")
-        return {}
-
     meta_json = {}
     try:
         # Only pass a compact subset of metadata
@@ -264,13 +258,7 @@ Restrictions:
 """
 
     try:
-        def call_llm():
-            return llm.invoke([HumanMessage(content=prompt)])
-
-        import asyncio
-
-        loop = asyncio.get_event_loop()
-        response = await asyncio.wait_for(loop.run_in_executor(None, call_llm), timeout=20.0)
+        response = await invoke_llm([HumanMessage(content=prompt)], timeout=20.0)
         text = response.content
     except Exception as e:
         logger.warning(f"LLM perspective classification failed: {e}")
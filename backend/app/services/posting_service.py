@@ -0,0 +1,374 @@
+"""
+Ledger Posting Service
+
+Posts a validated receipt as one unit of work: the ledger entry, its items and
+the balanced double-entry journal are added to a single session and committed
+once, so a receipt is either fully posted or not at all. Account IDs come from
+the per-user chart of accounts cache in accounting_service instead of a
+lookup per posting.
+
+post_ledger_entries_bulk is the import/batch path: N records are written
+with executemany inserts, one transaction per chunk, and it maintains
+account_balances and period closes itself since Core inserts bypass the
+session hooks.
+
+Timings are kept per process; ``postings_per_core_sec`` divides postings by
+the CPU time of the posting threads, i.e. the throughput one core sustains.
+"""
+
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
+import threading
+import time
+import logging
+
+from sqlalchemy import func, insert
+
+from app.db.sql import (
+    SessionLocal, LedgerEntry, LedgerItem, JournalEntry, JournalEntryLine,
+    apply_account_balance_deltas, reopen_closed_periods
+)
+from app.utils.date_normalizer import normalize_date, locale_for_currency
+from app.services.accounting_service import (
+    get_cached_account, build_expense_journal,
+    expense_account_code, payment_account_code
+)
+
+logger = logging.getLogger(__name__)
+
+# Records per transaction in post_ledger_entries_bulk
+BULK_CHUNK_SIZE = 500
+
+_stats_lock = threading.Lock()
+_stats = {"postings": 0, "failures": 0, "without_journal": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0}
+
+
+def ledger_entry_fields(
+    record_id: str,
+    structured_data: Dict[str, Any],
+    orchestration_result: Dict[str, Any],
+    user_id: int
+) -> Dict[str, Any]:
+    """Column values of the ledger entry for a validated record (without items)"""
+    validation_result = orchestration_result["validation_result"]
+
+    # Determine entry status based on validation
+    entry_status = "validated" if validation_result["status"] == "valid" else "pending"
+
+    # Use validated currency from LLM if available, otherwise use extracted currency
+    currency = validation_result.get("currency") or structured_data.get("currency", "USD")
+
+    vendor = structured_data.get("vendor") or "Unknown Vendor"
+    extracted_date = structured_data.get("date") or "N/A"
+
+    return dict(
+        user_id=user_id,
+        record_id=record_id,
+        vendor=vendor,
+        date=extracted_date,
+        transaction_date=normalize_date(extracted_date, locale_for_currency(currency)),
+        amount=structured_data.get("subtotal") or structured_data.get("total") or 0.0,
+        tax=structured_data.get("tax"),
+        total=structured_data.get("total") or structured_data.get("subtotal") or 0.0,
+        currency=currency,
+        exchange_rate=structured_data.get("exchange_rate", 1.0),
+        usd_total=structured_data.get("usd_equivalent", structured_data.get("total", 0.0)),
+        invoice_number=structured_data.get("invoice_number"),
+        description=structured_data.get("description") or f"Transaction from {structured_data.get('vendor', 'Unknown')}",
+        category=structured_data.get("category"),
+        payment_method=structured_data.get("payment_method"),
+        status=entry_status,
+        validation_confidence=validation_result.get("confidence"),
+        validation_issues=validation_result.get("issues", []),
+        reasoning_trace=orchestration_result.get("reasoning_trace")
+    )
+
+
+def ledger_item_fields(item_data: Dict[str, Any]) -> Dict[str, Any]:
+    return dict(
+        name=item_data.get("name"),
+        quantity=item_data.get("quantity", 1),
+        unit_price=item_data.get("unit_price", 0.0),
+        line_total=item_data.get("line_total", 0.0)
+    )
+
+
+def build_ledger_entry(
+    record_id: str,
+    structured_data: Dict[str, Any],
+    orchestration_result: Dict[str, Any],
+    user_id: int
+) -> LedgerEntry:
+    """Unsaved ledger entry (with items) for a validated record"""
+    entry = LedgerEntry(**ledger_entry_fields(record_id, structured_data, orchestration_result, user_id))
+
+    items = structured_data.get("items") or []
+    if not items:
+        logger.warning(f"No items in structured_data for record_id: {record_id}")
+    for item_data in items:
+        entry.items.append(LedgerItem(**ledger_item_fields(item_data)))
+    return entry
+
+
+def _attach_journal(db, entry: LedgerEntry) -> bool:
+    """Add the balanced journal to the entry; False when none applies"""
+    expense_code = expense_account_code(entry.category)
+    payment_code = payment_account_code(entry.payment_method)
+    expense_account = get_cached_account(entry.user_id, expense_code, db)
+    payment_account = get_cached_account(entry.user_id, payment_code, db)
+    if not expense_account or not payment_account:
+        logger.warning(f"No accounts {expense_code}/{payment_code} for user {entry.user_id}; posting without journal")
+        return False
+
+    journal_entry = build_expense_journal(entry, entry.category, expense_account.id, payment_account.id)
+    if journal_entry is None:
+        return False
+    entry.journal_entry = journal_entry
+    return True
+
+
+def post_ledger_entry(
+    record_id: str,
+    structured_data: Dict[str, Any],
+    orchestration_result: Dict[str, Any],
+    user_id: int,
+    db=None
+) -> LedgerEntry:
+    """
+    Post a validated record: ledger entry, items and journal in one transaction.
+
+    Args:
+        record_id: Receipt record ID
+        structured_data: Extracted receipt fields (items, category, payment method, ...)
+        orchestration_result: Validation result and reasoning trace
+        user_id: Owner of the entry
+        db: Session to post on and commit (default: a new one)
+
+    Returns:
+        The committed LedgerEntry (detached, with id and status loaded)
+    """
+    started, cpu_started = time.perf_counter(), time.thread_time()
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        entry = build_ledger_entry(record_id, structured_data, orchestration_result, user_id)
+        has_journal = _attach_journal(db, entry)
+        db.add(entry)
+        db.commit()
+        db.refresh(entry)
+    except Exception as e:
+        db.rollback()
+        with _stats_lock:
+            _stats["failures"] += 1
+        logger.error(f"Error posting ledger entry {record_id}: {e}", exc_info=True)
+        raise
+    finally:
+        if own_session:
+            db.close()
+
+    with _stats_lock:
+        _stats["postings"] += 1
+        _stats["without_journal"] += 0 if has_journal else 1
+        _stats["wall_seconds"] += time.perf_counter() - started
+        _stats["cpu_seconds"] += time.thread_time() - cpu_started
+    logger.info(
+        f"Posted ledger entry {entry.id} ({entry.status}) with {len(structured_data.get('items') or [])} items"
+        f"{' and journal' if has_journal else ''}"
+    )
+    return entry
+
+
+def _bulk_journal(fields: Dict[str, Any], user_id: int, db=None) -> Optional[JournalEntry]:
+    """Unsaved journal for one bulk record (None when no journal applies)"""
+    expense_account = get_cached_account(user_id, expense_account_code(fields["category"]), db)
+    payment_account = get_cached_account(user_id, payment_account_code(fields["payment_method"]), db)
+    if not expense_account or not payment_account:
+        return None
+    return build_expense_journal(LedgerEntry(**fields), fields["category"], expense_account.id, payment_account.id)
+
+
+def _post_chunk(db, user_id: int, prepared: List[Dict[str, Any]]) -> Dict[str, int]:
+    """executemany inserts for one chunk on db; the caller commits. Returns ledger entry id per record_id"""
+    now = datetime.utcnow()
+    db.execute(insert(LedgerEntry), [{**record["fields"], "created_at": now, "updated_at": now} for record in prepared])
+    entry_ids = dict(db.query(LedgerEntry.record_id, LedgerEntry.id).filter(
+        LedgerEntry.user_id == user_id,
+        LedgerEntry.record_id.in_([record["record_id"] for record in prepared])
+    ).all())
+
+    item_rows = [
+        {**item, "ledger_entry_id": entry_ids[record["record_id"]]}
+        for record in prepared for item in record["items"]
+    ]
+    if item_rows:
+        db.execute(insert(LedgerItem), item_rows)
+
+    journaled = [record for record in prepared if record["journal"] is not None]
+    if not journaled:
+        return entry_ids
+    db.execute(insert(JournalEntry), [
+        {
+            "user_id": user_id,
+            "ledger_entry_id": entry_ids[record["record_id"]],
+            "entry_date": record["journal"].entry_date,
+            "reference": record["journal"].reference,
+            "description": record["journal"].description,
+            "is_balanced": True,
+            "is_adjusting": False,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for record in journaled
+    ])
+    journal_ids = dict(db.query(JournalEntry.ledger_entry_id, JournalEntry.id).filter(
+        JournalEntry.ledger_entry_id.in_([entry_ids[record["record_id"]] for record in journaled])
+    ).all())
+
+    line_rows = []
+    deltas: Dict[int, List[float]] = {}
+    for record in journaled:
+        journal_id = journal_ids[entry_ids[record["record_id"]]]
+        for line in record["journal"].lines:
+            line_rows.append({
+                "journal_entry_id": journal_id,
+                "account_id": line.account_id,
+                "debit": line.debit,
+                "credit": line.credit,
+                "description": line.description,
+            })
+            delta = deltas.setdefault(line.account_id, [0.0, 0.0, None])
+            delta[0] += line.debit or 0.0
+            delta[1] += line.credit or 0.0
+    db.execute(insert(JournalEntryLine), line_rows)
+
+    # Core inserts bypass the after-flush hooks: fold the lines into
+    # account_balances and reopen closed periods they land in, in this transaction
+    for account_id, last_line_id in db.query(JournalEntryLine.account_id, func.max(JournalEntryLine.id)).filter(
+        JournalEntryLine.journal_entry_id.in_(list(journal_ids.values()))
+    ).group_by(JournalEntryLine.account_id).all():
+        deltas[account_id][2] = last_line_id
+    connection = db.connection()
+    apply_account_balance_deltas(connection, deltas)
+    reopen_closed_periods(connection, {user_id: min(record["journal"].entry_date for record in journaled)})
+    return entry_ids
+
+
+def post_ledger_entries_bulk(
+    records: List[Tuple[str, Dict[str, Any], Dict[str, Any]]],
+    user_id: int,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    db=None
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Post many validated records: ledger entries, items, journals and journal
+    lines are written with executemany inserts, one transaction per chunk.
+
+    Failures are per record: a record whose data cannot be posted, that is
+    already in the ledger or that repeats a record_id of the batch fails on
+    its own. If a chunk's transaction fails anyway, its records are retried one
+    by one through post_ledger_entry so only the offending ones fail.
+
+    Args:
+        records: (record_id, structured_data, orchestration_result) per record
+        user_id: Owner of the entries
+        chunk_size: Records per transaction
+        db: Session to post on, committed once per chunk (default: a new one per chunk)
+
+    Returns:
+        {"posted": [{record_id, ledger_entry_id, status, journal}], "failed": [{record_id, error}]}
+    """
+    posted, failed = [], []
+    seen = set()
+    for start in range(0, len(records), chunk_size):
+        started, cpu_started = time.perf_counter(), time.thread_time()
+        prepared = []
+        for record_id, structured_data, orchestration_result in records[start:start + chunk_size]:
+            if record_id in seen:
+                failed.append({"record_id": record_id, "error": "Duplicate record_id in batch"})
+                continue
+            seen.add(record_id)
+            try:
+                fields = ledger_entry_fields(record_id, structured_data, orchestration_result, user_id)
+                prepared.append({
+                    "record_id": record_id,
+                    "structured_data": structured_data,
+                    "orchestration_result": orchestration_result,
+                    "fields": fields,
+                    "items": [ledger_item_fields(item) for item in structured_data.get("items") or []],
+                    "journal": _bulk_journal(fields, user_id, db),
+                })
+            except Exception as e:
+                failed.append({"record_id": record_id, "error": f"Invalid record: {e}"})
+        if not prepared:
+            continue
+
+        session = db or SessionLocal()
+        try:
+            existing = {rid for (rid,) in session.query(LedgerEntry.record_id).filter(
+                LedgerEntry.user_id == user_id,
+                LedgerEntry.record_id.in_([record["record_id"] for record in prepared])
+            ).all()}
+            failed.extend({"record_id": rid, "error": "Already in the ledger"} for rid in sorted(existing))
+            prepared = [record for record in prepared if record["record_id"] not in existing]
+            if not prepared:
+                continue
+            entry_ids = _post_chunk(session, user_id, prepared)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"Bulk posting of {len(prepared)} records failed ({e}); posting them one by one")
+            entry_ids = None
+        finally:
+            if db is None:
+                session.close()
+
+        if entry_ids is None:
+            for record in prepared:
+                try:
+                    entry = post_ledger_entry(
+                        record["record_id"], record["structured_data"], record["orchestration_result"], user_id, db=db
+                    )
+                    posted.append({"record_id": entry.record_id, "ledger_entry_id": entry.id,
+                                   "status": entry.status, "journal": record["journal"] is not None})
+                except Exception as e:
+                    failed.append({"record_id": record["record_id"], "error": str(e)})
+            continue
+
+        without_journal = sum(1 for record in prepared if record["journal"] is None)
+        with _stats_lock:
+            _stats["postings"] += len(prepared)
+            _stats["without_journal"] += without_journal
+            _stats["wall_seconds"] += time.perf_counter() - started
+            _stats["cpu_seconds"] += time.thread_time() - cpu_started
+        posted.extend(
+            {
+                "record_id": record["record_id"],
+                "ledger_entry_id": entry_ids[record["record_id"]],
+                "status": record["fields"]["status"],
+                "journal": record["journal"] is not None,
+            }
+            for record in prepared
+        )
+        logger.info(f"Bulk posted {len(prepared)} ledger entries for user {user_id} ({without_journal} without journal)")
+
+    return {"posted": posted, "failed": failed}
+
+
+def get_posting_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    postings = stats["postings"]
+    return {
+        "postings": postings,
+        "failures": stats["failures"],
+        "without_journal": stats["without_journal"],
+        "avg_ms": round(stats["wall_seconds"] / postings * 1000, 3) if postings else None,
+        "postings_per_sec": round(postings / stats["wall_seconds"], 1) if stats["wall_seconds"] else None,
+        "postings_per_core_sec": round(postings / stats["cpu_seconds"], 1) if stats["cpu_seconds"] else None,
+    }
+
+
+def reset_posting_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0 if isinstance(_stats[key], int) else 0.0
@@ -0,0 +1,394 @@
+"""
+Reconciliation Graph Service
+
+Reconciliation links (``reconciliation_links``) are the edges of a per-user
+graph whose nodes are record IDs. Each edge is typed duplicate, counterparty or
+related, and tagged with its source:
+
+- auto:    written by the bulk reconciliation run (bulk_reconciliation_service)
+- receipt: duplicate/counterparty found when the receipt was uploaded
+- manual:  created by a user via POST /ledger/{record_id_1}/link/{record_id_2}
+
+Connected components of the graph are kept in ``reconciliation_group_members``
+with union-find, so "everything related to this record" is one indexed lookup
+on (user_id, group_id) instead of a fresh similarity search. Components are
+refreshed locally whenever links are added or removed, and rebuilt for the
+whole user after a bulk run.
+"""
+
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+from datetime import datetime
+import logging
+
+from sqlalchemy import insert, or_, select
+
+from app.db.sql import SessionLocal, LedgerEntry, ReconciliationLink, ReconciliationGroupMember
+
+logger = logging.getLogger(__name__)
+
+RELATIONSHIPS = ("duplicate", "counterparty", "related")
+LINK_SOURCES = ("auto", "receipt", "manual")
+
+# Rows per INSERT / IN (...) list
+CHUNK_SIZE = 1000
+
+
+class UnionFind:
+    """Disjoint sets over hashable nodes (path halving, union by size)"""
+
+    def __init__(self):
+        self.parent: Dict[str, str] = {}
+        self.size: Dict[str, int] = {}
+
+    def add(self, node: str):
+        if node not in self.parent:
+            self.parent[node] = node
+            self.size[node] = 1
+
+    def find(self, node: str) -> str:
+        self.add(node)
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(self, a: str, b: str):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+
+    def components(self) -> Dict[str, str]:
+        """Map every node with at least one edge to its component's smallest node"""
+        members: Dict[str, List[str]] = {}
+        for node in self.parent:
+            members.setdefault(self.find(node), []).append(node)
+        group_of: Dict[str, str] = {}
+        for nodes in members.values():
+            if len(nodes) < 2:
+                continue
+            group_id = min(nodes)
+            for node in nodes:
+                group_of[node] = group_id
+        return group_of
+
+
+def _ordered(record_id_1: str, record_id_2: str) -> Tuple[str, str]:
+    return (record_id_1, record_id_2) if record_id_1 < record_id_2 else (record_id_2, record_id_1)
+
+
+def _chunks(values: List[str]):
+    for i in range(0, len(values), CHUNK_SIZE):
+        yield values[i:i + CHUNK_SIZE]
+
+
+def _link_pairs(db, user_id: int, record_ids: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+    """Edges of the user's graph, optionally only those touching record_ids"""
+    if record_ids is None:
+        return db.query(ReconciliationLink.record_id_a, ReconciliationLink.record_id_b).filter(
+            ReconciliationLink.user_id == user_id
+        ).all()
+    pairs: Set[Tuple[str, str]] = set()
+    for chunk in _chunks(record_ids):
+        pairs.update(db.query(ReconciliationLink.record_id_a, ReconciliationLink.record_id_b).filter(
+            ReconciliationLink.user_id == user_id,
+            or_(ReconciliationLink.record_id_a.in_(chunk), ReconciliationLink.record_id_b.in_(chunk))
+        ).all())
+    return list(pairs)
+
+
+def _write_groups(db, user_id: int, nodes: List[str], group_of: Dict[str, str]):
+    now = datetime.utcnow()
+    for chunk in _chunks(nodes):
+        db.query(ReconciliationGroupMember).filter(
+            ReconciliationGroupMember.user_id == user_id,
+            ReconciliationGroupMember.record_id.in_(chunk)
+        ).delete(synchronize_session=False)
+    rows = [
+        {"user_id": user_id, "record_id": record_id, "group_id": group_id, "updated_at": now}
+        for record_id, group_id in group_of.items()
+    ]
+    for i in range(0, len(rows), CHUNK_SIZE):
+        db.execute(insert(ReconciliationGroupMember), rows[i:i + CHUNK_SIZE])
+
+
+def _refresh_groups(db, user_id: int, record_ids: Iterable[str]):
+    """
+    Recompute the components containing record_ids after their links changed.
+    Only the affected groups are touched; the caller commits.
+    """
+    nodes = set(record_ids)
+    group_ids: Set[str] = set()
+    for chunk in _chunks(list(nodes)):
+        group_ids.update(gid for (gid,) in db.query(ReconciliationGroupMember.group_id).filter(
+            ReconciliationGroupMember.user_id == user_id,
+            ReconciliationGroupMember.record_id.in_(chunk)
+        ).all())
+    for chunk in _chunks(list(group_ids)):
+        nodes.update(rid for (rid,) in db.query(ReconciliationGroupMember.record_id).filter(
+            ReconciliationGroupMember.user_id == user_id,
+            ReconciliationGroupMember.group_id.in_(chunk)
+        ).all())
+
+    node_list = sorted(nodes)
+    uf = UnionFind()
+    for a, b in _link_pairs(db, user_id, node_list):
+        uf.union(a, b)
+    _write_groups(db, user_id, node_list, uf.components())
+
+
+def rebuild_groups(user_id: int, db=None) -> int:
+    """
+    Recompute every component of a user's link graph from scratch.
+
+    Args:
+        user_id: Owner of the links
+        db: Optional open session (committed here)
+
+    Returns:
+        Number of groups
+    """
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        uf = UnionFind()
+        for a, b in _link_pairs(db, user_id):
+            uf.union(a, b)
+        group_of = uf.components()
+        db.query(ReconciliationGroupMember).filter(
+            ReconciliationGroupMember.user_id == user_id
+        ).delete(synchronize_session=False)
+        _write_groups(db, user_id, [], group_of)
+        db.commit()
+        groups = len(set(group_of.values()))
+        logger.info(f"Rebuilt reconciliation groups for user {user_id}: {groups} groups, {len(group_of)} records")
+        return groups
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if own_session:
+            db.close()
+
+
+def add_links(
+    user_id: int,
+    links: Iterable[Tuple[str, str, str, Optional[float]]],
+    source: str,
+    db=None
+) -> int:
+    """
+    Store links and merge the groups they connect.
+
+    Args:
+        user_id: Owner of both records
+        links: (record_id_1, record_id_2, relationship, confidence) tuples
+        source: "receipt" or "manual" (manual links replace existing edges,
+                other sources never overwrite an existing edge)
+        db: Optional open session (committed here)
+
+    Returns:
+        Number of links inserted or updated
+    """
+    edges: Dict[Tuple[str, str], Tuple[str, Optional[float]]] = {}
+    for record_id_1, record_id_2, relationship, confidence in links:
+        if not record_id_1 or not record_id_2 or record_id_1 == record_id_2:
+            continue
+        if relationship not in RELATIONSHIPS:
+            raise ValueError(f"Unknown relationship: {relationship}")
+        edges[_ordered(record_id_1, record_id_2)] = (relationship, confidence)
+    if not edges:
+        return 0
+
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        existing = {}
+        for chunk in _chunks(sorted({a for a, _ in edges})):
+            for link in db.query(ReconciliationLink).filter(
+                ReconciliationLink.user_id == user_id,
+                ReconciliationLink.record_id_a.in_(chunk)
+            ).all():
+                existing[(link.record_id_a, link.record_id_b)] = link
+
+        now = datetime.utcnow()
+        rows = []
+        changed = 0
+        for (a, b), (relationship, confidence) in edges.items():
+            link = existing.get((a, b))
+            if link is None:
+                rows.append({
+                    "user_id": user_id,
+                    "record_id_a": a,
+                    "record_id_b": b,
+                    "relationship_type": relationship,
+                    "source": source,
+                    "confidence": confidence,
+                    "created_at": now,
+                })
+            elif source == "manual":
+                link.relationship_type = relationship
+                link.source = source
+                link.confidence = confidence
+                changed += 1
+        for i in range(0, len(rows), CHUNK_SIZE):
+            db.execute(insert(ReconciliationLink), rows[i:i + CHUNK_SIZE])
+        db.flush()
+
+        if rows:
+            _refresh_groups(db, user_id, {rid for pair in edges for rid in pair})
+        db.commit()
+        return len(rows) + changed
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if own_session:
+            db.close()
+
+
+def record_reconciliation(user_id: int, record_id: str, reconciliation: Dict[str, Any], db=None) -> int:
+    """Persist the duplicate/counterparty found by check_duplicates for a new receipt"""
+    links = []
+    confidence = reconciliation.get("confidence")
+    if reconciliation.get("is_duplicate") and reconciliation.get("duplicate_record_id"):
+        links.append((record_id, reconciliation["duplicate_record_id"], "duplicate", confidence))
+    if reconciliation.get("is_counterparty") and reconciliation.get("counterparty_record_id"):
+        links.append((record_id, reconciliation["counterparty_record_id"], "counterparty", confidence))
+    return add_links(user_id, links, source="receipt", db=db) if links else 0
+
+
+def remove_record(user_id: int, record_id: str, db=None) -> int:
+    """Drop a deleted record's links and split its group if needed"""
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        neighbours = {
+            b if a == record_id else a for a, b in _link_pairs(db, user_id, [record_id])
+        }
+        deleted = db.query(ReconciliationLink).filter(
+            ReconciliationLink.user_id == user_id,
+            or_(ReconciliationLink.record_id_a == record_id, ReconciliationLink.record_id_b == record_id)
+        ).delete(synchronize_session=False)
+        db.flush()
+        _refresh_groups(db, user_id, neighbours | {record_id})
+        db.commit()
+        return deleted
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if own_session:
+            db.close()
+
+
+def get_record_group(user_id: int, record_id: str, db=None) -> Optional[Dict[str, Any]]:
+    """
+    Read the precomputed group of a record.
+
+    The members (with their ledger details) come from one query on the
+    (user_id, group_id) index; the edges between them from a second.
+
+    Returns:
+        {"group_id", "records": [...], "links": [...]} or None if the record has no links
+    """
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        group_id = select(ReconciliationGroupMember.group_id).where(
+            ReconciliationGroupMember.user_id == user_id,
+            ReconciliationGroupMember.record_id == record_id
+        ).scalar_subquery()
+        members = db.query(
+            ReconciliationGroupMember.group_id, ReconciliationGroupMember.record_id,
+            LedgerEntry.id, LedgerEntry.vendor, LedgerEntry.date, LedgerEntry.total, LedgerEntry.status
+        ).outerjoin(
+            LedgerEntry,
+            (LedgerEntry.user_id == ReconciliationGroupMember.user_id)
+            & (LedgerEntry.record_id == ReconciliationGroupMember.record_id)
+        ).filter(
+            ReconciliationGroupMember.user_id == user_id,
+            ReconciliationGroupMember.group_id == group_id
+        ).order_by(ReconciliationGroupMember.record_id).all()
+        if not members:
+            return None
+
+        record_ids = [m.record_id for m in members]
+        links = []
+        for chunk in _chunks(record_ids):
+            links.extend(db.query(ReconciliationLink).filter(
+                ReconciliationLink.user_id == user_id,
+                ReconciliationLink.record_id_a.in_(chunk)
+            ).all())
+
+        return {
+            "group_id": members[0].group_id,
+            "records": [
+                {
+                    "record_id": m.record_id,
+                    "ledger_entry_id": m.id,
+                    "vendor": m.vendor,
+                    "date": m.date,
+                    "total": m.total,
+                    "status": m.status,
+                }
+                for m in members
+            ],
+            "links": [
+                {
+                    "record_id_a": link.record_id_a,
+                    "record_id_b": link.record_id_b,
+                    "relationship": link.relationship_type,
+                    "source": link.source,
+                    "confidence": link.confidence,
+                }
+                for link in links
+            ],
+        }
+    finally:
+        if own_session:
+            db.close()
+
+
+def reconciliation_from_group(record_id: str, group: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a record's group as a ReconciliationResponse payload"""
+    records = {r["record_id"]: r for r in group["records"]}
+    rank = {name: i for i, name in enumerate(RELATIONSHIPS)}
+
+    matches = []
+    for link in group["links"]:
+        if record_id not in (link["record_id_a"], link["record_id_b"]):
+            continue
+        other = link["record_id_b"] if link["record_id_a"] == record_id else link["record_id_a"]
+        info = records.get(other, {})
+        matches.append({
+            "record_id": other,
+            "vendor": info.get("vendor"),
+            "date": info.get("date"),
+            "total": info.get("total"),
+            "similarity": link["confidence"] if link["confidence"] is not None else 1.0,
+            "ledger_entry_id": info.get("ledger_entry_id"),
+            "relationship": link["relationship"],
+        })
+    matches.sort(key=lambda m: (rank[m["relationship"]], -m["similarity"]))
+
+    duplicate = next((m for m in matches if m["relationship"] == "duplicate"), None)
+    counterparty = next((m for m in matches if m["relationship"] == "counterparty"), None)
+    best = duplicate or counterparty
+    return {
+        "is_duplicate": duplicate is not None,
+        "is_counterparty": counterparty is not None,
+        "match_type": best["relationship"] if best else "none",
+        "confidence": best["similarity"] if best else (matches[0]["similarity"] if matches else 0.0),
+        "matched_records": matches,
+        "counterparty_record": counterparty,
+        "duplicate_record_id": duplicate["record_id"] if duplicate else None,
+        "counterparty_record_id": counterparty["record_id"] if counterparty else None,
+        "counterparty_vendor": counterparty["vendor"] if counterparty else None,
+        "group_id": group["group_id"],
+        "group_records": [r for r in group["records"] if r["record_id"] != record_id],
+    }
@@ -7,24 +7,69 @@ and managing counterparty relationships.
 
 from typing import Dict, Any, List, Optional
 from datetime import datetime
+import asyncio
 import logging
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.mongodb import get_database
-from app.db.sql import SessionLocal, LedgerEntry
-from app.services.vector_service import find_similar_documents
+from app.db.sql import SessionLocal, LedgerEntry, run_in_session
+from app.services.vector_service import find_similar_documents, find_blocking_candidates
+from app.utils.embedding_codec import decode_embedding
+from app.utils.match_keys import match_date
+from app.services.reconciliation_graph import add_links
 
 logger = logging.getLogger(__name__)
 
 
+def _ledger_ids_by_record(user_id: int, record_ids: List[str], db=None) -> Dict[str, int]:
+    """{record_id: ledger entry id} for the user's entries among record_ids"""
+    if not record_ids:
+        return {}
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        return dict(db.query(LedgerEntry.record_id, LedgerEntry.id).filter(
+            LedgerEntry.record_id.in_(record_ids),
+            LedgerEntry.user_id == user_id
+        ).all())
+    finally:
+        if own_session:
+            db.close()
+
+
+def _count_owned(user_id: int, record_ids: List[str], db=None) -> int:
+    """How many of record_ids have a ledger entry belonging to the user"""
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        return db.query(LedgerEntry).filter(
+            LedgerEntry.user_id == user_id,
+            LedgerEntry.record_id.in_(record_ids)
+        ).count()
+    finally:
+        if own_session:
+            db.close()
+
+
+async def _run_sql(session: Optional[AsyncSession], fn, *args, **kwargs):
+    """Run a sync query helper on the caller's async session, or in a worker thread without one"""
+    if session is not None:
+        return await run_in_session(session, fn, *args, **kwargs)
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
 async def reconcile_transaction(
     record_id: str,
     structured_data: Dict[str, Any],
-    embedding: List[float]
+    embedding: List[float],
+    user_id: int,
+    session: Optional[AsyncSession] = None
 ) -> Dict[str, Any]:
     """
     Reconcile a transaction with existing records.
     
     This function:
-    1. Finds similar transactions using vector search
+    1. Finds candidates sharing the exact (total, date) blocking key, falling
+       back to vector search when that block is empty
     2. Matches based on amount, date, and vendor
     3. Identifies counterparty documents
     4. Links related transactions
@@ -33,6 +78,9 @@ async def reconcile_transaction(
         record_id: Current transaction record ID
         structured_data: Structured data from the transaction
         embedding: Document embedding vector
+        user_id: Owner of the transaction (only their records are matched)
+        session: Request's async session for the ledger lookup (a worker
+                 thread with its own session is used without one)
     
     Returns:
         Reconciliation result with matched transactions and relationships
@@ -48,87 +96,88 @@ async def reconcile_transaction(
     
     # Get transaction details
     total = structured_data.get("total") or structured_data.get("amount") or 0
-    date = structured_data.get("date", "").strip()
+    # Normalised YYYY-MM-DD, the same form the blocking key uses
+    date = match_date(structured_data)
     vendor = (structured_data.get("vendor") or "").strip().lower()
     invoice_number = (structured_data.get("invoice_number") or "").strip().lower()
     
-    # Find similar documents
-    similar_docs = await find_similar_documents(embedding, threshold=0.7, limit=20)
-    similar_docs = [d for d in similar_docs if d.get("record_id") != record_id]
+    # Same-total, same-date block first; vector search only when it is empty
+    similar_docs = await find_blocking_candidates(embedding, user_id, structured_data, exclude_record_id=record_id)
+    if not similar_docs:
+        similar_docs = await find_similar_documents(
+            embedding, user_id, threshold=0.7, limit=20, exclude_record_id=record_id
+        )
     
     matched_transactions = []
     counterparty_transactions = []
     duplicate_transactions = []
     
-    # Get ledger entries for matching
-    sql_db = SessionLocal()
-    try:
-        for doc in similar_docs:
-            other_record_id = doc.get("record_id")
-            other_data = doc.get("structured_data", {}) or {}
-            
-            # Get ledger entry if exists
-            ledger_entry = sql_db.query(LedgerEntry).filter(
-                LedgerEntry.record_id == other_record_id
-            ).first()
-            
-            if not ledger_entry:
-                continue
-            
-            other_total = other_data.get("total") or other_data.get("amount") or 0
-            other_date = (other_data.get("date") or "").strip()
-            other_vendor = (other_data.get("vendor") or "").strip().lower()
-            
-            # Check amount match (within 0.01 tolerance)
-            amounts_match = abs(float(total) - float(other_total)) < 0.01 if total and other_total else False
-            
-            # Check date match
-            dates_match = bool(date and other_date and date == other_date)
-            
-            # Check vendor match
-            vendors_match = bool(vendor and other_vendor and vendor == other_vendor)
-            vendors_different = bool(
-                vendor and other_vendor and 
-                vendor != other_vendor and
-                vendor not in other_vendor and
-                other_vendor not in vendor
-            )
-            
-            # Duplicate: same amount, date, and vendor
-            if amounts_match and dates_match and vendors_match:
-                duplicate_transactions.append({
-                    "record_id": other_record_id,
-                    "vendor": other_data.get("vendor"),
-                    "date": other_date,
-                    "total": other_total,
-                    "similarity": doc.get("similarity", 0.0),
-                    "ledger_entry_id": ledger_entry.id
-                })
-            
-            # Counterparty: same amount and date, different vendor
-            elif amounts_match and dates_match and vendors_different:
-                counterparty_transactions.append({
-                    "record_id": other_record_id,
-                    "vendor": other_data.get("vendor"),
-                    "date": other_date,
-                    "total": other_total,
-                    "similarity": doc.get("similarity", 0.0),
-                    "ledger_entry_id": ledger_entry.id,
-                    "relationship": "counterparty"
-                })
-            
-            # General match: similar amount and date
-            elif amounts_match and dates_match:
-                matched_transactions.append({
-                    "record_id": other_record_id,
-                    "vendor": other_data.get("vendor"),
-                    "date": other_date,
-                    "total": other_total,
-                    "similarity": doc.get("similarity", 0.0),
-                    "ledger_entry_id": ledger_entry.id
-                })
-    finally:
-        sql_db.close()
+    # Ledger entries for all candidates in one query
+    candidate_ids = [doc.get("record_id") for doc in similar_docs if doc.get("record_id")]
+    ledger_by_record = await _run_sql(session, _ledger_ids_by_record, user_id, candidate_ids)
+    
+    for doc in similar_docs:
+        other_record_id = doc.get("record_id")
+        other_data = doc.get("structured_data", {}) or {}
+        
+        # Get ledger entry if exists
+        ledger_entry_id = ledger_by_record.get(other_record_id)
+        
+        if not ledger_entry_id:
+            continue
+        
+        other_total = other_data.get("total") or other_data.get("amount") or 0
+        other_date = match_date(other_data)
+        other_vendor = (other_data.get("vendor") or "").strip().lower()
+        
+        # Check amount match (within 0.01 tolerance)
+        amounts_match = abs(float(total) - float(other_total)) < 0.01 if total and other_total else False
+        
+        # Check date match
+        dates_match = bool(date and other_date and date == other_date)
+        
+        # Check vendor match
+        vendors_match = bool(vendor and other_vendor and vendor == other_vendor)
+        vendors_different = bool(
+            vendor and other_vendor and 
+            vendor != other_vendor and
+            vendor not in other_vendor and
+            other_vendor not in vendor
+        )
+        
+        # Duplicate: same amount, date, and vendor
+        if amounts_match and dates_match and vendors_match:
+            duplicate_transactions.append({
+                "record_id": other_record_id,
+                "vendor": other_data.get("vendor"),
+                "date": other_date,
+                "total": other_total,
+                "similarity": doc.get("similarity", 0.0),
+                "ledger_entry_id": ledger_entry_id
+            })
+        
+        # Counterparty: same amount and date, different vendor
+        elif amounts_match and dates_match and vendors_different:
+            counterparty_transactions.append({
+                "record_id": other_record_id,
+                "vendor": other_data.get("vendor"),
+                "date": other_date,
+                "total": other_total,
+                "similarity": doc.get("similarity", 0.0),
+                "ledger_entry_id": ledger_entry_id,
+                "relationship": "counterparty"
+            })
+        
+        # General match: similar amount and date
+        elif amounts_match and dates_match:
+            matched_transactions.append({
+                "record_id": other_record_id,
+                "vendor": other_data.get("vendor"),
+                "date": other_date,
+                "total": other_total,
+                "similarity": doc.get("similarity", 0.0),
+                "ledger_entry_id": ledger_entry_id
+            })
     
     return {
         "reconciled": len(duplicate_transactions) > 0 or len(counterparty_transactions) > 0,
@@ -139,12 +188,13 @@ async def reconcile_transaction(
     }
 
 
-async def get_reconciliation_status(record_id: str) -> Dict[str, Any]:
+async def get_reconciliation_status(record_id: str, session: Optional[AsyncSession] = None) -> Dict[str, Any]:
     """
     Get reconciliation status for a specific transaction.
     
     Args:
         record_id: Transaction record ID
+        session: Request's async session, passed on to reconcile_transaction
     
     Returns:
         Reconciliation status with linked transactions
@@ -159,13 +209,13 @@ async def get_reconciliation_status(record_id: str) -> Dict[str, Any]:
     if not doc:
         return {"status": "not_found", "linked_transactions": []}
     
-    embedding = doc.get("embedding", [])
+    embedding = decode_embedding(doc)
     structured_data = doc.get("structured_data", {})
     
-    if not embedding:
+    if embedding is None:
         return {"status": "no_embedding", "linked_transactions": []}
     
-    reconciliation = await reconcile_transaction(record_id, structured_data, embedding)
+    reconciliation = await reconcile_transaction(record_id, structured_data, embedding, doc.get("user_id"), session)
     
     return {
         "status": "reconciled" if reconciliation["reconciled"] else "not_reconciled",
@@ -173,55 +223,45 @@ async def get_reconciliation_status(record_id: str) -> Dict[str, Any]:
     }
 
 
-async def link_transactions(record_id_1: str, record_id_2: str, relationship: str = "counterparty") -> bool:
+async def link_transactions(
+    record_id_1: str,
+    record_id_2: str,
+    relationship: str = "counterparty",
+    user_id: Optional[int] = None,
+    session: Optional[AsyncSession] = None
+) -> bool:
     """
     Manually link two transactions.
     
+    The link is stored in the reconciliation link table (source "manual",
+    replacing any automatic link for the pair) and the two records' groups
+    are merged.
+    
     Args:
         record_id_1: First transaction record ID
         record_id_2: Second transaction record ID
         relationship: Relationship type ("counterparty", "duplicate", "related")
+        user_id: Owner of both transactions
+        session: Request's async session for the ownership check and the link
+                 write (a worker thread with its own session is used without one)
     
     Returns:
-        True if linked successfully
+        True if linked successfully, False if either transaction does not belong to the user
     """
-    db = get_database()
-    if db is None:
+    if record_id_1 == record_id_2:
         return False
     
-    collection = db.receipts
-    
-    try:
-        # Update both documents with link information
-        await collection.update_one(
-            {"record_id": record_id_1},
-            {
-                "$addToSet": {
-                    "linked_transactions": {
-                        "record_id": record_id_2,
-                        "relationship": relationship,
-                        "linked_at": datetime.utcnow()
-                    }
-                }
-            }
-        )
-        
-        await collection.update_one(
-            {"record_id": record_id_2},
-            {
-                "$addToSet": {
-                    "linked_transactions": {
-                        "record_id": record_id_1,
-                        "relationship": relationship,
-                        "linked_at": datetime.utcnow()
-                    }
-                }
-            }
+    db = get_database()
+    if db is not None:
+        owned = await db.receipts.count_documents(
+            {"record_id": {"$in": [record_id_1, record_id_2]}, "user_id": user_id}
         )
-        
-        logger.info(f"Linked transactions {record_id_1} and {record_id_2} with relationship {relationship}")
-        return True
-    except Exception as e:
-        logger.error(f"Error linking transactions: {e}", exc_info=True)
+    else:
+        owned = await _run_sql(session, _count_owned, user_id, [record_id_1, record_id_2])
+    if owned < 2:
+        logger.warning(f"Cannot link {record_id_1} and {record_id_2}: not both owned by user {user_id}")
         return False
-
+    
+    await _run_sql(session, add_links, user_id, [(record_id_1, record_id_2, relationship, 1.0)], source="manual")
+    logger.info(f"Linked transactions {record_id_1} and {record_id_2} with relationship {relationship}")
+    return True
@@ -0,0 +1,106 @@
+"""
+Ledger Statistics Service
+
+Dashboard statistics computed in the database: entry counts by status, USD
+totals, distinct vendors and the average transaction come from one aggregate
+query over ledger_entries (optionally limited to a receipt date range), and
+the per-category breakdown from one GROUP BY. No ledger rows are loaded into
+Python, so the result is exact for any ledger size.
+"""
+
+from typing import Dict, Any, List, Optional
+from datetime import date
+import logging
+
+from sqlalchemy import func, case
+
+from app.db.sql import SessionLocal, LedgerEntry
+
+logger = logging.getLogger(__name__)
+
+LEDGER_STATUSES = ("validated", "pending", "rejected")
+
+# Amount aggregated across currencies: the USD equivalent, else the raw total
+_usd_amount = func.coalesce(LedgerEntry.usd_total, LedgerEntry.total, 0.0)
+
+
+def _ledger_query(db, user_id: int, columns, start_date: Optional[date], end_date: Optional[date]):
+    query = db.query(*columns).filter(LedgerEntry.user_id == user_id)
+    # Range scan on (user_id, transaction_date); entries without a parseable date fall outside any range
+    if start_date:
+        query = query.filter(LedgerEntry.transaction_date >= start_date)
+    if end_date:
+        query = query.filter(LedgerEntry.transaction_date <= end_date)
+    return query
+
+
+def get_ledger_stats(
+    user_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    by_category: bool = False,
+    db=None
+) -> Dict[str, Any]:
+    """
+    Aggregate statistics for a user's ledger.
+
+    Args:
+        user_id: Owner of the ledger
+        start_date: Only receipts dated on or after this day
+        end_date: Only receipts dated on or before this day
+        by_category: Also return count and USD total per category
+        db: Session to query on (default: a new one)
+
+    Returns:
+        Totals, counts by status and (optionally) the category breakdown
+    """
+    own_session = db is None
+    db = db or SessionLocal()
+    try:
+        columns = [
+            func.count(LedgerEntry.id),
+            func.sum(_usd_amount),
+            func.count(func.distinct(LedgerEntry.vendor)),
+        ] + [
+            func.sum(case((LedgerEntry.status == status, 1), else_=0)) for status in LEDGER_STATUSES
+        ]
+        total_entries, total_amount, unique_vendors, *status_counts = _ledger_query(
+            db, user_id, columns, start_date, end_date
+        ).one()
+        total_entries = total_entries or 0
+        total_amount = float(total_amount or 0.0)
+        by_status = {status: int(count or 0) for status, count in zip(LEDGER_STATUSES, status_counts)}
+
+        stats = {
+            "total_entries": total_entries,
+            "validated_entries": by_status["validated"],
+            "pending_entries": by_status["pending"],
+            "total_amount": total_amount,  # In USD
+            "unique_vendors": unique_vendors or 0,
+            "average_transaction": total_amount / total_entries if total_entries > 0 else 0,
+            "by_status": by_status,
+            "period_start": start_date.isoformat() if start_date else None,
+            "period_end": end_date.isoformat() if end_date else None,
+        }
+        if by_category:
+            stats["categories"] = _category_breakdown(db, user_id, start_date, end_date)
+        return stats
+    finally:
+        if own_session:
+            db.close()
+
+
+def _category_breakdown(db, user_id: int, start_date: Optional[date], end_date: Optional[date]) -> List[Dict[str, Any]]:
+    rows = _ledger_query(
+        db, user_id, [LedgerEntry.category, func.count(LedgerEntry.id), func.sum(_usd_amount)], start_date, end_date
+    ).group_by(LedgerEntry.category).all()
+    breakdown = [
+        {
+            "category": category,
+            "entries": count,
+            "total_amount": float(amount or 0.0),
+            "average_transaction": float(amount or 0.0) / count if count else 0,
+        }
+        for category, count, amount in rows
+    ]
+    return sorted(breakdown, key=lambda row: row["total_amount"], reverse=True)
@@ -0,0 +1,286 @@
+"""
+In-process per-user vector index.
+
+Each user's receipt embeddings live in one contiguous, L2-normalised float32
+matrix, so a similarity query is a single matrix-vector product instead of a
+Python loop over documents loaded from Mongo. The index is built lazily from
+Mongo on a user's first query (every document, not just the first 1000) and
+kept current by ``store_document``, ``update_document_status`` and
+``delete_document``.
+
+The index is per process: with several workers, each keeps its own copy and
+picks up other workers' writes when it is rebuilt after
+``VECTOR_INDEX_TTL`` seconds.
+"""
+
+from typing import Dict, Any, List, Optional, Set
+from collections import OrderedDict
+import asyncio
+import time
+import logging
+
+import numpy as np
+
+from app.core.config import settings
+from app.db.mongodb import get_database
+from app.utils.embedding_codec import decode_embedding
+
+logger = logging.getLogger(__name__)
+
+# Statuses never returned by similarity search
+EXCLUDED_STATUSES: Set[str] = {"deleted"}
+
+# Characters of raw text kept per document for result previews
+RAW_TEXT_PREVIEW = 200
+
+
+class UserVectorIndex:
+    """Normalised embedding matrix plus per-row metadata for one user"""
+
+    def __init__(self, dim: int, capacity: int = 64):
+        self.dim = dim
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self.record_ids: List[Optional[str]] = []
+        self.statuses: List[Optional[str]] = []
+        self.metadata: List[Optional[Dict[str, Any]]] = []
+        self.row_of: Dict[str, int] = {}
+        self.built_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+    def _grow(self):
+        capacity = max(64, self.matrix.shape[0] * 2)
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        active = np.zeros(capacity, dtype=bool)
+        active[:self.size] = self.active[:self.size]
+        self.matrix, self.active = matrix, active
+
+    def add(
+        self,
+        record_id: str,
+        embedding: Any,
+        status: Optional[str],
+        structured_data: Optional[Dict[str, Any]],
+        raw_text: Optional[str]
+    ) -> bool:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.dim:
+            return False
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return False
+        meta = {"structured_data": structured_data or {}, "raw_text": (raw_text or "")[:RAW_TEXT_PREVIEW]}
+
+        row = self.row_of.get(record_id)
+        if row is None:
+            if self.size >= self.matrix.shape[0]:
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.record_ids.append(record_id)
+            self.statuses.append(status)
+            self.metadata.append(meta)
+            self.row_of[record_id] = row
+        else:
+            self.statuses[row] = status
+            self.metadata[row] = meta
+        self.matrix[row] = vector / norm
+        self.active[row] = status not in EXCLUDED_STATUSES
+        return True
+
+    def set_status(self, record_id: str, status: str) -> bool:
+        row = self.row_of.get(record_id)
+        if row is None:
+            return False
+        self.statuses[row] = status
+        self.active[row] = status not in EXCLUDED_STATUSES
+        return True
+
+    def remove(self, record_id: str) -> bool:
+        row = self.row_of.pop(record_id, None)
+        if row is None:
+            return False
+        self.active[row] = False
+        self.record_ids[row] = None
+        self.statuses[row] = None
+        self.metadata[row] = None
+        # Compact once tombstones make up a quarter of the matrix
+        if self.size >= 64 and len(self.row_of) < self.size * 0.75:
+            self._compact()
+        return True
+
+    def _compact(self):
+        rows = sorted(self.row_of.values())
+        self.matrix = np.ascontiguousarray(self.matrix[rows]) if rows else np.zeros((64, self.dim), dtype=np.float32)
+        self.active = self.active[rows].copy() if rows else np.zeros(64, dtype=bool)
+        self.record_ids = [self.record_ids[r] for r in rows]
+        self.statuses = [self.statuses[r] for r in rows]
+        self.metadata = [self.metadata[r] for r in rows]
+        self.row_of = {record_id: i for i, record_id in enumerate(self.record_ids)}
+        self.size = len(rows)
+
+    def search(self, embedding: Any, threshold: float, limit: int) -> List[Dict[str, Any]]:
+        """Top ``limit`` active rows with cosine similarity >= threshold, best first"""
+        if self.size == 0 or limit <= 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if query.shape[0] != self.dim or norm == 0:
+            return []
+
+        scores = self.matrix[:self.size] @ (query / norm)
+        scores[~self.active[:self.size]] = -np.inf
+        candidates = np.flatnonzero(scores >= threshold)
+        if candidates.size == 0:
+            return []
+        if candidates.size > limit:
+            top = np.argpartition(scores[candidates], -limit)[-limit:]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(scores[candidates])[::-1]]
+
+        return [
+            {
+                "record_id": self.record_ids[row],
+                "similarity": float(scores[row]),
+                "structured_data": self.metadata[row]["structured_data"],
+                "raw_text": self.metadata[row]["raw_text"],
+            }
+            for row in candidates
+        ]
+
+
+# {user_id: UserVectorIndex}, least recently used first
+_indexes: "OrderedDict[int, UserVectorIndex]" = OrderedDict()
+_build_locks: Dict[int, asyncio.Lock] = {}
+# Writes that arrive while a user's index is being built; replayed once it is ready
+_pending_ops: Dict[int, List[tuple]] = {}
+
+_stats: Dict[str, Any] = {"builds": 0, "queries": 0, "query_ms": 0.0, "evictions": 0}
+
+
+async def _build_index(user_id: int) -> Optional[UserVectorIndex]:
+    db = get_database()
+    if db is None:
+        return None
+    start = time.perf_counter()
+    cursor = db.receipts.find(
+        {"user_id": user_id},
+        {
+            "record_id": 1, "embedding": 1, "embedding_dtype": 1, "embedding_scale": 1,
+            "status": 1, "structured_data": 1, "raw_text": 1
+        }
+    )
+    index: Optional[UserVectorIndex] = None
+    async for doc in cursor:
+        embedding = decode_embedding(doc)
+        if embedding is None:
+            continue
+        if index is None:
+            index = UserVectorIndex(len(embedding))
+        index.add(
+            doc.get("record_id"), embedding, doc.get("status"),
+            doc.get("structured_data"), doc.get("raw_text")
+        )
+    if index is None:
+        index = UserVectorIndex(settings.EMBEDDING_DIMENSION)
+    _stats["builds"] += 1
+    logger.info(
+        f"Built vector index for user {user_id}: {len(index)} documents "
+        f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+    return index
+
+
+def _is_fresh(index: UserVectorIndex) -> bool:
+    return settings.VECTOR_INDEX_TTL <= 0 or time.monotonic() - index.built_at < settings.VECTOR_INDEX_TTL
+
+
+async def get_user_index(user_id: int) -> Optional[UserVectorIndex]:
+    """The user's index, building it from Mongo on first use (or after the TTL)"""
+    index = _indexes.get(user_id)
+    if index is not None and _is_fresh(index):
+        _indexes.move_to_end(user_id)
+        return index
+
+    lock = _build_locks.setdefault(user_id, asyncio.Lock())
+    async with lock:
+        index = _indexes.get(user_id)
+        if index is None or not _is_fresh(index):
+            _pending_ops[user_id] = []
+            try:
+                index = await _build_index(user_id)
+            finally:
+                ops = _pending_ops.pop(user_id, [])
+            if index is None:
+                return None
+            for op, args in ops:
+                getattr(index, op)(*args)
+            _indexes[user_id] = index
+            while len(_indexes) > settings.VECTOR_INDEX_MAX_USERS:
+                evicted, _ = _indexes.popitem(last=False)
+                _build_locks.pop(evicted, None)
+                _stats["evictions"] += 1
+        _indexes.move_to_end(user_id)
+        return index
+
+
+async def search_user_index(
+    embedding: List[float],
+    user_id: int,
+    threshold: float,
+    limit: int
+) -> Optional[List[Dict[str, Any]]]:
+    """Similarity search over the user's index; None if the index is unavailable"""
+    index = await get_user_index(user_id)
+    if index is None:
+        return None
+    start = time.perf_counter()
+    results = index.search(embedding, threshold, limit)
+    _stats["queries"] += 1
+    _stats["query_ms"] += (time.perf_counter() - start) * 1000
+    return results
+
+
+def index_add(
+    user_id: int,
+    record_id: str,
+    embedding: List[float],
+    status: Optional[str],
+    structured_data: Optional[Dict[str, Any]],
+    raw_text: Optional[str]
+):
+    """Add or replace a document in the user's index (no-op if it is not loaded)"""
+    _apply(user_id, "add", (record_id, embedding, status, structured_data, raw_text))
+
+
+def index_set_status(user_id: int, record_id: str, status: str):
+    _apply(user_id, "set_status", (record_id, status))
+
+
+def index_remove(user_id: int, record_id: str):
+    _apply(user_id, "remove", (record_id,))
+
+
+def _apply(user_id: int, op: str, args: tuple):
+    if user_id in _pending_ops:
+        _pending_ops[user_id].append((op, args))
+    index = _indexes.get(user_id)
+    if index is not None:
+        getattr(index, op)(*args)
+
+
+
+def get_vector_index_stats() -> Dict[str, Any]:
+    queries = _stats["queries"]
+    return {
+        "users": len(_indexes),
+        "documents": sum(len(index) for index in _indexes.values()),
+        "builds": _stats["builds"],
+        "evictions": _stats["evictions"],
+        "queries": queries,
+        "avg_query_ms": round(_stats["query_ms"] / queries, 4) if queries else None,
+    }
@@ -1,29 +1,31 @@
 from typing import List, Dict, Any, Optional
-from sentence_transformers import SentenceTransformer
 import numpy as np
 from app.db.mongodb import get_database
+from app.core.config import settings
+from app.services.embedding_service import embed_text, embed_texts
+from app.utils.embedding_codec import encode_embedding, decode_embedding
+from app.utils.match_keys import blocking_key, blocking_fields, match_date
+from app.services.vector_index import EXCLUDED_STATUSES, RAW_TEXT_PREVIEW
+from app.services.vector_store import get_vector_store
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize embedding model (lazy loading)
-_embedding_model = None
+# Maximum receipts read from one (user, total, date) block
+BLOCK_CANDIDATE_LIMIT = 50
 
-
-def get_embedding_model():
-    """Lazy load embedding model"""
-    global _embedding_model
-    if _embedding_model is None:
-        _embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-    return _embedding_model
+_blocking_stats: Dict[str, int] = {"lookups": 0, "hits": 0, "candidates": 0, "vector_fallbacks": 0}
 
 
 async def create_embedding(text: str) -> List[float]:
-    """Create embedding vector for text"""
-    model = get_embedding_model()
-    embedding = model.encode(text)
-    return embedding.tolist()
+    """Create embedding vector for text (micro-batched, encoded off the event loop)"""
+    return await embed_text(text)
+
+
+async def create_embeddings(texts: List[str]) -> List[List[float]]:
+    """Create embedding vectors for several texts in one encoder batch"""
+    return await embed_texts(texts)
 
 
 async def store_document(
@@ -48,13 +50,17 @@ async def store_document(
         "record_id": record_id,
         "user_id": user_id,
         "structured_data": structured_data,
-        "embedding": embedding,
+        # Packed Binary (float32/float16/int8) unless EMBEDDING_STORAGE_FORMAT=array
+        **encode_embedding(embedding, settings.EMBEDDING_STORAGE_FORMAT),
+        # Normalised (total, date) blocking key for duplicate/counterparty lookups
+        **blocking_fields(structured_data),
         "raw_text": raw_text,
         "created_at": datetime.utcnow(),
         "status": "pending_reconciliation"
     }
     
     result = await collection.insert_one(document)
+    get_vector_store().on_add(user_id, record_id, embedding, document["status"], structured_data, raw_text)
     return str(result.inserted_id)
 
 
@@ -62,59 +68,95 @@ async def find_similar_documents(
     embedding: List[float],
     user_id: int,
     threshold: float = 0.7,
-    limit: int = 5
+    limit: int = 5,
+    exclude_record_id: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
     Find similar documents using cosine similarity for a specific user
     
+    Served by the deployment's vector store (Atlas $vectorSearch, the in-process
+    index or a brute-force scan; see vector_store.py). The owner and status
+    filters are applied inside the backend, before scoring.
+    
     Args:
         embedding: Query embedding vector
         user_id: User ID to filter documents
         threshold: Similarity threshold (0-1)
         limit: Maximum number of results
+        exclude_record_id: Record to leave out (usually the query document itself)
     
     Returns:
         List of similar documents with similarity scores
     """
-    db = get_database()
-    if db is None:
-        return []
-    
-    collection = db.receipts
+    return await get_vector_store().search(embedding, user_id, threshold, limit, exclude_record_id)
+
+
+async def find_blocking_candidates(
+    embedding: List[float],
+    user_id: int,
+    structured_data: Optional[Dict[str, Any]],
+    exclude_record_id: Optional[str] = None
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Receipts sharing this one's exact (total in cents, date) blocking key
     
-    # Get all documents for this user
-    all_docs = await collection.find({"user_id": user_id, "status": {"$ne": "deleted"}}).to_list(length=1000)
+    One lookup on the (user_id, total_cents, match_date) index; cosine similarity
+    is then computed only over the returned block.
     
-    if not all_docs:
-        return []
+    Returns:
+        Candidates scored by similarity (best first, same shape as
+        find_similar_documents), or None if the receipt has no blocking key
+    """
+    key = blocking_key(structured_data)
+    db = get_database()
+    if key is None or db is None:
+        return None
     
-    # Calculate cosine similarities
-    query_vec = np.array(embedding)
-    similarities = []
+    _blocking_stats["lookups"] += 1
+    query = {
+        "user_id": user_id,
+        "total_cents": key[0],
+        "match_date": key[1],
+        "status": {"$nin": list(EXCLUDED_STATUSES)},
+    }
+    if exclude_record_id:
+        query["record_id"] = {"$ne": exclude_record_id}
+    docs = await db.receipts.find(
+        query,
+        {"record_id": 1, "embedding": 1, "embedding_dtype": 1, "embedding_scale": 1, "structured_data": 1, "raw_text": 1}
+    ).limit(BLOCK_CANDIDATE_LIMIT).to_list(length=BLOCK_CANDIDATE_LIMIT)
     
-    for doc in all_docs:
-        doc_embedding = doc.get("embedding", [])
-        if not doc_embedding:
-            continue
-        
-        doc_vec = np.array(doc_embedding)
-        if len(doc_vec) == len(query_vec) and len(query_vec) > 0:
-            # Cosine similarity
-            norm_query = np.linalg.norm(query_vec)
-            norm_doc = np.linalg.norm(doc_vec)
-            if norm_query > 0 and norm_doc > 0:
-                similarity = np.dot(query_vec, doc_vec) / (norm_query * norm_doc)
-                if similarity >= threshold:
-                    similarities.append({
-                        "record_id": doc.get("record_id"),
-                        "similarity": float(similarity),
-                        "structured_data": doc.get("structured_data", {}),
-                        "raw_text": doc.get("raw_text", "")[:200]  # Preview
-                    })
+    query_vec = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    query_norm = np.linalg.norm(query_vec)
+    candidates = []
+    for doc in docs:
+        similarity = 0.0
+        doc_vec = decode_embedding(doc)
+        if doc_vec is not None and doc_vec.shape == query_vec.shape and query_norm > 0:
+            doc_norm = np.linalg.norm(doc_vec)
+            if doc_norm > 0:
+                similarity = float(np.dot(query_vec, doc_vec) / (query_norm * doc_norm))
+        candidates.append({
+            "record_id": doc.get("record_id"),
+            "similarity": similarity,
+            "structured_data": doc.get("structured_data", {}),
+            "raw_text": (doc.get("raw_text") or "")[:RAW_TEXT_PREVIEW]
+        })
     
-    # Sort by similarity and return top results
-    similarities.sort(key=lambda x: x["similarity"], reverse=True)
-    return similarities[:limit]
+    if candidates:
+        _blocking_stats["hits"] += 1
+        _blocking_stats["candidates"] += len(candidates)
+    candidates.sort(key=lambda x: x["similarity"], reverse=True)
+    return candidates
+
+
+def get_blocking_stats() -> Dict[str, Any]:
+    lookups = _blocking_stats["lookups"]
+    return {
+        **_blocking_stats,
+        "hit_rate": round(_blocking_stats["hits"] / lookups, 4) if lookups else None,
+        "avg_block_size": round(_blocking_stats["candidates"] / _blocking_stats["hits"], 2) if _blocking_stats["hits"] else None,
+    }
 
 
 async def check_duplicates(
@@ -127,6 +169,10 @@ async def check_duplicates(
     """
     Check for duplicate receipts and counterparty documents for a specific user
     
+    Candidates come from the exact (total, date) block; vector similarity search
+    is only used when the block is empty (e.g. documents stored before blocking
+    keys existed) or the receipt has no total/date.
+    
     Args:
         record_id: Current record ID
         embedding: Document embedding vector
@@ -143,11 +189,13 @@ async def check_duplicates(
         - confidence: Similarity confidence
         - match_type: "duplicate", "counterparty", or "none"
     """
-    # Find similar documents with lower threshold to catch counterparties
-    similar = await find_similar_documents(embedding, user_id, threshold=0.7, limit=20)
-    
-    # Filter out self
-    similar = [s for s in similar if s["record_id"] != record_id]
+    similar = await find_blocking_candidates(embedding, user_id, structured_data, exclude_record_id=record_id)
+    if not similar:
+        _blocking_stats["vector_fallbacks"] += 1
+        # Find similar documents with lower threshold to catch counterparties
+        similar = await find_similar_documents(
+            embedding, user_id, threshold=0.7, limit=20, exclude_record_id=record_id
+        )
     
     if not similar:
         return {
@@ -162,7 +210,8 @@ async def check_duplicates(
     # Get current document's structured data for comparison
     current_data = structured_data or {}
     current_total = current_data.get("total") or current_data.get("amount") or 0
-    current_date = current_data.get("date", "").strip()
+    # Normalised YYYY-MM-DD, the same form the blocking key uses
+    current_date = match_date(current_data)
     current_vendor = (current_data.get("vendor") or "").strip().lower()
     current_invoice = (current_data.get("invoice_number") or "").strip().lower()
     
@@ -171,7 +220,7 @@ async def check_duplicates(
         if match["similarity"] >= threshold:
             other_data = match.get("structured_data", {}) or {}
             other_total = other_data.get("total") or other_data.get("amount") or 0
-            other_date = (other_data.get("date") or "").strip()
+            other_date = match_date(other_data)
             other_vendor = (other_data.get("vendor") or "").strip().lower()
             other_invoice = (other_data.get("invoice_number") or "").strip().lower()
             
@@ -205,7 +254,7 @@ async def check_duplicates(
         if match["similarity"] >= 0.75:  # Lower threshold for counterparty detection
             other_data = match.get("structured_data", {}) or {}
             other_total = other_data.get("total") or other_data.get("amount") or 0
-            other_date = (other_data.get("date") or "").strip()
+            other_date = match_date(other_data)
             other_vendor = (other_data.get("vendor") or "").strip().lower()
             
             # Check if amounts match (within 0.01 tolerance)
@@ -261,6 +310,7 @@ async def update_document_status(record_id: str, status: str, user_id: int) -> b
         )
         
         if result.matched_count > 0:
+            get_vector_store().on_status(user_id, record_id, status)
             if result.modified_count > 0:
                 logger.info(f"Updated document {record_id} status to {status} in MongoDB")
             else:
@@ -307,6 +357,7 @@ async def delete_document(record_id: str, user_id: int) -> bool:
         result = await collection.delete_one({"record_id": record_id, "user_id": user_id})
         
         if result.deleted_count > 0:
+            get_vector_store().on_remove(user_id, record_id)
             logger.info(f"Deleted document {record_id} from MongoDB (deleted_count: {result.deleted_count})")
             return True
         else:
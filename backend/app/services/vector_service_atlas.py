@@ -2,111 +2,157 @@
 MongoDB Atlas Vector Search implementation.
 
 This module provides vector search using MongoDB Atlas Vector Search
-when available. Falls back to application-level similarity if not available.
+when available. The vector store (vector_store.py) probes for a usable index
+at startup and falls back to in-process similarity when there is none.
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable
 from app.db.mongodb import get_database
+from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+VECTOR_INDEX_NAME = "vector_index"
+
+# Fields every query pre-filters on; they must be declared as "filter" fields in the index
+FILTER_FIELDS = ("user_id", "status", "record_id")
+
+
+def vector_index_definition() -> Dict[str, Any]:
+    """Atlas vectorSearch index definition used by scripts/setup_mongodb_vector_index.py"""
+    return {
+        "fields": [
+            {
+                "type": "vector",
+                "path": "embedding",
+                "numDimensions": settings.EMBEDDING_DIMENSION,
+                "similarity": "cosine"
+            },
+            *({"type": "filter", "path": field} for field in FILTER_FIELDS)
+        ]
+    }
+
 
 async def vector_search_atlas(
     embedding: List[float],
+    user_id: int,
     collection_name: str = "receipts",
     limit: int = 5,
-    score_threshold: float = 0.7
+    score_threshold: float = 0.7,
+    exclude_statuses: Iterable[str] = (),
+    exclude_record_id: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
     Perform vector search using MongoDB Atlas Vector Search.
-    
+
     This requires:
     1. MongoDB Atlas cluster
-    2. Vector Search Index created on the collection
-    3. Index name: "vector_index"
-    
+    2. Vector Search Index created on the collection (see vector_index_definition)
+    3. Embeddings stored as BSON arrays (EMBEDDING_STORAGE_FORMAT=array)
+
+    The owner, excluded statuses and excluded record are applied as
+    $vectorSearch pre-filters, so candidates never include other users' receipts.
+
     Args:
         embedding: Query embedding vector
+        user_id: Owner whose receipts are searched
         collection_name: Name of the collection
         limit: Maximum number of results
-        score_threshold: Minimum similarity score
-    
+        score_threshold: Minimum cosine similarity
+        exclude_statuses: Document statuses never returned
+        exclude_record_id: Record to leave out (usually the query document itself)
+
     Returns:
-        List of matching documents with similarity scores
+        List of matching documents with cosine similarity scores
+
+    Raises:
+        Exception: if the aggregation fails (no index, unsupported deployment)
     """
     db = get_database()
     if db is None:
         return []
-    
+
     collection = db[collection_name]
-    
-    try:
-        # MongoDB Atlas Vector Search aggregation pipeline
-        pipeline = [
-            {
-                "$vectorSearch": {
-                    "index": "vector_index",
-                    "path": "embedding",
-                    "queryVector": embedding,
-                    "numCandidates": limit * 10,  # Search more candidates for better results
-                    "limit": limit
-                }
-            },
-            {
-                "$addFields": {
-                    "score": {"$meta": "vectorSearchScore"}
-                }
-            },
-            {
-                "$match": {
-                    "score": {"$gte": score_threshold}
-                }
-            },
-            {
-                "$project": {
-                    "record_id": 1,
-                    "structured_data": 1,
-                    "raw_text": {"$substr": ["$raw_text", 0, 200]},
-                    "similarity": "$score",
-                    "created_at": 1
-                }
+
+    search_filter: Dict[str, Any] = {"user_id": {"$eq": user_id}}
+    exclude_statuses = list(exclude_statuses)
+    if exclude_statuses:
+        search_filter["status"] = {"$nin": exclude_statuses}
+    if exclude_record_id:
+        search_filter["record_id"] = {"$ne": exclude_record_id}
+
+    # For cosine indexes Atlas reports (1 + cosine) / 2
+    min_score = (1.0 + score_threshold) / 2.0
+
+    # MongoDB Atlas Vector Search aggregation pipeline
+    pipeline = [
+        {
+            "$vectorSearch": {
+                "index": VECTOR_INDEX_NAME,
+                "path": "embedding",
+                "queryVector": [float(x) for x in embedding],
+                "numCandidates": min(10000, max(100, limit * 20)),  # Search more candidates for better recall
+                "limit": limit,
+                "filter": search_filter
             }
-        ]
-        
-        results = []
-        async for doc in collection.aggregate(pipeline):
-            results.append({
-                "record_id": doc.get("record_id"),
-                "similarity": doc.get("similarity", 0.0),
-                "structured_data": doc.get("structured_data", {}),
-                "raw_text": doc.get("raw_text", "")
-            })
-        
-        return results
-    
-    except Exception as e:
-        logger.warning(f"Atlas Vector Search not available, falling back to application-level search: {e}")
-        # Fall back to application-level similarity (implemented in vector_service.py)
-        return []
+        },
+        {
+            "$addFields": {
+                "score": {"$meta": "vectorSearchScore"}
+            }
+        },
+        {
+            "$match": {
+                "score": {"$gte": min_score}
+            }
+        },
+        {
+            "$project": {
+                "record_id": 1,
+                "structured_data": 1,
+                "raw_text": {"$substrCP": [{"$ifNull": ["$raw_text", ""]}, 0, 200]},
+                "score": 1
+            }
+        }
+    ]
+
+    results = []
+    async for doc in collection.aggregate(pipeline):
+        results.append({
+            "record_id": doc.get("record_id"),
+            "similarity": 2.0 * doc.get("score", 0.0) - 1.0,
+            "structured_data": doc.get("structured_data", {}),
+            "raw_text": doc.get("raw_text", "")
+        })
+
+    return results
 
 
 async def check_vector_index_exists(collection_name: str = "receipts") -> bool:
-    """Check if vector search index exists"""
+    """Check if a queryable vector search index with the required filter fields exists"""
     try:
         db = get_database()
         if db is None:
             return False
-        
+
         collection = db[collection_name]
-        indexes = await collection.list_search_indexes()
-        
+        indexes = await collection.list_search_indexes().to_list(length=None)
+
         for index in indexes:
-            if index.get("name") == "vector_index":
-                return True
-        
+            if index.get("name") != VECTOR_INDEX_NAME or not index.get("queryable", False):
+                continue
+            definition = index.get("latestDefinition") or {}
+            filter_paths = {
+                field.get("path") for field in definition.get("fields", []) if field.get("type") == "filter"
+            }
+            missing = set(FILTER_FIELDS) - filter_paths
+            if missing:
+                logger.warning(f"Vector search index is missing filter fields {sorted(missing)}")
+                return False
+            return True
+
         return False
     except Exception as e:
         logger.debug(f"Could not check vector index: {e}")
         return False
-
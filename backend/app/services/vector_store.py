@@ -0,0 +1,237 @@
+"""
+Pluggable vector similarity search.
+
+Every similarity query (duplicate checks, reconciliation, /chat retrieval,
+perspective re-evaluation) goes through the VectorStore chosen for this
+deployment:
+
+- ``atlas``        MongoDB Atlas ``$vectorSearch`` (vector_service_atlas.py)
+- ``local``        in-process per-user matrix index (vector_index.py)
+- ``brute_force``  NumPy scan of the user's receipts in Mongo
+
+All backends apply the same pre-filters (owner ``user_id``, statuses excluded
+from search, optionally the query's own record) and return the same result
+shape: ``{"record_id", "similarity", "structured_data", "raw_text"}``, best
+first. With ``VECTOR_STORE_BACKEND=auto`` a capability probe at startup picks
+Atlas when a usable search index exists and otherwise the local index.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional
+import logging
+
+import numpy as np
+
+from app.core.config import settings
+from app.db.mongodb import get_database
+from app.utils.embedding_codec import decode_embedding
+from app.services.vector_index import (
+    EXCLUDED_STATUSES, RAW_TEXT_PREVIEW, search_user_index, index_add, index_set_status, index_remove
+)
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("auto", "atlas", "local", "brute_force")
+
+
+class VectorStore(ABC):
+    """Similarity search over one user's receipts, plus write hooks to keep the backend current"""
+
+    name = "base"
+
+    @abstractmethod
+    async def search(
+        self,
+        embedding: List[float],
+        user_id: int,
+        threshold: float,
+        limit: int,
+        exclude_record_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Receipts scoring at least threshold, best first, at most limit"""
+
+    def on_add(
+        self,
+        user_id: int,
+        record_id: str,
+        embedding: List[float],
+        status: Optional[str],
+        structured_data: Optional[Dict[str, Any]],
+        raw_text: Optional[str]
+    ):
+        """Called after a receipt is stored"""
+
+    def on_status(self, user_id: int, record_id: str, status: str):
+        """Called after a receipt's status changes"""
+
+    def on_remove(self, user_id: int, record_id: str):
+        """Called after a receipt is deleted"""
+
+
+class BruteForceVectorStore(VectorStore):
+    """Loads the user's embeddings from Mongo and scores them with one matrix product"""
+
+    name = "brute_force"
+
+    async def search(self, embedding, user_id, threshold, limit, exclude_record_id=None):
+        db = get_database()
+        if db is None or limit <= 0:
+            return []
+        query_vec = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        query_norm = np.linalg.norm(query_vec)
+        if query_norm == 0:
+            return []
+
+        query: Dict[str, Any] = {"user_id": user_id, "status": {"$nin": list(EXCLUDED_STATUSES)}}
+        if exclude_record_id:
+            query["record_id"] = {"$ne": exclude_record_id}
+        docs, vectors = [], []
+        async for doc in db.receipts.find(
+            query,
+            {"record_id": 1, "embedding": 1, "embedding_dtype": 1, "embedding_scale": 1, "structured_data": 1, "raw_text": 1}
+        ):
+            vector = decode_embedding(doc)
+            if vector is None or vector.shape != query_vec.shape:
+                continue
+            docs.append(doc)
+            vectors.append(vector)
+        if not docs:
+            return []
+
+        matrix = np.vstack(vectors)
+        norms = np.linalg.norm(matrix, axis=1)
+        norms[norms == 0] = np.inf
+        scores = (matrix @ query_vec) / (norms * query_norm)
+        candidates = np.flatnonzero(scores >= threshold)
+        candidates = candidates[np.argsort(scores[candidates])[::-1]][:limit]
+        return [
+            {
+                "record_id": docs[row].get("record_id"),
+                "similarity": float(scores[row]),
+                "structured_data": docs[row].get("structured_data", {}),
+                "raw_text": (docs[row].get("raw_text") or "")[:RAW_TEXT_PREVIEW]
+            }
+            for row in candidates
+        ]
+
+
+class LocalIndexVectorStore(VectorStore):
+    """In-process per-user index, kept current by the write hooks"""
+
+    name = "local"
+
+    def __init__(self, fallback: VectorStore):
+        self.fallback = fallback
+
+    async def search(self, embedding, user_id, threshold, limit, exclude_record_id=None):
+        # One extra result so excluding the query's own record still leaves ``limit``
+        results = await search_user_index(embedding, user_id, threshold, limit + 1 if exclude_record_id else limit)
+        if results is None:
+            return await self.fallback.search(embedding, user_id, threshold, limit, exclude_record_id)
+        if exclude_record_id:
+            results = [r for r in results if r["record_id"] != exclude_record_id]
+        return results[:limit]
+
+    def on_add(self, user_id, record_id, embedding, status, structured_data, raw_text):
+        index_add(user_id, record_id, embedding, status, structured_data, raw_text)
+
+    def on_status(self, user_id, record_id, status):
+        index_set_status(user_id, record_id, status)
+
+    def on_remove(self, user_id, record_id):
+        index_remove(user_id, record_id)
+
+
+class AtlasVectorStore(VectorStore):
+    """Atlas $vectorSearch with pre-filters; falls back per query if Atlas errors"""
+
+    name = "atlas"
+
+    def __init__(self, fallback: VectorStore):
+        self.fallback = fallback
+        self.errors = 0
+
+    async def search(self, embedding, user_id, threshold, limit, exclude_record_id=None):
+        from app.services.vector_service_atlas import vector_search_atlas
+        try:
+            return await vector_search_atlas(
+                embedding,
+                user_id,
+                limit=limit,
+                score_threshold=threshold,
+                exclude_statuses=EXCLUDED_STATUSES,
+                exclude_record_id=exclude_record_id
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Atlas vector search failed, using {self.fallback.name}: {e}")
+            return await self.fallback.search(embedding, user_id, threshold, limit, exclude_record_id)
+
+
+_store: Optional[VectorStore] = None
+_probe: Dict[str, Any] = {}
+
+
+def _default_store() -> VectorStore:
+    brute_force = BruteForceVectorStore()
+    if settings.VECTOR_INDEX_ENABLED:
+        return LocalIndexVectorStore(fallback=brute_force)
+    return brute_force
+
+
+async def _atlas_available() -> bool:
+    from app.services.vector_service_atlas import check_vector_index_exists
+    if settings.EMBEDDING_STORAGE_FORMAT != "array":
+        _probe["atlas"] = "embeddings are packed Binary; $vectorSearch needs EMBEDDING_STORAGE_FORMAT=array"
+        return False
+    if not await check_vector_index_exists():
+        _probe["atlas"] = "no queryable vector search index with user_id/status/record_id filter fields"
+        return False
+    _probe["atlas"] = "available"
+    return True
+
+
+async def init_vector_store() -> VectorStore:
+    """Probe the deployment and select the similarity backend (called at startup)"""
+    global _store
+    _probe.clear()
+    requested = settings.VECTOR_STORE_BACKEND
+    if requested not in BACKENDS:
+        logger.warning(f"Unknown VECTOR_STORE_BACKEND '{requested}', using auto")
+        requested = "auto"
+
+    fallback = _default_store()
+    if requested == "brute_force":
+        store: VectorStore = BruteForceVectorStore()
+    elif requested == "local":
+        store = LocalIndexVectorStore(fallback=BruteForceVectorStore())
+    elif await _atlas_available():
+        store = AtlasVectorStore(fallback=fallback)
+    else:
+        if requested == "atlas":
+            logger.warning(f"Atlas vector search requested but unavailable ({_probe.get('atlas')}), using {fallback.name}")
+        store = fallback
+
+    _store = store
+    _probe["requested"] = requested
+    logger.info(f"Vector store backend: {store.name}")
+    return store
+
+
+def get_vector_store() -> VectorStore:
+    """The active store; before startup probing this is the local index (or brute force)"""
+    global _store
+    if _store is None:
+        _store = _default_store()
+    return _store
+
+
+def get_vector_store_info() -> Dict[str, Any]:
+    store = get_vector_store()
+    info: Dict[str, Any] = {"backend": store.name, "probe": dict(_probe)}
+    fallback = getattr(store, "fallback", None)
+    if fallback is not None:
+        info["fallback"] = fallback.name
+    if isinstance(store, AtlasVectorStore):
+        info["atlas_errors"] = store.errors
+    return info
@@ -0,0 +1,115 @@
+"""
+Per-user vendor -> category memo.
+
+Built lazily from each user's validated ``LedgerEntry.category`` history (one
+GROUP BY query) and consulted before any classifier runs, so recurring vendors
+are categorised the way the user already books them. New validated entries
+are folded in incrementally; status changes, deletes and category edits drop
+the user's memo so it is rebuilt from the ledger on next use.
+"""
+
+from typing import Dict, Any, Optional
+import re
+import threading
+import logging
+
+from sqlalchemy import func
+
+from app.db.sql import SessionLocal, LedgerEntry
+
+logger = logging.getLogger(__name__)
+
+# {user_id: {normalized_vendor: {category: count}}}
+_memo: Dict[int, Dict[str, Dict[str, int]]] = {}
+_lock = threading.Lock()
+
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "loads": 0, "invalidations": 0}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_vendor(vendor: Optional[str]) -> str:
+    """Case/punctuation-insensitive vendor key ("Starbucks, Inc." -> "starbucks inc")"""
+    return _NON_ALNUM.sub(" ", (vendor or "").lower()).strip()
+
+
+def _load(user_id: int) -> Dict[str, Dict[str, int]]:
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            LedgerEntry.vendor, LedgerEntry.category, func.count(LedgerEntry.id)
+        ).filter(
+            LedgerEntry.user_id == user_id,
+            LedgerEntry.status == "validated",
+            LedgerEntry.category.isnot(None)
+        ).group_by(LedgerEntry.vendor, LedgerEntry.category).all()
+    finally:
+        db.close()
+
+    vendors: Dict[str, Dict[str, int]] = {}
+    for vendor, category, count in rows:
+        key = normalize_vendor(vendor)
+        if not key or key == "unknown vendor":
+            continue
+        counts = vendors.setdefault(key, {})
+        counts[category] = counts.get(category, 0) + count
+    return vendors
+
+
+def _get_user_memo(user_id: int) -> Dict[str, Dict[str, int]]:
+    memo = _memo.get(user_id)
+    if memo is None:
+        with _lock:
+            memo = _memo.get(user_id)
+            if memo is None:
+                memo = _load(user_id)
+                _memo[user_id] = memo
+                _stats["loads"] += 1
+    return memo
+
+
+def get_memoized_category(user_id: Optional[int], vendor: Optional[str]) -> Optional[str]:
+    """
+    Category the user most often confirmed for this vendor.
+
+    Returns:
+        Category string, or None if the vendor has no confirmed history
+    """
+    key = normalize_vendor(vendor)
+    if user_id is None or not key:
+        return None
+    counts = _get_user_memo(user_id).get(key)
+    if not counts:
+        _stats["misses"] += 1
+        return None
+    _stats["hits"] += 1
+    return max(counts.items(), key=lambda kv: kv[1])[0]
+
+
+def remember_vendor_category(user_id: int, vendor: Optional[str], category: Optional[str], count: int = 1):
+    """Fold count newly validated entries into the user's memo (if it is loaded)"""
+    key = normalize_vendor(vendor)
+    if not key or not category:
+        return
+    with _lock:
+        memo = _memo.get(user_id)
+        if memo is None:
+            return
+        counts = memo.setdefault(key, {})
+        counts[category] = counts.get(category, 0) + count
+
+
+def invalidate_vendor_memo(user_id: int):
+    """Drop the user's memo; it is rebuilt from the ledger on next lookup"""
+    with _lock:
+        if _memo.pop(user_id, None) is not None:
+            _stats["invalidations"] += 1
+
+
+def get_vendor_memo_stats() -> Dict[str, Any]:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else None,
+        "cached_users": len(_memo),
+    }
@@ -0,0 +1,50 @@
+"""
+Opaque cursors for keyset ("seek") pagination.
+
+A listing ordered by ``(sort_column DESC, id DESC)`` hands out the sort key of
+the last row it returned as a cursor; the next page asks for rows strictly
+after that key. With a composite index on ``(user_id, sort_column, id)`` every
+page is one index range scan of ``limit`` rows, however deep it is, instead of
+reading and discarding ``skip`` rows as OFFSET does.
+
+Cursors are url-safe base64 JSON tagged with the listing they belong to, so a
+ledger cursor cannot be replayed against the journal listing.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List
+
+from sqlalchemy import tuple_
+
+# Response header carrying the next page's cursor on paginated listings
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(kind: str, sort_value: Any, row_id: int) -> str:
+    """Cursor pointing just after the row (sort_value, row_id)"""
+    if isinstance(sort_value, datetime):
+        sort_value = {"dt": sort_value.isoformat()}
+    payload = json.dumps({"k": kind, "v": [sort_value, row_id]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(kind: str, cursor: str) -> List[Any]:
+    """[sort_value, row_id] from a cursor; ValueError if it is malformed or for another listing"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if payload["k"] != kind:
+            raise ValueError("cursor belongs to a different listing")
+        sort_value, row_id = payload["v"]
+        if isinstance(sort_value, dict):
+            sort_value = datetime.fromisoformat(sort_value["dt"])
+        return [sort_value, int(row_id)]
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, KeyError, TypeError) as e:
+        raise ValueError(f"invalid cursor: {e}")
+
+
+def after_cursor(sort_column, id_column, cursor_values: List[Any]):
+    """WHERE clause for the rows after the cursor in (sort_column DESC, id DESC) order"""
+    return tuple_(sort_column, id_column) < tuple_(*cursor_values)
@@ -0,0 +1,122 @@
+"""
+Transaction date normalisation.
+
+Receipt dates arrive as whatever the OCR/LLM extraction produced:
+"2025-07-12", "26/01/2015", "07/12/2025", "12 Jul 2025", "2025年7月12日",
+"N/A". ``normalize_date`` turns them into a ``date`` (or None) for the typed
+``ledger_entries.transaction_date`` column.
+
+ISO dates take a regex fast path. Everything else is tried against a list of
+formats whose order depends on the locale (month-first for en_US, year-first
+for CJK, day-first otherwise), and the first format that parses wins, so an
+ambiguous "03/04/2025" always follows the locale: the result depends only on
+the text and the locale, never on what was parsed before, and is the same in
+every worker and in the backfill script. Scan results are cached per (text,
+locale); receipts repeat the same date strings, so repeat parses cost a
+dictionary lookup.
+"""
+
+import re
+from functools import lru_cache
+from datetime import date, datetime
+from typing import Dict, Optional
+
+_ISO = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})(?:$|[T\s])")
+_TIME_SUFFIX = re.compile(r"[T\s]+\d{1,2}:\d{2}(?::\d{2})?(?:\.\d+)?\s*(?:[AaPp][Mm])?\s*(?:Z|[+-]\d{2}:?\d{2})?$")
+_ORDINAL_SUFFIX = re.compile(r"(\d)(st|nd|rd|th)\b", re.IGNORECASE)
+
+_YEAR_FIRST = ["%Y/%m/%d", "%Y.%m.%d", "%Y%m%d", "%Y年%m月%d日"]
+_DAY_FIRST = ["%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y", "%d-%m-%y", "%d.%m.%y"]
+_MONTH_FIRST = ["%m/%d/%Y", "%m-%d-%Y", "%m.%d.%Y", "%m/%d/%y", "%m-%d-%y"]
+_NAMED_MONTH = [
+    "%d %b %Y", "%d %B %Y", "%b %d %Y", "%B %d %Y", "%b %d, %Y", "%B %d, %Y",
+    "%d-%b-%Y", "%d-%b-%y", "%d %b, %Y", "%a, %d %b %Y", "%A, %d %B %Y",
+]
+
+_LOCALE_FORMATS = {
+    "month_first": _MONTH_FIRST + _YEAR_FIRST + _DAY_FIRST + _NAMED_MONTH,
+    "year_first": _YEAR_FIRST + _DAY_FIRST + _MONTH_FIRST + _NAMED_MONTH,
+    "day_first": _DAY_FIRST + _YEAR_FIRST + _MONTH_FIRST + _NAMED_MONTH,
+}
+_LOCALE_ORDER = {"en_US": "month_first", "ja_JP": "year_first", "zh_CN": "year_first", "ko_KR": "year_first"}
+
+# Receipt currency -> locale, for callers that only know the currency
+_CURRENCY_LOCALES = {"USD": "en_US", "JPY": "ja_JP", "CNY": "zh_CN", "KRW": "ko_KR"}
+
+MIN_YEAR, MAX_YEAR = 1900, 2100
+# Distinct (text, locale) scan results kept in the cache
+SCAN_CACHE_SIZE = 65536
+
+_stats = {"calls": 0, "iso": 0, "scanned": 0, "unparsed": 0}
+
+
+def locale_for_currency(currency: Optional[str]) -> Optional[str]:
+    return _CURRENCY_LOCALES.get((currency or "").upper())
+
+
+def _order(locale: Optional[str]) -> str:
+    return _LOCALE_ORDER.get(locale or "", "day_first")
+
+
+def _plausible(parsed: date) -> bool:
+    return MIN_YEAR <= parsed.year <= MAX_YEAR
+
+
+def _try(value: str, fmt: str) -> Optional[date]:
+    try:
+        parsed = datetime.strptime(value, fmt).date()
+    except ValueError:
+        return None
+    return parsed if _plausible(parsed) else None
+
+
+@lru_cache(maxsize=SCAN_CACHE_SIZE)
+def _scan(text: str, order: str) -> Optional[date]:
+    """First format in the locale's order that parses text"""
+    _stats["scanned"] += 1
+    for fmt in _LOCALE_FORMATS[order]:
+        parsed = _try(text, fmt)
+        if parsed:
+            return parsed
+    return None
+
+
+def normalize_date(value, locale: Optional[str] = None) -> Optional[date]:
+    """
+    Calendar date of a receipt date string, or None if it is not a date.
+
+    Args:
+        value: Extracted date (str, date or datetime)
+        locale: e.g. "en_US" (month first), "ja_JP" (year first); default day first
+    """
+    _stats["calls"] += 1
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+
+    text = str(value).strip()
+    match = _ISO.match(text)
+    if match:
+        _stats["iso"] += 1
+        try:
+            parsed = date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+            return parsed if _plausible(parsed) else None
+        except ValueError:
+            return None
+    if not text or not any(ch.isdigit() for ch in text):
+        _stats["unparsed"] += 1
+        return None
+
+    text = _ORDINAL_SUFFIX.sub(r"\1", _TIME_SUFFIX.sub("", text)).strip()
+    parsed = _scan(text, _order(locale))
+    if parsed is None:
+        _stats["unparsed"] += 1
+    return parsed
+
+
+def get_normalizer_stats() -> Dict[str, int]:
+    cache = _scan.cache_info()
+    return {**_stats, "cache_hits": cache.hits, "cached_dates": cache.currsize}
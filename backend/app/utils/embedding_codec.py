@@ -0,0 +1,83 @@
+"""
+Compact storage encoding for embeddings in MongoDB.
+
+An embedding stored as a BSON array of doubles costs ~9 bytes per dimension
+(type byte, array-index key, 8-byte double) and has to be rebuilt into a Python
+list on every read. Packed as a BSON Binary it costs 4 bytes per dimension as
+float32, 2 as float16 or 1 as int8 (symmetric scalar quantisation with a stored
+scale), and decodes straight into NumPy with ``np.frombuffer``.
+
+Document fields written by ``encode_embedding``:
+    embedding        Binary (or a plain array when the format is "array")
+    embedding_dtype  "float32" | "float16" | "int8" (absent for arrays)
+    embedding_scale  dequantisation scale (int8 only)
+"""
+
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+from bson.binary import Binary
+
+STORAGE_FORMATS = ("array", "float32", "float16", "int8")
+
+_NUMPY_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+    "int8": np.dtype("i1"),
+}
+
+
+def encode_embedding(embedding: Sequence[float], storage_format: str = "float32") -> Dict[str, Any]:
+    """
+    Encode an embedding for storage.
+
+    Args:
+        embedding: Embedding vector
+        storage_format: One of STORAGE_FORMATS
+
+    Returns:
+        Fields to ``$set`` on the document (embedding plus dtype/scale metadata)
+    """
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown embedding storage format '{storage_format}', expected one of {STORAGE_FORMATS}")
+
+    vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    if storage_format == "array":
+        return {"embedding": vector.tolist(), "embedding_dtype": None, "embedding_scale": None}
+
+    scale = None
+    if storage_format == "int8":
+        peak = float(np.max(np.abs(vector))) if vector.size else 0.0
+        scale = peak / 127.0 if peak > 0 else 1.0
+        packed = np.clip(np.rint(vector / scale), -127, 127).astype(_NUMPY_DTYPES["int8"])
+    else:
+        packed = vector.astype(_NUMPY_DTYPES[storage_format])
+
+    return {
+        "embedding": Binary(packed.tobytes()),
+        "embedding_dtype": storage_format,
+        "embedding_scale": scale,
+    }
+
+
+def decode_embedding(doc: Dict[str, Any]) -> Optional[np.ndarray]:
+    """
+    Read a document's embedding as a float32 NumPy vector.
+
+    Handles both packed Binary embeddings and legacy BSON arrays.
+
+    Returns:
+        float32 vector, or None if the document has no embedding
+    """
+    raw = doc.get("embedding")
+    if raw is None:
+        return None
+    if isinstance(raw, (bytes, bytearray, memoryview)):
+        dtype = doc.get("embedding_dtype") or "float32"
+        vector = np.frombuffer(raw, dtype=_NUMPY_DTYPES[dtype])
+        if dtype == "int8":
+            return vector.astype(np.float32) * np.float32(doc.get("embedding_scale") or 1.0)
+        return vector.astype(np.float32, copy=False)
+    if len(raw) == 0:
+        return None
+    return np.asarray(raw, dtype=np.float32)
@@ -0,0 +1,86 @@
+"""
+Multi-pattern keyword matching with an Aho-Corasick automaton.
+
+Replaces chains of ``any(k in text for k in keywords)`` scans: the automaton is
+compiled once from every keyword list and finds all labelled keywords in a
+single pass over the text, however many keywords there are. Matching is plain
+substring matching, exactly like ``k in text``.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton mapping keywords to labels.
+
+    Example:
+        matcher = KeywordMatcher({"travel": ["flight", "hotel"], "food": ["cafe"]})
+        matcher.labels_in("hotel cafe")  # {"travel", "food"}
+    """
+
+    def __init__(self, keywords_by_label: Dict[str, Iterable[str]], lowercase: bool = True):
+        self.lowercase = lowercase
+        # Trie as parallel arrays: goto transitions, failure links, output labels
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Set[str]] = [set()]
+        for label, keywords in keywords_by_label.items():
+            for keyword in keywords:
+                self._add(keyword.lower() if lowercase else keyword, label)
+        self._build_failure_links()
+
+    def _add(self, keyword: str, label: str):
+        if not keyword:
+            return
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(set())
+            state = next_state
+        self._out[state].add(label)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                # Inherit outputs of the longest proper suffix that is also a keyword
+                self._out[next_state] |= self._out[self._fail[next_state]]
+
+    def labels_in(self, text: str) -> Set[str]:
+        """All labels whose keywords occur anywhere in ``text``"""
+        found: Set[str] = set()
+        if not text:
+            return found
+        if self.lowercase:
+            text = text.lower()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+    def first_label(self, text: str, priority: Iterable[str]) -> Optional[str]:
+        """The first label in ``priority`` order that matches ``text``, if any"""
+        found = self.labels_in(text)
+        for label in priority:
+            if label in found:
+                return label
+        return None
@@ -0,0 +1,62 @@
+"""
+Exact-match blocking keys for duplicate and counterparty detection.
+
+Two receipts can only be duplicates or counterparties of each other if they
+carry the same total and the same date, so both are stored on every receipt in
+a normalised form (``total_cents``, ``match_date``) under the compound index
+``(user_id, total_cents, match_date)``. One indexed lookup then yields the
+whole candidate block; embedding similarity is only computed over that block.
+
+``match_date`` is the ISO ``YYYY-MM-DD`` form of the receipt date, so
+"2025-01-05", "05/01/2025" and "2025-01-05T00:00:00" share a block. Ambiguous
+dates follow the receipt currency's locale, so both sides of a counterparty
+pair resolve them the same way.
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any, Dict, Optional, Tuple
+
+from app.utils.date_normalizer import normalize_date, locale_for_currency
+
+# Compound index backing blocking lookups on the receipts collection
+BLOCKING_INDEX = [("user_id", 1), ("total_cents", 1), ("match_date", 1)]
+BLOCKING_INDEX_NAME = "user_total_date_block"
+
+
+def amount_to_cents(value: Any) -> Optional[int]:
+    """Amount in integer cents ("12.345" -> 1235); None for missing, zero or unparseable amounts"""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        cents = int((Decimal(str(value).replace(",", "").strip()) * 100).quantize(Decimal("1"), ROUND_HALF_UP))
+    except (InvalidOperation, ValueError):
+        return None
+    return cents or None
+
+
+def blocking_key(structured_data: Optional[Dict[str, Any]]) -> Optional[Tuple[int, str]]:
+    """(total_cents, date) for a receipt, or None if either is missing"""
+    data = structured_data or {}
+    cents = amount_to_cents(data.get("total") or data.get("amount"))
+    date = match_date(data)
+    if cents is None or not date:
+        return None
+    return cents, date
+
+
+def match_date(structured_data: Dict[str, Any]) -> Optional[str]:
+    """Receipt date as YYYY-MM-DD; the stripped raw value if it does not parse"""
+    raw = structured_data.get("date")
+    parsed = normalize_date(raw, locale=locale_for_currency(structured_data.get("currency")))
+    if parsed is not None:
+        return parsed.isoformat()
+    return str(raw or "").strip() or None
+
+
+def blocking_fields(structured_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Document fields to store alongside ``structured_data`` (None when there is no key)"""
+    key = blocking_key(structured_data)
+    return {
+        "total_cents": key[0] if key else None,
+        "match_date": key[1] if key else None,
+    }
@@ -1,12 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 from app.core.config import settings
 from app.api.routes import router
 from app.api.auth import router as auth_router
+from app.utils.cursor import NEXT_CURSOR_HEADER
 from app.db.mongodb import connect_to_mongo, close_mongo_connection
-from app.db.sql import init_db
+from app.db.sql import init_db, async_engine
 
 
 @asynccontextmanager
@@ -14,9 +16,19 @@ async def lifespan(app: FastAPI):
     # Startup
     await connect_to_mongo()
     init_db()
+    from app.services.vector_store import init_vector_store
+    # Pick Atlas $vectorSearch, the local index or brute force for this deployment
+    await init_vector_store()
+    if settings.LLM_WARMUP_ON_STARTUP:
+        from app.core.llm import warm_up_llms
+        # TLS handshake + auth for the primary/secondary LLM clients, off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, warm_up_llms)
     yield
     # Shutdown
+    from app.services.embedding_service import shutdown_embedding_service
+    await shutdown_embedding_service()
     await close_mongo_connection()
+    await async_engine.dispose()
 
 
 app = FastAPI(
@@ -33,6 +45,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include routers
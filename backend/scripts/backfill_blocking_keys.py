@@ -0,0 +1,75 @@
+"""
+Backfill duplicate-detection blocking keys on existing receipts.
+
+Receipts stored before blocking keys existed have no ``total_cents`` /
+``match_date`` fields, so they are only found through the vector-search
+fallback. This script computes both from ``structured_data`` (see
+app/utils/match_keys.py) and creates the ``(user_id, total_cents, match_date)``
+index. Safe to re-run. Use --all to recompute keys that were stored before
+``match_date`` was normalised to YYYY-MM-DD.
+
+Usage:
+    python scripts/backfill_blocking_keys.py
+    python scripts/backfill_blocking_keys.py --all
+    python scripts/backfill_blocking_keys.py --dry-run
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import argparse
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.utils.match_keys import BLOCKING_INDEX, BLOCKING_INDEX_NAME, blocking_fields
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def backfill(batch_size: int, dry_run: bool, rekey_all: bool = False):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.MONGODB_DB_NAME]
+    collection = db.receipts
+
+    await client.admin.command('ping')
+    logger.info(f"Connected to MongoDB: {settings.MONGODB_DB_NAME}")
+
+    query = {} if rekey_all else {"total_cents": {"$exists": False}}
+    pending = await collection.count_documents(query)
+    logger.info(f"{pending} receipt(s) {'to re-key' if rekey_all else 'without blocking keys'}")
+    if dry_run:
+        client.close()
+        return
+
+    updated = 0
+    ops = []
+    async for doc in collection.find(query, {"_id": 1, "structured_data": 1}):
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": blocking_fields(doc.get("structured_data"))}))
+        if len(ops) >= batch_size:
+            await collection.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+            logger.info(f"Updated {updated}/{pending}")
+    if ops:
+        await collection.bulk_write(ops, ordered=False)
+        updated += len(ops)
+
+    await collection.create_index(BLOCKING_INDEX, name=BLOCKING_INDEX_NAME)
+    logger.info(f"Backfilled {updated} receipt(s); index '{BLOCKING_INDEX_NAME}' is in place")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill total/date blocking keys on receipts")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Only count receipts that would change")
+    parser.add_argument("--all", action="store_true", help="Recompute keys on every receipt, not only missing ones")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.batch_size, args.dry_run, args.all))
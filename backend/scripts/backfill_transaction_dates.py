@@ -0,0 +1,134 @@
+"""
+Backfill ledger_entries.transaction_date from the extracted date strings.
+
+Adds the transaction_date column and its (user_id, transaction_date) index to
+an existing database if they are missing, then normalises ``date`` (see
+app/utils/date_normalizer.py) for every entry without a transaction_date, in
+id-ordered chunks with one executemany UPDATE and commit per chunk. Entries
+whose date is not a date ("N/A") stay NULL. Safe to re-run. With --all,
+entries that already have a transaction_date are re-normalised too and
+updated where the result differs (dates written before ambiguous dates were
+resolved by locale alone).
+
+With --fix-journal-dates, receipt journals whose entry_date differs from the
+normalised date (they were dated when the receipt was posted because its
+date was not YYYY-MM-DD) are re-dated, and closed periods they move into or
+out of are reopened.
+
+Usage:
+    python scripts/backfill_transaction_dates.py
+    python scripts/backfill_transaction_dates.py --chunk-size 5000 --fix-journal-dates
+    python scripts/backfill_transaction_dates.py --all --fix-journal-dates
+    python scripts/backfill_transaction_dates.py --dry-run
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+from datetime import datetime
+from sqlalchemy import inspect, text, update, bindparam
+from app.db.sql import engine, init_db, LedgerEntry, JournalEntry, reopen_closed_periods
+from app.utils.date_normalizer import normalize_date, locale_for_currency, get_normalizer_stats
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "ix_ledger_entries_user_txn_date"
+
+
+def ensure_column():
+    """Add transaction_date and its index to a ledger_entries table created before them"""
+    columns = {column["name"] for column in inspect(engine).get_columns("ledger_entries")}
+    if "transaction_date" not in columns:
+        logger.info("Adding transaction_date column to ledger_entries...")
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE ledger_entries ADD COLUMN transaction_date DATE NULL"))
+    indexes = {index["name"] for index in inspect(engine).get_indexes("ledger_entries")}
+    if INDEX_NAME not in indexes:
+        logger.info(f"Creating index {INDEX_NAME}...")
+        next(ix for ix in LedgerEntry.__table__.indexes if ix.name == INDEX_NAME).create(bind=engine)
+
+
+def backfill(chunk_size: int, dry_run: bool, recompute: bool = False):
+    table = LedgerEntry.__table__
+    statement = update(table).where(table.c.id == bindparam("b_id")).values(transaction_date=bindparam("b_date"))
+    last_id, scanned, filled = 0, 0, 0
+    started = time.perf_counter()
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                table.select().with_only_columns(table.c.id, table.c.date, table.c.currency, table.c.transaction_date)
+                .where(table.c.id > last_id, *([] if recompute else [table.c.transaction_date.is_(None)]))
+                .order_by(table.c.id).limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            scanned += len(rows)
+            values = []
+            for row in rows:
+                parsed = normalize_date(row.date, locale_for_currency(row.currency))
+                if parsed and parsed != row.transaction_date:
+                    values.append({"b_id": row.id, "b_date": parsed})
+            if values and not dry_run:
+                conn.execute(statement, values)
+            filled += len(values)
+        logger.info(f"Scanned {scanned} entries, dated {filled} (up to id {last_id})")
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"✅ {filled}/{scanned} entries {'would be ' if dry_run else ''}dated in {elapsed:.1f}s; "
+        f"normaliser: {get_normalizer_stats()}"
+    )
+
+
+def fix_journal_dates(chunk_size: int, dry_run: bool):
+    """Re-date receipt journals to their ledger entry's transaction_date"""
+    journals, ledger = JournalEntry.__table__, LedgerEntry.__table__
+    statement = update(journals).where(journals.c.id == bindparam("b_id")).values(entry_date=bindparam("b_date"))
+    last_id, fixed = 0, 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                journals.select().with_only_columns(
+                    journals.c.id, journals.c.user_id, journals.c.entry_date, ledger.c.transaction_date
+                ).join(ledger, ledger.c.id == journals.c.ledger_entry_id)
+                .where(journals.c.id > last_id, ledger.c.transaction_date.isnot(None), journals.c.is_adjusting == False)
+                .order_by(journals.c.id).limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            values, earliest = [], {}
+            for row in rows:
+                new_date = datetime.combine(row.transaction_date, datetime.min.time())
+                if row.entry_date and row.entry_date.date() == row.transaction_date:
+                    continue
+                values.append({"b_id": row.id, "b_date": new_date})
+                for changed in (row.entry_date, new_date):
+                    if changed and (row.user_id not in earliest or changed < earliest[row.user_id]):
+                        earliest[row.user_id] = changed
+            if values and not dry_run:
+                conn.execute(statement, values)
+                reopen_closed_periods(conn, earliest)
+            fixed += len(values)
+    logger.info(f"✅ {fixed} journal entr{'y' if fixed == 1 else 'ies'} {'would be ' if dry_run else ''}re-dated")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill normalised transaction dates on ledger entries")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--fix-journal-dates", action="store_true", help="Re-date receipt journals to the normalised date")
+    parser.add_argument("--all", action="store_true", help="Re-normalise entries that already have a transaction_date")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    init_db()
+    ensure_column()
+    backfill(args.chunk_size, args.dry_run, args.all)
+    if args.fix_journal_dates:
+        fix_journal_dates(args.chunk_size, args.dry_run)
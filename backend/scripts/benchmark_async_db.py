@@ -0,0 +1,262 @@
+"""
+Benchmark request concurrency with blocking vs async database sessions.
+
+Runs route-shaped coroutines on one event loop against DATABASE_URL: --clients
+"fast" clients each make the --route request in a loop, while --slow-clients
+run a query that takes --slow-seconds in the database (SQLite: a sleeping SQL
+function; MySQL: SLEEP()). Each mode is timed for --duration seconds with and
+without the slow clients. Routes:
+
+    page      fetch a 50-row ledger page (GET /ledger)
+    link      manually link two of the user's entries (POST
+              /ledger/{id_1}/link/{id_2}): the ownership check and the
+              reconciliation link/group write in link_transactions
+
+Modes:
+
+    blocking  the previous route code: SessionLocal() queries through the sync
+              driver, directly on the event loop
+    async     the request-scoped AsyncSession, services run through
+              run_in_session on the asyncio driver
+
+With blocking sessions every slow query stalls the whole loop, so fast
+request throughput collapses to a few pages per slow query (their own p50/p95
+stay low: the stall happens between requests, not inside them); with async
+sessions it stays close to the run without slow clients. A throwaway user
+with --entries ledger entries is created and deleted afterwards.
+
+    DATABASE_URL=sqlite:////tmp/async.db python scripts/benchmark_async_db.py --clients 10 --slow-clients 2
+    DATABASE_URL=sqlite:////tmp/async.db python scripts/benchmark_async_db.py --route link
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+import uuid
+import logging
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, text
+
+from app.db.sql import (
+    SessionLocal, AsyncSessionLocal, engine, async_engine, init_db, run_in_session,
+    User, Account, AccountBalance, ChartOfAccountsVersion, JournalEntry, JournalEntryLine, LedgerEntry, LedgerItem,
+    ReconciliationLink, ReconciliationGroupMember
+)
+from app.services.ledger_service import create_ledger_entries_bulk, get_ledger_entries_page
+from app.services.reconciliation_graph import add_links
+from app.services.reconciliation_service import link_transactions
+from app.services.accounting_service import initialize_chart_of_accounts, invalidate_chart_cache
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 50
+IS_SQLITE = engine.dialect.name == "sqlite"
+
+
+def _sqlite_sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _register_sleep(dbapi_connection, connection_record):
+    dbapi_connection.create_function("bench_sleep", 1, _sqlite_sleep)
+
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _register_sleep)
+    event.listen(async_engine.sync_engine, "connect", _register_sleep)
+
+SLOW_QUERY = text("SELECT bench_sleep(:seconds)" if IS_SQLITE else "SELECT SLEEP(:seconds)")
+
+
+def load(entries: int) -> int:
+    init_db()
+    db = SessionLocal()
+    try:
+        user = User(email=f"async-bench-{uuid.uuid4().hex[:8]}@example.com", hashed_password="!")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    finally:
+        db.close()
+    initialize_chart_of_accounts(user_id)
+    records = [
+        (
+            f"async-bench-{user_id}-{i}",
+            {
+                "vendor": f"Vendor {i % 50}", "date": f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+                "total": 10.0 + i % 500, "amount": 10.0 + i % 500, "currency": "USD",
+                "category": "Office Supplies", "payment_method": "Credit Card",
+                "items": [{"name": "item", "quantity": 1, "unit_price": 10.0, "line_total": 10.0}],
+            },
+            {"validation_result": {"status": "valid", "confidence": 1.0, "issues": []}, "reasoning_trace": {}},
+        )
+        for i in range(entries)
+    ]
+    create_ledger_entries_bulk(records, user_id)
+    return user_id
+
+
+_pair_counter = itertools.count()
+
+
+def _record_pair(user_id: int, entries: int):
+    # Disjoint pairs in turn, so no two in-flight requests touch the same link or group
+    i = next(_pair_counter) % (entries // 2) * 2
+    return f"async-bench-{user_id}-{i}", f"async-bench-{user_id}-{i + 1}"
+
+
+# Route-shaped handlers: what an `async def` endpoint does per request in each mode
+
+async def blocking_page(user_id: int, entries: int):
+    page, _ = get_ledger_entries_page(user_id, limit=PAGE_SIZE)
+    return page
+
+
+async def blocking_link(user_id: int, entries: int):
+    record_id_1, record_id_2 = _record_pair(user_id, entries)
+    db = SessionLocal()
+    try:
+        owned = db.query(LedgerEntry).filter(
+            LedgerEntry.user_id == user_id,
+            LedgerEntry.record_id.in_([record_id_1, record_id_2])
+        ).count()
+    finally:
+        db.close()
+    if owned == 2:
+        add_links(user_id, [(record_id_1, record_id_2, "related", 1.0)], source="manual")
+
+
+async def blocking_slow(seconds: float):
+    db = SessionLocal()
+    try:
+        db.execute(SLOW_QUERY, {"seconds": seconds})
+    finally:
+        db.close()
+
+
+async def async_page(user_id: int, entries: int):
+    async with AsyncSessionLocal() as session:
+        page, _ = await run_in_session(session, get_ledger_entries_page, user_id, limit=PAGE_SIZE)
+        return page
+
+
+async def async_link(user_id: int, entries: int):
+    record_id_1, record_id_2 = _record_pair(user_id, entries)
+    async with AsyncSessionLocal() as session:
+        await link_transactions(record_id_1, record_id_2, "related", user_id, session)
+
+
+async def async_slow(seconds: float):
+    async with AsyncSessionLocal() as session:
+        await session.execute(SLOW_QUERY, {"seconds": seconds})
+
+
+MODES = {
+    "blocking": ({"page": blocking_page, "link": blocking_link}, blocking_slow),
+    "async": ({"page": async_page, "link": async_link}, async_slow),
+}
+
+
+async def run_mode(
+    mode: str, route: str, user_id: int, entries: int,
+    clients: int, slow_clients: int, slow_seconds: float, duration: float
+):
+    routes, slow = MODES[mode]
+    request = routes[route]
+    deadline = time.perf_counter() + duration
+    latencies, slow_done = [], [0]
+
+    async def fast_client():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await request(user_id, entries)
+            latencies.append(time.perf_counter() - started)
+            # Yield like a real request boundary would
+            await asyncio.sleep(0)
+
+    async def slow_client():
+        while time.perf_counter() < deadline:
+            await slow(slow_seconds)
+            slow_done[0] += 1
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[fast_client() for _ in range(clients)], *[slow_client() for _ in range(slow_clients)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+        "slow_queries": slow_done[0],
+    }
+
+
+def cleanup(user_id: int):
+    db = SessionLocal()
+    try:
+        entry_ids = db.query(LedgerEntry.id).filter(LedgerEntry.user_id == user_id)
+        journal_ids = db.query(JournalEntry.id).filter(JournalEntry.user_id == user_id)
+        db.query(ReconciliationGroupMember).filter(ReconciliationGroupMember.user_id == user_id).delete(synchronize_session=False)
+        db.query(ReconciliationLink).filter(ReconciliationLink.user_id == user_id).delete(synchronize_session=False)
+        db.query(JournalEntryLine).filter(JournalEntryLine.journal_entry_id.in_(journal_ids)).delete(synchronize_session=False)
+        db.query(JournalEntry).filter(JournalEntry.user_id == user_id).delete(synchronize_session=False)
+        db.query(LedgerItem).filter(LedgerItem.ledger_entry_id.in_(entry_ids)).delete(synchronize_session=False)
+        db.query(LedgerEntry).filter(LedgerEntry.user_id == user_id).delete(synchronize_session=False)
+        db.query(AccountBalance).filter(AccountBalance.user_id == user_id).delete(synchronize_session=False)
+        db.query(Account).filter(Account.user_id == user_id).delete(synchronize_session=False)
+        db.query(ChartOfAccountsVersion).filter(ChartOfAccountsVersion.user_id == user_id).delete(synchronize_session=False)
+        db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    invalidate_chart_cache(user_id)
+
+
+async def benchmark(args):
+    user_id = load(args.entries)
+    try:
+        # Warm both pools and the chart cache before timing
+        for mode in MODES:
+            await run_mode(mode, args.route, user_id, args.entries, 1, 0, 0.0, 0.2)
+
+        print(f"{args.route} route: {args.clients} fast clients, {args.slow_clients} slow clients x {args.slow_seconds}s queries, "
+              f"{args.duration}s per run ({engine.dialect.name})")
+        print(f"{'mode':<10} {'slow':<5} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'slow q':>7}")
+        for mode in MODES:
+            for slow_clients in (0, args.slow_clients):
+                result = await run_mode(
+                    mode, args.route, user_id, args.entries,
+                    args.clients, slow_clients, args.slow_seconds, args.duration
+                )
+                print(
+                    f"{mode:<10} {'yes' if slow_clients else 'no':<5} {result['requests']:>9} {result['rps']:>9.1f} "
+                    f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['slow_queries']:>7}"
+                )
+    finally:
+        await async_engine.dispose()
+        if not args.keep:
+            cleanup(user_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark blocking vs async database sessions under slow queries")
+    parser.add_argument("--route", choices=["page", "link"], default="page", help="Request made by the fast clients")
+    parser.add_argument("--clients", type=int, default=10, help="Concurrent clients making --route requests")
+    parser.add_argument("--slow-clients", type=int, default=2, help="Concurrent clients running the slow query")
+    parser.add_argument("--slow-seconds", type=float, default=0.5, help="Duration of each slow query")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per run")
+    parser.add_argument("--entries", type=int, default=2000, help="Ledger entries for the benchmark user")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark user and its ledger")
+    args = parser.parse_args()
+    asyncio.run(benchmark(args))
@@ -0,0 +1,76 @@
+"""
+Benchmark the set-based reconciliation engine.
+
+Generates a synthetic period of ledger records with injected duplicates and
+counterparties, runs the in-memory matcher (bulk_reconciliation_service.match_period)
+and reports records per second. With --user-id it also runs the full
+reconcile_period (load, match, bulk write) against DATABASE_URL.
+
+    python scripts/benchmark_bulk_reconciliation.py --records 500000 --window 3
+    python scripts/benchmark_bulk_reconciliation.py --user-id 1 --start 2025-01-01 --end 2025-01-31 --dry-run
+"""
+
+import sys
+import os
+import argparse
+import time
+import logging
+from datetime import date
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from app.services.bulk_reconciliation_service import match_period, reconcile_period, RELATIONSHIPS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def synthetic_period(records: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    vendor_pool = np.array([f"vendor {i}" for i in range(max(10, records // 50))])
+    cents = rng.integers(100, 500_000, size=records).astype(np.int64)
+    days = rng.integers(20089, 20089 + 31, size=records).astype(np.int64)  # one month
+    vendors = vendor_pool[rng.integers(0, len(vendor_pool), size=records)]
+
+    # 2% exact duplicates, 3% counterparties (same amount, other vendor, up to 2 days later)
+    dup = rng.choice(records, size=records // 50, replace=False)
+    src = rng.choice(records, size=dup.size)
+    cents[dup], days[dup], vendors[dup] = cents[src], days[src], vendors[src]
+    cp = rng.choice(records, size=records * 3 // 100, replace=False)
+    src = rng.choice(records, size=cp.size)
+    cents[cp], days[cp] = cents[src], days[src] + rng.integers(0, 3, size=cp.size)
+    return cents, days, vendors
+
+
+def run_in_memory(records: int, window: int, tolerance_cents: int):
+    cents, days, vendors = synthetic_period(records)
+    start = time.perf_counter()
+    matches = match_period(cents, days, vendors, window, tolerance_cents)
+    elapsed = time.perf_counter() - start
+    counts = {name: int(np.sum(matches["relationship"] == code)) for code, name in enumerate(RELATIONSHIPS)}
+    print(
+        f"records={records} window={window}d tolerance={tolerance_cents}c "
+        f"candidate_pairs={matches['candidate_pairs']} {counts} "
+        f"match={elapsed * 1000:.1f} ms -> {records / elapsed:,.0f} records/s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bulk reconciliation")
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--window", type=int, default=0, help="Date window in days")
+    parser.add_argument("--tolerance-cents", type=int, default=0)
+    parser.add_argument("--user-id", type=int, help="Also run reconcile_period against the database for this user")
+    parser.add_argument("--start", default=None, help="Period start (ISO date) for --user-id")
+    parser.add_argument("--end", default=None, help="Period end (ISO date) for --user-id")
+    parser.add_argument("--dry-run", action="store_true", help="Do not write links for --user-id runs")
+    args = parser.parse_args()
+
+    run_in_memory(args.records, args.window, args.tolerance_cents)
+    if args.user_id:
+        start = date.fromisoformat(args.start) if args.start else date.today().replace(day=1)
+        end = date.fromisoformat(args.end) if args.end else date.today()
+        print(reconcile_period(args.user_id, start, end, args.window, args.tolerance_cents / 100, dry_run=args.dry_run))
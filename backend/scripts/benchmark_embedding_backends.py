@@ -0,0 +1,126 @@
+"""
+Benchmark embedding backends: torch sentence-transformers vs the int8 ONNX export.
+
+Each backend runs in its own subprocess so resident memory is measured in
+isolation. Reports model load time, single-text latency (p50/p95), batched
+throughput and RSS before/after loading and at peak.
+
+    python scripts/export_onnx_embedder.py          # once, to create the ONNX export
+    python scripts/benchmark_embedding_backends.py --requests 200 --batch-size 32
+"""
+
+import sys
+import os
+import argparse
+import json
+import resource
+import subprocess
+import time
+import logging
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx")
+
+VENDORS = ["Starbucks", "Uber", "Acme Consulting", "Hilton", "Office Depot", "AWS", "Shell", "Delta Air Lines"]
+ITEMS = ["Caffe Latte", "Trip fare", "Consulting hours", "Deluxe room", "Printer paper", "EC2 usage", "Unleaded fuel", "Baggage fee"]
+
+
+def receipt_texts(count: int):
+    texts = []
+    for i in range(count):
+        vendor, item = VENDORS[i % len(VENDORS)], ITEMS[(i * 3) % len(ITEMS)]
+        texts.append(
+            f"{vendor} receipt #{1000 + i}\n{item} x{i % 5 + 1} {12.5 + i % 40:.2f}\n"
+            f"Tax {(12.5 + i % 40) * 0.08:.2f}\nTotal {(12.5 + i % 40) * 1.08:.2f}\nDate 2025-07-{i % 28 + 1:02d}"
+        )
+    return texts
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return float("nan")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def run_worker(backend: str, requests: int, batch_size: int):
+    os.environ["EMBEDDING_BACKEND"] = backend
+    from app.services import embedding_service
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    model = embedding_service.get_embedding_model()
+    load_s = time.perf_counter() - start
+    actual = embedding_service.get_embedding_backend()
+
+    texts = receipt_texts(requests)
+    embedding_service.encode_texts(texts[:4])  # warm-up
+
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        embedding_service.encode_texts([text])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        embedding_service.encode_texts(texts[i:i + batch_size])
+    throughput = len(texts) / (time.perf_counter() - start)
+
+    print(json.dumps({
+        "backend": actual,
+        "model": type(model).__name__,
+        "load_s": round(load_s, 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "throughput_per_s": round(throughput, 1),
+        "rss_before_mb": round(rss_before, 1),
+        "rss_after_mb": round(current_rss_mb(), 1),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def main(requests: int, batch_size: int):
+    results = []
+    for backend in BACKENDS:
+        logger.info(f"Benchmarking {backend} backend...")
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", backend, "--requests", str(requests), "--batch-size", str(batch_size)],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            logger.error(f"{backend} backend failed:\n{proc.stderr[-2000:]}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if result["backend"] != backend:
+            logger.warning(f"Requested {backend} but the service fell back to {result['backend']}")
+        results.append(result)
+
+    columns = ["backend", "load_s", "p50_ms", "p95_ms", "throughput_per_s", "rss_after_mb", "peak_rss_mb"]
+    print(" ".join(f"{c:>16}" for c in columns))
+    for result in results:
+        print(" ".join(f"{str(result[c]):>16}" for c in columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark torch vs ONNX embedding backends")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        run_worker(args.worker, args.requests, args.batch_size)
+    else:
+        main(args.requests, args.batch_size)
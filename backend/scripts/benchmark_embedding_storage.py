@@ -0,0 +1,129 @@
+"""
+Compare embedding storage formats: BSON array vs packed Binary (float32/float16/int8).
+
+For each format reports:
+  - BSON document size (what Mongo stores and sends over the wire per receipt)
+  - decode time for N documents (list -> NumPy vs np.frombuffer)
+  - brute-force query time over the decoded matrix
+  - accuracy vs the original float32 vectors (cosine error, top-k overlap)
+
+Runs offline on synthetic vectors by default. With --mongo, also round-trips the
+documents through a scratch collection in MONGODB_DB_NAME and times the fetch.
+
+    python scripts/benchmark_embedding_storage.py --docs 20000
+    python scripts/benchmark_embedding_storage.py --docs 20000 --mongo
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import time
+import logging
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import bson
+import numpy as np
+
+from app.core.config import settings
+from app.utils.embedding_codec import STORAGE_FORMATS, encode_embedding, decode_embedding
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCRATCH_COLLECTION = "embedding_storage_benchmark"
+
+
+def make_documents(vectors: np.ndarray, storage_format: str):
+    docs = []
+    for i, vector in enumerate(vectors):
+        doc = {
+            "record_id": f"bench-{i}",
+            "user_id": 1,
+            "status": "validated",
+            "structured_data": {"vendor": "Bench Vendor", "total_amount": 12.5, "date": "2026-01-01"},
+        }
+        doc.update(encode_embedding(vector, storage_format))
+        docs.append(doc)
+    return docs
+
+
+def decode_matrix(docs) -> np.ndarray:
+    return np.vstack([decode_embedding(doc) for doc in docs])
+
+
+def top_k(matrix: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    scores = (matrix / np.where(norms == 0, 1, norms)) @ queries.T
+    return np.argpartition(scores, -k, axis=0)[-k:].T
+
+
+async def fetch_from_mongo(docs) -> float:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    collection = client[settings.MONGODB_DB_NAME][SCRATCH_COLLECTION]
+    try:
+        await collection.drop()
+        await collection.insert_many([dict(doc) for doc in docs])
+        start = time.perf_counter()
+        fetched = await collection.find(
+            {"user_id": 1},
+            {"record_id": 1, "embedding": 1, "embedding_dtype": 1, "embedding_scale": 1}
+        ).to_list(length=None)
+        decode_matrix(fetched)
+        return (time.perf_counter() - start) * 1000
+    finally:
+        await collection.drop()
+        client.close()
+
+
+def run(num_docs: int, dim: int, num_queries: int, k: int, use_mongo: bool):
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((num_docs, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.choice(num_docs, size=num_queries, replace=False)]
+    queries = queries + rng.normal(0, 0.05, queries.shape).astype(np.float32)
+    reference = top_k(vectors, queries, k)
+
+    logger.info(f"{num_docs} documents, dim={dim}, {num_queries} queries, top-{k}")
+    header = f"{'format':<8} {'doc bytes':>10} {'total MB':>9} {'decode ms':>10} {'query ms':>9} {'max cos err':>12} {'top-k overlap':>14}"
+    if use_mongo:
+        header += f" {'mongo fetch ms':>15}"
+    print(header)
+
+    for storage_format in STORAGE_FORMATS:
+        docs = make_documents(vectors, storage_format)
+        sizes = [len(bson.encode(doc)) for doc in docs]
+
+        start = time.perf_counter()
+        matrix = decode_matrix(docs)
+        decode_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        found = top_k(matrix, queries, k)
+        query_ms = (time.perf_counter() - start) * 1000 / num_queries
+
+        cos = np.sum(matrix * vectors, axis=1) / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(vectors, axis=1))
+        overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(found, reference)])
+
+        line = (
+            f"{storage_format:<8} {int(np.mean(sizes)):>10} {sum(sizes) / 1e6:>9.2f} {decode_ms:>10.1f} "
+            f"{query_ms:>9.3f} {float(np.max(1 - cos)):>12.2e} {overlap:>14.3f}"
+        )
+        if use_mongo:
+            line += f" {asyncio.run(fetch_from_mongo(docs)):>15.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark embedding storage formats")
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=settings.EMBEDDING_DIMENSION)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--mongo", action="store_true", help="Also time a fetch from a scratch Mongo collection")
+    args = parser.parse_args()
+    run(args.docs, args.dim, args.queries, args.top_k, args.mongo)
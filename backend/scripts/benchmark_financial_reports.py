@@ -0,0 +1,167 @@
+"""
+Benchmark the financial reports at scale.
+
+Loads --lines journal lines (default 1M, two per journal entry spread over one
+year) for a throwaway user against DATABASE_URL, then times the shared
+GROUP BY aggregate behind the trial balance, income statement and balance
+sheet: all-time, one month, and the three reports together. With --legacy it
+also times the previous approach (one session and a full line scan per
+account) for comparison. The benchmark user is deleted afterwards unless
+--keep is given.
+
+    DATABASE_URL=sqlite:////tmp/reports.db python scripts/benchmark_financial_reports.py --lines 1000000
+"""
+
+import sys
+import os
+import argparse
+import random
+import time
+import uuid
+import logging
+from datetime import date, datetime, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import insert, func
+
+from app.db.sql import (
+    SessionLocal, init_db, User, Account, AccountBalance, ChartOfAccountsVersion, JournalEntry, JournalEntryLine
+)
+from app.services.accounting_service import (
+    get_chart, get_account_totals, get_financial_reports, invalidate_chart_cache,
+    CATEGORY_TO_EXPENSE_ACCOUNT
+)
+from app.services.account_balances import rebuild_account_balances
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+CHUNK = 20_000
+YEAR_START = datetime(2025, 1, 1)
+
+
+def load(user_id: int, lines: int, seed: int = 11):
+    rng = random.Random(seed)
+    chart = get_chart(user_id)
+    expense_ids = [chart[code].id for code in CATEGORY_TO_EXPENSE_ACCOUNT.values() if code in chart]
+    payment_ids = [chart["1100"].id, chart["2200"].id, chart["2100"].id]
+    revenue_id, receivable_id = chart["4100"].id, chart["1200"].id
+
+    db = SessionLocal()
+    try:
+        first_id = (db.query(func.max(JournalEntry.id)).scalar() or 0) + 1
+        entries = lines // 2
+        for start in range(0, entries, CHUNK):
+            count = min(CHUNK, entries - start)
+            journal_rows, line_rows = [], []
+            for k in range(count):
+                entry_id = first_id + start + k
+                amount = round(rng.uniform(1, 2000), 2)
+                if rng.random() < 0.2:
+                    debit_account, credit_account = receivable_id, revenue_id
+                else:
+                    debit_account, credit_account = rng.choice(expense_ids), rng.choice(payment_ids)
+                journal_rows.append({
+                    "id": entry_id, "user_id": user_id,
+                    "entry_date": YEAR_START + timedelta(days=rng.randrange(365), seconds=rng.randrange(86400)),
+                    "reference": f"bench-{entry_id}", "description": "benchmark", "is_balanced": True,
+                })
+                line_rows.append({"journal_entry_id": entry_id, "account_id": debit_account, "debit": amount, "credit": 0.0})
+                line_rows.append({"journal_entry_id": entry_id, "account_id": credit_account, "debit": 0.0, "credit": amount})
+            db.execute(insert(JournalEntry), journal_rows)
+            db.execute(insert(JournalEntryLine), line_rows)
+            db.commit()
+            print(f"\rloaded {(start + count) * 2:,} lines", end="", flush=True)
+        print()
+    finally:
+        db.close()
+    # Core inserts bypass the balance hook
+    rebuild_account_balances(user_id)
+
+
+def legacy_totals(user_id: int):
+    """Previous approach: per account, a new session and every line summed in Python"""
+    db = SessionLocal()
+    try:
+        accounts = db.query(Account).filter(Account.user_id == user_id).all()
+    finally:
+        db.close()
+    totals = {}
+    for account in accounts:
+        session = SessionLocal()
+        try:
+            lines = session.query(JournalEntryLine).filter(JournalEntryLine.account_id == account.id).all()
+            totals[account.code] = (sum(line.debit for line in lines), sum(line.credit for line in lines))
+        finally:
+            session.close()
+    return totals
+
+
+def timed(label: str, fn, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<48} {best * 1000:>10.1f} ms")
+    return result
+
+
+def cleanup(user_id: int):
+    db = SessionLocal()
+    try:
+        journal_ids = db.query(JournalEntry.id).filter(JournalEntry.user_id == user_id)
+        db.query(JournalEntryLine).filter(JournalEntryLine.journal_entry_id.in_(journal_ids)).delete(synchronize_session=False)
+        db.query(JournalEntry).filter(JournalEntry.user_id == user_id).delete(synchronize_session=False)
+        db.query(AccountBalance).filter(AccountBalance.user_id == user_id).delete(synchronize_session=False)
+        db.query(Account).filter(Account.user_id == user_id).delete(synchronize_session=False)
+        db.query(ChartOfAccountsVersion).filter(ChartOfAccountsVersion.user_id == user_id).delete(synchronize_session=False)
+        db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    invalidate_chart_cache(user_id)
+
+
+def run(lines: int, legacy: bool, keep: bool):
+    init_db()
+    db = SessionLocal()
+    try:
+        user = User(email=f"reports-bench-{uuid.uuid4().hex[:8]}@example.com", hashed_password="!")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    finally:
+        db.close()
+
+    try:
+        started = time.perf_counter()
+        load(user_id, lines)
+        print(f"load + balance rebuild: {time.perf_counter() - started:.1f}s")
+
+        totals = timed("aggregate, all time", lambda: get_account_totals(user_id))
+        timed("aggregate, one month", lambda: get_account_totals(user_id, date(2025, 6, 1), date(2025, 6, 30)))
+        reports = timed("all three reports, all time (one aggregate)", lambda: get_financial_reports(user_id))
+        timed("all three reports, Q2 (two aggregates)", lambda: get_financial_reports(
+            user_id, date(2025, 4, 1), date(2025, 6, 30)
+        ))
+        print(
+            f"accounts={len(totals)} trial balance balanced={reports['trial_balance']['is_balanced']} "
+            f"balance sheet balanced={reports['balance_sheet']['is_balanced']}"
+        )
+        if legacy:
+            timed("legacy per-account scan, all time", lambda: legacy_totals(user_id), repeat=1)
+    finally:
+        if not keep:
+            cleanup(user_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark financial report aggregation")
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--legacy", action="store_true", help="Also time the per-account scan used before")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark user and its journal")
+    args = parser.parse_args()
+    run(args.lines, args.legacy, args.keep)
@@ -0,0 +1,133 @@
+"""
+Benchmark the ledger posting pipeline.
+
+Posts synthetic receipts (ledger entry + items + balanced journal, one
+transaction each) through posting_service against DATABASE_URL for a
+throwaway benchmark user, and reports postings per second and per core
+(postings / CPU seconds of the posting thread). With --bulk the same receipts
+go through post_ledger_entries_bulk (executemany inserts, one transaction per
+--chunk-size records), e.g. to time a 10,000 receipt import. The benchmark
+user and everything posted for it are deleted afterwards unless --keep is
+given.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python scripts/benchmark_posting.py --postings 2000
+    DATABASE_URL=sqlite:////tmp/bench.db python scripts/benchmark_posting.py --postings 10000 --bulk
+"""
+
+import sys
+import os
+import argparse
+import time
+import uuid
+import logging
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.sql import (
+    SessionLocal, init_db, User, Account, AccountBalance, ChartOfAccountsVersion, JournalEntry, JournalEntryLine, LedgerEntry
+)
+from app.services.accounting_service import CATEGORY_TO_EXPENSE_ACCOUNT, invalidate_chart_cache
+from app.services.posting_service import (
+    post_ledger_entry, post_ledger_entries_bulk, get_posting_stats, reset_posting_stats, BULK_CHUNK_SIZE
+)
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+CATEGORIES = list(CATEGORY_TO_EXPENSE_ACCOUNT)
+PAYMENT_METHODS = ["cash", "credit card", "bank transfer", None]
+
+VALID = {
+    "validation_result": {"status": "valid", "issues": [], "confidence": 0.95, "currency": "USD"},
+    "reasoning_trace": {"steps": [], "final_conclusion": "benchmark", "confidence_score": 0.95},
+}
+
+
+def synthetic_receipt(i: int, items: int):
+    lines = [
+        {"name": f"Item {k}", "quantity": k % 3 + 1, "unit_price": 2.5 + k, "line_total": (k % 3 + 1) * (2.5 + k)}
+        for k in range(items)
+    ]
+    total = round(sum(line["line_total"] for line in lines) or 10.0, 2)
+    return {
+        "vendor": f"Vendor {i % 97}",
+        "date": f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+        "subtotal": total,
+        "total": total,
+        "currency": "USD",
+        "category": CATEGORIES[i % len(CATEGORIES)],
+        "payment_method": PAYMENT_METHODS[i % len(PAYMENT_METHODS)],
+        "items": lines,
+    }
+
+
+def create_user() -> int:
+    db = SessionLocal()
+    try:
+        user = User(email=f"posting-bench-{uuid.uuid4().hex[:8]}@example.com", hashed_password="!")
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def cleanup(user_id: int):
+    db = SessionLocal()
+    try:
+        journal_ids = db.query(JournalEntry.id).filter(JournalEntry.user_id == user_id)
+        db.query(JournalEntryLine).filter(JournalEntryLine.journal_entry_id.in_(journal_ids)).delete(synchronize_session=False)
+        db.query(JournalEntry).filter(JournalEntry.user_id == user_id).delete(synchronize_session=False)
+        for entry in db.query(LedgerEntry).filter(LedgerEntry.user_id == user_id).all():
+            db.delete(entry)
+        db.query(AccountBalance).filter(AccountBalance.user_id == user_id).delete(synchronize_session=False)
+        db.query(Account).filter(Account.user_id == user_id).delete(synchronize_session=False)
+        db.query(ChartOfAccountsVersion).filter(ChartOfAccountsVersion.user_id == user_id).delete(synchronize_session=False)
+        db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    invalidate_chart_cache(user_id)
+
+
+def run(postings: int, items: int, keep: bool, bulk: bool = False, chunk_size: int = BULK_CHUNK_SIZE):
+    init_db()
+    user_id = create_user()
+    try:
+        # First posting creates the chart of accounts and fills the account cache
+        post_ledger_entry(f"bench-warmup-{user_id}", synthetic_receipt(0, items), VALID, user_id)
+        reset_posting_stats()
+
+        started = time.perf_counter()
+        if bulk:
+            records = [(f"bench-{user_id}-{i}", synthetic_receipt(i, items), VALID) for i in range(postings)]
+            result = post_ledger_entries_bulk(records, user_id, chunk_size)
+            if result["failed"]:
+                print(f"{len(result['failed'])} failed, first: {result['failed'][0]}")
+        else:
+            for i in range(postings):
+                post_ledger_entry(f"bench-{user_id}-{i}", synthetic_receipt(i, items), VALID, user_id)
+        elapsed = time.perf_counter() - started
+
+        stats = get_posting_stats()
+        print(
+            f"{'bulk (chunk ' + str(chunk_size) + ') ' if bulk else ''}"
+            f"postings={postings} items/posting={items} elapsed={elapsed:.2f}s "
+            f"avg={stats['avg_ms']} ms -> {stats['postings_per_sec']} postings/s, "
+            f"{stats['postings_per_core_sec']} postings/core-s"
+        )
+    finally:
+        if not keep:
+            cleanup(user_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark single-transaction ledger posting")
+    parser.add_argument("--postings", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=3, help="Line items per receipt")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark user and its postings")
+    parser.add_argument("--bulk", action="store_true", help="Post through post_ledger_entries_bulk")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE, help="Records per bulk transaction")
+    args = parser.parse_args()
+    run(args.postings, args.items, args.keep, args.bulk, args.chunk_size)
@@ -0,0 +1,124 @@
+"""
+Load-test /process-receipt against a running backend.
+
+Start the server with the offline fake LLM provider so no API spend is incurred:
+
+    LLM_PROVIDER=fake FAKE_LLM_LATENCY_MEAN=0.8 uvicorn main:app
+
+then run, e.g.:
+
+    python scripts/benchmark_process_receipt.py --email me@example.com --password secret \\
+        --file sample_receipt.png --requests 50 --concurrency 1,4,16
+
+Reports throughput, latency percentiles and error counts per concurrency level.
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import time
+import logging
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post("/api/v1/auth/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_level(client, token, file_bytes, filename, total_requests, concurrency, ocr_engine):
+    """Fire total_requests uploads with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    "/api/v1/process-receipt",
+                    params={"ocr_engine": ocr_engine},
+                    files={"file": (filename, file_bytes)},
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total_requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput": total_requests / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "max": max(latencies) if latencies else 0.0,
+    }
+
+
+async def main(args):
+    with open(args.file, "rb") as f:
+        file_bytes = f.read()
+    filename = os.path.basename(args.file)
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+        token = args.token or await login(client, args.email, args.password)
+
+        health = await client.get("/api/v1/health/llm")
+        if health.status_code == 200 and health.json().get("primary") != "fake":
+            logger.warning("Server is not using LLM_PROVIDER=fake - this run will call a live provider")
+
+        print(f"{'conc':>5} {'reqs':>5} {'errs':>5} {'req/s':>8} {'p50 s':>8} {'p95 s':>8} {'max s':>8}")
+        for concurrency in levels:
+            result = await run_level(client, token, file_bytes, filename, args.requests, concurrency, args.ocr_engine)
+            print(
+                f"{result['concurrency']:>5} {result['requests']:>5} {result['errors']:>5} "
+                f"{result['throughput']:>8.2f} {result['p50']:>8.2f} {result['p95']:>8.2f} {result['max']:>8.2f}"
+            )
+
+        health = await client.get("/api/v1/health/llm")
+        if health.status_code == 200:
+            logger.info(f"LLM health after run: {health.json()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /process-receipt throughput and concurrency")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--email", help="Login email (or pass --token)")
+    parser.add_argument("--password", help="Login password")
+    parser.add_argument("--token", help="Existing bearer token")
+    parser.add_argument("--file", required=True, help="Receipt image/PDF to upload")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--ocr-engine", default="tesseract")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+    if not args.token and not (args.email and args.password):
+        parser.error("either --token or --email/--password is required")
+    asyncio.run(main(args))
@@ -0,0 +1,58 @@
+"""
+Close accounting periods for every user (e.g. from a nightly or month-end cron).
+
+Writes per-account closing balance snapshots for each month (or quarter) up to
+the last complete one, and recomputes periods reopened by back-dated journal
+entries. See app/services/period_close_service.py.
+
+Usage:
+    python scripts/close_periods.py
+    python scripts/close_periods.py --period-type quarter --through 2025-06-30
+    python scripts/close_periods.py --user-id 3
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import argparse
+from datetime import date
+from app.db.sql import SessionLocal, JournalEntry, init_db
+from app.services.period_close_service import close_periods, PERIOD_TYPES
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run(period_type: str, through, user_id=None):
+    init_db()
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        db = SessionLocal()
+        try:
+            user_ids = [uid for (uid,) in db.query(JournalEntry.user_id).distinct().all()]
+        finally:
+            db.close()
+
+    total = 0
+    for uid in user_ids:
+        closed = close_periods(uid, through, period_type)
+        total += len(closed)
+        if closed:
+            logger.info(f"User {uid}: closed {len(closed)} period(s), latest {closed[-1]['period_end']}")
+    logger.info(f"✅ Closed {total} period(s) for {len(user_ids)} user(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Close accounting periods and refresh reopened ones")
+    parser.add_argument("--period-type", choices=PERIOD_TYPES, default="month")
+    parser.add_argument("--through", type=date.fromisoformat, default=None,
+                        help="Close periods up to this date (default: last complete period)")
+    parser.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args()
+    run(args.period_type, args.through, args.user_id)
@@ -0,0 +1,142 @@
+"""
+Export the sentence-transformer embedder to ONNX with dynamic int8 quantisation.
+
+Writes model.onnx and tokenizer.json to EMBEDDING_ONNX_DIR (or --output), then
+checks the quantised model against the torch model: every sample text must
+embed with cosine agreement >= --min-cosine, otherwise the script exits with
+status 1 and the export should not be deployed.
+
+Requires the export-time extras (not needed by the API at runtime):
+    pip install torch transformers sentence-transformers onnx onnxruntime
+
+Usage:
+    python scripts/export_onnx_embedder.py
+    python scripts/export_onnx_embedder.py --verify-only --texts-file sample_texts.txt
+Then set EMBEDDING_BACKEND=onnx.
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import argparse
+import logging
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.onnx_embedder import OnnxEmbedder, MODEL_FILE, TOKENIZER_FILE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Minimum per-text cosine between the int8 export and the fp32 torch model
+MIN_COSINE = 0.98
+
+# Receipt-, ledger- and chat-shaped inputs covering the texts the app embeds
+SAMPLE_TEXTS = [
+    "STARBUCKS COFFEE #1234\n1 Caffe Latte Grande 4.95\n1 Blueberry Muffin 3.25\nSubtotal 8.20\nTax 0.66\nTotal 8.86\nVISA ****4821",
+    "Uber Technologies Inc. Trip on 2025-07-12. Base fare 12.40 Distance 8.3 mi Total $23.18",
+    "INVOICE #INV-2025-0042 Acme Consulting LLC. Professional services rendered, March 2025. Amount due: 4,500.00 USD. Net 30.",
+    "Hilton Garden Inn Paris. 2 nights deluxe room, city tax, breakfast. Total EUR 412.60",
+    "AWS Invoice. Amazon Web Services EC2 usage 1,204 hrs, S3 storage 3.2 TB. Total 1,873.44",
+    "Office Depot. Printer paper 5 reams, toner cartridge HP 26A, stapler. Total 187.23",
+    "Starbucks. Caffe Latte, Blueberry Muffin",
+    "Delta Air Lines. Flight, Baggage fee",
+    "What did I spend on travel last month?",
+    "Show me all invoices from Acme that are still pending",
+    "Comcast Business internet monthly service 149.99 due 2025-08-01",
+    "Payroll run for June: gross wages 48,200.00, employer taxes 3,687.30",
+    "Received payment from Globex Corporation, invoice 7781, 12,000.00 wire transfer",
+    "Rent - 123 Market Street Suite 400 - July 2025 - 6,250.00",
+    "Udemy course: Advanced Python for Finance. 89.99",
+    "Shell station 0412. Unleaded 11.2 gal @ 4.39. Total 49.17",
+    "Team lunch at Chipotle Mexican Grill, 8 burrito bowls, 96.40",
+    "Adobe Creative Cloud annual subscription renewal 659.88",
+    "",
+    "Ω receipt with unicode ☕ café crème 3,50 €",
+]
+
+
+def export(output_dir: Path, keep_fp32: bool, opset: int):
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    st_model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    dummy = tokenizer(["export sample"], return_tensors="pt")
+    fp32_path = output_dir / "model.fp32.onnx"
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    logger.info(f"Exporting {settings.EMBEDDING_MODEL_NAME} to {fp32_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+
+    logger.info("Applying dynamic int8 quantisation")
+    quantize_dynamic(str(fp32_path), str(output_dir / MODEL_FILE), weight_type=QuantType.QInt8)
+    tokenizer.backend_tokenizer.save(str(output_dir / TOKENIZER_FILE))
+
+    if not keep_fp32:
+        fp32_path.unlink()
+    size_mb = (output_dir / MODEL_FILE).stat().st_size / 1e6
+    logger.info(f"Wrote {output_dir / MODEL_FILE} ({size_mb:.1f} MB) and {TOKENIZER_FILE}")
+
+
+def verify(output_dir: Path, texts, min_cosine: float) -> bool:
+    from sentence_transformers import SentenceTransformer
+
+    reference = SentenceTransformer(settings.EMBEDDING_MODEL_NAME, device="cpu").encode(
+        texts, normalize_embeddings=True, show_progress_bar=False
+    )
+    quantised = OnnxEmbedder(output_dir).encode(texts)
+    cosines = np.sum(reference * quantised, axis=1)
+
+    worst = int(np.argmin(cosines))
+    logger.info(
+        f"Cosine agreement over {len(texts)} texts: min={cosines.min():.5f} "
+        f"mean={cosines.mean():.5f} p05={np.percentile(cosines, 5):.5f}"
+    )
+    if cosines[worst] < min_cosine:
+        logger.error(f"Agreement below {min_cosine} for: {texts[worst][:80]!r} ({cosines[worst]:.5f})")
+        return False
+    logger.info(f"✅ ONNX embedder agrees with torch (>= {min_cosine})")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export and verify the quantised ONNX embedder")
+    parser.add_argument("--output", default=settings.EMBEDDING_ONNX_DIR)
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--keep-fp32", action="store_true", help="Keep the unquantised export next to model.onnx")
+    parser.add_argument("--verify-only", action="store_true", help="Skip the export, only run the agreement check")
+    parser.add_argument("--texts-file", help="Extra texts to check, one per line")
+    parser.add_argument("--min-cosine", type=float, default=MIN_COSINE)
+    args = parser.parse_args()
+
+    output_dir = Path(args.output)
+    if not args.verify_only:
+        export(output_dir, args.keep_fp32, args.opset)
+
+    texts = list(SAMPLE_TEXTS)
+    if args.texts_file:
+        texts += [line.strip() for line in Path(args.texts_file).read_text().splitlines() if line.strip()]
+    if not verify(output_dir, texts, args.min_cosine):
+        sys.exit(1)
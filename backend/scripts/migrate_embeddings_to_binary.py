@@ -0,0 +1,98 @@
+"""
+Migrate receipt embeddings from BSON arrays to packed Binary.
+
+Rewrites the ``embedding`` field of documents in the ``receipts`` collection
+using app/utils/embedding_codec.py (float32, float16 or int8 with a stored
+scale). Documents already in the target format are skipped, so the script can
+be re-run safely and resumed after interruption.
+
+Usage:
+    python scripts/migrate_embeddings_to_binary.py                  # settings.EMBEDDING_STORAGE_FORMAT
+    python scripts/migrate_embeddings_to_binary.py --format int8
+    python scripts/migrate_embeddings_to_binary.py --dry-run
+    python scripts/migrate_embeddings_to_binary.py --format array   # roll back to BSON arrays
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import argparse
+import asyncio
+import time
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.utils.embedding_codec import STORAGE_FORMATS, encode_embedding, decode_embedding
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _needs_migration_filter(target_format: str) -> dict:
+    if target_format == "array":
+        return {"embedding": {"$type": "binData"}}
+    return {
+        "embedding": {"$exists": True},
+        "$or": [
+            {"embedding": {"$type": "array"}},
+            {"embedding_dtype": {"$ne": target_format}},
+        ],
+    }
+
+
+async def migrate(target_format: str, batch_size: int, dry_run: bool):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.MONGODB_DB_NAME]
+    collection = db.receipts
+
+    await client.admin.command('ping')
+    logger.info(f"Connected to MongoDB: {settings.MONGODB_DB_NAME}")
+
+    query = _needs_migration_filter(target_format)
+    pending = await collection.count_documents(query)
+    logger.info(f"{pending} document(s) to convert to '{target_format}'")
+    if dry_run or pending == 0:
+        client.close()
+        return
+
+    start = time.perf_counter()
+    converted = 0
+    skipped = 0
+    ops = []
+    cursor = collection.find(query, {"_id": 1, "embedding": 1, "embedding_dtype": 1, "embedding_scale": 1})
+    async for doc in cursor:
+        vector = decode_embedding(doc)
+        if vector is None:
+            skipped += 1
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": encode_embedding(vector, target_format)}))
+        if len(ops) >= batch_size:
+            await collection.bulk_write(ops, ordered=False)
+            converted += len(ops)
+            ops = []
+            logger.info(f"Converted {converted}/{pending}")
+    if ops:
+        await collection.bulk_write(ops, ordered=False)
+        converted += len(ops)
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Converted {converted} document(s), skipped {skipped} without embeddings "
+        f"in {elapsed:.1f}s ({converted / elapsed if elapsed else 0:.0f} docs/s)"
+    )
+    logger.info("Restart the API (or wait for VECTOR_INDEX_TTL) so in-process vector indexes reload")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert receipt embeddings to packed Binary storage")
+    parser.add_argument("--format", choices=STORAGE_FORMATS, default=settings.EMBEDDING_STORAGE_FORMAT)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Only count documents that would change")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.format, args.batch_size, args.dry_run))
@@ -0,0 +1,90 @@
+"""
+Move manual reconciliation links into the link table and build link groups.
+
+Before the link table existed, POST /ledger/{id}/link/{id} stored links as
+``linked_transactions`` arrays inside both Mongo receipt documents. This script
+copies those arrays into ``reconciliation_links`` (source "manual"), then
+rebuilds every user's reconciliation groups (connected components, see
+app/services/reconciliation_graph.py). Safe to re-run.
+
+Usage:
+    python scripts/migrate_reconciliation_links.py
+    python scripts/migrate_reconciliation_links.py --skip-mongo   # only rebuild groups
+    python scripts/migrate_reconciliation_links.py --dry-run
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import argparse
+import asyncio
+from collections import defaultdict
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.db.sql import SessionLocal, ReconciliationLink, init_db
+from app.services.reconciliation_graph import add_links, rebuild_groups, RELATIONSHIPS
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def load_mongo_links():
+    """Manual links per user from the legacy linked_transactions arrays"""
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    collection = client[settings.MONGODB_DB_NAME].receipts
+    await client.admin.command('ping')
+    logger.info(f"Connected to MongoDB: {settings.MONGODB_DB_NAME}")
+
+    links = defaultdict(dict)
+    query = {"linked_transactions.0": {"$exists": True}}
+    async for doc in collection.find(query, {"record_id": 1, "user_id": 1, "linked_transactions": 1}):
+        if doc.get("user_id") is None:
+            continue
+        for link in doc.get("linked_transactions") or []:
+            other = link.get("record_id")
+            relationship = link.get("relationship", "counterparty")
+            if not other or relationship not in RELATIONSHIPS:
+                continue
+            pair = tuple(sorted((doc["record_id"], other)))
+            links[doc["user_id"]][pair] = relationship
+    client.close()
+    return links
+
+
+def migrate(skip_mongo: bool, dry_run: bool):
+    init_db()
+
+    if not skip_mongo:
+        legacy = asyncio.run(load_mongo_links())
+        logger.info(f"Found {sum(len(p) for p in legacy.values())} legacy link(s) for {len(legacy)} user(s)")
+        if not dry_run:
+            for user_id, pairs in legacy.items():
+                written = add_links(
+                    user_id, [(a, b, relationship, 1.0) for (a, b), relationship in pairs.items()], source="manual"
+                )
+                logger.info(f"User {user_id}: stored {written} manual link(s)")
+
+    db = SessionLocal()
+    try:
+        user_ids = [uid for (uid,) in db.query(ReconciliationLink.user_id).distinct().all()]
+    finally:
+        db.close()
+    logger.info(f"Rebuilding reconciliation groups for {len(user_ids)} user(s)")
+    if dry_run:
+        return
+    for user_id in user_ids:
+        rebuild_groups(user_id)
+    logger.info("✅ Reconciliation groups are up to date")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate legacy manual links and rebuild reconciliation groups")
+    parser.add_argument("--skip-mongo", action="store_true", help="Do not read linked_transactions arrays from MongoDB")
+    parser.add_argument("--dry-run", action="store_true", help="Only count links and users")
+    args = parser.parse_args()
+    migrate(args.skip_mongo, args.dry_run)
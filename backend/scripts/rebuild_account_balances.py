@@ -0,0 +1,47 @@
+"""
+Rebuild or check the materialised account balances.
+
+account_balances is maintained on every journal post; rebuild it after a
+restore, after loading journal lines outside the ORM, or when first deploying
+the table. --check compares it with journal_entry_lines without writing and
+exits with status 1 if any account differs.
+
+Usage:
+    python scripts/rebuild_account_balances.py
+    python scripts/rebuild_account_balances.py --check
+    python scripts/rebuild_account_balances.py --user-id 3
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import argparse
+from app.db.sql import init_db
+from app.services.account_balances import rebuild_account_balances, check_account_balances
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or check materialised account balances")
+    parser.add_argument("--user-id", type=int, help="Only this user's accounts")
+    parser.add_argument("--check", action="store_true", help="Compare with the journal instead of rebuilding")
+    args = parser.parse_args()
+
+    init_db()
+    if args.check:
+        problems = check_account_balances(args.user_id)
+        for problem in problems[:50]:
+            logger.error(f"Inconsistent balance: {problem}")
+        if problems:
+            logger.error(f"{len(problems)} account(s) out of step; run without --check to rebuild")
+            sys.exit(1)
+        logger.info("✅ Account balances match the journal")
+    else:
+        rebuild_account_balances(args.user_id)
@@ -20,7 +20,9 @@ sys.path.insert(0, str(backend_dir))
 import asyncio
 import json
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.operations import SearchIndexModel
 from app.core.config import settings
+from app.services.vector_service_atlas import VECTOR_INDEX_NAME, FILTER_FIELDS, vector_index_definition
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -50,44 +52,46 @@ async def create_vector_search_index():
         # For local MongoDB, we'll use a manual approach with aggregation
         
         index_definition = {
-            "name": "vector_index",
-            "type": "vector",
-            "definition": {
-                "fields": [
-                    {
-                        "type": "vector",
-                        "path": "embedding",
-                        "numDimensions": 384,  # all-MiniLM-L6-v2 produces 384-dimensional vectors
-                        "similarity": "cosine"
-                    }
-                ]
-            }
+            "name": VECTOR_INDEX_NAME,
+            "type": "vectorSearch",
+            # Embedding field plus the user_id/status/record_id pre-filter fields
+            "definition": vector_index_definition()
         }
+        vector_field = index_definition["definition"]["fields"][0]
         
         logger.info("Vector Search Index Definition:")
         logger.info(f"  Name: {index_definition['name']}")
         logger.info(f"  Type: {index_definition['type']}")
-        logger.info(f"  Dimensions: {index_definition['definition']['fields'][0]['numDimensions']}")
-        logger.info(f"  Similarity: {index_definition['definition']['fields'][0]['similarity']}")
+        logger.info(f"  Dimensions: {vector_field['numDimensions']}")
+        logger.info(f"  Similarity: {vector_field['similarity']}")
+        logger.info(f"  Filter fields: {', '.join(FILTER_FIELDS)}")
+        
+        if settings.EMBEDDING_STORAGE_FORMAT != "array":
+            logger.warning(
+                "EMBEDDING_STORAGE_FORMAT is '%s': $vectorSearch needs embeddings stored as arrays. "
+                "Set EMBEDDING_STORAGE_FORMAT=array and run scripts/migrate_embeddings_to_binary.py --format array",
+                settings.EMBEDDING_STORAGE_FORMAT
+            )
         
         # Note: Vector search indexes in MongoDB require MongoDB Atlas (cloud) or MongoDB 6.0.11+ with vector search enabled
-        # For local MongoDB, we'll use cosine similarity in application code (already implemented)
+        # For local MongoDB, similarity is computed in application code (vector_store.py)
         
         # Try to create the index via Atlas Search API if available
         try:
-            # This requires MongoDB Atlas with Search API enabled
-            # For local MongoDB, skip this and use application-level similarity
-            search_indexes = await db.receipts.list_search_indexes()
-            existing_indexes = [idx for idx in search_indexes]
+            search_indexes = await db.receipts.list_search_indexes().to_list(length=None)
+            existing = next((idx for idx in search_indexes if idx.get("name") == VECTOR_INDEX_NAME), None)
             
-            if not any(idx.get("name") == "vector_index" for idx in existing_indexes):
+            if existing is None:
                 logger.info("Creating vector search index via Atlas Search API...")
-                # Note: This requires MongoDB Atlas and proper API access
-                # For local setup, the application will use cosine similarity in code
-                logger.warning("Vector search index creation requires MongoDB Atlas.")
-                logger.info("For local MongoDB, similarity search is handled in application code.")
+                await collection.create_search_index(SearchIndexModel(
+                    definition=index_definition["definition"],
+                    name=index_definition["name"],
+                    type=index_definition["type"]
+                ))
+                logger.info("Vector search index requested; Atlas builds it in the background")
             else:
-                logger.info("Vector search index already exists")
+                logger.info("Vector search index already exists, updating its definition")
+                await collection.update_search_index(VECTOR_INDEX_NAME, index_definition["definition"])
         except Exception as e:
             logger.info(f"Atlas Search API not available (expected for local MongoDB): {e}")
             logger.info("Using application-level cosine similarity (already implemented)")
@@ -104,7 +108,7 @@ async def create_vector_search_index():
         logger.info("2. Use the following configuration:")
         logger.info(json.dumps(index_definition, indent=2))
         logger.info("\nFor local MongoDB:")
-        logger.info("Vector similarity is handled in application code (vector_service.py)")
+        logger.info("Vector similarity is handled in application code (vector_store.py)")
         
         client.close()
         
@@ -0,0 +1,56 @@
+"""
+Create model indexes that are missing on existing tables.
+
+Base.metadata.create_all only creates indexes together with new tables, so
+indexes added to existing models (e.g. the (user_id, created_at, id) and
+(user_id, entry_date, id) keyset pagination indexes on ledger_entries and
+journal_entries) have to be added to a live database separately. Indexes whose
+columns changed are dropped and recreated. Safe to re-run.
+
+Usage:
+    python scripts/sync_sql_indexes.py
+    python scripts/sync_sql_indexes.py --dry-run
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+from sqlalchemy import inspect
+from app.db.sql import init_db, Base, engine
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def sync_indexes(dry_run: bool):
+    init_db()
+    inspector = inspect(engine)
+    created = 0
+    for table in Base.metadata.sorted_tables:
+        existing = {ix["name"]: ix["column_names"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            columns = [column.name for column in index.columns]
+            if existing.get(index.name) == columns:
+                continue
+            if index.name in existing:
+                logger.info(f"{table.name}: recreating {index.name} on ({', '.join(columns)})")
+                if not dry_run:
+                    index.drop(bind=engine)
+            else:
+                logger.info(f"{table.name}: creating {index.name} on ({', '.join(columns)})")
+            if not dry_run:
+                index.create(bind=engine)
+            created += 1
+    logger.info(f"✅ {created} index(es) {'to create' if dry_run else 'created'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create missing or changed SQL indexes")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the indexes that would be created")
+    args = parser.parse_args()
+    sync_indexes(args.dry_run)
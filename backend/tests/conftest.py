@@ -0,0 +1,68 @@
+import os
+import sys
+
+# Make the app package importable when pytest runs from backend/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Never touch a configured database from the tests
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+
+@pytest.fixture
+def db():
+    """Session on a fresh in-memory SQLite database; SessionLocal() in services opens the same one"""
+    from app.db.sql import Base, SessionLocal
+    from app.services.accounting_service import invalidate_chart_cache
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal.configure(bind=engine)
+    invalidate_chart_cache()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        invalidate_chart_cache()
+        engine.dispose()
+
+
+@pytest.fixture
+def user(db):
+    from app.db.sql import User
+
+    user = User(email="owner@example.com", hashed_password="!")
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def chart(db, user):
+    """The user's default chart of accounts"""
+    from app.services.accounting_service import initialize_chart_of_accounts
+
+    initialize_chart_of_accounts(user.id, db)
+    return user
+
+
+@pytest.fixture
+def receipt():
+    """Factory for (record_id, structured_data, orchestration_result) posting tuples"""
+    def make(record_id, total=10.0, date="2025-01-15", vendor="Acme", category="Office Supplies", **fields):
+        structured_data = {
+            "vendor": vendor, "date": date, "total": total, "amount": total, "currency": "USD",
+            "category": category, "payment_method": "Credit Card",
+            "items": [{"name": "item", "quantity": 1, "unit_price": total, "line_total": total}],
+            **fields,
+        }
+        orchestration_result = {
+            "validation_result": {"status": "valid", "confidence": 1.0, "issues": []}, "reasoning_trace": {}
+        }
+        return record_id, structured_data, orchestration_result
+    return make
@@ -0,0 +1,66 @@
+from sqlalchemy import insert
+
+from app.db.sql import AccountBalance, JournalEntry, JournalEntryLine
+from app.services.account_balances import check_account_balances, rebuild_account_balances
+from app.services.accounting_service import get_cached_account
+from app.services.posting_service import post_ledger_entry, post_ledger_entries_bulk
+
+
+def _balance(db, account_id):
+    db.expire_all()
+    row = db.get(AccountBalance, account_id)
+    return row.debit_total, row.credit_total
+
+
+def test_new_accounts_get_a_zero_balance_row(db, chart):
+    assert db.query(AccountBalance).filter(AccountBalance.user_id == chart.id).count() > 0
+    assert check_account_balances(chart.id) == []
+
+
+def test_orm_and_bulk_posts_keep_balances_in_step(db, chart, receipt):
+    post_ledger_entry(*receipt("r1", 25.0), chart.id, db=db)
+    post_ledger_entries_bulk([receipt("r2", 10.0), receipt("r3", 5.5)], chart.id, db=db)
+
+    expense = get_cached_account(chart.id, "5400", db)
+    assert _balance(db, expense.id) == (40.5, 0.0)
+    assert check_account_balances(chart.id) == []
+
+
+def test_line_updates_moves_and_deletes_are_tracked(db, chart, receipt):
+    post_ledger_entry(*receipt("r1", 25.0), chart.id, db=db)
+    post_ledger_entry(*receipt("r2", 10.0), chart.id, db=db)
+    journal = db.query(JournalEntry).filter(JournalEntry.reference == "r1").one()
+    debit_line = next(line for line in journal.lines if line.debit)
+    credit_line = next(line for line in journal.lines if line.credit)
+    old_account = debit_line.account_id
+    other = get_cached_account(chart.id, "5990", db)
+
+    debit_line.debit, credit_line.credit = 30.0, 30.0
+    db.commit()
+    assert check_account_balances(chart.id) == []
+
+    debit_line.account_id = other.id
+    db.commit()
+    assert _balance(db, other.id) == (30.0, 0.0)
+    assert _balance(db, old_account) == (10.0, 0.0)
+
+    db.delete(db.query(JournalEntry).filter(JournalEntry.reference == "r2").one())
+    db.commit()
+    assert _balance(db, old_account) == (0.0, 0.0)
+    assert check_account_balances(chart.id) == []
+
+
+def test_check_reports_drift_and_rebuild_repairs_it(db, chart, receipt):
+    post_ledger_entry(*receipt("r1", 25.0), chart.id, db=db)
+    journal_id = db.query(JournalEntry.id).filter(JournalEntry.reference == "r1").scalar()
+    expense = get_cached_account(chart.id, "5400", db)
+    # A Core insert bypasses the after-flush hook
+    db.execute(insert(JournalEntryLine), [{"journal_entry_id": journal_id, "account_id": expense.id, "debit": 7.0, "credit": 0.0}])
+    db.commit()
+
+    problems = check_account_balances(chart.id)
+    assert [(p["account_id"], p["issue"]) for p in problems] == [(expense.id, "totals")]
+
+    rebuild_account_balances(chart.id)
+    assert check_account_balances(chart.id) == []
+    assert _balance(db, expense.id) == (32.0, 0.0)
@@ -0,0 +1,78 @@
+from app.db.sql import JournalEntry, LedgerEntry
+from app.services import posting_service
+from app.services.account_balances import check_account_balances
+from app.services.posting_service import post_ledger_entry, post_ledger_entries_bulk
+
+
+def _record_ids(db, user_id):
+    db.expire_all()
+    return {record_id for (record_id,) in db.query(LedgerEntry.record_id).filter(LedgerEntry.user_id == user_id)}
+
+
+def test_duplicate_within_the_batch_fails_alone(db, chart, receipt):
+    result = post_ledger_entries_bulk([receipt("a"), receipt("b"), receipt("a", 99.0)], chart.id, db=db)
+
+    assert [row["record_id"] for row in result["posted"]] == ["a", "b"]
+    assert result["failed"] == [{"record_id": "a", "error": "Duplicate record_id in batch"}]
+    assert db.query(LedgerEntry.total).filter(LedgerEntry.record_id == "a").scalar() == 10.0
+
+
+def test_record_already_in_the_ledger_fails_alone(db, chart, receipt):
+    post_ledger_entry(*receipt("old"), chart.id, db=db)
+
+    result = post_ledger_entries_bulk([receipt("new1"), receipt("old"), receipt("new2")], chart.id, db=db)
+
+    assert {row["record_id"] for row in result["posted"]} == {"new1", "new2"}
+    assert result["failed"] == [{"record_id": "old", "error": "Already in the ledger"}]
+    assert _record_ids(db, chart.id) == {"old", "new1", "new2"}
+
+
+def test_invalid_record_fails_alone(db, chart, receipt):
+    record_id, structured_data, _ = receipt("broken")
+
+    result = post_ledger_entries_bulk([receipt("ok"), (record_id, structured_data, {})], chart.id, db=db)
+
+    assert [row["record_id"] for row in result["posted"]] == ["ok"]
+    assert result["failed"][0]["record_id"] == "broken"
+    assert result["failed"][0]["error"].startswith("Invalid record")
+
+
+def test_failed_chunk_falls_back_to_one_by_one(db, chart, receipt, monkeypatch):
+    original_chunk, original_post = posting_service._post_chunk, posting_service.post_ledger_entry
+    calls = []
+
+    def failing_chunk(session, user_id, prepared):
+        # Write the chunk, then fail: the rollback must drop it before the retry
+        original_chunk(session, user_id, prepared)
+        raise RuntimeError("chunk failed")
+
+    def post_one(record_id, *args, **kwargs):
+        calls.append(record_id)
+        if record_id == "bad":
+            raise RuntimeError("bad record")
+        return original_post(record_id, *args, **kwargs)
+
+    monkeypatch.setattr(posting_service, "_post_chunk", failing_chunk)
+    monkeypatch.setattr(posting_service, "post_ledger_entry", post_one)
+
+    result = post_ledger_entries_bulk(
+        [receipt("c1"), receipt("bad"), receipt("c2"), receipt("d1")], chart.id, chunk_size=3, db=db
+    )
+
+    assert calls == ["c1", "bad", "c2", "d1"]
+    assert {row["record_id"] for row in result["posted"]} == {"c1", "c2", "d1"}
+    assert result["failed"] == [{"record_id": "bad", "error": "bad record"}]
+    assert _record_ids(db, chart.id) == {"c1", "c2", "d1"}
+    assert db.query(JournalEntry).filter(JournalEntry.user_id == chart.id).count() == 3
+    assert check_account_balances(chart.id) == []
+
+
+def test_bulk_chunks_post_journals_and_balances(db, chart, receipt):
+    records = [receipt(f"r{i}", 1.0 + i) for i in range(7)] + [receipt("zero", 0.0)]
+
+    result = post_ledger_entries_bulk(records, chart.id, chunk_size=3, db=db)
+
+    assert len(result["posted"]) == 8 and result["failed"] == []
+    assert [row["journal"] for row in result["posted"]] == [True] * 7 + [False]
+    assert db.query(JournalEntry).filter(JournalEntry.user_id == chart.id).count() == 7
+    assert check_account_balances(chart.id) == []
@@ -0,0 +1,107 @@
+from datetime import date
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from app.db.sql import LedgerEntry, ReconciliationLink
+from app.services.bulk_reconciliation_service import (
+    RELATIONSHIPS, date_ordinals, match_period, reconcile_period
+)
+
+
+def _brute_force(cents, days, vendors, window, tolerance):
+    """Reference: every pair compared directly with the reconcile_transaction rules"""
+    pairs = set()
+    for i, j in combinations(range(len(cents)), 2):
+        if not cents[i] or not cents[j] or days[i] < 0 or days[j] < 0:
+            continue
+        if abs(cents[i] - cents[j]) > tolerance or abs(days[i] - days[j]) > window:
+            continue
+        a, b = vendors[i], vendors[j]
+        if a and b and a == b and days[i] == days[j] and cents[i] == cents[j]:
+            relationship = "duplicate"
+        elif a and b and a != b and a not in b and b not in a:
+            relationship = "counterparty"
+        else:
+            relationship = "related"
+        pairs.add((min(i, j), max(i, j), relationship))
+    return pairs
+
+
+def _pairs(matches):
+    return {
+        (min(i, j), max(i, j), RELATIONSHIPS[code])
+        for i, j, code in zip(matches["left"].tolist(), matches["right"].tolist(), matches["relationship"].tolist())
+    }
+
+
+@pytest.mark.parametrize("window,tolerance", [(0, 0), (3, 0), (2, 150)])
+def test_sort_merge_matches_brute_force(window, tolerance):
+    rng = np.random.default_rng(7)
+    n = 400
+    cents = rng.choice([0, 1000, 1050, 1100, 2500, 9999], size=n).astype(np.int64)
+    days = rng.integers(-1, 20, size=n).astype(np.int64)
+    vendors = rng.choice(["", "acme", "acme corp", "globex", "initech"], size=n)
+
+    matches = match_period(cents, days, vendors, window, tolerance)
+
+    expected = _brute_force(cents.tolist(), days.tolist(), vendors.tolist(), window, tolerance)
+    assert _pairs(matches) == expected
+    assert len(matches["left"]) == len(expected)
+
+
+def test_relationship_rules():
+    cents = np.array([1250, 1250, 1250, 1250, 1250], dtype=np.int64)
+    days = np.array([10, 10, 10, 12, 10], dtype=np.int64)
+    vendors = np.array(["cafe nero", "cafe nero", "globex", "cafe nero", "cafe nero ltd"])
+
+    pairs = _pairs(match_period(cents, days, vendors, date_window_days=2))
+
+    assert (0, 1, "duplicate") in pairs
+    assert (0, 2, "counterparty") in pairs
+    # Same vendor two days apart, and a vendor containing the other, are only related
+    assert (0, 3, "related") in pairs
+    assert (0, 4, "related") in pairs
+
+
+def test_records_without_amount_or_date_never_match():
+    cents = np.array([1000, 1000, 0, 0], dtype=np.int64)
+    days = np.array([5, -1, 5, 5], dtype=np.int64)
+    vendors = np.array(["acme", "acme", "acme", "acme"])
+
+    matches = match_period(cents, days, vendors)
+
+    assert matches["candidate_pairs"] == 0
+    assert len(matches["left"]) == 0
+
+
+def test_date_ordinals_marks_unparseable_dates():
+    ordinals = date_ordinals(["2025-01-05", "2025-01-06T10:00:00", "N/A", None])
+
+    assert ordinals[1] - ordinals[0] == 1
+    assert ordinals[2:].tolist() == [-1, -1]
+
+
+def test_reconcile_period_writes_links(db, user):
+    rows = [
+        ("r1", "Cafe Nero", date(2025, 1, 5), 12.5),
+        ("r2", "Cafe Nero", date(2025, 1, 5), 12.5),
+        ("r3", "Globex", date(2025, 1, 6), 12.5),
+        ("r4", "Initech", date(2025, 2, 20), 12.5),
+    ]
+    db.add_all([
+        LedgerEntry(user_id=user.id, record_id=record_id, vendor=vendor, date=day.isoformat(),
+                    transaction_date=day, total=total, amount=total)
+        for record_id, vendor, day, total in rows
+    ])
+    db.commit()
+
+    result = reconcile_period(user.id, date(2025, 1, 1), date(2025, 1, 31), date_window_days=1)
+
+    assert (result["duplicates"], result["counterparties"], result["related"]) == (1, 2, 0)
+    links = {
+        (link.record_id_a, link.record_id_b): link.relationship_type
+        for link in db.query(ReconciliationLink).filter(ReconciliationLink.user_id == user.id)
+    }
+    assert links == {("r1", "r2"): "duplicate", ("r1", "r3"): "counterparty", ("r2", "r3"): "counterparty"}
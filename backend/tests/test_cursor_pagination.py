@@ -0,0 +1,89 @@
+from datetime import datetime
+
+import pytest
+
+from app.db.sql import JournalEntry, LedgerEntry
+from app.services.accounting_service import get_journal_entries_page
+from app.services.ledger_service import get_ledger_entries_page
+from app.services.posting_service import post_ledger_entries_bulk
+from app.utils.cursor import decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def ledger(db, chart, receipt):
+    # Bulk chunks share one created_at, so most rows tie on the sort column
+    post_ledger_entries_bulk(
+        [receipt(f"r{i:02d}", 1.0 + i, date=f"2025-01-{i % 5 + 1:02d}") for i in range(23)],
+        chart.id, chunk_size=10, db=db
+    )
+    return chart
+
+
+def _walk(fetch, limit):
+    rows, cursor, pages = [], None, 0
+    while True:
+        page, cursor = fetch(limit=limit, cursor=cursor)
+        rows.extend(page)
+        pages += 1
+        if cursor is None:
+            return rows, pages
+
+
+def test_cursor_round_trip():
+    created = datetime(2025, 1, 2, 3, 4, 5, 678901)
+
+    assert decode_cursor("ledger", encode_cursor("ledger", created, 42)) == [created, 42]
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "e30", encode_cursor("journal", datetime(2025, 1, 1), 1)])
+def test_bad_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor("ledger", cursor)
+
+
+def test_ledger_pages_have_no_duplicates_or_gaps(db, ledger):
+    expected = [
+        record_id for (record_id,) in db.query(LedgerEntry.record_id).filter(LedgerEntry.user_id == ledger.id)
+        .order_by(LedgerEntry.created_at.desc(), LedgerEntry.id.desc())
+    ]
+
+    rows, pages = _walk(lambda **kw: get_ledger_entries_page(ledger.id, db=db, **kw), limit=7)
+
+    assert [row["record_id"] for row in rows] == expected
+    assert pages == 4
+
+
+def test_exact_multiple_of_the_page_size_ends_without_cursor(db, ledger):
+    page, cursor = get_ledger_entries_page(ledger.id, limit=23, db=db)
+
+    assert len(page) == 23
+    assert cursor is None
+
+
+def test_rows_added_between_pages_do_not_shift_later_pages(db, ledger, receipt):
+    first, cursor = get_ledger_entries_page(ledger.id, limit=5, db=db)
+    post_ledger_entries_bulk([receipt("newest", 50.0)], ledger.id, db=db)
+
+    page, cursor = get_ledger_entries_page(ledger.id, limit=100, cursor=cursor, db=db)
+
+    seen = [row["record_id"] for row in first + page]
+    assert "newest" not in seen
+    assert len(seen) == len(set(seen)) == 23
+
+
+def test_journal_pages_have_no_duplicates_or_gaps(db, ledger):
+    expected = [
+        journal_id for (journal_id,) in db.query(JournalEntry.id).filter(JournalEntry.user_id == ledger.id)
+        .order_by(JournalEntry.entry_date.desc(), JournalEntry.id.desc())
+    ]
+
+    rows, _ = _walk(lambda **kw: get_journal_entries_page(ledger.id, db=db, **kw), limit=4)
+
+    assert [row["id"] for row in rows] == expected
+
+
+def test_bad_cursor_raises_from_the_listing(db, ledger):
+    journal_cursor = encode_cursor("journal", datetime(2025, 1, 1), 1)
+
+    with pytest.raises(ValueError):
+        get_ledger_entries_page(ledger.id, cursor=journal_cursor, db=db)
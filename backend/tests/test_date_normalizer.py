@@ -0,0 +1,88 @@
+from datetime import date, datetime
+
+import pytest
+
+from app.db.sql import LedgerEntry
+from app.utils.date_normalizer import _scan, locale_for_currency, normalize_date
+
+JULY_12 = date(2025, 7, 12)
+
+
+@pytest.mark.parametrize("text", [
+    "2025-07-12",
+    "2025-7-12",
+    "2025-07-12T10:15:00Z",
+    "2025-07-12 10:15",
+    "12/07/2025",
+    "12-07-2025",
+    "12.07.2025",
+    "12/07/25",
+    "2025/07/12",
+    "2025.07.12",
+    "20250712",
+    "2025年7月12日",
+    "12 Jul 2025",
+    "12 July 2025",
+    "Jul 12 2025",
+    "July 12, 2025",
+    "12th July 2025",
+    "12-Jul-2025",
+    "Sat, 12 Jul 2025",
+    "12/07/2025 14:30:00",
+    "12/07/2025 2:30 PM",
+    "  12/07/2025  ",
+])
+def test_formats(text):
+    assert normalize_date(text) == JULY_12
+
+
+@pytest.mark.parametrize("locale,expected", [
+    ("en_US", date(2025, 3, 4)),
+    ("ja_JP", date(2025, 4, 3)),
+    ("de_DE", date(2025, 4, 3)),
+    (None, date(2025, 4, 3)),
+])
+def test_ambiguous_dates_follow_the_locale(locale, expected):
+    assert normalize_date("03/04/2025", locale) == expected
+
+
+def test_month_first_locale_still_reads_unambiguous_day_first_dates():
+    assert normalize_date("25/12/2025", "en_US") == date(2025, 12, 25)
+
+
+def test_result_does_not_depend_on_earlier_parses():
+    _scan.cache_clear()
+    first = normalize_date("03/04/2025")
+    normalize_date("13/04/2025")
+    normalize_date("04/13/2025", "en_US")
+    _scan.cache_clear()
+
+    assert normalize_date("03/04/2025") == first == date(2025, 4, 3)
+
+
+@pytest.mark.parametrize("value", [None, "", "N/A", "Unknown", "2025-02-30", "31/02/2025", "12/07/1850", "99999999"])
+def test_non_dates_are_none(value):
+    assert normalize_date(value) is None
+
+
+def test_date_and_datetime_pass_through():
+    assert normalize_date(datetime(2025, 7, 12, 23, 59)) == JULY_12
+    assert normalize_date(JULY_12) == JULY_12
+
+
+def test_currency_locales():
+    assert locale_for_currency("usd") == "en_US"
+    assert locale_for_currency("JPY") == "ja_JP"
+    assert locale_for_currency("EUR") is None
+    assert locale_for_currency(None) is None
+
+
+def test_ledger_writes_keep_transaction_date_in_step(db, user):
+    entry = LedgerEntry(user_id=user.id, record_id="r1", date="03/04/2025", currency="USD", total=1.0)
+    db.add(entry)
+    db.commit()
+    assert entry.transaction_date == date(2025, 3, 4)
+
+    entry.date = "N/A"
+    db.commit()
+    assert entry.transaction_date is None
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from app.services import vector_service
+
+
+def _candidate(record_id, similarity, **structured_data):
+    return {"record_id": record_id, "similarity": similarity, "structured_data": structured_data, "raw_text": ""}
+
+
+@pytest.fixture
+def block(monkeypatch):
+    candidates = []
+
+    async def find_blocking_candidates(embedding, user_id, structured_data, exclude_record_id=None):
+        return list(candidates)
+
+    monkeypatch.setattr(vector_service, "find_blocking_candidates", find_blocking_candidates)
+    return candidates
+
+
+def _check(structured_data):
+    return asyncio.run(vector_service.check_duplicates("new", [1.0, 0.0], 1, structured_data))
+
+
+def test_mixed_date_format_duplicate_is_flagged(block):
+    block.append(_candidate("old", 0.99, vendor="Cafe Nero", total=12.5, date="2025-01-05"))
+
+    result = _check({"vendor": "Cafe Nero", "total": 12.5, "date": "05/01/2025"})
+
+    assert result["is_duplicate"] is True
+    assert result["duplicate_record_id"] == "old"
+
+
+def test_mixed_date_format_counterparty_is_flagged(block):
+    block.append(_candidate("invoice", 0.8, vendor="Acme Supplies", total=99.0, date="2025-01-05T00:00:00"))
+
+    result = _check({"vendor": "Globex", "total": 99.0, "date": "05/01/2025"})
+
+    assert result["is_counterparty"] is True
+    assert result["counterparty_record_id"] == "invoice"
+
+
+def test_different_dates_are_not_duplicates(block):
+    block.append(_candidate("old", 0.99, vendor="Cafe Nero", total=12.5, date="2025-01-06"))
+
+    result = _check({"vendor": "Cafe Nero", "total": 12.5, "date": "05/01/2025"})
+
+    assert result["is_duplicate"] is False
@@ -0,0 +1,31 @@
+import pytest
+
+from app.api.schemas import ImportLedgerEntry
+
+
+def _entry(**fields):
+    return ImportLedgerEntry(vendor="Vendor", date="2025-01-05", total=1500.0, **fields)
+
+
+def test_usd_entry_converts_at_par():
+    assert _entry().usd_conversion() == (1.0, 1500.0)
+
+
+def test_rate_derived_from_usd_total():
+    assert _entry(currency="JPY", usd_total=10.0).usd_conversion() == (150.0, 10.0)
+
+
+def test_usd_total_derived_from_rate():
+    assert _entry(currency="JPY", exchange_rate=150.0).usd_conversion() == (150.0, 10.0)
+
+
+@pytest.mark.parametrize("fields", [
+    {"usd_total": 0.0},
+    {"usd_total": -10.0},
+    {"exchange_rate": 0.0},
+    {"exchange_rate": -150.0},
+    {},
+])
+def test_unconvertible_entry_raises_value_error(fields):
+    with pytest.raises(ValueError):
+        _entry(currency="JPY", **fields).usd_conversion()
@@ -0,0 +1,33 @@
+import pytest
+
+from app.core import llm
+from app.core.config import settings
+
+
+@pytest.fixture
+def llm_settings(monkeypatch):
+    def configure(**values):
+        for name, value in values.items():
+            monkeypatch.setattr(settings, name, value)
+    return configure
+
+
+def test_secondary_openai_does_not_inherit_gemini_model(llm_settings):
+    llm_settings(LLM_PROVIDER="gemini", LLM_MODEL="gemini-2.5-pro", LLM_SECONDARY_MODEL=None)
+
+    assert llm._default_model("gemini") == "gemini-2.5-pro"
+    assert llm._default_model("openai") == llm.DEFAULT_OPENAI_MODEL
+
+
+def test_secondary_model_setting(llm_settings):
+    llm_settings(LLM_PROVIDER="gemini", LLM_MODEL="gemini-2.5-pro", LLM_SECONDARY_MODEL="gpt-4o")
+
+    assert llm._default_model("openai") == "gpt-4o"
+
+
+def test_provider_defaults_without_configured_models(llm_settings):
+    llm_settings(LLM_PROVIDER="openai", LLM_MODEL=None, LLM_SECONDARY_MODEL=None)
+
+    assert llm._default_model("openai") == llm.DEFAULT_OPENAI_MODEL
+    assert llm._default_model("gemini") == llm.DEFAULT_GEMINI_MODEL
+    assert llm._default_model("fake") == llm.DEFAULT_FAKE_MODEL
@@ -0,0 +1,25 @@
+from app.utils.match_keys import blocking_key, blocking_fields
+
+
+def test_mixed_date_formats_share_a_blocking_key():
+    keys = {
+        blocking_key({"total": "12.50", "date": date})
+        for date in ("2025-01-05", "05/01/2025", "2025-01-05T00:00:00", " 2025-01-05 ")
+    }
+
+    assert keys == {(1250, "2025-01-05")}
+
+
+def test_ambiguous_date_follows_currency_locale():
+    assert blocking_key({"total": 10, "date": "03/04/2025", "currency": "USD"}) == (1000, "2025-03-04")
+    assert blocking_key({"total": 10, "date": "03/04/2025", "currency": "EUR"}) == (1000, "2025-04-03")
+
+
+def test_unparseable_date_keeps_raw_value():
+    assert blocking_key({"total": 10, "date": "Jan-ish 2025"}) == (1000, "Jan-ish 2025")
+
+
+def test_missing_total_or_date_has_no_key():
+    assert blocking_key({"total": 10}) is None
+    assert blocking_key({"date": "2025-01-05"}) is None
+    assert blocking_fields({"total": 0, "date": "2025-01-05"}) == {"total_cents": None, "match_date": None}
@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+SentenceTransformer = pytest.importorskip("sentence_transformers").SentenceTransformer
+
+from app.services.onnx_embedder import OnnxEmbedder, MODEL_FILE
+from scripts.export_onnx_embedder import SAMPLE_TEXTS, MIN_COSINE
+
+ONNX_DIR = Path(settings.EMBEDDING_ONNX_DIR)
+if not ONNX_DIR.is_absolute():
+    ONNX_DIR = Path(__file__).resolve().parent.parent / ONNX_DIR
+
+pytestmark = pytest.mark.skipif(
+    not (ONNX_DIR / MODEL_FILE).exists(),
+    reason=f"no ONNX export in {ONNX_DIR} (run scripts/export_onnx_embedder.py)"
+)
+
+
+def test_int8_export_agrees_with_fp32_model():
+    reference = SentenceTransformer(settings.EMBEDDING_MODEL_NAME, device="cpu").encode(
+        SAMPLE_TEXTS, normalize_embeddings=True, show_progress_bar=False
+    )
+    quantised = OnnxEmbedder(ONNX_DIR).encode(SAMPLE_TEXTS)
+
+    cosines = np.sum(reference * quantised, axis=1)
+
+    assert quantised.shape == reference.shape
+    assert cosines.min() >= MIN_COSINE, SAMPLE_TEXTS[int(np.argmin(cosines))]
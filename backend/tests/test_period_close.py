@@ -0,0 +1,89 @@
+from datetime import date, datetime
+
+import pytest
+
+from app.db.sql import JournalEntry, PeriodClose
+from app.services.accounting_service import get_account_totals
+from app.services.period_close_service import close_periods, get_cumulative_totals, period_end_for
+from app.services.posting_service import post_ledger_entry, post_ledger_entries_bulk
+
+
+def _totals(rows):
+    return {
+        row["account_id"]: (round(row["debit_total"], 2), round(row["credit_total"], 2))
+        for row in rows if row["debit_total"] or row["credit_total"]
+    }
+
+
+def _statuses(db, user_id):
+    db.expire_all()
+    return dict(db.query(PeriodClose.period_end, PeriodClose.status).filter(PeriodClose.user_id == user_id).all())
+
+
+@pytest.fixture
+def closed(db, chart, receipt):
+    """Entries from January to April, with January-March closed"""
+    for i, day in enumerate(["2025-01-10", "2025-01-31", "2025-02-14", "2025-03-03", "2025-03-31", "2025-04-20"]):
+        post_ledger_entry(*receipt(f"r{i}", 10.0 + i, date=day), chart.id, db=db)
+    close_periods(chart.id, through=date(2025, 3, 31), db=db)
+    return chart
+
+
+def test_period_end_for():
+    assert period_end_for(date(2024, 2, 10)) == date(2024, 2, 29)
+    assert period_end_for(date(2025, 12, 1)) == date(2025, 12, 31)
+    assert period_end_for(date(2025, 5, 1), "quarter") == date(2025, 6, 30)
+
+
+@pytest.mark.parametrize("as_of", [date(2025, 1, 31), date(2025, 2, 20), date(2025, 3, 31), date(2025, 4, 30), None])
+def test_snapshot_totals_match_full_aggregation(db, closed, as_of):
+    assert set(_statuses(db, closed.id).values()) == {"closed"}
+
+    expected = _totals(get_account_totals(closed.id, None, as_of, db=db))
+
+    assert _totals(get_cumulative_totals(closed.id, as_of, db=db)) == expected
+
+
+def test_back_dated_post_reopens_later_closes(db, closed, receipt):
+    post_ledger_entry(*receipt("late", 99.0, date="2025-02-01"), closed.id, db=db)
+
+    assert _statuses(db, closed.id) == {
+        date(2025, 1, 31): "closed", date(2025, 2, 28): "reopened", date(2025, 3, 31): "reopened",
+    }
+    expected = _totals(get_account_totals(closed.id, None, date(2025, 3, 31), db=db))
+    assert _totals(get_cumulative_totals(closed.id, date(2025, 3, 31), db=db)) == expected
+    assert set(_statuses(db, closed.id).values()) == {"closed"}
+
+
+def test_back_dated_bulk_post_reopens(db, closed, receipt):
+    post_ledger_entries_bulk([receipt("bulk", 5.0, date="2025-03-15")], closed.id, db=db)
+
+    assert _statuses(db, closed.id)[date(2025, 2, 28)] == "closed"
+    assert _statuses(db, closed.id)[date(2025, 3, 31)] == "reopened"
+
+
+def test_re_dating_out_of_a_closed_period_reopens_it(db, closed):
+    journal = db.query(JournalEntry).filter(JournalEntry.reference == "r0").one()
+    # Expired by the commit, so the old date is not in the attribute history yet
+    db.commit()
+
+    journal.entry_date = datetime(2025, 4, 25)
+    db.commit()
+
+    assert set(_statuses(db, closed.id).values()) == {"reopened"}
+    expected = _totals(get_account_totals(closed.id, None, date(2025, 1, 31), db=db))
+    assert _totals(get_cumulative_totals(closed.id, date(2025, 1, 31), db=db)) == expected
+
+
+def test_deleting_a_closed_entry_reopens(db, closed):
+    db.delete(db.query(JournalEntry).filter(JournalEntry.reference == "r3").one())
+    db.commit()
+
+    assert _statuses(db, closed.id)[date(2025, 2, 28)] == "closed"
+    assert _statuses(db, closed.id)[date(2025, 3, 31)] == "reopened"
+
+
+def test_posting_after_the_last_close_keeps_it(db, closed, receipt):
+    post_ledger_entry(*receipt("new", 1.0, date="2025-04-02"), closed.id, db=db)
+
+    assert set(_statuses(db, closed.id).values()) == {"closed"}